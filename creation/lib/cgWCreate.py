@@ -263,6 +263,7 @@ class GlideinSubmitDictFile(cgWDictFile.CondorJDLDictFile):
         self.add("+Owner", "undefined")
 
         # The logging of the jobs will be the same across grid types
+        # GLIDEIN_LOG_BUCKET is empty or the time bucket subdirectory, with the trailing slash
         self.add(
             "Log",
             "%s/user_$ENV(GLIDEIN_USER)/glidein_%s/entry_%s/condor_activity_$ENV(GLIDEIN_LOGNR)_$ENV(GLIDEIN_CLIENT).log"
@@ -270,12 +271,12 @@ class GlideinSubmitDictFile(cgWDictFile.CondorJDLDictFile):
         )
         self.add(
             "Output",
-            "%s/user_$ENV(GLIDEIN_USER)/glidein_%s/entry_%s/job.$(Cluster).$(Process).out"
+            "%s/user_$ENV(GLIDEIN_USER)/glidein_%s/entry_%s/$ENV(GLIDEIN_LOG_BUCKET)job.$(Cluster).$(Process).out"
             % (client_log_base_dir, glidein_name, entry_name),
         )
         self.add(
             "Error",
-            "%s/user_$ENV(GLIDEIN_USER)/glidein_%s/entry_%s/job.$(Cluster).$(Process).err"
+            "%s/user_$ENV(GLIDEIN_USER)/glidein_%s/entry_%s/$ENV(GLIDEIN_LOG_BUCKET)job.$(Cluster).$(Process).err"
             % (client_log_base_dir, glidein_name, entry_name),
         )
 
@@ -1276,6 +1276,16 @@ def populate_factory_descript(
     glidein_dict.add("RestartAttempts", conf["restart_attempts"])
     glidein_dict.add("RestartInterval", conf["restart_interval"])
     glidein_dict.add("EntryParallelWorkers", conf["entry_parallel_workers"])
+    glidein_dict.add("JobCacheFullRefresh", conf["job_cache_full_refresh"])
+    glidein_dict.add("WorkSnapshotMaxAge", conf["work_snapshot_max_age"])
+    glidein_dict.add("AdvertiseKeepAlive", conf["advertise_keepalive"])
+    glidein_dict.add("AdvertiseWithBindings", conf["advertise_with_bindings"])
+    glidein_dict.add("RRDBatchUpdates", conf["rrd_batch_updates"])
+    glidein_dict.add("RRDCachedDaemon", conf["rrd_cached_daemon"])
+    glidein_dict.add("RRDStatusWindows", conf["rrd_status_windows"])
+    glidein_dict.add("LogSingleWriter", conf["log_single_writer"])
+    glidein_dict.add("CleanupMaxRemoves", conf["cleanup_max_removes"])
+    glidein_dict.add("ClientLogBuckets", conf["client_log_buckets"])
 
     glidein_dict.add("RecoverableExitcodes", conf["recoverable_exitcodes"])
     glidein_dict.add("LogDir", conf.get_log_dir())
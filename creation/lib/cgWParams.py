@@ -357,6 +357,72 @@ class GlideinParams(cWParams.CommonParams):
             "Number of entries that will perform the work in parallel",
             None,
         )
+        self.defaults["job_cache_full_refresh"] = (
+            "0",
+            "seconds",
+            "Cache the glideins of each schedd, condor_q retrieves only the ones that changed status"
+            " and all of them every these seconds. 0 to query all the glideins every cycle",
+            None,
+        )
+        self.defaults["work_snapshot_max_age"] = (
+            "0",
+            "seconds",
+            "Seconds the Collector query of the requests is shared by the entry groups (e.g. half of loop_delay)."
+            " 0 for one query per group",
+            None,
+        )
+        self.defaults["advertise_keepalive"] = (
+            "0",
+            "seconds",
+            "Advertise only the classads that changed, and the others after these seconds"
+            " (less than the classad lifetime in the Collector). 0 to advertise all the classads every time",
+            None,
+        )
+        self.defaults["advertise_with_bindings"] = (
+            "False",
+            "Bool",
+            "Advertise the classads in process with the HTCondor Python bindings, if available, instead of condor_advertise",
+            None,
+        )
+        self.defaults["rrd_batch_updates"] = (
+            "False",
+            "Bool",
+            "Queue the RRD updates and write them in batches, once per cycle, through one rrdtool process",
+            None,
+        )
+        self.defaults["rrd_cached_daemon"] = (
+            "",
+            "address",
+            "Send the batched RRD updates to this rrdcached daemon (e.g. unix:/var/run/rrdcached.sock)."
+            " Empty to write the files directly",
+            None,
+        )
+        self.defaults["rrd_status_windows"] = (
+            "False",
+            "Bool",
+            "Compute the entry RRD averages from rolling windows kept in memory instead of fetching the RRD files",
+            None,
+        )
+        self.defaults["log_single_writer"] = (
+            "False",
+            "Bool",
+            "Write all the process log files from one log writer process, receiving the records through a unix socket",
+            None,
+        )
+        self.defaults["cleanup_max_removes"] = (
+            "0",
+            "NR",
+            "Max number of files removed by each log cleaner per cycle, continuing from a cursor in the next one"
+            " (0 for no limit)",
+            None,
+        )
+        self.defaults["client_log_buckets"] = (
+            "False",
+            "Bool",
+            "Put the glidein job files in one client log subdirectory per submission date,"
+            " removed at once when expired",
+            None,
+        )
 
         stage_defaults = cWParams.CommentedOrderedDict()
         stage_defaults["base_dir"] = ("/var/www/html/glidefactory/stage", "base_dir", "Stage base dir", None)
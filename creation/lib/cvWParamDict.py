@@ -861,6 +861,10 @@ def populate_frontend_descript(work_dir, frontend_dict, active_sub_list, params)
     frontend_dict.add("RestartInterval", params.restart_interval)
     frontend_dict.add("AdvertiseWithTCP", params.advertise_with_tcp)
     frontend_dict.add("AdvertiseWithMultiple", params.advertise_with_multiple)
+    frontend_dict.add("AdvertiseWithBindings", params.advertise_with_bindings)
+    frontend_dict.add("RRDBatchUpdates", params.rrd_batch_updates)
+    frontend_dict.add("RRDCachedDaemon", params.rrd_cached_daemon)
+    frontend_dict.add("LogSingleWriter", params.log_single_writer)
 
     frontend_dict.add("MonitorDisplayText", params.monitor_footer.display_txt)
     frontend_dict.add("MonitorLink", params.monitor_footer.href_link)
@@ -871,6 +875,13 @@ def populate_frontend_descript(work_dir, frontend_dict, active_sub_list, params)
     frontend_dict.add("ProcessLogs", str(params.log_retention["process_logs"]))
 
     frontend_dict.add("IgnoreDownEntries", params.config.ignore_down_entries)
+    frontend_dict.add("MatchEngine", params.config.match_engine)
+    frontend_dict.add("CompactClassads", params.config.compact_classads)
+    frontend_dict.add("ScheddQueryTimeout", params.config.schedd_query_timeout)
+    frontend_dict.add("JobCacheFullRefresh", params.config.job_cache_full_refresh)
+    frontend_dict.add("MatchCacheSize", params.config.match_cache_size)
+    frontend_dict.add("MatchCacheMaxAge", params.config.match_cache_max_age)
+    frontend_dict.add("AdvertiseKeepAlive", params.config.advertise_keepalive)
     frontend_dict.add("RampUpAttenuation", params.config.ramp_up_attenuation)
     frontend_dict.add("MaxIdleVMsTotal", params.config.idle_vms_total.max)
     frontend_dict.add("CurbIdleVMsTotal", params.config.idle_vms_total.curb)
@@ -894,6 +905,13 @@ def populate_group_descript(work_dir, group_descript_dict, sub_name, sub_params)
     group_descript_dict.add("PartGlideinMinMemory", sub_params.config.partitionable_glidein.min_memory)
 
     group_descript_dict.add("IgnoreDownEntries", sub_params.config.ignore_down_entries)
+    group_descript_dict.add("MatchEngine", sub_params.config.match_engine)
+    group_descript_dict.add("CompactClassads", sub_params.config.compact_classads)
+    group_descript_dict.add("ScheddQueryTimeout", sub_params.config.schedd_query_timeout)
+    group_descript_dict.add("JobCacheFullRefresh", sub_params.config.job_cache_full_refresh)
+    group_descript_dict.add("MatchCacheSize", sub_params.config.match_cache_size)
+    group_descript_dict.add("MatchCacheMaxAge", sub_params.config.match_cache_max_age)
+    group_descript_dict.add("AdvertiseKeepAlive", sub_params.config.advertise_keepalive)
     group_descript_dict.add("RampUpAttenuation", sub_params.config.ramp_up_attenuation)
     group_descript_dict.add("MaxRunningPerEntry", sub_params.config.running_glideins_per_entry.max)
     group_descript_dict.add("MinRunningPerEntry", sub_params.config.running_glideins_per_entry.min)
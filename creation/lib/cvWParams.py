@@ -97,6 +97,55 @@ class VOFrontendParams(cWParams.CommonParams):
             " When True the frontend will ignore down entries during matching counts",
             None,
         ]
+        group_config_defaults["match_engine"] = [
+            "",
+            "batched|eval",
+            "If set, the group setting will override the global value (or its default, batched)."
+            " How countMatch evaluates the match expression",
+            None,
+        ]
+        group_config_defaults["compact_classads"] = [
+            "",
+            "String",
+            "If set to True or False the group setting will override the global value (or its default, False)."
+            " Store the condor_q and condor_status results as compact records",
+            None,
+        ]
+        group_config_defaults["schedd_query_timeout"] = [
+            "",
+            "seconds",
+            "If set, the group setting will override the global value (or its default, 0)."
+            " Time each schedd has to answer condor_q",
+            None,
+        ]
+        group_config_defaults["job_cache_full_refresh"] = [
+            "",
+            "seconds",
+            "If set, the group setting will override the global value (or its default, 0)."
+            " Seconds between the full queries of the per-schedd job cache",
+            None,
+        ]
+        group_config_defaults["match_cache_size"] = [
+            "",
+            "NR",
+            "If set, the group setting will override the global value (or its default, 0)."
+            " Number of match results kept across cycles",
+            None,
+        ]
+        group_config_defaults["match_cache_max_age"] = [
+            "",
+            "seconds",
+            "If set, the group setting will override the global value (or its default, 86400)."
+            " How long the match results not used are kept",
+            None,
+        ]
+        group_config_defaults["advertise_keepalive"] = [
+            "",
+            "seconds",
+            "If set, the group setting will override the global value (or its default, 0)."
+            " Advertise only the changed classads, and the others after these seconds",
+            None,
+        ]
 
         common_config_running_total_defaults = cWParams.CommentedOrderedDict()
         common_config_running_total_defaults["max"] = [
@@ -465,6 +514,31 @@ class VOFrontendParams(cWParams.CommonParams):
             "Time interval NR sec which allow max restart attempts",
             None,
         )
+        self.defaults["advertise_with_bindings"] = (
+            "False",
+            "Bool",
+            "Advertise the classads in process with the HTCondor Python bindings, if available, instead of condor_advertise",
+            None,
+        )
+        self.defaults["rrd_batch_updates"] = (
+            "False",
+            "Bool",
+            "Queue the RRD updates and write them in batches, once per cycle, through one rrdtool process",
+            None,
+        )
+        self.defaults["rrd_cached_daemon"] = (
+            "",
+            "address",
+            "Send the batched RRD updates to this rrdcached daemon (e.g. unix:/var/run/rrdcached.sock)."
+            " Empty to write the files directly",
+            None,
+        )
+        self.defaults["log_single_writer"] = (
+            "False",
+            "Bool",
+            "Write all the process log files from one log writer process, receiving the records through a unix socket",
+            None,
+        )
 
         stage_defaults = cWParams.CommentedOrderedDict()
         stage_defaults["base_dir"] = ("/var/www/html/vofrontend/stage", "base_dir", "Stage base dir", None)
@@ -571,6 +645,51 @@ class VOFrontendParams(cWParams.CommonParams):
             "If set the frontend will ignore down entries during matching counts",
             None,
         ]
+        global_config_defaults["match_engine"] = [
+            "batched",
+            "batched|eval",
+            "How countMatch evaluates the match expression: batched, analyzing the expression once per group,"
+            " or eval, evaluating it for each job cluster and entry",
+            None,
+        ]
+        global_config_defaults["compact_classads"] = [
+            "False",
+            "Bool",
+            "Store the condor_q and condor_status results as compact records instead of dictionaries",
+            None,
+        ]
+        global_config_defaults["schedd_query_timeout"] = [
+            "0",
+            "seconds",
+            "Time each schedd has to answer condor_q, the slower schedds are left out of the cycle. 0 for no timeout",
+            None,
+        ]
+        global_config_defaults["job_cache_full_refresh"] = [
+            "0",
+            "seconds",
+            "Cache the jobs of each schedd, condor_q retrieves only the jobs that changed status"
+            " and all the jobs every these seconds. 0 to query all the jobs every cycle",
+            None,
+        ]
+        global_config_defaults["match_cache_size"] = [
+            "0",
+            "NR",
+            "Number of match results of job clusters and entries kept across cycles. 0 to match all of them every cycle",
+            None,
+        ]
+        global_config_defaults["match_cache_max_age"] = [
+            "86400",
+            "seconds",
+            "How long the match results not used are kept in the match cache",
+            None,
+        ]
+        global_config_defaults["advertise_keepalive"] = [
+            "0",
+            "seconds",
+            "Advertise only the classads that changed, and the others after these seconds"
+            " (less than the classad lifetime in the Collector). 0 to advertise all the classads every time",
+            None,
+        ]
         global_config_defaults["idle_vms_total"] = copy.deepcopy(common_config_vms_total_defaults)
         global_config_defaults["idle_vms_total_global"] = copy.deepcopy(common_config_vms_total_defaults)
         global_config_defaults["running_glideins_total"] = copy.deepcopy(common_config_running_total_defaults)
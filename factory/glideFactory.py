@@ -50,7 +50,7 @@ from glideinwms.factory import (
     glideFactoryMonitoring,
     glideFactoryPidLib,
 )
-from glideinwms.lib import cleanupSupport, condorMonitor, glideinWMSVersion, logSupport, util
+from glideinwms.lib import cleanupSupport, condorMonitor, glideinWMSVersion, logSupport, rrdSupport, util
 from glideinwms.lib.condorMonitor import CondorQEdit, QueryError
 
 FACTORY_DIR = os.path.dirname(glideFactoryLib.__file__)
@@ -85,6 +85,11 @@ def aggregate_stats(in_downtime):
     except Exception:
         # protect and report
         logSupport.log.exception("aggregateRRDStats failed: ")
+    try:
+        rrdSupport.flush_updates()
+    except Exception:
+        # protect and report
+        logSupport.log.exception("Writing the RRD updates failed: ")
     return stats
 
 
@@ -495,6 +500,10 @@ def spawn(
 
     factory_downtimes = glideFactoryDowntimeLib.DowntimeFile(glideinDescript.data["DowntimesFile"])
 
+    # Queue the RRD updates of the aggregation and write them in batches, optionally to an rrdcached daemon
+    if glideinDescript.data.get("RRDBatchUpdates", "False") in ("True", "1"):
+        rrdSupport.set_update_service(True, daemon=glideinDescript.data.get("RRDCachedDaemon") or None)
+
     logSupport.log.info("Available Entries: %s" % entries)
 
     group_size = int(math.ceil(float(len(entries)) / entry_process_count))
@@ -675,6 +684,8 @@ def spawn(
                     glideFactoryCredentials.process_global(classad, glideinDescript, frontendDescript)
                 except Exception:
                     logSupport.log.exception("Error occurred processing the globals classads: ")
+            credential_stats = glideFactoryCredentials.credential_store.get_stats()
+            logSupport.log.info("Credential files written: %(writes)i, unchanged: %(unchanged)i" % credential_stats)
 
             logSupport.log.info("Checking EntryGroups %s" % list(children.keys()))
             for group in list(children):  # making a copy of the keys because the dict is being modified in the loop
@@ -814,7 +825,7 @@ def increase_process_limit(new_limit=10000):
     Args:
         new_limit (int, optional): New process limit. Defaults to 10000.
     """
-    (soft, hard) = resource.getrlimit(resource.RLIMIT_NPROC)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NPROC)
     if soft < new_limit:
         try:
             resource.setrlimit(resource.RLIMIT_NPROC, (new_limit, hard))
@@ -861,6 +872,10 @@ def main(startup_dir):
     logSupport.log_dir = os.path.join(glideinDescript.data["LogDir"], "factory")
 
     # Configure factory process logging
+    # With a single log writer, the entry groups and all the forked children send it their records
+    # (the entry log directories are in LogDir, like the factory one)
+    if glideinDescript.data.get("LogSingleWriter", "False") in ("True", "1"):
+        logSupport.start_log_writer(glideinDescript.data["LogDir"])
     logSupport.log = logSupport.get_logger_with_handlers("factory", logSupport.log_dir, glideinDescript.data)
     logSupport.log.info("Logging initialized")
 
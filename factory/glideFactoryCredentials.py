@@ -10,11 +10,13 @@ ClassAds for the GlideinWMS factory.
 
 import base64
 import gzip
+import hashlib
 import io
 import os
 import pwd
 import re
 import shutil
+import time
 
 from glideinwms.lib import condorMonitor, logSupport
 from glideinwms.lib.defaults import force_bytes
@@ -31,6 +33,8 @@ SUPPORTED_AUTH_METHODS = [
     "idtoken",
     "scitoken",
 ]
+# Unchanged credential files are touched at most once in this interval (seconds), to keep them from the cleanup
+CREDENTIAL_TOUCH_INTERVAL = 3600
 
 
 class CredentialError(Exception):
@@ -138,11 +142,147 @@ class SubmitCredentials:
         return output
 
 
+def get_credential_digest(credential_data):
+    """Returns the content digest of a credential.
+
+    Args:
+        credential_data (bytes or str): The credential data.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    return hashlib.sha256(force_bytes(credential_data)).hexdigest()
+
+
+class CredentialStore:
+    """Content-addressed store of the credential files received from the Frontends.
+
+    The files are written, atomically with `safe_update`, only when the content digest changes.
+    The compressed credential is rebuilt only when the credential or the mapped IDTOKEN change.
+    After a restart the digests of the credential files are read from the disk.
+
+    Attributes:
+        digests (dict): The credential digest of each (username, client_id).
+        file_digests (dict): The digest of the content of each file written.
+        writes (int): Number of files written since the last `get_stats`.
+        unchanged (int): Number of files not written, since the last `get_stats`, because unchanged.
+    """
+
+    def __init__(self):
+        self.digests = {}
+        self.file_digests = {}
+        self.writes = 0
+        self.unchanged = 0
+
+    def get_digest(self, username, client_id):
+        """Returns the digest of the last credential received for a client.
+
+        Args:
+            username (str): The credentials' username.
+            client_id (str): The id used for tracking the submit credentials.
+
+        Returns:
+            str: The digest, None if the credential was not received.
+        """
+        return self.digests.get((username, client_id))
+
+    def update(self, username, client_id, credential_data, request_clientname):
+        """Updates the credential file and the compressed one, if their content changed.
+
+        Args:
+            username (str): The credentials' username.
+            client_id (str): The id used for tracking the submit credentials.
+            credential_data (bytes): The credentials to be advertised.
+            request_clientname (str): The client name passed by the frontend.
+
+        Returns:
+            tuple: A tuple containing the credential file name and the compressed file name.
+        """
+        proxy_dir = glideFactoryLib.factoryConfig.get_client_proxies_dir(username)
+        fname_short = f"credential_{request_clientname}_{glideFactoryLib.escapeParam(client_id)}"
+        fname = os.path.join(proxy_dir, fname_short)
+        fname_compressed = "%s_compressed" % fname
+        fname_mapped_idtoken = "%s_idtoken" % fname
+
+        digest = get_credential_digest(credential_data)
+        self.digests[(username, client_id)] = digest
+        self.update_file(fname, digest, lambda: credential_data, True)
+
+        idtoken_data = None
+        if os.path.exists(fname_mapped_idtoken):
+            with open(fname_mapped_idtoken) as idtf:
+                idtoken_data = idtf.read()
+        if idtoken_data is None:
+            compressed_digest = digest
+        else:
+            compressed_digest = get_credential_digest(f"{digest}####{idtoken_data}")
+
+        def get_compressed_data():
+            compressed_credential = compress_credential(credential_data)
+            if idtoken_data is None:
+                return b"glidein_credentials=%s" % compressed_credential
+            return b"%s####glidein_credentials=%s" % (force_bytes(idtoken_data), compressed_credential)
+
+        # the compressed content changes at every compression (gzip time stamp), so the digest is of the inputs
+        self.update_file(fname_compressed, compressed_digest, get_compressed_data, False)
+
+        return fname, fname_compressed
+
+    def update_file(self, fname, digest, get_data, content_digest):
+        """Writes a file if its digest changed, or touches it once in a while.
+
+        Args:
+            fname (str): The file name.
+            digest (str): The digest of the new content.
+            get_data (function): Returns the new content, called only if the file is written.
+            content_digest (bool): True if `digest` is the digest of the content, so the file on disk
+                can be compared after a restart.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        old_digest = self.file_digests.get(fname)
+        try:
+            fstat = os.stat(fname)
+        except OSError:
+            fstat = None
+            old_digest = None
+        if fstat is not None and old_digest is None and content_digest:
+            with open(fname, "rb") as fl:
+                old_digest = get_credential_digest(fl.read())
+        if fstat is not None and old_digest == digest:
+            self.file_digests[fname] = digest
+            self.unchanged += 1
+            if time.time() - fstat.st_mtime > CREDENTIAL_TOUCH_INTERVAL:
+                os.utime(fname)
+            return False
+        safe_update(fname, get_data())
+        self.file_digests[fname] = digest
+        self.writes += 1
+        return True
+
+    def get_stats(self):
+        """Returns and resets the counters of the files written and unchanged.
+
+        Returns:
+            dict: "writes" and "unchanged" counters.
+        """
+        stats = {"writes": self.writes, "unchanged": self.unchanged}
+        self.writes = 0
+        self.unchanged = 0
+        return stats
+
+
+# Credentials received by the Factory
+credential_store = CredentialStore()
+
+
 def update_credential_file(username, client_id, credential_data, request_clientname):
     """Update the credential file.
 
     This function updates the credential files by writing the new credential data in one file and
     a compressed version of the glidein credentials in a second file.
+    The files are written only if the content changed, see `CredentialStore`.
 
     Args:
         username (str): The credentials' username.
@@ -153,29 +293,8 @@ def update_credential_file(username, client_id, credential_data, request_clientn
     Returns:
         tuple: A tuple containing the credential file name and the compressed file name.
     """
-    proxy_dir = glideFactoryLib.factoryConfig.get_client_proxies_dir(username)
-    fname_short = f"credential_{request_clientname}_{glideFactoryLib.escapeParam(client_id)}"
-    fname = os.path.join(proxy_dir, fname_short)
-    fname_compressed = "%s_compressed" % fname
-    fname_mapped_idtoken = "%s_idtoken" % fname
-
-    msg = "updating credential file %s" % fname
-    logSupport.log.debug(msg)
-
-    safe_update(fname, credential_data)
-    compressed_credential = compress_credential(credential_data)
-    if os.path.exists(fname_mapped_idtoken):
-        idtoken_data = ""
-        with open(fname_mapped_idtoken) as idtf:
-            for line in idtf.readlines():
-                idtoken_data += line
-        safe_update(
-            fname_compressed, b"%s####glidein_credentials=%s" % (force_bytes(idtoken_data), compressed_credential)
-        )
-    else:
-        safe_update(fname_compressed, b"glidein_credentials=%s" % (compressed_credential))
-
-    return fname, fname_compressed
+    logSupport.log.debug(f"updating credential {client_id} of {request_clientname} for {username}")
+    return credential_store.update(username, client_id, credential_data, request_clientname)
 
 
 # Comment by Igor:
@@ -511,45 +630,48 @@ def safe_update(fname, credential_data):
 
     If the file does not exist, it is created. If it exists, the file is updated
     only if the content has changed, with a backup created if necessary.
+    The new content is written and synced to a temporary file, then renamed, so the file is
+    replaced atomically.
 
     Args:
         fname (str): The filename of the credential file.
         credential_data (bytes or str): The credential data to write.
+
+    Returns:
+        bool: True if the file was written, False if the content was the same.
     """
     logSupport.log.debug(f"Creating/updating credential file {fname}")
-    if not os.path.isfile(fname):
-        # new file, create - os.open() returns a file descriptor (int), cannot use context/with
-        fd = os.open(fname, os.O_CREAT | os.O_WRONLY, 0o600)
-        try:
-            os.write(fd, credential_data)
-        finally:
-            os.close(fd)
-    else:
+    credential_data = force_bytes(credential_data)
+    old_exists = os.path.isfile(fname)
+    if old_exists:
         # old file exists, check if same content
-        with open(fname) as fl:
+        with open(fname, "rb") as fl:
             old_data = fl.read()
+        #  if proxy_data == old_data nothing changed, done
+        if credential_data == old_data:
+            return False
+        # proxy changed, need to update
+        # remove any previous backup file, if it exists
+        try:
+            os.remove(fname + ".old")
+        except OSError:
+            pass  # just protect
+
+    # create new file - os.open() returns a file descriptor (int), cannot use context/with
+    fd = os.open(fname + ".new", os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, credential_data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    if old_exists:
+        # copy the old file to a tmp bck and rename new one to the official name
+        try:
+            shutil.copy2(fname, fname + ".old")
+        except (OSError, shutil.Error):
+            # file not found, permission error, same file
+            pass  # just protect
 
-        #  if proxy_data == old_data nothing changed, done else
-        if not (credential_data == old_data):
-            # proxy changed, need to update
-            # remove any previous backup file, if it exists
-            try:
-                os.remove(fname + ".old")
-            except OSError:
-                pass  # just protect
-
-            # create new file - os.open() returns a file descriptor (int), cannot use context/with
-            fd = os.open(fname + ".new", os.O_CREAT | os.O_WRONLY, 0o600)
-            try:
-                os.write(fd, credential_data)
-            finally:
-                os.close(fd)
-
-            # copy the old file to a tmp bck and rename new one to the official name
-            try:
-                shutil.copy2(fname, fname + ".old")
-            except (OSError, shutil.Error):
-                # file not found, permission error, same file
-                pass  # just protect
-
-            os.rename(fname + ".new", fname)
+    os.rename(fname + ".new", fname)
+    return True
@@ -20,6 +20,7 @@ from glideinwms.factory import glideFactoryConfig, glideFactoryCredentials, glid
 from glideinwms.factory import glideFactoryInterface as gfi
 from glideinwms.factory import glideFactoryLib, glideFactoryLogParser, glideFactoryMonitoring
 from glideinwms.lib import classadSupport, cleanupSupport, defaults, glideinWMSVersion, logSupport, token_util, util
+from glideinwms.lib.disk_cache import DiskCache
 from glideinwms.lib.util import chmod
 
 
@@ -56,15 +57,25 @@ class Entry:
         # Schedd where my glideins will be submitted
         self.scheddName = self.jobDescript.data["Schedd"]
 
+        # With JobCacheFullRefresh (seconds) the glideins are cached in the entry directory and condor_q
+        # retrieves only the ones that changed status, all of them every JobCacheFullRefresh seconds
+        self.jobCacheRefresh = int(self.glideinDescript.data.get("JobCacheFullRefresh", 0) or 0)
+        self.jobCache = None
+        if self.jobCacheRefresh > 0:
+            self.jobCache = DiskCache(os.path.join(self.startupDir, "entry_%s" % self.name))
+
         # glideFactoryLib.log_files
         self.log = logSupport.get_logger_with_handlers(self.name, self.logDir, self.glideinDescript.data)
 
+        # Maximum number of files removed by each cleaner in a cycle, 0 means no limit
+        self.cleanupMaxRemoves = int(self.glideinDescript.data.get("CleanupMaxRemoves", 0) or 0)
         cleaner = cleanupSupport.DirCleanupWSpace(
             self.logDir,
             r"(condor_activity_.*\.log\..*\.ftstpk)",
             glideFactoryLib.days2sec(float(self.glideinDescript.data["CondorLogRetentionMaxDays"])),
             glideFactoryLib.days2sec(float(self.glideinDescript.data["CondorLogRetentionMinDays"])),
             float(self.glideinDescript.data["CondorLogRetentionMaxMBs"]) * pow(2, 20),
+            max_removes=self.cleanupMaxRemoves,
         )
         cleanupSupport.cleaners.add_cleaner(cleaner)
 
@@ -109,6 +120,9 @@ class Entry:
             self.glideinDescript.data["ClientLogBaseDir"],
             self.glideinDescript.data["ClientProxiesBaseDir"],
         )
+        # With ClientLogBuckets the job files of the glideins go in subdirectories by submission date
+        client_log_buckets = self.glideinDescript.data.get("ClientLogBuckets", "False")
+        self.gflFactoryConfig.client_log_buckets = client_log_buckets in ("True", "1")
 
         self.gflFactoryConfig.max_submits = int(self.jobDescript.data["MaxSubmitRate"])
         self.gflFactoryConfig.max_cluster_size = int(self.jobDescript.data["SubmitCluster"])
@@ -119,8 +133,11 @@ class Entry:
         self.gflFactoryConfig.max_releases = int(self.jobDescript.data["MaxReleaseRate"])
         self.gflFactoryConfig.release_sleep = float(self.jobDescript.data["ReleaseSleep"])
         self.gflFactoryConfig.log_stats = glideFactoryMonitoring.condorLogSummary(log=self.log)
+        # the averages in the rrd_*.xml files come from rolling windows of the RRD updates instead of rrdtool fetch
         self.gflFactoryConfig.rrd_stats = glideFactoryMonitoring.FactoryStatusData(
-            log=self.log, base_dir=self.monitoringConfig.monitor_dir
+            log=self.log,
+            base_dir=self.monitoringConfig.monitor_dir,
+            use_windows=self.glideinDescript.data.get("RRDStatusWindows", "False") in ("True", "1"),
         )
         self.gflFactoryConfig.rrd_stats.base_dir = self.monitorDir
 
@@ -132,12 +149,15 @@ class Entry:
         # Add cleaners for the user log directories
         for username in self.frontendDescript.get_all_usernames():
             user_log_dir = self.gflFactoryConfig.get_client_log_dir(self.name, username)
+            # the job files can be in time buckets (ClientLogBuckets), also if disabled afterward
             cleaner = cleanupSupport.DirCleanupWSpace(
                 user_log_dir,
                 r"(job\..*\.out)|(job\..*\.err)",
                 glideFactoryLib.days2sec(float(self.glideinDescript.data["JobLogRetentionMaxDays"])),
                 glideFactoryLib.days2sec(float(self.glideinDescript.data["JobLogRetentionMinDays"])),
                 float(self.glideinDescript.data["JobLogRetentionMaxMBs"]) * pow(2, 20),
+                max_removes=self.cleanupMaxRemoves,
+                bucket_format=glideFactoryLib.CLIENT_LOG_BUCKET_FORMAT,
             )
             cleanupSupport.cleaners.add_cleaner(cleaner)
 
@@ -147,6 +167,7 @@ class Entry:
                 glideFactoryLib.days2sec(float(self.glideinDescript.data["CondorLogRetentionMaxDays"])),
                 glideFactoryLib.days2sec(float(self.glideinDescript.data["CondorLogRetentionMinDays"])),
                 float(self.glideinDescript.data["CondorLogRetentionMaxMBs"]) * pow(2, 20),
+                max_removes=self.cleanupMaxRemoves,
             )
             cleanupSupport.cleaners.add_cleaner(cleaner)
 
@@ -355,7 +376,14 @@ class Entry:
             condorMonitor.CondorQ: A loaded CondorQ object with job information.
         """
         try:
-            return glideFactoryLib.getCondorQData(self.name, None, self.scheddName, factoryConfig=self.gflFactoryConfig)
+            return glideFactoryLib.getCondorQData(
+                self.name,
+                None,
+                self.scheddName,
+                factoryConfig=self.gflFactoryConfig,
+                job_cache=self.jobCache,
+                job_cache_refresh=self.jobCacheRefresh,
+            )
         except Exception:
             self.log.info("Schedd %s not responding, skipping" % self.scheddName)
             tb = traceback.format_exception(sys.exc_info()[0], sys.exc_info()[1], sys.exc_info()[2])
@@ -688,6 +716,10 @@ class Entry:
 
         self.loadContext()
 
+        if self.gflFactoryConfig.rrd_stats.windows is not None:
+            # the values written to the RRD files are added to the rolling windows
+            self.monitoringConfig.status_data = self.gflFactoryConfig.rrd_stats
+
         self.log.info("Computing log_stats diff for %s" % self.name)
         self.gflFactoryConfig.log_stats.computeDiff()
         self.log.info("log_stats diff computed")
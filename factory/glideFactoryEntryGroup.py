@@ -19,7 +19,6 @@ Command line arguments:
        It may change between Factory reconfigurations.
 """
 
-
 import os
 import os.path
 import pickle
@@ -31,7 +30,7 @@ from glideinwms.factory import glideFactoryDowntimeLib, glideFactoryEntry
 from glideinwms.factory import glideFactoryInterface as gfi
 from glideinwms.factory import glideFactoryLib as gfl
 from glideinwms.factory import glideFactoryPidLib
-from glideinwms.lib import classadSupport, cleanupSupport, logSupport
+from glideinwms.lib import classadSupport, cleanupSupport, condorManager, logSupport, rrdSupport
 from glideinwms.lib.fork import fetch_fork_result_list, ForkManager, print_child_processes
 from glideinwms.lib.pidSupport import register_sighandler, unregister_sighandler
 
@@ -141,6 +140,11 @@ def find_work(factory_in_downtime, glideinDescript, frontendDescript, group_name
                 continue
             work[w] = work_oldkey[w]
 
+    logSupport.log.debug(
+        "Symmetric key cache: %i hits, %i shared hits, %i decrypted"
+        % (gfi.sym_key_cache.hits, gfi.sym_key_cache.store_hits, gfi.sym_key_cache.misses)
+    )
+
     # Append empty work item for entries that do not have work
     # This is required to trigger glidein sanitization further in the code
     for ent in my_entries:
@@ -547,6 +551,10 @@ def iterate(parent_pid, sleep_time, advertize_rate, glideinDescript, frontendDes
                             except Exception:
                                 entry.log.warning(f"Error writing stats for entry '{entry.name}'")
                                 entry.log.exception(f"Error writing stats for entry '{entry.name}': ")
+                        try:
+                            rrdSupport.flush_updates()
+                        except Exception:
+                            logSupport.log.exception("Error writing the RRD updates: ")
 
                         try:
                             os.write(w, pickle.dumps(return_dict))
@@ -555,6 +563,7 @@ def iterate(parent_pid, sleep_time, advertize_rate, glideinDescript, frontendDes
                             # runaway processes.
                             logSupport.log.exception(f"Error writing pickled state for entries '{entrylists[cpu]}': ")
                         os.close(w)
+                        logSupport.flush_log_writer()
                         # Exit without triggering SystemExit exception
                         # Note that this is skippihg also all the cleanup (files closing, finally clauses)
                         os._exit(0)
@@ -625,6 +634,8 @@ def main(parent_pid, sleep_time, advertize_rate, startup_dir, entry_names, group
 
     # Set up the lock_dir
     gfi.factoryConfig.lock_dir = os.path.join(startup_dir, "lock")
+    # Symmetric keys decrypted by any of the Entry Groups are shared via the lock_dir
+    gfi.sym_key_cache = gfi.SymKeyCache(os.path.join(gfi.factoryConfig.lock_dir, "sym_key_cache.pickle"))
 
     # Read information about the glidein and frontends
     glideinDescript = gfc.GlideinDescript()
@@ -641,7 +652,26 @@ def main(parent_pid, sleep_time, advertize_rate, startup_dir, entry_names, group
     my_entries = {}
     glidein_entries = glideinDescript.data["Entries"]
 
-    # Initialize log files for entry groups
+    # One Collector query per cycle shared by all the groups, used for WorkSnapshotMaxAge seconds, 0 to disable
+    gfi.factoryConfig.work_snapshot_max_age = int(glideinDescript.data.get("WorkSnapshotMaxAge", 0) or 0)
+    gfi.factoryConfig.work_snapshot_entries = glidein_entries.split(",")
+
+    # Advertise in process with the HTCondor Python bindings, if available, instead of condor_advertise
+    if glideinDescript.data.get("AdvertiseWithBindings", "False") in ("True", "1"):
+        condorManager.set_advertise_with_bindings(True)
+
+    # Advertise only the changed classads, and the others every AdvertiseKeepAlive seconds, 0 to disable
+    advertise_keepalive = int(glideinDescript.data.get("AdvertiseKeepAlive", 0))
+    if advertise_keepalive > 0:
+        gfi.factoryConfig.advertise_cache = classadSupport.AdvertiseCache(advertise_keepalive)
+
+    # Queue the RRD updates of the entries and write them in batches, optionally to an rrdcached daemon
+    if glideinDescript.data.get("RRDBatchUpdates", "False") in ("True", "1"):
+        rrdSupport.set_update_service(True, daemon=glideinDescript.data.get("RRDCachedDaemon") or None)
+
+    # Initialize log files for entry groups, using the log writer of the Factory if enabled
+    if glideinDescript.data.get("LogSingleWriter", "False") in ("True", "1"):
+        logSupport.start_log_writer(glideinDescript.data["LogDir"])
     logSupport.log_dir = os.path.join(glideinDescript.data["LogDir"], "factory")
     logSupport.log = logSupport.get_logger_with_handlers(group_name, logSupport.log_dir, glideinDescript.data)
     logSupport.log.info(f"Logging initialized for {group_name}")
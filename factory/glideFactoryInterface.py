@@ -8,9 +8,13 @@ from the Collector.
 """
 
 import fcntl
+import hashlib
 import os
+import pickle
 import time
 
+from collections import OrderedDict
+
 from glideinwms.lib import classadSupport, condorExe, condorManager, condorMonitor, logSupport
 
 ############################################################
@@ -103,6 +107,16 @@ class FactoryConfig:
         # i.e. the -pool argument coption to HTCondor cmdline tools
         self.factory_collector = None
 
+        # Work snapshot shared by the Entry Groups (see findGroupWork)
+        # Seconds a snapshot of the requests is valid, 0 to query the Collector in each group
+        self.work_snapshot_max_age = 0
+        # All the entries of the Factory, queried once for all the groups
+        self.work_snapshot_entries = None
+
+        # classadSupport.AdvertiseCache to advertise only the changed glidefactory and glidefactoryclient classads
+        # None to advertise all of them every time
+        self.advertise_cache = None
+
 
 # global configuration of the module
 factoryConfig = FactoryConfig()
@@ -148,6 +162,374 @@ class MultiExeError(condorExe.ExeError):
         condorExe.ExeError.__init__(self, error_str)
 
 
+class SymKeyCache:
+    """Cache of the symmetric keys and parameters decrypted from the Frontend requests.
+
+    Extracting the symmetric key requires an RSA private key decryption for each request classad.
+    A Frontend group uses the same symmetric key, and encrypted key code, for all its requests of a cycle,
+    so the cache saves the decryptions of the other requests of the group.
+    A group sends the same encrypted key in the following cycles only when it keeps its symmetric key
+    across cycles, i.e. with the Frontend advertise cache (`Key4AdvertizeBuilder` state file, renewed daily).
+    Only then the cached keys are hit across cycles, otherwise each cycle brings new keys.
+    The key codes are cached in memory, bounded in size (LRU) and with a TTL, and optionally in a file
+    (e.g. in the lock directory) shared by all the Entry Group processes.
+    The decrypted parameter values are cached only in memory.
+
+    The cache key is a hash of the Factory key ID, ReqPubKeyID and ReqEncKeyCode, so a new Factory key
+    or a new Frontend key never matches an old entry. Failed decryptions are not cached.
+    """
+
+    def __init__(self, store_fname=None, ttl=3600, max_entries=1000, max_values=10000):
+        """Initialize the cache.
+
+        Args:
+            store_fname (str): File shared across processes to store the key codes. None to keep only the memory cache.
+            ttl (int): Seconds a key is cached before it is decrypted again with the RSA key.
+            max_entries (int): Maximum number of symmetric keys in the cache.
+            max_values (int): Maximum number of decrypted values in the cache.
+        """
+        self.store_fname = store_fname
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_values = max_values
+        self.keys = OrderedDict()  # digest -> (sym_key_obj, key_code, expiration time)
+        self.values = OrderedDict()  # (key_code, encrypted value) -> decrypted value
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_digest(pub_key_obj, pub_key_id, enc_key_code):
+        """Return the cache key for an encrypted symmetric key.
+
+        Args:
+            pub_key_obj (GlideinKey): Factory key used to decrypt the symmetric key.
+            pub_key_id (str): ReqPubKeyID from the request classad.
+            enc_key_code (str): ReqEncKeyCode from the request classad.
+
+        Returns:
+            str: Hex digest identifying the encrypted key.
+        """
+        return hashlib.sha256(
+            ("%s\n%s\n%s" % (getattr(pub_key_obj, "pub_key_id", ""), pub_key_id, enc_key_code)).encode("utf-8")
+        ).hexdigest()
+
+    def extract_sym_key(self, pub_key_obj, pub_key_id, enc_key_code):
+        """Return the symmetric key object, decrypting it with the RSA key only if not in the cache.
+
+        Args:
+            pub_key_obj (GlideinKey): Factory key used to decrypt the symmetric key.
+            pub_key_id (str): ReqPubKeyID from the request classad.
+            enc_key_code (str): ReqEncKeyCode from the request classad.
+
+        Returns:
+            SymKey: The symmetric key object.
+
+        Raises:
+            Exception: Any exception raised by `pub_key_obj.extract_sym_key` on invalid keys.
+        """
+        now = time.time()
+        digest = self.get_digest(pub_key_obj, pub_key_id, enc_key_code)
+        el = self.keys.get(digest)
+        if el is not None and el[2] > now:
+            self.keys.move_to_end(digest)
+            self.hits += 1
+            return el[0]
+        if el is not None:
+            del self.keys[digest]
+        sym_key_obj = None
+        stored = self._read_store().get(digest)
+        if stored is not None and stored[1] > now:
+            try:
+                sym_key_obj = pub_key_obj.sym_class(stored[0])
+                key_code, expiration = stored
+                self.store_hits += 1
+            except Exception:
+                sym_key_obj = None
+        if sym_key_obj is None:
+            sym_key_obj = pub_key_obj.extract_sym_key(enc_key_code)
+            key_code = sym_key_obj.get_code()
+            expiration = now + self.ttl
+            self.misses += 1
+            self._update_store(digest, key_code, expiration, now)
+        self.keys[digest] = (sym_key_obj, key_code, expiration)
+        while len(self.keys) > self.max_entries:
+            self.keys.popitem(last=False)
+        return sym_key_obj
+
+    def decrypt_hex(self, sym_key_obj, enc_value):
+        """Return `sym_key_obj.decrypt_hex(enc_value)`, using the cached value when available.
+
+        Args:
+            sym_key_obj (SymKey): Symmetric key object.
+            enc_value (str): Hex encoded encrypted value.
+
+        Returns:
+            bytes: The decrypted value.
+        """
+        value_key = (sym_key_obj.get_code(), enc_value)
+        try:
+            value = self.values[value_key]
+            self.values.move_to_end(value_key)
+            return value
+        except KeyError:
+            pass
+        value = sym_key_obj.decrypt_hex(enc_value)
+        self.values[value_key] = value
+        while len(self.values) > self.max_values:
+            self.values.popitem(last=False)
+        return value
+
+    def _read_store(self):
+        """Return the dictionary in the shared file, {digest: (key_code, expiration time)}, empty if not available."""
+        if self.store_fname is None:
+            return {}
+        try:
+            with open(self.store_fname, "rb") as fd:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                try:
+                    data = pickle.load(fd)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logSupport.log.debug("Could not read the symmetric key cache %s: %s" % (self.store_fname, e))
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _update_store(self, digest, key_code, expiration, now):
+        """Add a key code to the shared file, dropping the expired entries.
+
+        The file is readable only by the owner since it contains the symmetric keys.
+        Errors are logged and ignored, the memory cache is still used.
+        """
+        if self.store_fname is None:
+            return
+        try:
+            fdn = os.open(self.store_fname, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fdn, "r+b") as fd:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    try:
+                        data = pickle.load(fd)
+                        if not isinstance(data, dict):
+                            data = {}
+                    except Exception:
+                        data = {}  # new or corrupted file
+                    data = {k: v for k, v in data.items() if v[1] > now}
+                    data[digest] = (key_code, expiration)
+                    if len(data) > self.max_entries:
+                        data = dict(sorted(data.items(), key=lambda kv: kv[1][1])[-self.max_entries :])
+                    fd.seek(0)
+                    fd.truncate()
+                    pickle.dump(data, fd, protocol=pickle.HIGHEST_PROTOCOL)
+                    fd.flush()
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        except Exception as e:
+            logSupport.log.debug("Could not update the symmetric key cache %s: %s" % (self.store_fname, e))
+
+
+# global cache of the decrypted symmetric keys
+# the Entry Group processes replace it with one using a file in the lock directory
+sym_key_cache = SymKeyCache()
+
+
+# Attributes of the request classads not copied in any bucket
+REQUEST_RESERVED_NAMES = frozenset(
+    (
+        "ReqName",
+        "ReqGlidein",
+        "ClientName",
+        "FrontendName",
+        "GroupName",
+        "ReqPubKeyID",
+        "ReqEncKeyCode",
+        "ReqEncIdentity",
+        "AuthenticatedIdentity",
+    )
+)
+
+# Attributes of the request classads copied in the "internals" bucket
+REQUEST_INTERNAL_NAMES = frozenset(
+    (
+        "ClientName",
+        "FrontendName",
+        "GroupName",
+        "ReqName",
+        "LastHeardFrom",
+        "ReqPubKeyID",
+        "AuthenticatedIdentity",
+    )
+)
+
+
+class RequestAttrClassifier:
+    """Classify the attributes of the request classads in the work buckets.
+
+    The prefixes are taken from `factoryConfig` and compiled once. Each attribute name is classified
+    only the first time it is seen: the request classads of all the Frontends share most attribute names.
+    """
+
+    def __init__(self, prefixes):
+        """Initialize the classifier.
+
+        Args:
+            prefixes (tuple): (bucket, prefix) pairs. An attribute is added to all the buckets with a matching prefix.
+        """
+        self.prefixes = prefixes
+        # prefixes grouped by length, to look up the attribute head in a dictionary
+        self.by_len = {}
+        for key, prefix in prefixes:
+            self.by_len.setdefault(len(prefix), {}).setdefault(prefix, []).append(key)
+        self.lens = sorted(self.by_len)
+        self.cache = {}
+
+    def classify(self, attr):
+        """Return the buckets of an attribute.
+
+        Args:
+            attr (str): Attribute name.
+
+        Returns:
+            tuple: (bucket, name without prefix) pairs, empty for reserved and unknown attributes.
+        """
+        try:
+            return self.cache[attr]
+        except KeyError:
+            pass
+        out = []
+        if attr not in REQUEST_RESERVED_NAMES:
+            for plen in self.lens:
+                keys = self.by_len[plen].get(attr[:plen])
+                if keys:
+                    out.extend((key, attr[plen:]) for key in keys)
+        out = tuple(out)
+        self.cache[attr] = out
+        return out
+
+
+_attr_classifier = None
+
+
+def get_attr_classifier():
+    """Return the classifier for the prefixes currently in `factoryConfig`, creating it if needed.
+
+    Returns:
+        RequestAttrClassifier: Attribute classifier.
+    """
+    global _attr_classifier
+    prefixes = (
+        ("requests", factoryConfig.client_req_prefix),
+        ("web", factoryConfig.client_web_prefix),
+        ("params", factoryConfig.glidein_param_prefix),
+        ("monitor", factoryConfig.glidein_monitor_prefix),
+        ("params_decrypted", factoryConfig.encrypted_param_prefix),
+    )
+    if _attr_classifier is None or _attr_classifier.prefixes != prefixes:
+        _attr_classifier = RequestAttrClassifier(prefixes)
+    return _attr_classifier
+
+
+# Requests parsed by findGroupWork in the previous cycle, {pub_key_id: {classad name: (stamp, work)}}
+_parsed_requests = {}
+
+
+def _parse_request(k, kel, pub_key_obj, old_parsed=None, new_parsed=None, decode_identity=True):
+    """Split a request classad in the work buckets, decrypting the encrypted parameters.
+
+    If `old_parsed` has the same classad (same name, LastHeardFrom and keys), its work is reused.
+
+    Args:
+        k (str): Classad name.
+        kel (dict): Classad attributes.
+        pub_key_obj (GlideinKey): Factory key to decrypt the symmetric key, None to skip the decryption.
+        old_parsed (dict): Requests parsed in the previous cycle, {name: (stamp, work)}. None to parse always.
+        new_parsed (dict): Dictionary where to add this request once parsed. None not to save it.
+        decode_identity (bool): Decode ReqEncIdentity before comparing it with AuthenticatedIdentity.
+
+    Returns:
+        dict|None: Work for the request, with "requests", "web", "params", "params_decrypted", "monitor"
+            and "internals" dictionaries. None if the classad is invalid.
+    """
+    stamp = None
+    if "LastHeardFrom" in kel:
+        stamp = tuple(
+            kel.get(attr)
+            for attr in ("LastHeardFrom", "ReqPubKeyID", "ReqEncKeyCode", "ReqEncIdentity", "AuthenticatedIdentity")
+        )
+        if old_parsed is not None and k in old_parsed and old_parsed[k][0] == stamp:
+            if new_parsed is not None:
+                new_parsed[k] = old_parsed[k]
+            # the callers may modify the work, return a copy
+            return {key: dict(val) for key, val in old_parsed[k][1].items()}
+
+    el = {"requests": {}, "web": {}, "params": {}, "params_decrypted": {}, "monitor": {}, "internals": {}}
+    encrypted = []
+    classify = get_attr_classifier().classify
+    for attr, val in kel.items():
+        for key, name in classify(attr):
+            if key == "params_decrypted":
+                encrypted.append((name, val))
+            else:
+                el[key][name] = val
+        if attr in REQUEST_INTERNAL_NAMES:
+            el["internals"][attr] = val
+
+    # sym_key_obj will stay None if
+    # 1) kel does not contain 'ReqPubKeyID'
+    # 2) pub_key_obj is None and there is no key to decrypt
+    sym_key_obj = None
+    if (pub_key_obj is not None) and ("ReqPubKeyID" in kel):
+        try:
+            sym_key_obj = sym_key_cache.extract_sym_key(pub_key_obj, kel["ReqPubKeyID"], kel["ReqEncKeyCode"])
+        except Exception:
+            # Bad key, ignore the request
+            return None
+
+    if sym_key_obj is not None:
+        # Verify that the identity the client claims to be is the
+        # identity that Condor thinks it is
+        try:
+            enc_identity = sym_key_cache.decrypt_hex(sym_key_obj, kel["ReqEncIdentity"])
+            if decode_identity:
+                enc_identity = enc_identity.decode("utf-8")
+        except Exception:
+            logSupport.log.warning(
+                "Client %s provided invalid ReqEncIdentity, could not decode. Skipping for security reasons." % k
+            )
+            return None  # Corrupted classad
+        if enc_identity != kel["AuthenticatedIdentity"]:
+            logSupport.log.warning(
+                "Client %s provided invalid ReqEncIdentity(%s!=%s). Skipping for security reasons."
+                % (k, enc_identity, kel["AuthenticatedIdentity"])
+            )
+            # Either the client is misconfigured or someone is cheating
+            return None
+
+    for name, val in encrypted:
+        # Define it even if I don't understand the content
+        el["params_decrypted"][name] = None
+        if sym_key_obj is not None:
+            try:
+                el["params_decrypted"][name] = sym_key_cache.decrypt_hex(sym_key_obj, val)
+            except Exception:
+                # I don't understand it -> invalid
+                logSupport.log.warning(
+                    "At least one of the encrypted parameters for client %s cannot be decoded. Skipping for security reasons."
+                    % k
+                )
+                return None
+
+    if stamp is not None and new_parsed is not None:
+        new_parsed[k] = (stamp, el)
+        return {key: dict(val) for key, val in el.items()}
+    return el
+
+
 ############################################################
 #
 # User functions
@@ -171,6 +553,11 @@ def findGroupWork(
     of work to perform, grouped by entry and client.
     Example: work[entry_name][frontend] = {'params':'value', 'requests':'value}
 
+    If `factoryConfig.work_snapshot_max_age` and `factoryConfig.work_snapshot_entries` are set,
+    the Collector is queried for all the Factory entries and the result is saved in a snapshot
+    in the lock directory, used by all the groups until it is older than the maximum age.
+    Each group then keeps only the requests for its entries.
+
     Args:
         factory_name (str): Name of the Factory.
         glidein_name (str): Name of the glidein instance.
@@ -191,6 +578,12 @@ def findGroupWork(
     if factory_collector == DEFAULT_VAL:
         factory_collector = factoryConfig.factory_collector
 
+    use_snapshot = factoryConfig.work_snapshot_max_age > 0 and factoryConfig.work_snapshot_entries
+    if use_snapshot:
+        # Query the requests for all the Factory entries, the snapshot is shared by all the groups
+        my_req_glideins = {f"{entry}@{glidein_name}@{factory_name}" for entry in entry_names}
+        entry_names = sorted(set(factoryConfig.work_snapshot_entries).union(entry_names))
+
     req_glideins = ""
     for entry in entry_names:
         req_glideins = f"{entry}@{glidein_name}@{factory_name},{req_glideins}"
@@ -237,123 +630,99 @@ def findGroupWork(
             # could be a race condition
             pass
 
-    with open(lock_fname, "r+") as fd:
-        fcntl.flock(fd, fcntl.LOCK_EX)
-        try:
-            status.load(status_constraint)
-        finally:
-            fcntl.flock(fd, fcntl.LOCK_UN)
-
-    data = status.fetchStored()
+    data = None
+    if use_snapshot:
+        snapshot_fname = os.path.join(
+            factoryConfig.lock_dir,
+            "gfi_work.%s.pickle" % hashlib.sha1(status_constraint.encode("utf-8")).hexdigest()[:16],
+        )
+        # Most groups find a fresh snapshot and do not need the lock
+        data = _read_work_snapshot(snapshot_fname, status_constraint, factoryConfig.work_snapshot_max_age)
 
-    reserved_names = (
-        "ReqName",
-        "ReqGlidein",
-        "ClientName",
-        "FrontendName",
-        "GroupName",
-        "ReqPubKeyID",
-        "ReqEncKeyCode",
-        "ReqEncIdentity",
-        "AuthenticatedIdentity",
-    )
+    if data is None:
+        with open(lock_fname, "r+") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if use_snapshot:
+                    # Another group may have refreshed it while waiting for the lock
+                    data = _read_work_snapshot(snapshot_fname, status_constraint, factoryConfig.work_snapshot_max_age)
+                if data is None:
+                    status.load(status_constraint)
+                    data = status.fetchStored()
+                    if use_snapshot:
+                        _write_work_snapshot(snapshot_fname, status_constraint, data)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    if use_snapshot:
+        data = {k: v for k, v in data.items() if v.get("ReqGlidein") in my_req_glideins}
 
     # Output is now in the format of
     # out[entry_name][frontend]
     out = {}
 
-    # Copy over requests and parameters
-
+    # Copy over requests and parameters, reusing the requests not changed since the previous cycle
+    pub_key_id = pub_key_obj.get_pub_key_id() if pub_key_obj is not None else None
+    old_parsed = _parsed_requests.get(pub_key_id, {})
+    new_parsed = {}
     for k in data:
-        kel = data[k]
-        el = {"requests": {}, "web": {}, "params": {}, "params_decrypted": {}, "monitor": {}, "internals": {}}
-
-        for key, prefix in (
-            ("requests", factoryConfig.client_req_prefix),
-            ("web", factoryConfig.client_web_prefix),
-            ("params", factoryConfig.glidein_param_prefix),
-            ("monitor", factoryConfig.glidein_monitor_prefix),
-        ):
-            plen = len(prefix)
-            for attr in kel:
-                if attr in reserved_names:
-                    # Skip reserved names
-                    continue
-                if attr[:plen] == prefix:
-                    el[key][attr[plen:]] = kel[attr]
-
-        # sym_key_obj will stay None if
-        # 1) extract_sym_key throws exception
-        # 2) kel does not contain 'ReqPubKeyID'
-        # 3) pub_key_obj is None and there is no key to decrypt
-        sym_key_obj = None
-        if (pub_key_obj is not None) and ("ReqPubKeyID" in kel):
-            try:
-                sym_key_obj = pub_key_obj.extract_sym_key(kel["ReqEncKeyCode"])
-            except Exception:
-                continue
+        el = _parse_request(k, data[k], pub_key_obj, old_parsed, new_parsed)
+        if el is not None:
+            out[k] = el
+    _parsed_requests[pub_key_id] = new_parsed
 
-        if sym_key_obj is not None:
-            # Verify that the identity the client claims to be is the
-            # identity that Condor thinks it is
-            try:
-                enc_identity = sym_key_obj.decrypt_hex(kel["ReqEncIdentity"]).decode("utf-8")
-            except Exception:
-                logSupport.log.warning(
-                    "Client %s provided invalid ReqEncIdentity, could not decode. Skipping for security reasons." % k
-                )
-                continue  # Corrupted classad
-            if enc_identity != kel["AuthenticatedIdentity"]:
-                logSupport.log.warning(
-                    "Client %s provided invalid ReqEncIdentity(%s!=%s). Skipping for security reasons."
-                    % (k, enc_identity, kel["AuthenticatedIdentity"])
-                )
-                # Either the client is misconfigured or someone is cheating
-                continue
-
-        invalid_classad = False
-
-        for key, prefix in (("params_decrypted", factoryConfig.encrypted_param_prefix),):
-            # TODO: useless for, only one element
-            plen = len(prefix)
-            for attr in kel:
-                if attr in reserved_names:
-                    # Skip reserved names
-                    continue
-                if attr[:plen] == prefix:
-                    # Define it even if I don't understand the content
-                    el[key][attr[plen:]] = None
-                    if sym_key_obj is not None:
-                        try:
-                            el[key][attr[plen:]] = sym_key_obj.decrypt_hex(kel[attr])
-                        except Exception:
-                            # I don't understand it -> invalid
-                            invalid_classad = True
-                            break
-
-        # Continue if I have problems in an inner loop
-        if invalid_classad:
-            logSupport.log.warning(
-                "At least one of the encrypted parameters for client %s cannot be decoded. Skipping for security reasons."
-                % k
-            )
-            continue
-
-        for attr in kel:
-            if attr in (
-                "ClientName",
-                "FrontendName",
-                "GroupName",
-                "ReqName",
-                "LastHeardFrom",
-                "ReqPubKeyID",
-                "AuthenticatedIdentity",
-            ):
-                el["internals"][attr] = kel[attr]
+    return workGroupByEntries(out)
 
-        out[k] = el
 
-    return workGroupByEntries(out)
+def _read_work_snapshot(fname, constraint, max_age):
+    """Return the request classads in a work snapshot, if it is still valid.
+
+    Args:
+        fname (str): Snapshot file name.
+        constraint (str): Collector constraint used for the query, must match the one in the snapshot.
+        max_age (int): Maximum age of the snapshot in seconds.
+
+    Returns:
+        dict|None: Classads in the snapshot, keyed by name. None if missing, stale, or for a different query.
+    """
+    try:
+        with open(fname, "rb") as fd:
+            snapshot = pickle.load(fd)
+        if snapshot["constraint"] != constraint:
+            return None
+        age = time.time() - snapshot["time"]
+        if age < 0 or age > max_age:
+            return None
+        return snapshot["data"]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logSupport.log.debug("Ignoring invalid work snapshot %s: %s" % (fname, e))
+        return None
+
+
+def _write_work_snapshot(fname, constraint, data):
+    """Save the request classads in a work snapshot shared by the Entry Groups.
+
+    The file is replaced atomically and is readable only by the owner.
+    Errors are logged and ignored, the groups will query the Collector.
+
+    Args:
+        fname (str): Snapshot file name.
+        constraint (str): Collector constraint used for the query.
+        data (dict): Classads returned by the query.
+    """
+    tmp_fname = "%s.%i.tmp" % (fname, os.getpid())
+    try:
+        fdn = os.open(tmp_fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fdn, "wb") as fd:
+            pickle.dump(
+                {"time": time.time(), "constraint": constraint, "data": data}, fd, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_fname, fname)
+    except Exception as e:
+        logSupport.log.warning("Could not save the work snapshot %s: %s" % (fname, e))
+        _remove_if_there(tmp_fname)
 
 
 def workGroupByEntries(work):
@@ -465,97 +834,13 @@ def findWork(
 
     data = status.fetchStored()
 
-    reserved_names = (
-        "ReqName",
-        "ReqGlidein",
-        "ClientName",
-        "FrontendName",
-        "GroupName",
-        "ReqPubKeyID",
-        "ReqEncKeyCode",
-        "ReqEncIdentity",
-        "AuthenticatedIdentity",
-    )
-
     out = {}
 
     # copy over requests and parameters
     for k in list(data.keys()):
-        kel = data[k]
-        el = {"requests": {}, "web": {}, "params": {}, "params_decrypted": {}, "monitor": {}, "internals": {}}
-        for key, prefix in (
-            ("requests", factoryConfig.client_req_prefix),
-            ("web", factoryConfig.client_web_prefix),
-            ("params", factoryConfig.glidein_param_prefix),
-            ("monitor", factoryConfig.glidein_monitor_prefix),
-        ):
-            plen = len(prefix)
-            for attr in list(kel.keys()):
-                if attr in reserved_names:
-                    continue  # skip reserved names
-                if attr[:plen] == prefix:
-                    el[key][attr[plen:]] = kel[attr]
-        if pub_key_obj is not None:
-            if "ReqPubKeyID" in kel:
-                try:
-                    sym_key_obj = pub_key_obj.extract_sym_key(kel["ReqEncKeyCode"])
-                except Exception:
-                    continue  # bad key, ignore entry
-            else:
-                sym_key_obj = None  # no key used, will not decrypt
-        else:
-            sym_key_obj = None  # have no key, will not decrypt
-
-        if sym_key_obj is not None:
-            # this is verifying that the identity that the client claims to be is the identity that Condor thinks it is
-            try:
-                enc_identity = sym_key_obj.decrypt_hex(kel["ReqEncIdentity"])
-            except Exception:
-                logSupport.log.warning(
-                    "Client %s provided invalid ReqEncIdentity, could not decode. Skipping for security reasons." % k
-                )
-                continue  # corrupted classad
-            if enc_identity != kel["AuthenticatedIdentity"]:
-                logSupport.log.warning(
-                    "Client %s provided invalid ReqEncIdentity(%s!=%s). Skipping for security reasons."
-                    % (k, enc_identity, kel["AuthenticatedIdentity"])
-                )
-                continue  # uh oh... either the client is misconfigured, or someone is trying to cheat
-
-        invalid_classad = False
-        for key, prefix in (("params_decrypted", factoryConfig.encrypted_param_prefix),):
-            plen = len(prefix)
-            for attr in list(kel.keys()):
-                if attr in reserved_names:
-                    continue  # skip reserved names
-                if attr[:plen] == prefix:
-                    el[key][attr[plen:]] = None  # define it even if I don't understand the content
-                    if sym_key_obj is not None:
-                        try:
-                            el[key][attr[plen:]] = sym_key_obj.decrypt_hex(kel[attr])
-                        except Exception:
-                            invalid_classad = True
-                            break  # I don't understand it -> invalid
-        if invalid_classad:
-            logSupport.log.warning(
-                "At least one of the encrypted parameters for client %s cannot be decoded. Skipping for security reasons."
-                % k
-            )
-            continue  # need to go this way as I may have problems in an inner loop
-
-        for attr in list(kel.keys()):
-            if attr in (
-                "ClientName",
-                "FrontendName",
-                "GroupName",
-                "ReqName",
-                "LastHeardFrom",
-                "ReqPubKeyID",
-                "AuthenticatedIdentity",
-            ):
-                el["internals"][attr] = kel[attr]
-
-        out[k] = el
+        el = _parse_request(k, data[k], pub_key_obj, decode_identity=False)
+        if el is not None:
+            out[k] = el
 
     return out
 
@@ -1154,8 +1439,19 @@ def advertizeGlideinClientMonitoringFromFile(fname, remove_file=True, is_multi=F
     """
     if os.path.exists(fname):
         try:
-            logSupport.log.info("Advertising glidefactoryclient classads")
-            exe_condor_advertise(fname, "UPDATE_LICENSE_AD", is_multi=is_multi, factory_collector=factory_collector)
+            published = None
+            if factoryConfig.advertise_cache is not None:
+                nr_ads, published = factoryConfig.advertise_cache.filter_file(
+                    fname, prefix=f"{factory_collector}:UPDATE_LICENSE_AD:"
+                )
+                logSupport.log.info(
+                    "%i of %i glidefactoryclient classads changed or to refresh" % (len(published), nr_ads)
+                )
+            if published is None or len(published) > 0:
+                logSupport.log.info("Advertising glidefactoryclient classads")
+                exe_condor_advertise(fname, "UPDATE_LICENSE_AD", is_multi=is_multi, factory_collector=factory_collector)
+                if published:
+                    factoryConfig.advertise_cache.commit(published)
         except Exception:
             logSupport.log.warning("Advertising glidefactoryclient classads failed")
             logSupport.log.exception("Advertising glidefactoryclient classads failed: ")
@@ -1179,8 +1475,17 @@ def advertizeGlideinFromFile(fname, remove_file=True, is_multi=False, factory_co
     """
     if os.path.exists(fname):
         try:
-            logSupport.log.info("Advertising glidefactory classads")
-            exe_condor_advertise(fname, "UPDATE_AD_GENERIC", is_multi=is_multi, factory_collector=factory_collector)
+            published = None
+            if factoryConfig.advertise_cache is not None:
+                nr_ads, published = factoryConfig.advertise_cache.filter_file(
+                    fname, prefix=f"{factory_collector}:UPDATE_AD_GENERIC:"
+                )
+                logSupport.log.info("%i of %i glidefactory classads changed or to refresh" % (len(published), nr_ads))
+            if published is None or len(published) > 0:
+                logSupport.log.info("Advertising glidefactory classads")
+                exe_condor_advertise(fname, "UPDATE_AD_GENERIC", is_multi=is_multi, factory_collector=factory_collector)
+                if published:
+                    factoryConfig.advertise_cache.commit(published)
         except Exception:
             logSupport.log.warning("Advertising glidefactory classads failed")
             logSupport.log.exception("Advertising glidefactory classads failed: ")
@@ -1285,6 +1590,10 @@ def exe_condor_advertise(fname, command, is_multi=False, factory_collector=None)
     if factory_collector == DEFAULT_VAL:
         factory_collector = factoryConfig.factory_collector
 
+    if command.startswith("INVALIDATE") and factoryConfig.advertise_cache is not None:
+        # The invalidated classads must be advertised again even if unchanged
+        factoryConfig.advertise_cache.reset()
+
     lock_fname = os.path.join(factoryConfig.lock_dir, "gfi_advertize.lock")
     if not os.path.exists(lock_fname):  # create a lock file if needed
         try:
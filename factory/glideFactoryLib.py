@@ -5,7 +5,6 @@
 and provides support for glidein sanitizing.
 """
 
-
 import base64
 import glob
 import os
@@ -32,6 +31,9 @@ from glideinwms.lib.defaults import BINARY_ENCODING
 
 MY_USERNAME = pwd.getpwuid(os.getuid())[0]
 
+# Format of GLIDEIN_LOGNR, the date of submission, also naming the time-bucketed client log subdirectories
+CLIENT_LOG_BUCKET_FORMAT = "%Y%m%d"
+
 
 ############################################################
 #
@@ -119,6 +121,9 @@ class FactoryConfig:
         self.log_base_dir = None
         self.client_log_base_dir = None
         self.client_proxies_base_dir = None
+        # If True, the job files of the glideins are in subdirectories of the client log directory,
+        # one for each submission date (see get_client_log_dir)
+        self.client_log_buckets = False
 
     def config_whoamI(self, factory_name, glidein_name):
         """Configure Factory and glidein names.
@@ -164,12 +169,14 @@ class FactoryConfig:
         self.remove_sleep = sleep_between_removes
         self.max_removes = max_removes_x_cycle
 
-    def get_client_log_dir(self, entry_name, username):
+    def get_client_log_dir(self, entry_name, username, bucket=None):
         """Get the client log directory.
 
         Args:
             entry_name (str): Name of the entry.
             username (str): Client username.
+            bucket (str, optional): Time bucket, the submission date in `CLIENT_LOG_BUCKET_FORMAT`.
+                If provided, returns the bucket subdirectory with the job files. Defaults to None.
 
         Returns:
             str: Full path to the client log directory.
@@ -177,6 +184,8 @@ class FactoryConfig:
         log_dir = os.path.join(
             self.client_log_base_dir, f"user_{username}", f"glidein_{self.glidein_name}", f"entry_{entry_name}"
         )
+        if bucket is not None:
+            log_dir = os.path.join(log_dir, bucket)
         return log_dir
 
     def get_client_proxies_dir(self, username):
@@ -220,7 +229,7 @@ def secClass2Name(client_security_name, proxy_security_class):
 ############################################################
 
 
-def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
+def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None, job_cache=None, job_cache_refresh=3600):
     """Get Condor queue data for a specific entry and client.
 
     Args:
@@ -228,6 +237,9 @@ def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
         client_name (str): The client (Frontend) name. If None, returns data for all clients.
         schedd_name (str): HTCondor schedd name.
         factoryConfig (FactoryConfig, optional): Factory configuration. Defaults to global configuration.
+        job_cache (DiskCache, optional): If not None, keep the glideins in this cache and query only the ones
+            that changed status (condorMonitor.CondorQCache). Defaults to None, query all the glideins.
+        job_cache_refresh (int, optional): Seconds between full queries when using job_cache. Defaults to 3600.
 
     Returns:
         condorMonitor.CondorQ: Condor queue object with loaded data.
@@ -266,7 +278,10 @@ def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
         (factoryConfig.credential_secclass_schedd_attribute, "s"),
     ]
 
-    q = condorMonitor.CondorQ(schedd_name)
+    if job_cache is None:
+        q = condorMonitor.CondorQ(schedd_name)
+    else:
+        q = condorMonitor.CondorQCache(schedd_name, cache=job_cache, full_refresh_interval=job_cache_refresh)
     q.factory_name = factoryConfig.factory_name
     q.glidein_name = factoryConfig.glidein_name
     q.entry_name = entry_name
@@ -2193,8 +2208,16 @@ def get_submit_environment(
         if max_walltime:
             exe_env.append("GLIDEIN_MAX_WALLTIME=%s" % max_walltime)
 
-        submit_time = timeConversion.get_time_in_format(time_format="%Y%m%d")
+        submit_time = timeConversion.get_time_in_format(time_format=CLIENT_LOG_BUCKET_FORMAT)
         exe_env.append("GLIDEIN_LOGNR=%s" % str(submit_time))
+        # The job files go in the time bucket of the submission, if enabled
+        log_bucket = ""
+        if factoryConfig.client_log_buckets:
+            os.makedirs(
+                factoryConfig.get_client_log_dir(entry_name, submit_credentials.username, submit_time), exist_ok=True
+            )
+            log_bucket = "%s/" % submit_time
+        exe_env.append("GLIDEIN_LOG_BUCKET=%s" % log_bucket)
 
         # Main Params (glidein.descript
         glidein_name = glideinDescript.data["GlideinName"]
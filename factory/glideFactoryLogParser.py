@@ -3,7 +3,6 @@
 
 """This module implements classes to track changes in glidein status logs."""
 
-
 import copy
 import mmap
 import os
@@ -17,6 +16,9 @@ from glideinwms.lib import condorLogParser, logSupport
 rawJobId2Nr = condorLogParser.rawJobId2Nr
 rawTime2cTime = condorLogParser.rawTime2cTime
 
+# Log number in the name of the glidein activity logs, condor_activity_<GLIDEIN_LOGNR>_<client>.log
+LOGNR_RE = re.compile(r"condor_activity_(\d+)_")
+
 
 class logSummaryTimingsOutWrapper:
     """A wrapper class to lazily instantiate a logSummaryTimingsOut object."""
@@ -63,6 +65,11 @@ class logSummaryTimingsOut(condorLogParser.logSummaryTimings):
         """
         self.clInit(logname, cache_dir, ".%s.ftstpk" % username)
         self.dirname = os.path.dirname(logname)
+        # With the time-bucketed client logs, the job files are in the subdirectory named as the log number
+        self.bucket_dirname = None
+        lognr_match = LOGNR_RE.match(os.path.basename(logname))
+        if lognr_match is not None:
+            self.bucket_dirname = os.path.join(self.dirname, lognr_match.group(1))
         self.cache_dir = cache_dir
         self.now = time.time()
         self.year = time.localtime(self.now)[0]
@@ -87,16 +94,25 @@ class logSummaryTimingsOut(condorLogParser.logSummaryTimings):
         new_waitout = []
         now = time.time()
         year = time.localtime(now)[0]
+        job_dirname = self.get_job_dirname()
+        # jobs submitted before the buckets were enabled
+        flat_jobs = set()
         for el in org_completed:
             job_id = rawJobId2Nr(el[0])
             job_fname = "job.%i.%i.out" % job_id
-            job_fullname = os.path.join(self.dirname, job_fname)
+            job_fullname = os.path.join(job_dirname, job_fname)
 
             end_time = rawTime2cTime(el[3], year)
             if end_time > now:
                 end_time = rawTime2cTime(el[3], year - 1)
             try:
-                statinfo = os.stat(job_fullname)
+                try:
+                    statinfo = os.stat(job_fullname)
+                except OSError:
+                    if job_dirname == self.dirname:
+                        raise
+                    statinfo = os.stat(os.path.join(self.dirname, job_fname))
+                    flat_jobs.add(el[0])
                 ftime = statinfo[stat.ST_MTIME]
                 fsize = statinfo[stat.ST_SIZE]
 
@@ -130,13 +146,23 @@ class logSummaryTimingsOut(condorLogParser.logSummaryTimings):
             for el in self.data[k]:
                 job_id = rawJobId2Nr(el[0])
                 job_fname = "job.%i.%i" % (job_id[0], job_id[1])
-                job_fullname = os.path.join(self.dirname, job_fname)
+                job_fullname = os.path.join(self.dirname if el[0] in flat_jobs else job_dirname, job_fname)
                 new_el = el + (job_fullname,)
                 new_karr.append(new_el)
             self.data[k] = new_karr
 
         return
 
+    def get_job_dirname(self):
+        """Returns the directory of the job files of the log.
+
+        Returns:
+            str: The bucket subdirectory if it exists, else the directory of the log.
+        """
+        if self.bucket_dirname is not None and os.path.isdir(self.bucket_dirname):
+            return self.bucket_dirname
+        return self.dirname
+
     def diff_raw(self, other):
         """Compute the symmetric difference between self.data and other.
 
@@ -9,7 +9,7 @@ import pickle
 import time
 
 from glideinwms.factory import glideFactoryMonitoring
-from glideinwms.lib import logSupport, rrdSupport, xmlFormat, xmlParse
+from glideinwms.lib import logSupport, rrdSupport, snapshotSupport, xmlFormat, xmlParse
 
 ############################################################
 #
@@ -167,6 +167,76 @@ def verifyRRD(fix_rrd=False, backup=True):
 
 
 ##############################################################################
+# Values computed from the entry snapshots (or the files they replace), reused while the files do not change
+status_snapshots = snapshotSupport.SnapshotCache()
+logsummary_snapshots = snapshotSupport.SnapshotCache()
+
+
+def _load_status_xml(fname):
+    """Load an entry status XML file adding the counters in QStatsRow, as in the snapshot."""
+    entry_data = xmlParse.xmlfile2dict(fname)
+    entry_data["columns"] = {
+        fe: glideFactoryMonitoring.QStatsRow.from_dict(fe_el) for fe, fe_el in entry_data.get("frontends", {}).items()
+    }
+    if "total" in entry_data:
+        entry_data["total_row"] = glideFactoryMonitoring.QStatsRow.from_dict(entry_data["total"])
+    return entry_data
+
+
+def _load_completed_json(fname):
+    """Load the stats from an entry completed data JSON file."""
+    with open(fname) as fd:
+        return json.load(fd)["stats"]
+
+
+def load_entry_status(entry):
+    """Load the status of an entry (condorQStats), from the snapshot if up to date, or from the XML file.
+
+    The result is reused until the files change and must not be modified.
+
+    Args:
+        entry (str): The entry name.
+
+    Returns:
+        dict: The status as parsed from the XML file, with the counters also in "columns" (`{frontend: QStatsRow}`)
+            and, if there is a "total", in "total_row".
+
+    Raises:
+        OSError: If the status file is missing.
+    """
+    status_fname = os.path.join(
+        monitorAggregatorConfig.monitor_dir, f"entry_{entry}", monitorAggregatorConfig.status_relname
+    )
+    return status_snapshots.load(
+        snapshotSupport.get_snapshot_fname(status_fname), lambda data: data, status_fname, _load_status_xml
+    )
+
+
+def load_entry_completed_data(entry):
+    """Load the completed jobs stats of an entry, from the snapshot if up to date, or from the JSON file.
+
+    The result is reused until the files change and must not be modified.
+
+    Args:
+        entry (str): The entry name.
+
+    Returns:
+        dict: The stats of the entry ("stats" in the completed data file).
+
+    Raises:
+        OSError: If the completed data file is missing.
+    """
+    completed_data_fname = os.path.join(
+        monitorAggregatorConfig.monitor_dir, f"entry_{entry}", monitorAggregatorConfig.completed_data_relname
+    )
+    return status_snapshots.load(
+        snapshotSupport.get_snapshot_fname(completed_data_fname),
+        lambda data: data["stats"],
+        completed_data_fname,
+        _load_completed_json,
+    )
+
+
 def aggregateStatus(in_downtime):
     """Aggregate status files and return overall status information.
 
@@ -181,8 +251,6 @@ def aggregateStatus(in_downtime):
     """
     global monitorAggregatorConfig
 
-    avgEntries = ("InfoAge",)
-
     global_total = {"Status": None, "Requested": None, "ClientMonitor": None}
     status = {"entries": {}, "total": global_total}
     status_fe = {"frontends": {}}  # analogous to above but for frontend totals
@@ -203,71 +271,31 @@ def aggregateStatus(in_downtime):
 
     nr_entries = 0
     nr_feentries = {}  # dictionary for nr entries per fe
+    total_row = glideFactoryMonitoring.QStatsRow()  # sum of the entry totals
+    fe_rows = {}  # per frontend sum of the counters and types in the first entry with the frontend
     for entry in monitorAggregatorConfig.entries:
-        # load entry status file
-        status_fname = os.path.join(
-            monitorAggregatorConfig.monitor_dir, f"entry_{entry}", monitorAggregatorConfig.status_relname
-        )
-        # load entry completed data file
-        completed_data_fname = os.path.join(
-            monitorAggregatorConfig.monitor_dir,
-            f"entry_{entry}",
-            monitorAggregatorConfig.completed_data_relname,
-        )
-        completed_data_fp = None
         try:
-            # entry_data is a regular dictionary of nested dictionaries/lists returned form the XML parsed
-            entry_data = xmlParse.xmlfile2dict(status_fname)
-            completed_data_fp = open(completed_data_fname)
-            completed_data = json.load(completed_data_fp)
+            # entry_data is a regular dictionary of nested dictionaries/lists, as returned form the XML parsed
+            entry_data = load_entry_status(entry)
+            # load entry completed data file
+            completed_data_stats = load_entry_completed_data(entry)
         except OSError:
             continue  # file not found, ignore
-        finally:
-            if completed_data_fp:
-                completed_data_fp.close()
 
         # update entry
         status["entries"][entry] = {"downtime": entry_data["downtime"], "frontends": entry_data["frontends"]}
 
         # update completed data
-        completed_data_tot["entries"][entry] = completed_data["stats"]
+        completed_data_tot["entries"][entry] = completed_data_stats
 
-        # to log when total dictionary is modified (in update total/frontend)
+        # to log when total dictionary is modified (in update frontend)
         tmp_list_removed = []
 
-        # update total
+        # update total, vector sum of the counters
         if "total" in entry_data:
             nr_entries += 1
             status["entries"][entry]["total"] = entry_data["total"]
-
-            for w in list(global_total):  # making a copy of the keys because the dict is being modified (keys are not!)
-                tel = global_total[w]
-                if w not in entry_data["total"]:
-                    continue
-                el = entry_data["total"][w]
-                if tel is None:
-                    # new one, just copy over
-                    tel = {}
-                    for a in el:
-                        # coming from XML, everything is a string
-                        tel[a] = int(el[a])
-                    global_total[w] = tel
-                else:
-                    # successive, sum
-                    for a in el:
-                        if a in tel:  # pylint: disable=unsupported-membership-test
-                            tel[a] += int(el[a])  # pylint: disable=unsupported-assignment-operation
-                    # if any attribute from prev. frontends is not in the current one, remove from total
-                    for a in list(tel):  # making a copy of the keys because the dict is being modified
-                        if a not in el:
-                            del tel[a]  # pylint: disable=unsupported-delete-operation
-                            tmp_list_removed.append(a)
-                    if tmp_list_removed:
-                        logSupport.log.debug(
-                            "Elements removed from total status (%s: %s) because of %s: %s"
-                            % (w, len(tel), entry, tmp_list_removed)
-                        )
-                        tmp_list_removed = []
+            total_row.add_row(entry_data["total_row"])
 
         # update frontends
         if "frontends" in entry_data:
@@ -284,10 +312,18 @@ def aggregateStatus(in_downtime):
                     nr_feentries[fe] = 1  # first occurrence of frontend
                 else:
                     nr_feentries[fe] += 1  # already found one
+                # counters, vector sum. Only the types of the first entry with the frontend are summed
+                fe_row = entry_data["columns"][fe]
+                if fe_first:
+                    fe_rows[fe] = (set(fe_row.types), glideFactoryMonitoring.QStatsRow(values=fe_row.values))
+                else:
+                    fe_rows[fe][1].add_row(fe_row)
                 for w in entry_data["frontends"][fe]:
                     # w is the entry name of the entry using the frontend
                     if w not in status_fe["frontends"][fe]:
                         status_fe["frontends"][fe][w] = {}
+                    if w in glideFactoryMonitoring.QSTATS_TYPES:
+                        continue  # counters, from the row
                     tela = status_fe["frontends"][fe][w]
                     ela = entry_data["frontends"][fe][w]
                     for a in ela:
@@ -326,25 +362,25 @@ def aggregateStatus(in_downtime):
                             )
                             tmp_list_removed = []
 
+    # since all entries must have InfoAge to be here, just divide by nr of entries
+    total_row.average_info_age(nr_entries)
     for w in list(global_total):  # making a copy of the keys because the dict is being modified
-        if global_total[w] is None:
-            del global_total[w]  # remove entry if not defined
+        if w in total_row.types:
+            global_total[w] = total_row.get_type_dict(w)
         else:
-            tel = global_total[w]
-            for a in tel:  # pylint: disable=not-an-iterable
-                if a in avgEntries:
-                    # since all entries must have this attr to be here, just divide by nr of entries
-                    tel[a] = (
-                        tel[a] // nr_entries
-                    )  # pylint: disable=unsupported-assignment-operation,unsubscriptable-object
-
-    # do average for per-fe stat--'InfoAge' only
-    for fe in list(status_fe["frontends"].keys()):
-        for w in list(status_fe["frontends"][fe].keys()):
-            tel = status_fe["frontends"][fe][w]
-            for a in list(tel.keys()):
-                if a in avgEntries and fe in nr_feentries:
-                    tel[a] = tel[a] // nr_feentries[fe]  # divide per fe
+            del global_total[w]  # remove entry if not defined
+
+    # per-fe counters, with InfoAge averaged. The types missing in the first entry with the frontend stay empty
+    for fe, (fe_types, fe_row) in fe_rows.items():
+        fe_row.average_info_age(nr_feentries[fe])
+        for w in fe_types:
+            status_fe["frontends"][fe][w] = fe_row.get_type_dict(w)
+
+    snapshot_stats = status_snapshots.prune()
+    logSupport.log.debug(
+        "Entry status files: %(reused)i unchanged, %(snapshots)i snapshots and %(fallbacks)i XML/JSON files loaded"
+        % snapshot_stats
+    )
 
     xml_downtime = xmlFormat.dict2string(
         {}, dict_name="downtime", el_name="", params={"status": str(in_downtime)}, leading_tab=xmlFormat.DEFAULT_TAB
@@ -512,6 +548,87 @@ def aggregateJobsSummary():
 
 
 ######################################################################################
+def get_log_summary_counts(el, get_val, status_keys=None):
+    """Return the integer counts of a frontend or of the total of an entry log summary.
+
+    Args:
+        el (dict): The log summary of a frontend or the total, as in the log_summary XML file or snapshot.
+        get_val (function): Returns the integer value of a range element of the completed counts
+            (in the XML file the value is in the "val" attribute).
+        status_keys (dict, optional): Status names to use for "Current", "Entered" and "Exited".
+            Defaults to all the ones in `el`.
+
+    Returns:
+        dict: The counts: Current, Entered, Exited and CompletedCounts.
+    """
+    out_el = {}
+    for k in ["Current", "Entered", "Exited"]:
+        out_el[k] = {}
+        for s in status_keys[k] if status_keys else el[k]:
+            out_el[k][s] = int(el[k][s])
+    completed_counts = el["CompletedCounts"]
+    out_counts = {"Sum": {}, "Waste": {}, "WasteTime": {}, "Lasted": {}, "JobsNr": {}, "JobsDuration": {}}
+    for tkey in completed_counts["Sum"]:
+        out_counts["Sum"][tkey] = int(completed_counts["Sum"][tkey])
+    for k in glideFactoryMonitoring.getAllJobTypes():
+        for w in ("Waste", "WasteTime"):
+            out_counts[w][k] = {}
+            for t in glideFactoryMonitoring.getAllMillRanges():
+                out_counts[w][k][t] = get_val(completed_counts[w][k][t])
+    for t in glideFactoryMonitoring.getAllTimeRanges():
+        out_counts["Lasted"][t] = get_val(completed_counts["Lasted"][t])
+    for t in glideFactoryMonitoring.getAllTimeRanges():
+        out_counts["JobsDuration"][t] = get_val(completed_counts["JobsDuration"][t])
+    for t in glideFactoryMonitoring.getAllJobRanges():
+        out_counts["JobsNr"][t] = get_val(completed_counts["JobsNr"][t])
+    out_el["CompletedCounts"] = out_counts
+    return out_el
+
+
+def load_entry_log_summary(entry, global_total):
+    """Load the log summary of an entry, from the snapshot if up to date, or from the XML file.
+
+    The result is reused until the files change and must not be modified.
+
+    Args:
+        entry (str): The entry name.
+        global_total (dict): The aggregated total, its status names are the ones in the entry total.
+
+    Returns:
+        tuple: The counts of each frontend (`{frontend: counts}`) and the counts of the entry total,
+            None if the entry has no total. See `get_log_summary_counts`.
+
+    Raises:
+        OSError: If the log summary file is missing.
+    """
+
+    def get_counts(entry_data, get_val):
+        out_data = {}
+        for frontend in entry_data["frontends"]:
+            out_data[frontend] = get_log_summary_counts(entry_data["frontends"][frontend], get_val)
+        local_total = None
+        if "total" in entry_data:
+            local_total = get_log_summary_counts(entry_data["total"], get_val, global_total)
+        return out_data, local_total
+
+    def from_xml(fname):
+        entry_data = xmlParse.xmlfile2dict(fname, always_singular_list=["Fraction", "TimeRange", "Range"])
+        return get_counts(entry_data, lambda el: int(el["val"]))
+
+    status_fname = os.path.join(
+        monitorAggregatorConfig.monitor_dir,
+        f"entry_{entry}",
+        monitorAggregatorConfig.logsummary_relname,
+    )
+    try:
+        return logsummary_snapshots.load(
+            snapshotSupport.get_snapshot_fname(status_fname), lambda data: get_counts(data, int), status_fname, from_xml
+        )
+    except OSError:
+        logSupport.log.debug(f"Missing file {status_fname}: ignoring and continuing")
+        raise
+
+
 def aggregateLogSummary():
     """Aggregate log summary files and write an aggregate log summary.
 
@@ -580,111 +697,17 @@ def aggregateLogSummary():
     nr_feentries = {}  # dictionary for nr entries per fe
     for entry in monitorAggregatorConfig.entries:
         # load entry log summary file
-        status_fname = os.path.join(
-            monitorAggregatorConfig.monitor_dir,
-            f"entry_{entry}",
-            monitorAggregatorConfig.logsummary_relname,
-        )
-
         try:
-            entry_data = xmlParse.xmlfile2dict(status_fname, always_singular_list=["Fraction", "TimeRange", "Range"])
+            out_data, local_total = load_entry_log_summary(entry, global_total)
         except OSError:
-            logSupport.log.debug(f"Missing file {status_fname}: ignoring and continuing")
             continue  # file not found, ignore
 
-        # update entry
-        out_data = {}
-        for frontend in list(entry_data["frontends"].keys()):
-            fe_el = entry_data["frontends"][frontend]
-            out_fe_el = {}
-            for k in ["Current", "Entered", "Exited"]:
-                out_fe_el[k] = {}
-                for s in list(fe_el[k].keys()):
-                    out_fe_el[k][s] = int(fe_el[k][s])
-            out_fe_el["CompletedCounts"] = {
-                "Waste": {},
-                "WasteTime": {},
-                "Lasted": {},
-                "JobsNr": {},
-                "JobsDuration": {},
-                "Sum": {},
-            }
-            for tkey in list(fe_el["CompletedCounts"]["Sum"].keys()):
-                out_fe_el["CompletedCounts"]["Sum"][tkey] = int(fe_el["CompletedCounts"]["Sum"][tkey])
-            for k in glideFactoryMonitoring.getAllJobTypes():
-                for w in ("Waste", "WasteTime"):
-                    out_fe_el["CompletedCounts"][w][k] = {}
-                    for t in glideFactoryMonitoring.getAllMillRanges():
-                        out_fe_el["CompletedCounts"][w][k][t] = int(fe_el["CompletedCounts"][w][k][t]["val"])
-            for t in glideFactoryMonitoring.getAllTimeRanges():
-                out_fe_el["CompletedCounts"]["Lasted"][t] = int(fe_el["CompletedCounts"]["Lasted"][t]["val"])
-            out_fe_el["CompletedCounts"]["JobsDuration"] = {}
-            for t in glideFactoryMonitoring.getAllTimeRanges():
-                out_fe_el["CompletedCounts"]["JobsDuration"][t] = int(
-                    fe_el["CompletedCounts"]["JobsDuration"][t]["val"]
-                )
-            for t in glideFactoryMonitoring.getAllJobRanges():
-                out_fe_el["CompletedCounts"]["JobsNr"][t] = int(fe_el["CompletedCounts"]["JobsNr"][t]["val"])
-            out_data[frontend] = out_fe_el
-
         status["entries"][entry] = {"frontends": out_data}
 
         # update total
-        if "total" in entry_data:
+        if local_total is not None:
             nr_entries += 1
-            local_total = {}
-
-            for k in ["Current", "Entered", "Exited"]:
-                local_total[k] = {}
-                for s in list(global_total[k].keys()):
-                    local_total[k][s] = int(entry_data["total"][k][s])
-                    global_total[k][s] += int(entry_data["total"][k][s])
-            local_total["CompletedCounts"] = {
-                "Sum": {},
-                "Waste": {},
-                "WasteTime": {},
-                "Lasted": {},
-                "JobsNr": {},
-                "JobsDuration": {},
-            }
-            for tkey in list(entry_data["total"]["CompletedCounts"]["Sum"].keys()):
-                local_total["CompletedCounts"]["Sum"][tkey] = int(entry_data["total"]["CompletedCounts"]["Sum"][tkey])
-                global_total["CompletedCounts"]["Sum"][tkey] += int(entry_data["total"]["CompletedCounts"]["Sum"][tkey])
-            for k in glideFactoryMonitoring.getAllJobTypes():
-                for w in ("Waste", "WasteTime"):
-                    local_total["CompletedCounts"][w][k] = {}
-                    for t in glideFactoryMonitoring.getAllMillRanges():
-                        local_total["CompletedCounts"][w][k][t] = int(
-                            entry_data["total"]["CompletedCounts"][w][k][t]["val"]
-                        )
-                        global_total["CompletedCounts"][w][k][t] += int(
-                            entry_data["total"]["CompletedCounts"][w][k][t]["val"]
-                        )
-
-            for t in glideFactoryMonitoring.getAllTimeRanges():
-                local_total["CompletedCounts"]["Lasted"][t] = int(
-                    entry_data["total"]["CompletedCounts"]["Lasted"][t]["val"]
-                )
-                global_total["CompletedCounts"]["Lasted"][t] += int(
-                    entry_data["total"]["CompletedCounts"]["Lasted"][t]["val"]
-                )
-            local_total["CompletedCounts"]["JobsDuration"] = {}
-            for t in glideFactoryMonitoring.getAllTimeRanges():
-                local_total["CompletedCounts"]["JobsDuration"][t] = int(
-                    entry_data["total"]["CompletedCounts"]["JobsDuration"][t]["val"]
-                )
-                global_total["CompletedCounts"]["JobsDuration"][t] += int(
-                    entry_data["total"]["CompletedCounts"]["JobsDuration"][t]["val"]
-                )
-
-            for t in glideFactoryMonitoring.getAllJobRanges():
-                local_total["CompletedCounts"]["JobsNr"][t] = int(
-                    entry_data["total"]["CompletedCounts"]["JobsNr"][t]["val"]
-                )
-                global_total["CompletedCounts"]["JobsNr"][t] += int(
-                    entry_data["total"]["CompletedCounts"]["JobsNr"][t]["val"]
-                )
-
+            sumDictInt(local_total, global_total)
             status["entries"][entry]["total"] = local_total
 
         # update frontends
@@ -749,6 +772,12 @@ def aggregateLogSummary():
     )
     glideFactoryMonitoring.monitoringConfig.write_file(monitorAggregatorConfig.logsummary_relname, xml_str)
 
+    snapshot_stats = logsummary_snapshots.prune()
+    logSupport.log.debug(
+        "Entry log summary files: %(reused)i unchanged, %(snapshots)i snapshots and %(fallbacks)i XML files loaded"
+        % snapshot_stats
+    )
+
     # Write rrds
     writeLogSummaryRRDs("total", status["total"])
 
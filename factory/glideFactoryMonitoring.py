@@ -11,7 +11,9 @@ import pickle
 import re
 import time
 
-from glideinwms.lib import cleanupSupport, logSupport, rrdSupport, timeConversion, util, xmlFormat
+from array import array
+
+from glideinwms.lib import cleanupSupport, logSupport, rrdSupport, snapshotSupport, timeConversion, util, xmlFormat
 
 # list of rrd files that each site has
 RRD_LIST = (
@@ -46,6 +48,7 @@ class MonitoringConfig:
         rrd_obj: An instance of rrdSupport.rrdSupport() for creating/updating RRD files.
         my_name (str): The name of the monitor (default "Unknown").
         log: The logger to use.
+        status_data (FactoryStatusData): Receives the values written to the RRD files, if set (initially None).
     """
 
     def __init__(self, log=logSupport.log):
@@ -70,6 +73,7 @@ class MonitoringConfig:
         """@ivar: The name of the attribute that identifies the glidein """
         self.my_name = "Unknown"
         self.log = log
+        self.status_data = None
 
     def config_log(self, log_dir, max_days, min_days, max_mbs):
         """Configure the log directory and cleanup parameters.
@@ -205,6 +209,22 @@ class MonitoringConfig:
 
         return
 
+    def write_snapshot(self, relative_fname, data, data_time):
+        """Write the binary snapshot of a monitoring file, read by the aggregator instead of the file.
+
+        Errors are logged, the aggregator uses the monitoring file if the snapshot is older.
+
+        Args:
+            relative_fname (str): The monitoring file (e.g. schedd_status.xml) relative to `self.monitor_dir`.
+            data: The data, must be picklable.
+            data_time (float): The time of the data, typically `self.updated`.
+        """
+        fname = snapshotSupport.get_snapshot_fname(os.path.join(self.monitor_dir, relative_fname))
+        try:
+            snapshotSupport.write_snapshot(fname, data, data_time)
+        except Exception as e:
+            self.log.error(f"Failed to write the snapshot {fname}: {e}")
+
     def establish_dir(self, relative_dname):
         """Ensure that a directory exists within the monitor directory.
 
@@ -253,6 +273,13 @@ class MonitoringConfig:
                 for ds_name in ds_names:
                     ds_arr.append((ds_name, ds_type, self.rrd_heartbeat, min_val, max_val))
                 self.rrd_obj.create_rrd_multi(fname, self.rrd_step, rrd_archives, ds_arr)
+                created = True
+            else:
+                created = False
+
+            if self.status_data is not None:
+                ds_types = {ds_name: ds_type for ds_name in val_dict}
+                self.update_status_data(relative_fname + rrd_ext, ds_types, time, val_dict, created)
 
             # print "Updating RRD "+fname
             try:
@@ -299,6 +326,13 @@ class MonitoringConfig:
 
                     ds_arr.append((ds_name, ds_desc["ds_type"], self.rrd_heartbeat, ds_desc["min"], ds_desc["max"]))
                 self.rrd_obj.create_rrd_multi(fname, self.rrd_step, rrd_archives, ds_arr)
+                created = True
+            else:
+                created = False
+
+            if self.status_data is not None:
+                ds_types = {ds_name: ds_desc_dict.get(ds_name, {}).get("ds_type", "GAUGE") for ds_name in val_dict}
+                self.update_status_data(relative_fname + rrd_ext, ds_types, time, val_dict, created)
 
             # print "Updating RRD "+fname
             try:
@@ -307,6 +341,22 @@ class MonitoringConfig:
                 self.log.exception("Failed to update %s: " % fname)
         return
 
+    def update_status_data(self, relative_fname, ds_types, time, val_dict, created):
+        """Pass to status_data the values written to an RRD file, before writing them.
+
+        Args:
+            relative_fname (str): The RRD file name, relative to monitor_dir.
+            ds_types (dict): The type of each data source.
+            time (float): Timestamp for the update.
+            val_dict (dict): Dictionary of values to update.
+            created (bool): True if the file was just created.
+        """
+        try:
+            self.status_data.update_rrd(relative_fname, ds_types, time, val_dict, self, created)
+        except Exception:
+            # Never fail for monitoring. Just log
+            self.log.exception("Failed to add to the rolling window the values of %s: " % relative_fname)
+
 
 #######################################################################################################################
 #
@@ -316,6 +366,182 @@ class MonitoringConfig:
 #
 #######################################################################################################################
 
+# Attributes of the condorQStats types published in the XML files and RRDs
+QSTATS_ATTRIBUTES = {
+    "Status": ("Idle", "Running", "Held", "Wait", "Pending", "StageIn", "IdleOther", "StageOut", "RunningCores"),
+    "Requested": ("Idle", "MaxGlideins", "IdleCores", "MaxCores"),
+    "ClientMonitor": (
+        "InfoAge",
+        "JobsIdle",
+        "JobsRunning",
+        "JobsRunHere",
+        "GlideIdle",
+        "GlideRunning",
+        "GlideTotal",
+        "CoresIdle",
+        "CoresRunning",
+        "CoresTotal",
+    ),
+}
+QSTATS_TYPES = tuple(QSTATS_ATTRIBUTES)
+# Prefix of the RRD data sources of each type
+QSTATS_RRD_PREFIX = {"Status": "Status", "Requested": "Req", "ClientMonitor": "Client"}
+# Fixed schema of the counters (QStatsRow): the columns of each type, in the order of the dictionaries,
+# including the internal average counters
+QSTATS_COLUMNS = {
+    "Status": QSTATS_ATTRIBUTES["Status"],
+    "Requested": QSTATS_ATTRIBUTES["Requested"],
+    "ClientMonitor": QSTATS_ATTRIBUTES["ClientMonitor"][1:] + ("InfoAge", "InfoAgeAvgCounter"),
+}
+QSTATS_SLICES = {}
+QSTATS_NR_COLUMNS = 0
+for _tp in QSTATS_TYPES:
+    QSTATS_SLICES[_tp] = slice(QSTATS_NR_COLUMNS, QSTATS_NR_COLUMNS + len(QSTATS_COLUMNS[_tp]))
+    QSTATS_NR_COLUMNS += len(QSTATS_COLUMNS[_tp])
+del _tp
+QSTATS_INFOAGE = QSTATS_SLICES["ClientMonitor"].start + QSTATS_COLUMNS["ClientMonitor"].index("InfoAge")
+QSTATS_INFOAGE_COUNTER = QSTATS_INFOAGE + 1
+
+
+class QStatsRow:
+    """Counters of a frontend, or of a total, in a compact array with the fixed schema QSTATS_COLUMNS
+
+    Only the types in `types` are defined, the columns of the other types are zero.
+    Rows are summed as vectors and the types of the sum are the union of the types.
+
+    Attributes:
+        types (set): Types defined in the row (Status, Requested, ClientMonitor).
+        values (array.array): Counters, one column for each (type, attribute).
+    """
+
+    __slots__ = ("types", "values")
+
+    def __init__(self, types=(), values=None):
+        """Initialize a row, all zero by default.
+
+        Args:
+            types (iterable): Types defined in the row.
+            values (iterable, optional): Values of all the columns. Defaults to zeros.
+        """
+        self.types = set(types)
+        self.values = array("d", values if values is not None else bytes(8 * QSTATS_NR_COLUMNS))
+
+    def __getstate__(self):
+        return self.types, self.values
+
+    def __setstate__(self, state):
+        self.types, self.values = state
+
+    def add(self, tp, counts):
+        """Add the counts of a type (in the order of QSTATS_COLUMNS[tp]) and mark the type as defined.
+
+        Args:
+            tp (str): The type.
+            counts (list): The counts to add.
+        """
+        values = self.values
+        for i, count in enumerate(counts, QSTATS_SLICES[tp].start):
+            values[i] += count
+        self.types.add(tp)
+
+    def add_row(self, other):
+        """Vector sum of another row into this one.
+
+        Args:
+            other (QStatsRow): The row to add.
+        """
+        self.values = array("d", map(sum, zip(self.values, other.values)))
+        self.types |= other.types
+
+    @classmethod
+    def sum(cls, rows):
+        """Return the vector sum of the rows.
+
+        Args:
+            rows (iterable): QStatsRow objects.
+
+        Returns:
+            QStatsRow: The sum, all zero and without types if `rows` is empty.
+        """
+        rows = list(rows)
+        if not rows:
+            return cls()
+        return cls(set().union(*[row.types for row in rows]), map(sum, zip(*[row.values for row in rows])))
+
+    def round(self, tp):
+        """Round to the nearest integer the columns of a type.
+
+        Args:
+            tp (str): The type.
+        """
+        tp_slice = QSTATS_SLICES[tp]
+        self.values[tp_slice] = array("d", [round(i) for i in self.values[tp_slice]])
+
+    def average_info_age(self, divisor=None):
+        """Divide (integer division) InfoAge by `divisor`, by its average counter if None.
+
+        Args:
+            divisor (int, optional): The divisor. Defaults to the InfoAgeAvgCounter column.
+        """
+        if divisor is None:
+            divisor = self.values[QSTATS_INFOAGE_COUNTER]
+            self.values[QSTATS_INFOAGE_COUNTER] = 0
+        if divisor:
+            self.values[QSTATS_INFOAGE] = self.values[QSTATS_INFOAGE] // divisor
+
+    def get_type_dict(self, tp):
+        """Return the published attributes of a type (internal counters excluded).
+
+        Args:
+            tp (str): The type.
+
+        Returns:
+            dict: The integer values, `{attribute: value}`.
+        """
+        values = self.values[QSTATS_SLICES[tp]]
+        return {a: int(v) for a, v in zip(QSTATS_COLUMNS[tp], values) if not a.endswith("AvgCounter")}
+
+    def get_dict(self):
+        """Return the published attributes of the defined types, `{type: {attribute: value}}`."""
+        return {tp: self.get_type_dict(tp) for tp in QSTATS_TYPES if tp in self.types}
+
+    def get_rrd_values(self):
+        """Return the values for the Status_Attributes RRD, None for the undefined types.
+
+        Returns:
+            dict: The values, `{type_prefix+attribute: value}`.
+        """
+        val_dict = {}
+        for tp in QSTATS_TYPES:
+            tp_str = QSTATS_RRD_PREFIX[tp]
+            if tp in self.types:
+                tp_el = self.get_type_dict(tp)
+                for a in QSTATS_ATTRIBUTES[tp]:
+                    val_dict[f"{tp_str}{a}"] = tp_el[a]
+            else:
+                for a in QSTATS_ATTRIBUTES[tp]:
+                    val_dict[f"{tp_str}{a}"] = None
+        return val_dict
+
+    @classmethod
+    def from_dict(cls, el):
+        """Build a row from a dictionary like the one returned by `get_dict` (e.g. parsed from the XML files).
+
+        Values are converted with int(), other types and missing attributes are ignored.
+
+        Args:
+            el (dict): The dictionary, `{type: {attribute: value}}`.
+
+        Returns:
+            QStatsRow: The row.
+        """
+        row = cls()
+        for tp in QSTATS_TYPES:
+            if tp in el:
+                tp_el = el[tp]
+                row.add(tp, [int(tp_el.get(a, 0)) for a in QSTATS_COLUMNS[tp]])
+        return row
+
 
 # TODO: ['Downtime'] is added to the self.data[client_name] dictionary only if logRequest is called before logSchedd, logClientMonitor
 #       This is inconsistent and should be changed, Redmine [#17244]
@@ -328,6 +554,7 @@ class condorQStats:
         log: Logger instance.
         files_updated: Timestamp when files were last updated.
         attributes (dict): Dictionary defining attributes for different categories.
+        columns (dict): The counters of each client (QStatsRow), used for the totals and RRDs.
         downtime (str): Global downtime status.
         expected_cores (int): Expected number of cores per glidein.
     """
@@ -344,32 +571,8 @@ class condorQStats:
         self.log = log
 
         self.files_updated = None
-        self.attributes = {
-            "Status": (
-                "Idle",
-                "Running",
-                "Held",
-                "Wait",
-                "Pending",
-                "StageIn",
-                "IdleOther",
-                "StageOut",
-                "RunningCores",
-            ),
-            "Requested": ("Idle", "MaxGlideins", "IdleCores", "MaxCores"),
-            "ClientMonitor": (
-                "InfoAge",
-                "JobsIdle",
-                "JobsRunning",
-                "JobsRunHere",
-                "GlideIdle",
-                "GlideRunning",
-                "GlideTotal",
-                "CoresIdle",
-                "CoresRunning",
-                "CoresTotal",
-            ),
-        }
+        self.attributes = dict(QSTATS_ATTRIBUTES)
+        self.columns = {}
         # create a global downtime field since we want to propagate it in various places
         self.downtime = "True"
         self.expected_cores = (
@@ -399,7 +602,7 @@ class condorQStats:
         else:
             el = {}
             t_el["Status"] = el
-        self.aggregateStates(qc_status, el)
+        self.aggregateStates(qc_status, el, self.get_row(client_name))
 
         # And now aggregate states by submit file
         if "StatusEntries" in t_el:
@@ -445,43 +648,39 @@ class condorQStats:
                 empty_data[k][kk] = 0
         return empty_data
 
-    def aggregateStates(self, qc_status, el):
+    def get_row(self, client_name):
+        """Return the counters of a client, creating an empty row if missing.
+
+        Args:
+            client_name (str): The client name.
+
+        Returns:
+            QStatsRow: The counters of the client.
+        """
+        try:
+            return self.columns[client_name]
+        except KeyError:
+            row = self.columns[client_name] = QStatsRow()
+            return row
+
+    def aggregateStates(self, qc_status, el, row=None):
         """Aggregate state counts from a qc_status dictionary (condor_q) into another dictionary using state names.
 
         Args:
             qc_status (dict): Dictionary mapping numeric status codes to counts.
             el (dict): Dictionary to accumulate counts, with state names (e.g. 'Idle' instead of 1) as keys.
+            row (QStatsRow, optional): Counters to update as well.
         """
-        # Listing pairs with jobs counting as 1. Avoid duplicates with the list below
+        # Status codes of the jobs counting as 1, in the order of the Status attributes (Idle, Running, Held,
+        # Wait, Pending, StageIn, IdleOther, StageOut)
         # These numbers must be consistent w/ the one used to build qc_status
-        status_pairs = (
-            (1, "Idle"),
-            (2, "Running"),
-            (5, "Held"),
-            (1001, "Wait"),
-            (1002, "Pending"),
-            (1010, "StageIn"),
-            (1100, "IdleOther"),
-            (4010, "StageOut"),
-        )
-        for p in status_pairs:
-            nr, status = p
-            # TODO: rewrite w/ if in ... else (after m31)
-            if status not in el:
-                el[status] = 0
-            if nr in qc_status:
-                el[status] += qc_status[nr]
-
-        # Listing pairs counting the cores (expected_cores). Avoid duplicates with the list above
-        # These numbers must be consistent w/ the one used to build qc_status
-        status_pairs = ((2, "RunningCores"),)
-        for p in status_pairs:
-            nr, status = p
-            # TODO: rewrite w/ if in ... else (after m31)
-            if status not in el:
-                el[status] = 0
-            if nr in qc_status:
-                el[status] += qc_status[nr] * self.expected_cores
+        counts = [qc_status.get(nr, 0) for nr in (1, 2, 5, 1001, 1002, 1010, 1100, 4010)]
+        # RunningCores counts the cores (expected_cores) of the Running jobs
+        counts.append(qc_status.get(2, 0) * self.expected_cores)
+        for status, count in zip(QSTATS_COLUMNS["Status"], counts):
+            el[status] = el.get(status, 0) + count
+        if row is not None:
+            row.add("Status", counts)
 
     def logRequest(self, client_name, requests):
         """Log client glidein requests.
@@ -509,18 +708,12 @@ class condorQStats:
             el = {}
             t_el["Requested"] = el
 
-        for reqpair in (("IdleGlideins", "Idle"), ("MaxGlideins", "MaxGlideins")):
-            org, new = reqpair
-            if new not in el:
-                el[new] = 0
-            if org in requests:
-                el[new] += requests[org]
-        for reqpair in (("IdleGlideins", "IdleCores"), ("MaxGlideins", "MaxCores")):
-            org, new = reqpair
-            if new not in el:
-                el[new] = 0
-            if org in requests:
-                el[new] += requests[org] * self.expected_cores
+        # Idle, MaxGlideins, IdleCores, MaxCores
+        counts = [requests.get("IdleGlideins", 0), requests.get("MaxGlideins", 0)]
+        counts += [count * self.expected_cores for count in counts]
+        for new, count in zip(QSTATS_COLUMNS["Requested"], counts):
+            el[new] = el.get(new, 0) + count
+        self.get_row(client_name).add("Requested", counts)
 
         # Had to get rid of this
         # Does not make sense when one aggregates
@@ -562,34 +755,37 @@ class condorQStats:
             el = {}
             t_el["ClientMonitor"] = el
 
-        for karr in (
-            ("Idle", "JobsIdle"),
-            ("Running", "JobsRunning"),
-            ("RunningHere", "JobsRunHere"),
-            ("GlideinsIdle", "GlideIdle"),
-            ("GlideinsRunning", "GlideRunning"),
-            ("GlideinsTotal", "GlideTotal"),
-            ("GlideinsIdleCores", "CoresIdle"),
-            ("GlideinsRunningCores", "CoresRunning"),
-            ("GlideinsTotalCores", "CoresTotal"),
+        # in the order of the ClientMonitor columns: JobsIdle, JobsRunning, JobsRunHere, GlideIdle, GlideRunning,
+        # GlideTotal, CoresIdle, CoresRunning, CoresTotal
+        counts = []
+        for ck in (
+            "Idle",
+            "Running",
+            "RunningHere",
+            "GlideinsIdle",
+            "GlideinsRunning",
+            "GlideinsTotal",
+            "GlideinsIdleCores",
+            "GlideinsRunningCores",
+            "GlideinsTotalCores",
         ):
-            ck, ek = karr
-            if ek not in el:
-                el[ek] = 0
             if ck in client_monitor:
-                el[ek] += int(client_monitor[ck]) * fraction
-            elif ck == "RunningHere":
+                counts.append(int(client_monitor[ck]) * fraction)
+            elif ck == "RunningHere" and "Running" in client_monitor and "GlideinsRunning" in client_monitor:
                 # for compatibility, if RunningHere not defined, use min between Running and GlideinsRunning
-                if "Running" in client_monitor and "GlideinsRunning" in client_monitor:
-                    el[ek] += min(int(client_monitor["Running"]), int(client_monitor["GlideinsRunning"])) * fraction
-
-        if "InfoAge" not in el:
-            el["InfoAge"] = 0
-            el["InfoAgeAvgCounter"] = 0  # used for totals since we need an avg in totals, not absnum
+                counts.append(min(int(client_monitor["Running"]), int(client_monitor["GlideinsRunning"])) * fraction)
+            else:
+                counts.append(0)
 
+        # InfoAgeAvgCounter is used for totals since we need an avg in totals, not absnum
         if "LastHeardFrom" in client_internals:
-            el["InfoAge"] += int(time.time() - int(client_internals["LastHeardFrom"])) * fraction
-            el["InfoAgeAvgCounter"] += fraction
+            counts += [int(time.time() - int(client_internals["LastHeardFrom"])) * fraction, fraction]
+        else:
+            counts += [0, 0]
+
+        for ek, count in zip(QSTATS_COLUMNS["ClientMonitor"], counts):
+            el[ek] = el.get(ek, 0) + count
+        self.get_row(client_name).add("ClientMonitor", counts)
 
         self.updated = time.time()
 
@@ -603,6 +799,9 @@ class condorQStats:
                 el = self.data[client_name]["ClientMonitor"]
                 for k in list(el.keys()):
                     el[k] = int(round(el[k]))
+        for row in self.columns.values():
+            if "ClientMonitor" in row.types:
+                row.round("ClientMonitor")
         return
 
     def get_data(self):
@@ -648,6 +847,9 @@ class condorQStats:
     def get_total(self, history={"set_to_zero": False}):
         """Compute and return a total summary of the monitoring data.
 
+        The total is the vector sum of the counters of all the clients, InfoAge is averaged.
+        ClientMonitor totals are meant to be computed after `finalizeClientMonitor`.
+
         Args:
             history (dict, optional): A dictionary used to track if totals have been set to zero.
                 Defaults to {"set_to_zero": False}.
@@ -655,54 +857,11 @@ class condorQStats:
         Returns:
             dict: A dictionary with keys "Status", "Requested", and "ClientMonitor" containing aggregated counts.
         """
-        total = {"Status": None, "Requested": None, "ClientMonitor": None}
-        set_to_zero = False
-
-        for f in list(self.data.keys()):
-            fe = self.data[f]
-            for w in list(fe.keys()):
-                if w in total:  # ignore eventual not supported classes
-                    el = fe[w]
-                    tel = total[w]
-
-                    if tel is None:
-                        # first one, just copy over
-                        total[w] = {}
-                        tel = total[w]
-                        for a in list(el.keys()):
-                            if isinstance(el[a], int):  # copy only numbers
-                                tel[a] = el[a]
-                    else:
-                        # successive, sum
-                        for a in list(el.keys()):
-                            if isinstance(el[a], int):  # consider only numbers
-                                if a in tel:
-                                    tel[a] += el[a]
-                            # if other frontends did't have this attribute, ignore
-                        # if any attribute from prev. frontends are not in the current one, remove from total
-                        for a in list(tel.keys()):
-                            if a not in el:
-                                del tel[a]
-                            elif not isinstance(el[a], int):
-                                del tel[a]
-
-        for w in list(total.keys()):
-            if total[w] is None:
-                if w == "Status":
-                    total[w] = self.get_zero_data_element()[w]
-                    set_to_zero = True
-                else:
-                    del total[w]  # remove entry if not defined unless is 'Status'
-            else:
-                tel = total[w]
-                for a in list(tel.keys()):
-                    if a[-10:] == "AvgCounter":
-                        # this is an average counter, calc the average of the referred element
-                        # like InfoAge=InfoAge/InfoAgeAvgCounter
-                        aorg = a[:-10]
-                        tel[aorg] = tel[aorg] // tel[a]
-                        # the avgcount totals are just for internal purposes
-                        del tel[a]
+        total_row = self.get_total_row()
+        # Status is always there, zero if not defined
+        set_to_zero = "Status" not in total_row.types
+        total_row.types.add("Status")
+        total = total_row.get_dict()
 
         if set_to_zero != history["set_to_zero"]:
             if set_to_zero:
@@ -710,6 +869,16 @@ class condorQStats:
             history["set_to_zero"] = set_to_zero
         return total
 
+    def get_total_row(self):
+        """Return the total of the counters of all the clients, with InfoAge averaged.
+
+        Returns:
+            QStatsRow: The total.
+        """
+        total_row = QStatsRow.sum(self.columns.values())
+        total_row.average_info_age()
+        return total_row
+
     @staticmethod
     def get_xml_total(total, indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=""):
         """Convert the total summary data to an XML string.
@@ -780,6 +949,7 @@ class condorQStats:
             total_el = alt_stats.get_total()
         else:
             total_el = self.get_total()
+        total_row = QStatsRow.from_dict(total_el)
 
         # write snapshot file
         xml_str = (
@@ -797,42 +967,29 @@ class condorQStats:
         )
         monitoringConfig.write_file("schedd_status.xml", xml_str)
 
+        # write the binary snapshot, the aggregator sums the counters without parsing the XML file
+        snapshot = {
+            "downtime": {"status": self.downtime},
+            "frontends": data,
+            "columns": {fe: self.columns.get(fe, QStatsRow()) for fe in data},
+            "total": total_el,
+            "total_row": total_row,
+        }
+        monitoringConfig.write_snapshot("schedd_status.xml", snapshot, self.updated)
+
         # update RRDs
-        type_strings = {"Status": "Status", "Requested": "Req", "ClientMonitor": "Client"}
         for fe in [None] + list(data.keys()):
             if fe is None:  # special key == Total
                 fe_dir = "total"
-                fe_el = total_el
+                fe_row = total_row
             else:
                 fe_dir = "frontend_" + fe
-                fe_el = data[fe]
-
-            val_dict = {}
-            # Initialize,  so that all get created properly
-            for tp in list(self.attributes.keys()):
-                tp_str = type_strings[tp]
-                attributes_tp = self.attributes[tp]
-                for a in attributes_tp:
-                    val_dict[f"{tp_str}{a}"] = None
+                fe_row = self.columns.get(fe, QStatsRow())
 
             monitoringConfig.establish_dir(fe_dir)
-            for tp in list(fe_el.keys()):
-                # values (RRD type) - Status, Requested or ClientMonitor
-                if tp not in list(self.attributes.keys()):
-                    continue
-
-                tp_str = type_strings[tp]
-
-                attributes_tp = self.attributes[tp]
-
-                fe_el_tp = fe_el[tp]
-                for a in list(fe_el_tp.keys()):
-                    if a in attributes_tp:
-                        a_el = fe_el_tp[a]
-                        if not isinstance(a_el, dict):  # ignore subdictionaries
-                            val_dict[f"{tp_str}{a}"] = a_el
-
-            monitoringConfig.write_rrd_multi(os.path.join(fe_dir, "Status_Attributes"), "GAUGE", self.updated, val_dict)
+            monitoringConfig.write_rrd_multi(
+                os.path.join(fe_dir, "Status_Attributes"), "GAUGE", self.updated, fe_row.get_rrd_values()
+            )
 
         self.files_updated = self.updated
         return
@@ -1314,17 +1471,19 @@ class condorLogSummary:
             stats_data[client_name] = out_el
         return stats_data
 
-    def get_xml_data(self, indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=""):
+    def get_xml_data(self, indent_tab=xmlFormat.DEFAULT_TAB, leading_tab="", data=None):
         """Convert the summarized differential data to an XML formatted string.
 
         Args:
             indent_tab (str, optional): Indentation string. Defaults to xmlFormat.DEFAULT_TAB.
             leading_tab (str, optional): Leading indentation string. Defaults to "".
+            data (dict, optional): The summarized data, if already calculated. Defaults to `self.get_data_summary()`.
 
         Returns:
             str: XML formatted string of the summarized data.
         """
-        data = self.get_data_summary()
+        if data is None:
+            data = self.get_data_summary()
         return xmlFormat.dict2string(
             data,
             dict_name="frontends",
@@ -1450,17 +1609,19 @@ class condorLogSummary:
 
         return out_total
 
-    def get_xml_total(self, indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=""):
+    def get_xml_total(self, indent_tab=xmlFormat.DEFAULT_TAB, leading_tab="", total=None):
         """Convert the total summary to an XML formatted string.
 
         Args:
             indent_tab (str, optional): Indentation string. Defaults to xmlFormat.DEFAULT_TAB.
             leading_tab (str, optional): Leading indentation string. Defaults to "".
+            total (dict, optional): The total summary, if already calculated. Defaults to `self.get_total_summary()`.
 
         Returns:
             str: XML formatted total summary.
         """
-        total = self.get_total_summary()
+        if total is None:
+            total = self.get_total_summary()
         return xmlFormat.class2string(
             total,
             inst_name="total",
@@ -1496,18 +1657,21 @@ class condorLogSummary:
             return
 
         # write snapshot file
+        data = self.get_data_summary()
+        total = self.get_total_summary()
         xml_str = (
             '<?xml version="1.0" encoding="ISO-8859-1"?>\n\n'
             + "<glideFactoryEntryLogSummary>\n"
             + self.get_xml_updated(indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=xmlFormat.DEFAULT_TAB)
             + "\n"
-            + self.get_xml_data(indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=xmlFormat.DEFAULT_TAB)
+            + self.get_xml_data(indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=xmlFormat.DEFAULT_TAB, data=data)
             + "\n"
-            + self.get_xml_total(indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=xmlFormat.DEFAULT_TAB)
+            + self.get_xml_total(indent_tab=xmlFormat.DEFAULT_TAB, leading_tab=xmlFormat.DEFAULT_TAB, total=total)
             + "\n"
             + "</glideFactoryEntryLogSummary>\n"
         )
         monitoringConfig.write_file("log_summary.xml", xml_str)
+        monitoringConfig.write_snapshot("log_summary.xml", {"frontends": data, "total": total}, self.updated)
 
         # update rrds
         stats_data_summary = self.get_stats_data_summary()
@@ -1658,6 +1822,7 @@ class condorLogSummary:
                 continue
 
         monitoringConfig.write_completed_json("completed_data", updated, entry_data)
+        monitoringConfig.write_snapshot("completed_data.json", {"time": updated, "stats": entry_data}, updated)
 
     def write_job_info(self, scheddName, collectorName):
         """Extract and write job monitoring information for completed jobs.
@@ -1717,6 +1882,241 @@ class condorLogSummary:
         monitoringConfig.write_file("job_summary.pkl", pickle.dumps(jobinfo))
 
 
+###############################################################################
+#
+# RRDWindow
+# rolling windows of the values written to the RRD files, used by FactoryStatusData
+#
+###############################################################################
+
+
+class RRDWindowArchive:
+    """Ring buffer of the values consolidated with AVERAGE at one resolution, like an RRD archive.
+
+    Attributes:
+        res (int): The resolution in seconds (steps * RRD step).
+        steps (int): Number of PDPs consolidated in each value.
+        xff (float): Maximum fraction of unknown PDPs for a known consolidated value.
+        size (int): Number of values kept.
+        times (array): End time of the value in each slot of the ring, NaN if not set.
+        values (dict): The ring of values of each data source, NaN if unknown.
+        cdp (dict): Sum and number of the known PDPs of the current consolidated value, by data source.
+    """
+
+    def __init__(self, res, steps, xff, size):
+        self.res = res
+        self.steps = steps
+        self.xff = xff
+        self.size = size
+        self.times = array("d", [math.nan]) * size
+        self.values = {}
+        self.cdp = {}
+
+    def get_ring(self, ds_name):
+        """Return the ring of values of a data source, adding it if missing."""
+        ring = self.values.get(ds_name)
+        if ring is None:
+            ring = self.values[ds_name] = array("d", [math.nan]) * self.size
+        return ring
+
+    def add_pdp(self, pdp_end, pdp_values, ds_names):
+        """Add a PDP and, if it is the last one of the consolidated value, store the value.
+
+        Args:
+            pdp_end (int): End time of the PDP.
+            pdp_values (dict): The known values of the PDP, by data source.
+            ds_names (set): All the data sources.
+        """
+        for ds_name, val in pdp_values.items():
+            cdp = self.cdp.setdefault(ds_name, [0.0, 0])
+            cdp[0] += val
+            cdp[1] += 1
+        if pdp_end % self.res == 0:
+            self.end_cdp(pdp_end, ds_names)
+
+    def end_cdp(self, cdp_end, ds_names):
+        """Store the current consolidated value, ending at cdp_end, and start a new one.
+
+        PDPs not added (e.g. before the window started) count as unknown.
+        """
+        idx = (cdp_end // self.res) % self.size
+        self.times[idx] = cdp_end
+        for ds_name in ds_names:
+            cdp = self.cdp.get(ds_name)
+            if cdp is not None and self.steps - cdp[1] <= self.xff * self.steps:
+                self.get_ring(ds_name)[idx] = cdp[0] / cdp[1]
+            else:
+                self.get_ring(ds_name)[idx] = math.nan
+        self.cdp = {}
+
+    def set_row(self, cdp_end, row):
+        """Store a consolidated value read from the RRD file.
+
+        Args:
+            cdp_end (int): End time of the value.
+            row (dict): The values by data source, None if unknown.
+        """
+        idx = (cdp_end // self.res) % self.size
+        self.times[idx] = cdp_end
+        for ds_name, val in row.items():
+            self.get_ring(ds_name)[idx] = math.nan if val is None else val
+
+    def get_data_sets(self, start, end, ds_names):
+        """Return the known values of each data source ending in (start, end], as FactoryStatusData.fetchData.
+
+        Args:
+            start (int): Start time, multiple of the resolution.
+            end (int): End time, multiple of the resolution.
+            ds_names (set): All the data sources.
+
+        Returns:
+            dict: The lists of values by data source, empty if no value is known.
+        """
+        data_sets = {ds_name: [] for ds_name in ds_names}
+        all_empty = True
+        for cdp_end in range(start + self.res, end + 1, self.res):
+            idx = (cdp_end // self.res) % self.size
+            if self.times[idx] != cdp_end:
+                continue  # not in the window (e.g. no update at that time)
+            for ds_name, ring in self.values.items():
+                val = ring[idx]
+                if not math.isnan(val):
+                    data_sets[ds_name].append(val)
+                    all_empty = False
+        if all_empty:
+            return {}
+        return data_sets
+
+
+class RRDWindow:
+    """Rolling windows of the values written to an RRD file, consolidated as rrdtool does.
+
+    The updates are accumulated in primary data points (PDP), one per RRD step, and the PDPs consolidated in
+    RRDWindowArchive ring buffers. This gives the same averages of `rrdtool fetch` without reading the file:
+    - GAUGE values hold since the previous update, ABSOLUTE values are divided by the time since the previous update
+    - an interval longer than the heartbeat, or a data source missing from an update, is unknown
+    - a PDP is unknown if more than half of its step is unknown, it is the time weighted average otherwise
+    - a consolidated value is unknown if more than xff of its PDPs are unknown, it is their average otherwise
+
+    Attributes:
+        step (int): The RRD step in seconds.
+        heartbeat (int): The RRD heartbeat in seconds.
+        ds_names (set): The data sources of the RRD file.
+        last_update (int): Time of the last update, None if not known.
+        pdp_end (int): End time of the current PDP, None before the first update.
+        pdp (dict): Sum of the values times the seconds and known seconds of the current PDP, by data source.
+        archives (dict): The RRDWindowArchive by resolution.
+    """
+
+    def __init__(self, step, heartbeat):
+        self.step = step
+        self.heartbeat = heartbeat
+        self.ds_names = set()
+        self.last_update = None
+        self.pdp_end = None
+        self.pdp = {}
+        self.archives = {}
+
+    def add_archive(self, res, xff, size):
+        """Add a ring buffer of `size` values at resolution `res`, a multiple of the step."""
+        self.archives[res] = RRDWindowArchive(res, res // self.step, xff, size)
+
+    def update(self, update_time, ds_types, val_dict):
+        """Add an update, as written to the RRD file.
+
+        Args:
+            update_time (int): Time of the update. Updates not after the last one are ignored, as rrdtool does.
+            ds_types (dict): The type of each data source, GAUGE if missing.
+            val_dict (dict): The values by data source, None for unknown values.
+
+        Returns:
+            bool: True if the update was added.
+        """
+        update_time = int(update_time)
+        self.ds_names.update(val_dict)
+        prev = self.last_update
+        if prev is not None and update_time <= prev:
+            return False
+        self.last_update = update_time
+
+        rates = {}
+        if prev is not None and update_time - prev <= self.heartbeat:
+            for ds_name, val in val_dict.items():
+                if val is not None:
+                    if ds_types.get(ds_name) == "ABSOLUTE":
+                        rates[ds_name] = float(val) / (update_time - prev)
+                    else:
+                        rates[ds_name] = float(val)
+        if prev is None:
+            prev = update_time
+        if self.pdp_end is None:
+            self.pdp_end = (prev // self.step + 1) * self.step
+
+        # split the interval (prev, update_time] in PDPs
+        while self.pdp_end <= update_time:
+            self.add_interval(rates, self.pdp_end - prev)
+            prev = self.pdp_end
+            self.end_pdp()
+            if not rates and self.pdp_end < update_time:
+                # all unknown, jump to the last PDP
+                self.skip_pdps(-(-update_time // self.step) * self.step)
+                prev = self.pdp_end - self.step
+        self.add_interval(rates, update_time - prev)
+        return True
+
+    def add_interval(self, rates, seconds):
+        """Add the values holding for some seconds of the current PDP."""
+        if seconds <= 0:
+            return
+        for ds_name, rate in rates.items():
+            pdp = self.pdp.setdefault(ds_name, [0.0, 0])
+            pdp[0] += rate * seconds
+            pdp[1] += seconds
+
+    def end_pdp(self):
+        """Consolidate the current PDP and start the next one."""
+        pdp_values = {}
+        for ds_name, pdp in self.pdp.items():
+            if pdp[1] * 2 >= self.step:
+                pdp_values[ds_name] = pdp[0] / pdp[1]
+        for archive in self.archives.values():
+            archive.add_pdp(self.pdp_end, pdp_values, self.ds_names)
+        self.pdp = {}
+        self.pdp_end += self.step
+
+    def skip_pdps(self, pdp_end):
+        """Skip unknown PDPs up to the one ending at pdp_end, ending the consolidated values in between."""
+        for archive in self.archives.values():
+            cdp_end = (self.pdp_end - self.step) // archive.res * archive.res + archive.res
+            if cdp_end < pdp_end:
+                archive.end_cdp(cdp_end, self.ds_names)
+        self.pdp = {}
+        self.pdp_end = pdp_end
+
+    def seed(self, rrd_support, fname):
+        """Fill the ring buffers with the consolidated values in the RRD file.
+
+        The values of the current PDP and consolidated values are not in the file and count as unknown.
+
+        Args:
+            rrd_support (rrdSupport.BaseRRDSupport): Used to read the file.
+            fname (str): The RRD file name.
+
+        Raises:
+            RuntimeError: If the file cannot be read.
+        """
+        now = int(time.time())
+        for res, archive in self.archives.items():
+            end = now // res * res
+            fetched = rrd_support.fetch_rrd(fname, "AVERAGE", resolution=res, start=end - archive.size * res, end=end)
+            (ftime, _, fstep), names, rows = fetched
+            self.ds_names.update(names)
+            if fstep != res:
+                continue  # archive not in the file
+            for i, row in enumerate(rows):
+                archive.set_row(ftime + (i + 1) * fstep, dict(zip(names, row)))
+
+
 ###############################################################################
 #
 # factoryStatusData
@@ -1738,14 +2138,18 @@ class FactoryStatusData:
         frontends (list): List of frontend identifiers.
         base_dir (str): Base directory for monitoring data.
         log (logging.Logger): Logger instance.
+        windows (dict): The RRDWindow of each RRD file, by path relative to base_dir,
+            None if the data is fetched from the RRD files.
     """
 
-    def __init__(self, log=logSupport.log, base_dir=None):
+    def __init__(self, log=logSupport.log, base_dir=None, use_windows=False):
         """Initialize FactoryStatusData object with default values.
 
         Args:
             log (logging.Logger): Logger instance.
             base_dir (str, optional): Base directory for monitoring files. Defaults to monitorAggregatorConfig.monitor_dir.
+            use_windows (bool, optional): Compute the averages from rolling windows of the values written
+                to the RRD files (see `update_rrd`) instead of fetching them at each call. Defaults to False.
         """
         self.data = {}
         for rrd in RRD_LIST:
@@ -1758,7 +2162,10 @@ class FactoryStatusData:
         self.frontends = []
         if base_dir is None:
             self.base_dir = monitoringConfig.monitor_dir
+        else:
+            self.base_dir = base_dir
         self.log = log
+        self.windows = {} if use_windows else None
 
     def getUpdated(self):
         """Return an XML formatted string representing the last update time.
@@ -1795,35 +2202,20 @@ class FactoryStatusData:
             self.log.debug("Failed to load %s" % (pathway + rrd_file))
             return {}
 
-        # converts fetched from tuples to lists
-        fetched_names = list(fetched[1])
-
-        fetched_data_raw = fetched[2][
-            :-1
-        ]  # drop the last entry... rrdtool will return one more than needed, and often that one is unreliable (in the python version)
-        fetched_data = []
-        for data in fetched_data_raw:
-            fetched_data.append(list(data))
-
         # creates a dictionary to be filled with lists of data
-        data_sets = {}
-        for name in fetched_names:
-            data_sets[name] = []
+        data_lists = [[] for _ in fetched[1]]
 
-        # check to make sure the data exists
-        all_empty = True
-        for data_set in data_sets:
-            index = fetched_names.index(data_set)
-            for data in fetched_data:
-                if isinstance(data[index], (int, float)):
-                    data_sets[data_set].append(data[index])
-                    all_empty = False
+        # drop the last entry... rrdtool will return one more than needed, and often that one is unreliable (in the python version)
+        for data in fetched[2][:-1]:
+            for val, data_list in zip(data, data_lists):
+                if isinstance(val, (int, float)):
+                    data_list.append(val)
 
-        if all_empty:
+        # check to make sure the data exists
+        if not any(data_lists):
             # probably not updated recently
             return {}
-        else:
-            return data_sets
+        return dict(zip(fetched[1], data_lists))
 
     def average(self, input_list):
         """Calculate the average of a list of numbers.
@@ -1845,7 +2237,7 @@ class FactoryStatusData:
             return
 
     def getData(self, input_val, monitoringConfig=None):
-        """Retrieve RRD data for the specified client fetched by rrdtool.
+        """Retrieve RRD data for the specified client fetched by rrdtool, or from the rolling windows if used.
 
         This function updates the internal RRD data dictionary for the client and
         appends the client to the list of frontends if not there. It also returns the data dictionary.
@@ -1875,28 +2267,24 @@ class FactoryStatusData:
 
         for rrd in RRD_LIST:
             self.data[rrd][client] = {}
-            for res_raw in self.resolution:
-                # calculate the best resolution
-                res_idx = 0
-                rrd_res = monitoringConfig.rrd_archives[res_idx][2] * monitoringConfig.rrd_step
-                period_mul = int(res_raw / rrd_res)
-                while period_mul >= monitoringConfig.rrd_archives[res_idx][3]:
-                    # not all elements in the higher bucket, get next lower resolution
-                    res_idx += 1
-                    rrd_res = monitoringConfig.rrd_archives[res_idx][2] * monitoringConfig.rrd_step
-                    period_mul = int(res_raw / rrd_res)
-
-                period = period_mul * rrd_res
-
+            window = None
+            if self.windows is not None:
+                window = self.get_window(client + rrd, monitoringConfig)
+            for rrd_res, period in self.get_periods(monitoringConfig):
                 self.data[rrd][client][period] = {}
                 end = (
                     int(time.time() / rrd_res) - 1
                 ) * rrd_res  # round due to RRDTool requirements, -1 to avoid the last (partial) one
                 start = end - period
                 try:
-                    fetched_data = self.fetchData(
-                        rrd_file=rrd, pathway=self.base_dir + "/" + client, start=start, end=end, res=rrd_res
-                    )
+                    if self.windows is None:
+                        fetched_data = self.fetchData(
+                            rrd_file=rrd, pathway=self.base_dir + "/" + client, start=start, end=end, res=rrd_res
+                        )
+                    elif window is None:
+                        fetched_data = {}
+                    else:
+                        fetched_data = window.archives[rrd_res].get_data_sets(start, end, window.ds_names)
                     for data_set in fetched_data:
                         self.data[rrd][client][period][data_set] = self.average(fetched_data[data_set])
                 except TypeError:
@@ -1904,6 +2292,102 @@ class FactoryStatusData:
 
         return self.data
 
+    def get_periods(self, monitoringConfig):
+        """Return the RRD resolution and length of the period of each of the resolutions.
+
+        The resolution is the best one of the RRD archives with all the values of the period.
+
+        Args:
+            monitoringConfig (MonitoringConfig): Monitoring configuration, with the RRD step and archives.
+
+        Returns:
+            list: The (RRD resolution, period) tuples, in seconds.
+        """
+        periods = []
+        for res_raw in self.resolution:
+            # calculate the best resolution
+            res_idx = 0
+            rrd_res = monitoringConfig.rrd_archives[res_idx][2] * monitoringConfig.rrd_step
+            period_mul = int(res_raw / rrd_res)
+            while period_mul >= monitoringConfig.rrd_archives[res_idx][3]:
+                # not all elements in the higher bucket, get next lower resolution
+                res_idx += 1
+                rrd_res = monitoringConfig.rrd_archives[res_idx][2] * monitoringConfig.rrd_step
+                period_mul = int(res_raw / rrd_res)
+            periods.append((rrd_res, period_mul * rrd_res))
+        return periods
+
+    def get_window(self, relative_fname, monitoringConfig, created=False):
+        """Return the rolling window of an RRD file, creating it if needed.
+
+        A new window is seeded from the RRD file, once, unless the file was just created.
+
+        Args:
+            relative_fname (str): The RRD file name, relative to base_dir.
+            monitoringConfig (MonitoringConfig): Monitoring configuration, with the RRD step and archives.
+            created (bool, optional): True if the file was just created. Defaults to False.
+
+        Returns:
+            RRDWindow: The window, None if there is no RRD file.
+        """
+        window = self.windows.get(relative_fname)
+        if window is not None:
+            return window
+        window = self.new_window(monitoringConfig)
+        if created:
+            # as rrdSupport.create_rrd_multi
+            window.last_update = int(time.time() - 1)
+        else:
+            try:
+                window.seed(rrdSupport.rrdSupport(), os.path.join(self.base_dir, relative_fname))
+            except Exception:
+                # probably not created yet
+                self.log.debug("Failed to load %s" % os.path.join(self.base_dir, relative_fname))
+                return None
+        self.windows[relative_fname] = window
+        return window
+
+    def new_window(self, monitoringConfig):
+        """Return an empty rolling window, with the archives needed for the periods.
+
+        Args:
+            monitoringConfig (MonitoringConfig): Monitoring configuration, with the RRD step and archives.
+
+        Returns:
+            RRDWindow: The window.
+        """
+        window = RRDWindow(monitoringConfig.rrd_step, monitoringConfig.rrd_heartbeat)
+        sizes = {}
+        for rrd_res, period in self.get_periods(monitoringConfig):
+            # the periods end one resolution before now
+            sizes[rrd_res] = max(sizes.get(rrd_res, 0), period // rrd_res + 2)
+        for archive in monitoringConfig.rrd_archives:
+            rrd_res = archive[2] * monitoringConfig.rrd_step
+            if rrd_res in sizes:
+                window.add_archive(rrd_res, archive[1], sizes.pop(rrd_res))
+        return window
+
+    def update_rrd(self, relative_fname, ds_types, update_time, val_dict, monitoringConfig, created=False):
+        """Add to the rolling window of an RRD file the values written to it.
+
+        Called by MonitoringConfig before writing the values, does nothing if the windows are not used.
+
+        Args:
+            relative_fname (str): The RRD file name, relative to base_dir.
+            ds_types (dict): The type of each data source, GAUGE if missing.
+            update_time (int): Time of the update.
+            val_dict (dict): The values by data source, None for unknown values.
+            monitoringConfig (MonitoringConfig): Monitoring configuration, with the RRD step and archives.
+            created (bool, optional): True if the file was just created. Defaults to False.
+        """
+        if self.windows is None:
+            return
+        window = self.get_window(relative_fname, monitoringConfig, created)
+        if window is None:
+            # the file could not be read, start from this update
+            window = self.windows[relative_fname] = self.new_window(monitoringConfig)
+        window.update(update_time, ds_types, val_dict)
+
     def getXMLData(self, rrd):
         """Return an XML formatted string for the specified RRD data (all clients and total from a given site).
 
@@ -15,7 +15,6 @@ Args:
     work_dir (str): The working directory for the Frontend.
 """
 
-
 import fcntl
 import os
 import shutil
@@ -33,7 +32,7 @@ from glideinwms.frontend import (
     glideinFrontendMonitoring,
     glideinFrontendPidLib,
 )
-from glideinwms.lib import cleanupSupport, condorExe, logSupport, servicePerformance
+from glideinwms.lib import cleanupSupport, condorExe, logSupport, rrdSupport, servicePerformance
 
 
 ############################################################
@@ -44,7 +43,9 @@ def aggregate_stats():
     Returns:
         dict: Aggregated statistics for the frontend.
     """
-    return glideinFrontendMonitorAggregator.aggregateStatus()
+    stats = glideinFrontendMonitorAggregator.aggregateStatus()
+    rrdSupport.flush_updates()
+    return stats
 
 
 ############################################################
@@ -403,6 +404,10 @@ def spawn(
     ha_check_interval = glideinFrontendLib.getHACheckInterval(frontendDescript.data)
     mode = glideinFrontendLib.getHAMode(frontendDescript.data)
     master_frontend_name = ""
+
+    # Queue the RRD updates of the aggregation and write them in batches, optionally to an rrdcached daemon
+    if frontendDescript.data.get("RRDBatchUpdates", "False") in ("True", "1"):
+        rrdSupport.set_update_service(True, daemon=frontendDescript.data.get("RRDCachedDaemon") or None)
     if mode == "slave":
         master_frontend_name = ha.get("ha_frontends")[0].get("frontend_name")
 
@@ -671,6 +676,10 @@ def main(work_dir, action):
     # Configure logging
     # the log dir is shared between the frontend main and the groups, so use a subdirectory
     logSupport.log_dir = os.path.join(frontendDescript.data["LogDir"], "frontend")
+    # With a single log writer, the groups and all the forked children send it their records
+    # (the group log directories are in LogDir, like the frontend one)
+    if frontendDescript.data.get("LogSingleWriter", "False") in ("True", "1"):
+        logSupport.start_log_writer(frontendDescript.data["LogDir"])
     logSupport.log = logSupport.get_logger_with_handlers("frontend", logSupport.log_dir, frontendDescript.data)
 
     logSupport.log.info("Logging initialized")
@@ -33,13 +33,24 @@ from glideinwms.frontend import (
     glideinFrontendDowntimeLib,
     glideinFrontendInterface,
     glideinFrontendLib,
+    glideinFrontendMatch,
     glideinFrontendMonitoring,
     glideinFrontendPidLib,
     glideinFrontendPlugins,
 )
 
 # from glideinwms.lib.util import file_tmp2final
-from glideinwms.lib import cleanupSupport, condorMonitor, logSupport, pubCrypto, servicePerformance, token_util
+from glideinwms.lib import (
+    classadSupport,
+    cleanupSupport,
+    condorManager,
+    condorMonitor,
+    logSupport,
+    pubCrypto,
+    rrdSupport,
+    servicePerformance,
+    token_util,
+)
 from glideinwms.lib.disk_cache import DiskCache
 from glideinwms.lib.fork import fork_in_bg, ForkManager, wait_for_pids
 from glideinwms.lib.pidSupport import register_sighandler
@@ -185,6 +196,35 @@ class glideinFrontendElement:
         else:
             self.ignore_down_entries = self.elementDescript.frontend_data.get("IgnoreDownEntries") == "True"
         # TODO: do I need like ignore_down_entries with "" group default? How are other parameters handling defaults?
+        # The MatchEngine knob (group first, then global) selects how countMatch evaluates the match expression:
+        # "eval" uses eval() for each entry and job cluster, anything else (default "batched") the batched match engine,
+        # falling back to eval() for expressions the engine cannot compile
+        self.match_engine = None
+        match_engine_mode = self.elementDescript.element_data.get(
+            "MatchEngine", ""
+        ) or self.elementDescript.frontend_data.get("MatchEngine", "")
+        if match_engine_mode != "eval":
+            match_engine = glideinFrontendMatch.MatchEngine(
+                self.elementDescript.merged_data["MatchExpr"], self.elementDescript.merged_data["MatchPolicyModules"]
+            )
+            if match_engine.compiled:
+                self.match_engine = match_engine
+            else:
+                logSupport.log.info("Using eval() in countMatch, match engine not available: %s" % match_engine.reason)
+        # The MatchCacheSize knob (group first, then global) is the number of match results of job clusters and
+        # entries kept across cycles (glideinFrontendMatch.MatchCache), 0 or empty to match all the pairs every cycle.
+        # MatchCacheMaxAge is how many seconds an unused result is kept
+        self.match_cache_size = int(
+            self.elementDescript.element_data.get("MatchCacheSize", "")
+            or self.elementDescript.frontend_data.get("MatchCacheSize", "")
+            or 0
+        )
+        self.match_cache_max_age = int(
+            self.elementDescript.element_data.get("MatchCacheMaxAge", "")
+            or self.elementDescript.frontend_data.get("MatchCacheMaxAge", "")
+            or 86400
+        )
+        self.match_cache_stats = None
         self.ramp_up_attenuation = float(self.elementDescript.element_data["RampUpAttenuation"])
         self.min_running = int(self.elementDescript.element_data["MinRunningPerEntry"])
         self.max_running = int(self.elementDescript.element_data["MaxRunningPerEntry"])
@@ -228,6 +268,8 @@ class glideinFrontendElement:
         # Initializing some monitoring variables
         self.count_real_jobs = {}
         self.count_real_glideins = {}
+        # running jobs by RunningOn, from appendRealRunning
+        self.running_index = None
 
         self.glidein_config_limits = {}
         self.set_glidein_config_limits()
@@ -235,6 +277,28 @@ class glideinFrontendElement:
         # Initialize the cache for the schedd queries
         cache_dir = os.path.join(work_dir, glideinFrontendConfig.frontendConfig.cache_dir)
         condorMonitor.disk_cache = DiskCache(cache_dir)
+        # The CompactClassads knob (group first, then global) makes the condor_q and condor_status results
+        # CompactClassad records instead of dictionaries, less memory and faster to pickle across the forks
+        compact_classads = self.elementDescript.element_data.get(
+            "CompactClassads", ""
+        ) or self.elementDescript.frontend_data.get("CompactClassads", "")
+        condorMonitor.USE_COMPACT_CLASSADS = compact_classads == "True"
+        # The ScheddQueryTimeout knob (group first, then global) is the time in seconds each schedd
+        # has to answer condor_q, 0 or empty for no timeout
+        self.schedd_query_timeout = float(
+            self.elementDescript.element_data.get("ScheddQueryTimeout", "")
+            or self.elementDescript.frontend_data.get("ScheddQueryTimeout", "")
+            or 0
+        )
+        self.slow_schedds = set()
+        # The JobCacheFullRefresh knob (group first, then global) enables the per-schedd job cache:
+        # condor_q retrieves only the jobs that changed status and all the jobs every JobCacheFullRefresh seconds,
+        # 0 or empty to query all the jobs every time
+        self.job_cache_refresh = int(
+            self.elementDescript.element_data.get("JobCacheFullRefresh", "")
+            or self.elementDescript.frontend_data.get("JobCacheFullRefresh", "")
+            or 0
+        )
 
     def configure(self):
         """Perform initial configuration of the element.
@@ -249,7 +313,9 @@ class glideinFrontendElement:
             self.elementDescript.frontend_data["LogDir"], self.group_name
         )
 
-        # Configure frontend group process logging
+        # Configure frontend group process logging, using the log writer of the Frontend if enabled
+        if self.elementDescript.frontend_data.get("LogSingleWriter", "False") in ("True", "1"):
+            logSupport.start_log_writer(self.elementDescript.frontend_data["LogDir"])
         logSupport.log = logSupport.get_logger_with_handlers(
             self.group_name, logSupport.log_dir, self.elementDescript.frontend_data
         )
@@ -266,6 +332,26 @@ class glideinFrontendElement:
         glideinFrontendInterface.frontendConfig.advertise_use_multi = self.elementDescript.frontend_data[
             "AdvertiseWithMultiple"
         ] in ("True", "1")
+        # Advertise in process with the HTCondor Python bindings, if available, instead of condor_advertise
+        if self.elementDescript.frontend_data.get("AdvertiseWithBindings", "False") in ("True", "1"):
+            condorManager.set_advertise_with_bindings(True)
+        # Queue the RRD updates and write them in batches, optionally to an rrdcached daemon
+        if self.elementDescript.frontend_data.get("RRDBatchUpdates", "False") in ("True", "1"):
+            rrdSupport.set_update_service(
+                True, daemon=self.elementDescript.frontend_data.get("RRDCachedDaemon") or None
+            )
+        # AdvertiseKeepAlive (group first, then global): advertise only the changed classads, and the others after
+        # these seconds, that must be smaller than the classad lifetime in the Collector. 0 or empty to advertise all
+        # The group process is restarted every cycle, the published hashes are saved in the group directory
+        advertise_keepalive = int(
+            self.elementDescript.element_data.get("AdvertiseKeepAlive", "")
+            or self.elementDescript.frontend_data.get("AdvertiseKeepAlive", "")
+            or 0
+        )
+        if advertise_keepalive > 0:
+            glideinFrontendInterface.frontendConfig.advertise_cache = classadSupport.AdvertiseCache(
+                advertise_keepalive, os.path.join(group_dir, "advertise_cache.pickle")
+            )
 
         if self.elementDescript.merged_data["Proxies"]:
             proxy_plugins = glideinFrontendPlugins.proxy_plugins
@@ -470,17 +556,16 @@ class glideinFrontendElement:
             forkm_obj.add_fork(("factory", idx), self.query_factory, factory_pool)
 
         ## schedd
-        idx = 0
-        for schedd_name in self.getScheddList():
-            idx += 1
-            forkm_obj.add_fork(("schedd", idx), self.get_condor_q, schedd_name)
+        # one child queries all the schedds concurrently, a slow schedd delays the iteration at most schedd_query_timeout
+        forkm_obj.add_fork(("schedd", 0), self.get_condor_q, self.getScheddList())
 
         ## resource
         forkm_obj.add_fork(("collector", 0), self.get_condor_status)
 
         logSupport.log.debug("%i child query processes started" % len(forkm_obj))
         try:
-            servicePerformance.startPerfMetricEvent(self.group_name, "condor_queries")
+            t_queries = time.time()
+            servicePerformance.startPerfMetricEvent(self.group_name, "condor_queries", t=t_queries)
             pipe_out = forkm_obj.fork_and_collect()
             servicePerformance.endPerfMetricEvent(self.group_name, "condor_queries")
         except RuntimeError:
@@ -497,6 +582,7 @@ class glideinFrontendElement:
         self.glidein_dict = {}
         self.factoryclients_dict = {}
         self.condorq_dict = {}
+        self.slow_schedds = set()
 
         for pkel in pipe_out:
             ptype, idx = pkel
@@ -510,14 +596,20 @@ class glideinFrontendElement:
                 del pglidein_dict
                 del pfactoryclients_dict
             elif ptype == "schedd":
-                # one of the schedds
-                pcondorq_dict = pipe_out[pkel]
+                # the schedds, with the list of the ones not answering in time and the query times
+                pcondorq_dict, query_stats = pipe_out[pkel]
                 self.condorq_dict.update(pcondorq_dict)
+                self.slow_schedds.update(query_stats.get("timed_out", []))
+                for schedd_name, latency in query_stats.get("latency", {}).items():
+                    # classad friendly event name, published with the other group performance metrics
+                    event_name = "condor_q_%s" % re.sub(r"\W", "_", schedd_name)
+                    servicePerformance.startPerfMetricEvent(self.group_name, event_name, t=t_queries)
+                    servicePerformance.endPerfMetricEvent(self.group_name, event_name, t=t_queries + latency)
                 del pcondorq_dict
             # collector dealt with outside the loop because there is only one
             # nothing else left
 
-        (self.status_dict, self.fe_counts, self.global_counts, self.status_schedd_dict) = pipe_out[("collector", 0)]
+        self.status_dict, self.fe_counts, self.global_counts, self.status_schedd_dict = pipe_out[("collector", 0)]
 
         # M2Crypto objects are not pickleable, so do the transformation here
         self.populate_pubkey()
@@ -550,7 +642,9 @@ class glideinFrontendElement:
             )
         )
         self.populate_status_dict_types()
-        glideinFrontendLib.appendRealRunning(self.condorq_dict_running, self.status_dict_types["Running"]["dict"])
+        self.running_index = glideinFrontendLib.appendRealRunning(
+            self.condorq_dict_running, self.status_dict_types["Running"]["dict"]
+        )
 
         self.stats["group"].logGlideins(
             {
@@ -638,8 +732,14 @@ class glideinFrontendElement:
         )
         descript_obj.add_monitoring_url(self.monitoring_web_url)
 
-        # reuse between loops might be a good idea, but this will work for now
-        key_builder = glideinFrontendInterface.Key4AdvertizeBuilder()
+        # With the advertise cache the symkeys are reused between loops, saved in the group directory,
+        # otherwise the encrypted attributes would change every cycle and all the classads would be advertised
+        if glideinFrontendInterface.frontendConfig.advertise_cache is not None:
+            key_builder = glideinFrontendInterface.Key4AdvertizeBuilder(
+                os.path.join(glideinFrontendConfig.get_group_dir(self.work_dir, self.group_name), "symkeys.json")
+            )
+        else:
+            key_builder = glideinFrontendInterface.Key4AdvertizeBuilder()
 
         logSupport.log.info("Match")
 
@@ -649,6 +749,17 @@ class glideinFrontendElement:
         servicePerformance.startPerfMetricEvent(self.group_name, "matchmaking")
         self.do_match()
         servicePerformance.endPerfMetricEvent(self.group_name, "matchmaking")
+        if self.match_cache_stats:
+            lookups = self.match_cache_stats["hits"] + self.match_cache_stats["misses"]
+            logSupport.log.info(
+                "Match cache: %i hits, %i misses (hit ratio %.1f%%), estimated match time saved %.3f seconds"
+                % (
+                    self.match_cache_stats["hits"],
+                    self.match_cache_stats["misses"],
+                    100.0 * self.match_cache_stats["hits"] / lookups if lookups else 0,
+                    self.match_cache_stats["saved_time"],
+                )
+            )
 
         logSupport.log.info(
             "Total matching idle %i (old 10min %i 60min %i) running %i limit %i"
@@ -1282,9 +1393,15 @@ class glideinFrontendElement:
         2. Transfer queue (TransferQueueNumUploading) is greater than 95%
            of max allowed transfers (TransferQueueMaxUploading)
         3. CurbMatchmaking in schedd classad is true
+        4. The query of the jobs (condor_q) timed out
         """
         self.blacklist_schedds = set()
 
+        # 4. Did not answer to condor_q in time (ScheddQueryTimeout)
+        for schedd in sorted(self.slow_schedds):
+            logSupport.log.warning("Schedd %s did not answer to the query in time, blacklisting" % schedd)
+            self.blacklist_schedds.add(schedd)
+
         for c in self.status_schedd_dict:
             coll_status_schedd_dict = self.status_schedd_dict[c].fetchStored()
             for schedd in coll_status_schedd_dict:
@@ -2273,17 +2390,23 @@ class glideinFrontendElement:
             self.query_factoryclients(factory_pool),
         )
 
-    def get_condor_q(self, schedd_name):
-        """Retrieve the jobs a schedd is requesting
-
-        Args:
-            schedd_name (str): the schedd name
+    def get_condor_q(self, schedd_names):
+        """Retrieve the jobs the schedds are requesting
 
-        Returns (dict): a dictionary with all the jobs
+        The schedds are queried concurrently, each one with a timeout of self.schedd_query_timeout seconds
 
+        Args:
+            schedd_names (list|str): the schedd names (or a single schedd name)
 
+        Returns:
+            tuple: a dictionary with all the jobs (schedd name -> condorQ)
+                and the query stats with the schedds not answering in time ("timed_out")
+                and the time to query each schedd ("latency")
         """
+        if isinstance(schedd_names, str):
+            schedd_names = [schedd_names]
         condorq_dict = {}
+        query_stats = {"timed_out": [], "latency": {}}
         try:
             condorq_format_list = self.elementDescript.merged_data["JobMatchAttrs"]
             if self.x509_proxy_plugin:
@@ -2296,15 +2419,18 @@ class glideinFrontendElement:
             condorq_format_list = list(condorq_format_list) + list((("x509UserProxyFQAN", "s"),))
             condorq_format_list = list(condorq_format_list) + list((("x509userproxy", "s"),))
             condorq_dict = glideinFrontendLib.getCondorQ(
-                [schedd_name],
+                schedd_names,
                 self.elementDescript.merged_data["JobQueryExpr"],
                 # expand_DD(self.elementDescript.merged_data['JobQueryExpr'], self.attr_dict),
                 condorq_format_list,
+                timeout=self.schedd_query_timeout,
+                query_stats=query_stats,
+                job_cache_refresh=self.job_cache_refresh,
             )
         except Exception:
             logSupport.log.exception("In query schedd child, exception:")
 
-        return condorq_dict
+        return condorq_dict, query_stats
 
     def get_condor_status(self):
         """Retrieves and summarizes Condor slot and job status information for the current group and globally.
@@ -2471,9 +2597,9 @@ class glideinFrontendElement:
     def do_match(self):
         """Performs the actual job-to-glidein matching process in parallel.
 
-        This method forks subprocesses to parallelize the work of counting glideins, real jobs, and data transfers.
-        It runs the following subprocess methods in parallel:
-        - self.subprocess_count_glidein
+        This method forks subprocesses to parallelize the work of counting real jobs and data transfers.
+        The glidein counts (self.subprocess_count_glidein) are done first, in this process,
+        using an index of the slots. Then it runs the following subprocess methods in parallel:
         - self.subprocess_count_real
         - self.subprocess_count_dt
 
@@ -2483,27 +2609,25 @@ class glideinFrontendElement:
         - self.count_real_jobs
         - self.count_real_glideins
         - self.condorq_dict_types
+        - self.match_cache_stats (hits, misses and time saved by the match caches of all the types)
 
         Returns:
             None: This method updates internal attributes with matching results and does not return a value.
         """
 
-        # IS: Heuristics of 100 glideins per fork
-        #     Based on times seen by CMS
-        glideins_per_fork = 100
-
-        glidein_list = list(self.glidein_dict.keys())
-        # split the list in equal pieces
-        # the result is a list of lists
-        split_glidein_list = [
-            glidein_list[i : i + glideins_per_fork] for i in range(0, len(glidein_list), glideins_per_fork)
-        ]
+        # The glidein counts are lookups in an index built with a single pass on the slots,
+        # it is cheaper to do them here than in forked children
+        t_begin = time.time()
+        status_index = glideinFrontendLib.getClientCondorStatusIndex(
+            self.status_dict_types["Total"]["dict"], self.frontend_name, self.group_name, self.p_glidein_min_memory
+        )
+        self.count_status_multi, self.count_status_multi_per_cred = self.subprocess_count_glidein(
+            list(self.glidein_dict.keys()), status_index
+        )
+        logSupport.log.debug("Glidein counts from the slot index took %s seconds" % (time.time() - t_begin))
 
         forkm_obj = ForkManager()
 
-        for i in range(len(split_glidein_list)):
-            forkm_obj.add_fork(("Glidein", i), self.subprocess_count_glidein, split_glidein_list[i])
-
         forkm_obj.add_fork("Real", self.subprocess_count_real)
 
         for dt in self.condorq_dict_types:
@@ -2519,18 +2643,17 @@ class glideinFrontendElement:
             return
         logSupport.log.info("All children terminated - took %s seconds" % t_end)
 
+        self.match_cache_stats = None
         for dt, el in self.condorq_dict_types.items():
-            # c, p, h, pmc, t returned by  subprocess_count_dt(self, dt)
-            (el["count"], el["prop"], el["hereonly"], el["prop_mc"], el["total"]) = pipe_out[dt]
-
-        (self.count_real_jobs, self.count_real_glideins) = pipe_out["Real"]
-        self.count_status_multi = {}
-        self.count_status_multi_per_cred = {}
-        for i in range(len(split_glidein_list)):
-            tmp_count_status_multi = pipe_out[("Glidein", i)][0]
-            self.count_status_multi.update(tmp_count_status_multi)
-            tmp_count_status_multi_per_cred = pipe_out[("Glidein", i)][1]
-            self.count_status_multi_per_cred.update(tmp_count_status_multi_per_cred)
+            # c, p, h, pmc, t, match cache stats returned by  subprocess_count_dt(self, dt)
+            el["count"], el["prop"], el["hereonly"], el["prop_mc"], el["total"] = pipe_out[dt][:5]
+            if len(pipe_out[dt]) > 5 and pipe_out[dt][5]:
+                if self.match_cache_stats is None:
+                    self.match_cache_stats = {"hits": 0, "misses": 0, "saved_time": 0.0}
+                for k in self.match_cache_stats:
+                    self.match_cache_stats[k] += pipe_out[dt][5][k]
+
+        self.count_real_jobs, self.count_real_glideins = pipe_out["Real"]
 
     def subprocess_count_dt(self, dt):
         """Counts the matches (glideins matching entries) using glideinFrontendLib.countMatch.
@@ -2542,16 +2665,36 @@ class glideinFrontendElement:
             dt (int): Index within the data dictionary to process.
 
         Returns:
-            tuple: A tuple of five elements:
+            tuple: A tuple of six elements:
                 - count: Number of matches.
                 - prop: Proportional matches.
                 - hereonly: Matches exclusive to this context.
                 - prop_mc: Proportional multicore matches.
                 - total: Total matches.
+                - match_cache_stats: hits, misses and time saved by the match cache, None if not used.
         """
 
         out = ()
 
+        # The match results are cached per job type, each type is counted in its own process
+        match_cache = None
+        if self.match_cache_size > 0:
+            match_cache = glideinFrontendMatch.MatchCache(
+                os.path.join(
+                    glideinFrontendConfig.get_group_dir(self.work_dir, self.group_name), "match_cache.%s.pickle" % dt
+                ),
+                glideinFrontendMatch.MatchCache.context_fingerprint(
+                    self.elementDescript.merged_data["MatchExpr"],
+                    self.elementDescript.merged_data["MatchPolicyModules"],
+                    self.attr_dict,
+                    ignore_down_entries=self.ignore_down_entries,
+                    condorq_match_list=self.condorq_match_list,
+                ),
+                self.match_cache_size,
+                self.match_cache_max_age,
+            )
+            match_cache.load()
+
         c, p, h, pmc = glideinFrontendLib.countMatch(
             self.elementDescript.merged_data["MatchExprCompiledObj"],
             self.condorq_dict_types[dt]["dict"],
@@ -2560,14 +2703,20 @@ class glideinFrontendElement:
             self.ignore_down_entries,
             self.condorq_match_list,
             match_policies=self.elementDescript.merged_data["MatchPolicyModules"],
+            match_engine=self.match_engine,
+            match_cache=match_cache,
             # This is the line to enable if you want the frontend to dump data structures during countMatch
             # You can then use the profile_frontend.py script to execute the countMatch function with real data
             # Data will be saved into /tmp/frontend_dump/ . Make sure to create the dir beforehand.
             #                        group_name=self.group_name
         )
         t = glideinFrontendLib.countCondorQ(self.condorq_dict_types[dt]["dict"])
+        match_cache_stats = None
+        if match_cache is not None:
+            match_cache.save()
+            match_cache_stats = match_cache.stats()
 
-        out = (c, p, h, pmc, t)
+        out = (c, p, h, pmc, t, match_cache_stats)
 
         return out
 
@@ -2589,87 +2738,50 @@ class glideinFrontendElement:
             self.attr_dict,
             self.condorq_match_list,
             match_policies=self.elementDescript.merged_data["MatchPolicyModules"],
+            running_index=self.running_index,
         )
         return out
 
-    def subprocess_count_glidein(self, glidein_list):
-        """Counts statistics for glideins in parallel using multiple processes.
+    def subprocess_count_glidein(self, glidein_list, status_index=None):
+        """Counts statistics for glideins, per request and per credential.
 
-        This method calculates various statistics for the provided list of glideins,
-        distributing the work across multiple processes for efficiency.
+        The counts are lookups in the index of the slots (glideinFrontendLib.getClientCondorStatusIndex).
+        The index is built once for all the requests, if not provided.
 
         Args:
             glidein_list (list): List of glideins to analyze.
+            status_index (condorMonitor.QueryIndex, optional): Index from getClientCondorStatusIndex. Defaults to None.
 
         Returns:
-            tuple: A tuple containing statistics results for the given glideins.
-                (You can specify the exact elements of the tuple if known.)
+            tuple: A tuple containing statistics results for the given glideins:
+                count_status_multi (dict): request name -> state -> count
+                count_status_multi_per_cred (dict): request name -> credential ID -> state -> count
         """
-        out = ()
+        if status_index is None:
+            status_index = glideinFrontendLib.getClientCondorStatusIndex(
+                self.status_dict_types["Total"]["dict"], self.frontend_name, self.group_name, self.p_glidein_min_memory
+            )
 
         count_status_multi = {}
         # Count distribution per credentials
         count_status_multi_per_cred = {}
+        cred_ids = [cred.getId() for cred in self.x509_proxy_plugin.cred_list]
         for glideid in glidein_list:
             request_name = glideid[1]
 
             count_status_multi[request_name] = {}
             count_status_multi_per_cred[request_name] = {}
-            for cred in self.x509_proxy_plugin.cred_list:
-                count_status_multi_per_cred[request_name][cred.getId()] = {}
-
-            # It is cheaper to get Idle and Running from request-only
-            # classads then filter out requests from Idle and Running
-            # glideins
-            total_req_dict = glideinFrontendLib.getClientCondorStatus(
-                self.status_dict_types["Total"]["dict"], self.frontend_name, self.group_name, request_name
-            )
-
-            req_dict_types = {
-                "Total": total_req_dict,
-                "Idle": glideinFrontendLib.getIdleCondorStatus(total_req_dict, self.p_glidein_min_memory),
-                "Running": glideinFrontendLib.getRunningCondorStatus(total_req_dict),
-                "Failed": glideinFrontendLib.getFailedCondorStatus(total_req_dict),
-                "TotalCores": glideinFrontendLib.getCondorStatusNonDynamic(total_req_dict),
-                "IdleCores": glideinFrontendLib.getIdleCoresCondorStatus(total_req_dict),
-                "RunningCores": glideinFrontendLib.getRunningCoresCondorStatus(total_req_dict),
-            }
-
-            for st in req_dict_types:
-                req_dict = req_dict_types[st]
-                if st in ("TotalCores", "IdleCores", "RunningCores"):
-                    count_status_multi[request_name][st] = glideinFrontendLib.countCoresCondorStatus(req_dict, st)
-                elif st == "Running":
-                    # Running counts are computed differently because of
-                    # the dict composition. Dict also has p-slots
-                    # corresponding to the dynamic slots
-                    count_status_multi[request_name][st] = glideinFrontendLib.countRunningCondorStatus(req_dict)
-                else:
-                    count_status_multi[request_name][st] = glideinFrontendLib.countCondorStatus(req_dict)
-
-                for cred in self.x509_proxy_plugin.cred_list:
-                    cred_id = cred.getId()
-                    cred_dict = glideinFrontendLib.getClientCondorStatusCredIdOnly(req_dict, cred_id)
-
-                    if st in ("TotalCores", "IdleCores", "RunningCores"):
-                        count_status_multi_per_cred[request_name][cred_id][st] = (
-                            glideinFrontendLib.countCoresCondorStatus(cred_dict, st)
-                        )
-                    elif st == "Running":
-                        # Running counts are computed differently because of
-                        # the dict composition. Dict also has p-slots
-                        # corresponding to the dynamic slots
-                        count_status_multi_per_cred[request_name][cred_id][st] = (
-                            glideinFrontendLib.countRunningCondorStatus(cred_dict)
-                        )
-                    else:
-                        count_status_multi_per_cred[request_name][cred_id][st] = glideinFrontendLib.countCondorStatus(
-                            cred_dict
-                        )
-
-        out = (count_status_multi, count_status_multi_per_cred)
+            for cred_id in cred_ids:
+                count_status_multi_per_cred[request_name][cred_id] = {}
+
+            for st in ("Total", "Idle", "Running", "Failed", "TotalCores", "IdleCores", "RunningCores"):
+                count_status_multi[request_name][st] = status_index.count((request_name, None), st)
+                for cred_id in cred_ids:
+                    count_status_multi_per_cred[request_name][cred_id][st] = status_index.count(
+                        (request_name, cred_id), st
+                    )
 
-        return out
+        return (count_status_multi, count_status_multi_per_cred)
 
 
 ############################################################
@@ -2685,6 +2797,7 @@ def check_parent(parent_pid):
 def write_stats(stats):
     for k in list(stats.keys()):
         stats[k].write_file()
+    rrdSupport.flush_updates()
 
 
 ############################################################
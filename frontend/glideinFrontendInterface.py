@@ -5,8 +5,8 @@
 This module implements the functions needed to advertise and get resources from the Collector
 """
 
-import calendar
 import copy
+import json
 import os
 import time
 
@@ -76,6 +76,9 @@ class FrontendConfig:
         self.advertise_use_tcp = False
         # Should we use the new -multiple for condor_advertise?
         self.advertise_use_multi = False
+        # classadSupport.AdvertiseCache to advertise only the changed glideclient and glideresource classads
+        # None to advertise all of them every time
+        self.advertise_cache = None
 
         self.condor_reserved_names = (
             "MyType",
@@ -286,6 +289,88 @@ def format_condor_dict(data):
 # and not for every iteration.
 
 
+class CredentialMetadataCache:
+    """Metadata of the credential files, parsed in process once for each version of a file.
+
+    Holds the X.509 expiration (notAfter) and DN and the token `exp` and `nbf` claims.
+    The metadata of a file is valid while its inode, modification time and size do not change.
+
+    Attributes:
+        entries (dict): File name -> ((inode, mtime_ns, size), {metadata name: value}).
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def get_metadata(self, fname):
+        """Returns the metadata of the current version of a file.
+
+        Args:
+            fname (str): The file name.
+
+        Returns:
+            dict: The metadata parsed so far, a new dict if the file changed.
+
+        Raises:
+            OSError: If the file cannot be stat-ed.
+        """
+        fstat = os.stat(fname)
+        signature = (fstat.st_ino, fstat.st_mtime_ns, fstat.st_size)
+        entry = self.entries.get(fname)
+        if entry is None or entry[0] != signature:
+            entry = self.entries[fname] = (signature, {})
+        return entry[1]
+
+    def get_value(self, fname, name, parse):
+        """Returns a metadata value of a file, parsing it only for a new version of the file.
+
+        Args:
+            fname (str): The file name.
+            name (str): The metadata name.
+            parse (function): Returns the value, given the file name.
+
+        Returns:
+            The metadata value.
+        """
+        metadata = self.get_metadata(fname)
+        if name not in metadata:
+            metadata[name] = parse(fname)
+        return metadata[name]
+
+    def get_dn(self, fname):
+        """Returns the DN of an X.509 proxy, see `x509Support.extract_DN`."""
+        return self.get_value(fname, "dn", x509Support.extract_DN)
+
+    def get_not_after(self, fname):
+        """Returns the expiration time of an X.509 proxy or certificate, see `x509Support.extract_not_after`."""
+        return self.get_value(fname, "not_after", x509Support.extract_not_after)
+
+    def token_expired(self, fname):
+        """Checks the expiration and not-before times of a token file, as `token_util.token_file_expired`.
+
+        Args:
+            fname (str): The token file name.
+
+        Returns:
+            bool: True if the token is expired, not valid yet, invalid or missing.
+        """
+        try:
+            times = self.get_value(fname, "token_times", token_util.token_file_times)
+        except FileNotFoundError:
+            logSupport.log.warning(f"Token file '{fname}' not found. Considering it expired.")
+            return True
+        except Exception as e:
+            logSupport.log.exception("%s" % e)
+            return True
+        if times is None:
+            return True
+        return token_util.token_times_expired(*times)
+
+
+# Metadata of the credential files, shared by all the Credential objects
+credential_metadata = CredentialMetadataCache()
+
+
 class Credential:
     def __init__(self, proxy_id, proxy_fname, elementDescript):
         self.req_idle = 0
@@ -424,7 +509,7 @@ class Credential:
 
     def file_id(self, filename, ignoredn=False):
         if ("grid_proxy" in self.type) and not ignoredn:
-            dn = x509Support.extract_DN(filename)
+            dn = credential_metadata.get_dn(filename)
             hash_str = filename + dn
         else:
             hash_str = filename
@@ -436,16 +521,13 @@ class Credential:
         Returns the time left if a grid proxy
         If missing, returns 0
         If not a grid proxy or other unidentified error, return -1
+        The expiration is parsed in process and cached until the file changes
         """
         if not os.path.exists(self.filename):
             return 0
 
         if ("grid_proxy" in self.type) or ("cert_pair" in self.type):
-            time_list = condorExe.iexe_cmd("openssl x509 -in %s -noout -enddate" % self.filename)
-            if "notAfter=" in time_list[0]:
-                time_str = time_list[0].split("=")[1].strip()
-                timeleft = calendar.timegm(time.strptime(time_str, "%b %d %H:%M:%S %Y %Z")) - int(time.time())
-                return timeleft
+            return int(credential_metadata.get_not_after(self.filename)) - int(time.time())
         return -1
 
     def renew(self):
@@ -586,24 +668,29 @@ class FactoryKeys4Advertize:
             glidein_symKey = copy.deepcopy(glidein_symKey)
             glidein_symKey.new()
         self.glidein_symKey = glidein_symKey
+        # the RSA encryption is randomized, the key attributes are computed once so that they do not change
+        self.key_attrs = None
 
     # returns a list of strings
     def get_key_attrs(self):
         """Get the key attributes as classad lines
 
         Returns:
-            list: list of str containing the classads about the key
-        """
-        glidein_symKey_str = self.glidein_symKey.get_code()
-        return (
-            'ReqPubKeyID = "%s"' % self.factory_pub_key_id,
-            'ReqEncKeyCode = "%s"'
-            % self.factory_pub_key.encrypt_hex(glidein_symKey_str).decode(defaults.BINARY_ENCODING_CRYPTO),
-            # this attribute will be checked against the AuthenticatedIdentity
-            # this will prevent replay attacks, as only who knows the symkey can change this field
-            # no other changes needed, as HTCondor provides integrity of the whole classAd
-            'ReqEncIdentity = "%s"' % self.encrypt_hex(self.classad_identity).decode(defaults.BINARY_ENCODING_CRYPTO),
-        )
+            tuple: tuple of str containing the classads about the key, the same at every call
+        """
+        if self.key_attrs is None:
+            glidein_symKey_str = self.glidein_symKey.get_code()
+            self.key_attrs = (
+                'ReqPubKeyID = "%s"' % self.factory_pub_key_id,
+                'ReqEncKeyCode = "%s"'
+                % self.factory_pub_key.encrypt_hex(glidein_symKey_str).decode(defaults.BINARY_ENCODING_CRYPTO),
+                # this attribute will be checked against the AuthenticatedIdentity
+                # this will prevent replay attacks, as only who knows the symkey can change this field
+                # no other changes needed, as HTCondor provides integrity of the whole classAd
+                'ReqEncIdentity = "%s"'
+                % self.encrypt_hex(self.classad_identity).decode(defaults.BINARY_ENCODING_CRYPTO),
+            )
+        return self.key_attrs
 
     def encrypt_hex(self, data):
         """Encrypt the input data
@@ -617,13 +704,87 @@ class FactoryKeys4Advertize:
         return self.glidein_symKey.encrypt_hex(data)
 
 
+# Seconds a symkey saved by Key4AdvertizeBuilder is reused, then a new one is created
+SYMKEY_MAX_AGE = 86400
+
+
 class Key4AdvertizeBuilder:
     """Class for creating FactoryKeys4Advertize objects
     will reuse the symkey as much as possible
+
+    With `state_fname` the symkeys and their key attributes are saved in that file and reused by the next
+    builders, e.g. in the next cycles of a Frontend group, for up to `max_age` seconds. Then the glideclient
+    classads of unchanged requests are the same and are not advertised again (see `classadSupport.AdvertiseCache`).
+    A new symkey changes the key attributes, so all the classads are advertised again when it rotates.
     """
 
-    def __init__(self):
+    def __init__(self, state_fname=None, max_age=SYMKEY_MAX_AGE):
+        """Constructor
+
+        Args:
+            state_fname (str): File with the symkeys of the previous builders, readable only by the user.
+                None to use new symkeys.
+            max_age (int): Seconds after which a saved symkey is replaced by a new one.
+        """
         self.keys_cache = {}  # will contain a tuple of (key_obj, creation_time, last_access_time)
+        self.state_fname = state_fname
+        self.max_age = max_age
+        self.saved_keys = self._load()  # factory key -> dict with the symkey code, its attributes and creation time
+
+    def _load(self):
+        """Return the symkeys saved in the state file, if any, still valid"""
+        if self.state_fname is None:
+            return {}
+        try:
+            with open(self.state_fname) as fd:
+                saved_keys = json.load(fd)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logSupport.log.debug(f"Ignoring invalid symkey file {self.state_fname}: {e}")
+            return {}
+        min_creation_time = time.time() - self.max_age
+        return {k: v for k, v in saved_keys.items() if v["created"] >= min_creation_time}
+
+    def _save(self, cache_id, key_obj, creation_time):
+        """Add a new symkey to the state file, if any
+
+        Args:
+            cache_id (str): The Factory public key.
+            key_obj (FactoryKeys4Advertize): The key object, with the symkey.
+            creation_time (float): Creation time of the symkey.
+        """
+        if self.state_fname is None:
+            return
+        self.saved_keys[cache_id] = {
+            "identity": key_obj.classad_identity,
+            "pub_key_id": key_obj.factory_pub_key_id,
+            "key_code": key_obj.glidein_symKey.get_code(),
+            "key_attrs": list(key_obj.get_key_attrs()),
+            "created": creation_time,
+        }
+        tmp_fname = f"{self.state_fname}.{os.getpid()}.tmp"
+        try:
+            with open(os.open(tmp_fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as fd:
+                json.dump(self.saved_keys, fd)
+            os.replace(tmp_fname, self.state_fname)
+        except OSError as e:
+            # a new symkey will be used next time
+            logSupport.log.warning(f"Could not save the symkeys in {self.state_fname}: {e}")
+
+    def _get_saved_key_obj(self, cache_id, classad_identity, factory_pub_key_id, factory_pub_key):
+        """Return the key object of a saved symkey, None if there is none for this Factory key and identity"""
+        saved = self.saved_keys.get(cache_id)
+        if saved is None or saved["identity"] != classad_identity or saved["pub_key_id"] != factory_pub_key_id:
+            return None
+        try:
+            glidein_symKey = symCrypto.SymAES256Key(key_iv_code=saved["key_code"])
+        except ValueError as e:
+            logSupport.log.debug(f"Ignoring invalid saved symkey: {e}")
+            return None
+        key_obj = FactoryKeys4Advertize(classad_identity, factory_pub_key_id, factory_pub_key, glidein_symKey)
+        key_obj.key_attrs = tuple(saved["key_attrs"])
+        return key_obj
 
     def get_key_obj(self, classad_identity, factory_pub_key_id, factory_pub_key, glidein_symKey=None):
         """Get a key object
@@ -653,11 +814,17 @@ class Key4AdvertizeBuilder:
                 self.keys_cache[cache_id][2] = time.time()
                 return self.keys_cache[cache_id][0]
             else:
+                now = time.time()
+                saved_id = defaults.force_str(cache_id)
+                key_obj = self._get_saved_key_obj(saved_id, classad_identity, factory_pub_key_id, factory_pub_key)
+                if key_obj is not None:
+                    self.keys_cache[cache_id] = [key_obj, self.saved_keys[saved_id]["created"], now]
+                    return key_obj
                 key_obj = FactoryKeys4Advertize(
                     classad_identity, factory_pub_key_id, factory_pub_key, glidein_symKey=None
                 )
-                now = time.time()
                 self.keys_cache[cache_id] = [key_obj, now, now]
+                self._save(saved_id, key_obj, now)
                 return key_obj
 
     def clear(self, created_after=None, accessed_after=None):
@@ -747,7 +914,16 @@ class AdvertizeParams:
 # Can throw a CondorExe/ExeError exception
 def advertizeWorkFromFile(factory_pool, fname, remove_file=True, is_multi=False):
     try:
-        exe_condor_advertise(fname, "UPDATE_MASTER_AD", factory_pool, is_multi=is_multi)
+        published = None
+        if frontendConfig.advertise_cache is not None:
+            nr_ads, published = frontendConfig.advertise_cache.filter_file(fname, prefix=f"{factory_pool}:")
+            logSupport.log.info(
+                "%i of %i glideclient classads for %s changed or to refresh" % (len(published), nr_ads, factory_pool)
+            )
+        if published is None or len(published) > 0:
+            exe_condor_advertise(fname, "UPDATE_MASTER_AD", factory_pool, is_multi=is_multi)
+            if published:
+                frontendConfig.advertise_cache.commit(published)
     finally:
         if remove_file:
             os.remove(fname)
@@ -1205,7 +1381,7 @@ class MultiAdvertizeWork:
                         token_expired = token_util.token_str_expired(credential_el.generated_data)
                     except AttributeError:
                         # then try file stored credential
-                        token_expired = token_util.token_file_expired(credential_el.filename)
+                        token_expired = credential_metadata.token_expired(credential_el.filename)
                     if token_expired:
                         logSupport.log.warning(
                             f"Credential file {credential_el.filename} has expired scitoken, skipping"
@@ -1283,7 +1459,7 @@ class MultiAdvertizeWork:
                 if credential_el.project_id:
                     glidein_params_to_encrypt["ProjectId"] = str(credential_el.project_id)
 
-                (req_idle, req_max_run) = credential_el.get_usage_details()
+                req_idle, req_max_run = credential_el.get_usage_details()
                 logSupport.log.debug(
                     "Advertizing credential %s with (%d idle, %d max run) for request %s"
                     % (credential_el.filename, req_idle, req_max_run, params_obj.request_name)
@@ -1662,6 +1838,7 @@ class ResourceClassadAdvertiser(classadSupport.ClassadAdvertiser):
         self.adAdvertiseCmd = "UPDATE_AD_GENERIC"
         self.adInvalidateCmd = "INVALIDATE_ADS_GENERIC"
         self.advertiseFilePrefix = "gfi_ar"
+        self.advertiseCache = frontendConfig.advertise_cache
 
 
 class FrontendMonitorClassad(classadSupport.Classad):
@@ -1765,6 +1942,9 @@ class FrontendMonitorClassadAdvertiser(classadSupport.ClassadAdvertiser):
 
 def exe_condor_advertise(fname, command, pool, is_multi=False):
     logSupport.log.debug(f"CONDOR ADVERTISE {fname} {command} {pool} {is_multi}")
+    if command.startswith("INVALIDATE") and frontendConfig.advertise_cache is not None:
+        # The invalidated classads must be advertised again even if unchanged
+        frontendConfig.advertise_cache.reset()
     return condorManager.condorAdvertise(fname, command, frontendConfig.advertise_use_tcp, is_multi, pool)
 
 
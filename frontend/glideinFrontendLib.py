@@ -11,6 +11,7 @@ import os
 import os.path
 import pickle
 import sys
+import time
 import traceback
 
 from glideinwms.lib import condorMonitor, logSupport
@@ -26,7 +27,9 @@ from glideinwms.lib.xmlParse import OrderedDict  # noqa: F401   # needed for eva
 # If not all the jobs of the schedd has to be considered,
 # specify the appropriate constraint
 #
-def getCondorQ(schedd_names, constraint=None, format_list=None, want_format_completion=True, job_status_filter=(1, 2)):
+def getCondorQ(
+    schedd_names, constraint=None, format_list=None, want_format_completion=True, job_status_filter=(1, 2), **query_args
+):
     """Return a dictionary of schedds containing interesting jobs
     Each element is a condorQ
 
@@ -39,6 +42,7 @@ def getCondorQ(schedd_names, constraint=None, format_list=None, want_format_comp
         format_list:
         want_format_completion (bool):
         job_status_filter:
+        **query_args: optional timeout, query_stats and job_cache_refresh, see getCondorQConstrained
 
     Returns:
 
@@ -59,7 +63,7 @@ def getCondorQ(schedd_names, constraint=None, format_list=None, want_format_comp
             js_arr.append("(JobStatus=?=%i)" % n)
         js_constraint = "||".join(js_arr)
 
-    return getCondorQConstrained(schedd_names, js_constraint, constraint, format_list)
+    return getCondorQConstrained(schedd_names, js_constraint, constraint, format_list, **query_args)
 
 
 def getIdleVomsCondorQ(condorq_dict):
@@ -112,41 +116,64 @@ def appendRealRunning(condorq_dict, status_dict):
     The name of static or pslots is the value of RemoteHost
     NOTE: HTC 8.5 may change RemoteHost to be the DynamicSlot name
 
+    The jobs are also grouped by 'RunningOn' in the running job index returned,
+    so countRealRunning can match each job only with the entry it is running on
+
     :param condorq_dict: adding 'RunningOn' to each job
     :param status_dict: running jobs from condor_status
-    :return:
+    :return: running job index, RunningOn -> schedd name -> list of job IDs
     """
+    running_index = {}
+    # RemoteHost -> RunningOn, for the slots already found
+    running_on_cache = {}
     for schedd_name in condorq_dict:
         condorq = condorq_dict[schedd_name].fetchStored()
 
         for jid in condorq:
-            found = False
+            running_on = "UNKNOWN"
 
             if "RemoteHost" in condorq[jid]:
                 remote_host = condorq[jid]["RemoteHost"]
 
-                for collector_name in status_dict:
-                    condor_status = status_dict[collector_name].fetchStored()
-                    if remote_host in condor_status:
-                        # there is currently no way to get the factory
-                        # collector from condor status so this hack grabs
-                        # the hostname of the schedd
-                        schedd = condor_status[remote_host]["GLIDEIN_Schedd"].split("@")
-
-                        # split by : to remove port number if there
-                        fact_pool = schedd[-1].split(":")[0]
-
-                        condorq[jid]["RunningOn"] = "{}@{}@{}@{}".format(
-                            condor_status[remote_host]["GLIDEIN_Entry_Name"],
-                            condor_status[remote_host]["GLIDEIN_Name"],
-                            condor_status[remote_host]["GLIDEIN_Factory"],
-                            fact_pool,
-                        )
-                        found = True
-                        break
+                if remote_host in running_on_cache:
+                    running_on = running_on_cache[remote_host]
+                else:
+                    for collector_name in status_dict:
+                        condor_status = status_dict[collector_name].fetchStored()
+                        if remote_host in condor_status:
+                            # there is currently no way to get the factory
+                            # collector from condor status so this hack grabs
+                            # the hostname of the schedd
+                            schedd = condor_status[remote_host]["GLIDEIN_Schedd"].split("@")
+
+                            # split by : to remove port number if there
+                            fact_pool = schedd[-1].split(":")[0]
+
+                            running_on = "{}@{}@{}@{}".format(
+                                condor_status[remote_host]["GLIDEIN_Entry_Name"],
+                                condor_status[remote_host]["GLIDEIN_Name"],
+                                condor_status[remote_host]["GLIDEIN_Factory"],
+                                fact_pool,
+                            )
+                            break
+                    running_on_cache[remote_host] = running_on
+
+            condorq[jid]["RunningOn"] = running_on
+            running_index.setdefault(running_on, {}).setdefault(schedd_name, []).append(jid)
+    return running_index
 
-            if not found:
-                condorq[jid]["RunningOn"] = "UNKNOWN"
+
+def _indexRunningOn(condorq_dict):
+    """Group the jobs by 'RunningOn', like the index returned by appendRealRunning
+
+    :param condorq_dict: jobs with 'RunningOn' (the jobs without it are grouped with the None key)
+    :return: running job index, RunningOn -> schedd name -> list of job IDs
+    """
+    running_index = {}
+    for schedd_name in condorq_dict:
+        for jid, job in condorq_dict[schedd_name].fetchStored().items():
+            running_index.setdefault(job.get("RunningOn"), {}).setdefault(schedd_name, []).append(jid)
+    return running_index
 
 
 #
@@ -223,6 +250,8 @@ def countMatch(
     condorq_match_list=None,
     match_policies=[],
     group_name=None,
+    match_engine=None,
+    match_cache=None,
 ):
     """
     Get the number of jobs that match each glidein
@@ -234,6 +263,10 @@ def countMatch(
     :param glidein_dict: output of interface.findGlideins
     :param attr_dict:  dictionary of constant attributes
     :param condorq_match_list: list of job attributes from the XML file
+    :param match_engine: glideinFrontendMatch.MatchEngine compiled from the same match expression and policies,
+        used instead of eval(match_obj) if not None and compiled
+    :param match_cache: glideinFrontendMatch.MatchCache with the results of the previous cycles,
+        only the job clusters and glideins not in it are evaluated, and it is updated with their results
 
     :return: tuple of 4 elements, where first 3 are a dictionary of
         glidein name where elements are number of jobs matching
@@ -344,8 +377,32 @@ def countMatch(
     list_of_all_jobs = []
     all_jobs_clusters = {}
 
+    if match_engine is not None and match_engine.compiled:
+        _countMatchEngine(
+            match_engine,
+            condorq_dict,
+            glidein_dict,
+            attr_dict,
+            ignore_down_entries,
+            cq_dict_clusters,
+            procid_mul,
+            list_of_all_jobs,
+            all_jobs_clusters,
+            out_glidein_counts,
+            out_cpu_counts,
+            match_cache,
+        )
+
+    # job hash -> job cluster key in the match cache
+    cache_job_keys = {}
     for glidename in glidein_dict:
+        if glidename in out_glidein_counts:
+            # already matched by the match engine
+            continue
         glidein = glidein_dict[glidename]
+        glidein_fp = None
+        if match_cache is not None:
+            glidein_fp = match_cache.glidein_fingerprint(glidename, glidein)
         # Number of glideins to request
         glidein_count = 0
         # Number of cpus required by the jobs on a glidein
@@ -378,12 +435,19 @@ def countMatch(
                 job = condorq_data[(first_jid[0], first_jid[1])]
 
                 try:
+                    match = None
                     # Do not match downtime entries
                     if ignore_down_entries and safe_boolcomp(
                         glidein_dict[glidename]["attrs"].get("GLIDEIN_In_Downtime", False), True
                     ):
                         match = False
-                    else:
+                    elif glidein_fp is not None:
+                        # result of a previous cycle, if any
+                        if jh not in cache_job_keys:
+                            cache_job_keys[jh] = match_cache.job_key(jh)
+                        match = match_cache.get(cache_job_keys[jh], glidein_fp)
+                        t_eval = time.time()
+                    if match is None:
                         # Evaluate the Compiled object first.
                         # Evaluation order does not really matter.
                         match = eval(match_obj)
@@ -400,6 +464,9 @@ def countMatch(
                                         % policy.file
                                     )
                                 break
+                        if glidein_fp is not None:
+                            match_cache.set(cache_job_keys[jh], glidein_fp, match)
+                            match_cache.eval_time += time.time() - t_eval
 
                     if match == True:  # noqa: E712
                         # The lines inside this 'if' can be replaced with the following three commented lines for profiling
@@ -547,9 +614,175 @@ def countMatch(
     return (out_glidein_counts, final_out_counts, final_unique, final_out_cpu_counts)
 
 
-def countRealRunning(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_match_list=None, match_policies=[]):
+def _countMatchEngine(
+    match_engine,
+    condorq_dict,
+    glidein_dict,
+    attr_dict,
+    ignore_down_entries,
+    cq_dict_clusters,
+    procid_mul,
+    list_of_all_jobs,
+    all_jobs_clusters,
+    out_glidein_counts,
+    out_cpu_counts,
+    match_cache=None,
+):
+    """Match the job clusters against all glideins using the match engine
+
+    Fills list_of_all_jobs, all_jobs_clusters, out_glidein_counts and out_cpu_counts
+    exactly like the eval() loop in countMatch.
+    With a match cache, the engine matches only the clusters missing from the cache for some glidein,
+    and only against those glideins.
+
+    Args:
+        match_engine (glideinFrontendMatch.MatchEngine): compiled match engine
+        condorq_dict (dict): sched_name->CondorQ object
+        glidein_dict (dict): glidein_name->dictionary of params and attrs
+        attr_dict (dict): dictionary of constant attributes
+        ignore_down_entries (bool): if True, entries in downtime are not matched
+        cq_dict_clusters (dict): scheddIdx->{job hash->list of (ClusterId, ProcId, linear index)}
+        procid_mul (int): ProcId multiplier used for the linear job index
+        list_of_all_jobs (list): output, set of matched cluster indexes for each glidein
+        all_jobs_clusters (dict): output, cluster index->list of job indexes
+        out_glidein_counts (dict): output, glidein_name->number of matching jobs
+        out_cpu_counts (dict): output, glidein_name->number of cpus requested by the matching jobs
+        match_cache (glideinFrontendMatch.MatchCache): results of the previous cycles, updated with the new ones
+    """
+    schedds = list(condorq_dict.keys())
+    nr_schedds = len(schedds)
+
+    # Flatten the clusters of all schedds, the engine merges the equivalent ones
+    cluster_jobs = []
+    cluster_keys = []
+    # each element is (first_t, list of job indexes, cpus required by the cluster)
+    cluster_info = []
+    for scheddIdx in range(nr_schedds):
+        condorq_data = condorq_dict[schedds[scheddIdx]].fetchStored()
+        for jh, cluster in cq_dict_clusters[scheddIdx].items():
+            # get the first job... they are all the same
+            first_jid = cluster[0]
+            job = condorq_data[(first_jid[0], first_jid[1])]
+            cluster_jobs.append(job)
+            cluster_keys.append(jh)
+            first_t = (first_jid[0] * procid_mul + first_jid[1]) * nr_schedds + scheddIdx
+            cluster_info.append((first_t, [jid[2] for jid in cluster], job.get("RequestCpus", 1) * len(cluster)))
+
+    if match_cache is None:
+        matches = match_engine.match_clusters(cluster_jobs, glidein_dict, attr_dict, ignore_down_entries, cluster_keys)
+    else:
+        matches = _matchClustersCached(
+            match_engine, match_cache, cluster_jobs, cluster_keys, glidein_dict, attr_dict, ignore_down_entries
+        )
+
+    for glidename in glidein_dict:
+        matched_clusters, stats = matches[glidename]
+        match_engine.log_stats(stats, "countMatch")
+        glidein_count = 0
+        cpu_count = 0
+        jobs = set()
+        for idx in matched_clusters:
+            first_t, cluster_arr, cluster_cpus = cluster_info[idx]
+            all_jobs_clusters[first_t] = cluster_arr
+            jobs.add(first_t)
+            glidein_count += len(cluster_arr)
+            cpu_count += cluster_cpus
+        list_of_all_jobs.append(jobs)
+        out_glidein_counts[glidename] = glidein_count
+        out_cpu_counts[glidename] = cpu_count
+
+
+def _matchClustersCached(match_engine, match_cache, jobs, job_hashes, glidein_dict, attr_dict, ignore_down_entries):
+    """Match the job clusters against all glideins like MatchEngine.match_clusters, using the match cache
+
+    The pairs in the cache are not evaluated again: the engine matches the clusters missing for some glidein
+    against the glideins missing some cluster. Its results are added to the cache, only the matches for the glideins
+    with evaluation errors (the pairs that failed are not known)
+
+    Args:
+        match_engine (glideinFrontendMatch.MatchEngine): compiled match engine
+        match_cache (glideinFrontendMatch.MatchCache): results of the previous cycles
+        jobs (list): one representative job for each job cluster
+        job_hashes (list): hashJob() value of each cluster
+        glidein_dict (dict): glidein_name->dictionary of params and attrs
+        attr_dict (dict): dictionary of constant attributes
+        ignore_down_entries (bool): if True, entries in downtime are not matched
+
+    Returns:
+        dict: glidein_name -> (list of matching cluster indexes, MatchStats)
+    """
+    # glideinFrontendMatch imports this module
+    from glideinwms.frontend.glideinFrontendMatch import MatchStats
+
+    job_keys = [match_cache.job_key(jh) for jh in job_hashes]
+    # glidein_name -> cluster index -> cached result
+    cached = {}
+    glidein_fps = {}
+    missing_clusters = set()
+    missing_glideins = {}
+    for glidename, glidein in glidein_dict.items():
+        glidein_fp = glidein_fps[glidename] = match_cache.glidein_fingerprint(glidename, glidein)
+        cached[glidename] = {}
+        if glidein_fp is None:
+            missing_glideins[glidename] = glidein
+            missing_clusters.update(range(len(jobs)))
+            continue
+        for idx, job_key in enumerate(job_keys):
+            match = match_cache.get(job_key, glidein_fp)
+            if match is None:
+                missing_clusters.add(idx)
+                missing_glideins[glidename] = glidein
+            else:
+                cached[glidename][idx] = match
+
+    missing_clusters = sorted(missing_clusters)
+    matches = {}
+    if missing_glideins:
+        t_eval = time.time()
+        matches = match_engine.match_clusters(
+            [jobs[idx] for idx in missing_clusters],
+            missing_glideins,
+            attr_dict,
+            ignore_down_entries,
+            [job_hashes[idx] for idx in missing_clusters],
+        )
+        match_cache.eval_time += time.time() - t_eval
+
+    out = {}
+    for glidename in glidein_dict:
+        results = cached[glidename]
+        if glidename in matches:
+            matched, stats = matches[glidename]
+            new_results = dict.fromkeys(missing_clusters, False)
+            new_results.update((missing_clusters[j], True) for j in matched)
+            results.update(new_results)
+            if glidein_fps[glidename] is not None:
+                # the matches are certain, the failed evaluations are not matches: with errors cache only the matches
+                with_errors = stats.missing_keys or stats.tb_count or stats.non_boolean
+                for idx, match in new_results.items():
+                    if match or not with_errors:
+                        match_cache.set(job_keys[idx], glidein_fps[glidename], match)
+        else:
+            # all the results from the cache, nothing to report
+            stats = MatchStats()
+        out[glidename] = ([idx for idx, match in sorted(results.items()) if match], stats)
+    return out
+
+
+def countRealRunning(
+    match_obj,
+    condorq_dict,
+    glidein_dict,
+    attr_dict,
+    condorq_match_list=None,
+    match_policies=[],
+    running_index=None,
+):
     """Counts all the running jobs on an entry
 
+    A job can match only the entry it is running on ('RunningOn'), so the job clusters are grouped by entry
+    and each entry evaluates only its own clusters, O(clusters) instead of O(entries * clusters)
+
     Args:
         match_obj: selection for the jobs
         condorq_dict: result of condor_q, keyed by schedd name
@@ -557,6 +790,8 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_m
         attr_dict: entry attributes, NOT USED
         condorq_match_list: match attributes used for clustering
         match_policies:
+        running_index: running job index returned by appendRealRunning for condorq_dict,
+            built from the 'RunningOn' of the jobs if None
 
     Returns: Tuple with the job counts (used for stats) and glidein counts (used for glidein_max_run)
       Both are dictionaries keyed by glidename (entry)
@@ -574,25 +809,34 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_m
     schedds = list(condorq_dict.keys())
     nr_schedds = len(schedds)
 
-    # dict of job clusters
+    if running_index is None:
+        running_index = _indexRunningOn(condorq_dict)
+
+    # dict of job clusters for each entry (RunningOn)
     # group together those that have the same attributes
-    cq_dict_clusters = {}
-    for scheddIdx in range(nr_schedds):
-        schedd = schedds[scheddIdx]
-        cq_dict_clusters[scheddIdx] = {}
-        cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
-        condorq = condorq_dict[schedd]
-        condorq_data = condorq.fetchStored()
-        for jid in list(condorq_data.keys()):
-            jh = hashJob(condorq_data[jid], condorq_match_list)
-            if jh not in cq_dict_clusters_el:
-                cq_dict_clusters_el[jh] = []
-            cq_dict_clusters_el[jh].append(jid)
+    # RunningOn is in the hash, the jobs of a cluster are all running on the same entry
+    entry_clusters = {}
+    for running_on, schedd_jobs in running_index.items():
+        entry_clusters[running_on] = {}
+        for scheddIdx in range(nr_schedds):
+            schedd = schedds[scheddIdx]
+            if schedd not in schedd_jobs:
+                continue
+            cq_dict_clusters_el = entry_clusters[running_on][scheddIdx] = {}
+            condorq_data = condorq_dict[schedd].fetchStored()
+            for jid in schedd_jobs[schedd]:
+                jh = hashJob(condorq_data[jid], condorq_match_list)
+                if jh not in cq_dict_clusters_el:
+                    cq_dict_clusters_el[jh] = []
+                cq_dict_clusters_el[jh].append(jid)
+    # Jobs without RunningOn (appendRealRunning not called) cannot be evaluated
+    no_running_on_schedds = entry_clusters.pop(None, {})
 
     for glidename in glidein_dict:
         # split by : to remove port number if there
         glide_str = "{}@{}".format(glidename[1], glidename[0].split(":")[0])
         glidein = glidein_dict[glidename]
+        cq_dict_clusters = entry_clusters.get(glide_str, {})
         glidein_count = 0
         # Sets are necessary to remove duplicates
         # job_ids counts all the jobs running on the current entry (Running here stats)
@@ -607,12 +851,14 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_m
         glidein_ids = set()
         for scheddIdx in range(nr_schedds):
             schedd = schedds[scheddIdx]
-            cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
+            cq_dict_clusters_el = cq_dict_clusters.get(scheddIdx, {})
             condorq = condorq_dict[schedd]
             condorq_data = condorq.fetchStored()
             schedd_count = 0
 
             missing_keys = set()
+            if scheddIdx in no_running_on_schedds:
+                missing_keys.add("'RunningOn'")
             tb_count = 0
             recent_tb = None
 
@@ -621,9 +867,8 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_m
                 first_jid = cq_dict_clusters_el[jh][0]
                 job = condorq_data[first_jid]
                 try:
-                    # Evaluate the Compiled object first.
-                    # Evaluation order does not really matter.
-                    match = (job["RunningOn"] == glide_str) and eval(match_obj)
+                    # Only the clusters running on this entry (job["RunningOn"] == glide_str)
+                    match = eval(match_obj)
                     for policy in match_policies:
                         if match == True:  # noqa: E712
                             # Policies are supposed to be ANDed
@@ -755,6 +1000,63 @@ def getCondorStatus(
     return getCondorStatusConstrained(collector_names, type_constraint, constraint, format_list)
 
 
+#
+# Slot classification, used by the get*CondorStatus functions and by getClientCondorStatusIndex
+#
+
+
+def isIdleSlot(el, min_memory=2500):
+    """Return True if the slot is idle (unclaimed), see getIdleCondorStatus
+
+    Args:
+        el (dict): slot classad
+        min_memory (int): minimum memory in MB for partitionable slots (default=2500)
+
+    Returns:
+        bool: True if the slot is idle
+    """
+    return (
+        (el.get("State") == "Unclaimed")
+        and (el.get("Activity") == "Idle")
+        and (
+            not el.get("PartitionableSlot")
+            or (el.get("TotalSlots") == 1)
+            or (
+                el.get("Cpus", 0) > 0
+                and el.get("Memory", 2501) > min_memory
+                and (el.get("TotalGpus", 0) == 0 or el.get("Gpus", 0) > 0)
+            )
+        )
+    )
+
+
+def isRunningSlot(el):
+    """Return True if the slot is running (claimed) or is a p-slot with dynamic slots, see getRunningCondorStatus
+
+    Args:
+        el (dict): slot classad
+
+    Returns:
+        bool: True if the slot is running
+    """
+    return bool(
+        ((el.get("State") == "Claimed") and (el.get("Activity") in ("Busy", "Retiring")))
+        or (el.get("PartitionableSlot") and (el.get("TotalSlots", 1) > 1))
+    )
+
+
+def isFailedSlot(el):
+    """Return True if the slot is failed (drained and retiring), see getFailedCondorStatus
+
+    Args:
+        el (dict): slot classad
+
+    Returns:
+        bool: True if the slot is failed
+    """
+    return (el.get("State") == "Drained") and (el.get("Activity") == "Retiring")
+
+
 def getCondorStatusNonDynamic(status_dict):
     """
     Return a dictionary of collectors containing static+partitionable slots
@@ -822,22 +1124,7 @@ def getIdleCondorStatus(status_dict, min_memory=2500):
         #     (el.get('TotalGpus', 0) == 0 or el.get('Gpus', 0) > 0))
         # p-slots that have enough idle resources.
 
-        sq = condorMonitor.SubQuery(
-            status_dict[collector_name],
-            lambda el: (
-                (el.get("State") == "Unclaimed")
-                and (el.get("Activity") == "Idle")
-                and (
-                    not el.get("PartitionableSlot")
-                    or (el.get("TotalSlots") == 1)
-                    or (
-                        el.get("Cpus", 0) > 0
-                        and el.get("Memory", 2501) > min_memory
-                        and (el.get("TotalGpus", 0) == 0 or el.get("Gpus", 0) > 0)
-                    )
-                )
-            ),
-        )
+        sq = condorMonitor.SubQuery(status_dict[collector_name], lambda el: isIdleSlot(el, min_memory))
         sq.load()
         out[collector_name] = sq
     return out
@@ -858,13 +1145,7 @@ def getRunningCondorStatus(status_dict):
         # 3. p-slot with one or more dynamic slots
         #    We get them here so we can use them easily in appendRealRunning()
 
-        sq = condorMonitor.SubQuery(
-            status_dict[collector_name],
-            lambda el: (
-                ((el.get("State") == "Claimed") and (el.get("Activity") in ("Busy", "Retiring")))
-                or (el.get("PartitionableSlot") and (el.get("TotalSlots", 1) > 1))
-            ),
-        )
+        sq = condorMonitor.SubQuery(status_dict[collector_name], isRunningSlot)
         sq.load()
         out[collector_name] = sq
     return out
@@ -917,10 +1198,7 @@ def getRunningJobsCondorStatus(status_dict):
 def getFailedCondorStatus(status_dict):
     out = {}
     for collector_name in list(status_dict.keys()):
-        sq = condorMonitor.SubQuery(
-            status_dict[collector_name],
-            lambda el: ((el.get("State") == "Drained") and (el.get("Activity") == "Retiring")),
-        )
+        sq = condorMonitor.SubQuery(status_dict[collector_name], isFailedSlot)
         sq.load()
         out[collector_name] = sq
     return out
@@ -1040,6 +1318,80 @@ def getClientCondorStatusPerCredId(status_dict, frontend_name, group_name, reque
     return out
 
 
+def getClientCondorStatusIndex(status_dict, frontend_name, group_name, min_memory=2500):
+    """Return an index of the slots of a frontend group, by request and credential
+
+    The index is built with a single pass over all the slots and replaces the calls to
+    getClientCondorStatus and getClientCondorStatusCredIdOnly, followed by the get*CondorStatus filters
+    and the count*CondorStatus counters, for each request and credential.
+    Keys are (request_name, cred_id) and (request_name, None) for all the credentials.
+    Only the slots with the group name in GLIDECLIENT_Name ("frontend.group", the one queried by the frontend
+    element) are indexed, not the old "request@frontend.group" format matched by getClientCondorStatus.
+    The states are the ones in the status_dict_types of the frontend element (Total, Idle, Running, Failed,
+    TotalCores, IdleCores, RunningCores) and each state has a counter with the same name.
+    The counters are equal to countCondorStatus, countRunningCondorStatus or countCoresCondorStatus
+    on the corresponding getClientCondorStatusPerCredId and get*CondorStatus output.
+
+    Use the output of getCondorStatus
+
+    Args:
+        status_dict (dict): output of getCondorStatus
+        frontend_name (str): frontend name
+        group_name (str): group name
+        min_memory (int): minimum memory in MB for idle partitionable slots (default=2500)
+
+    Returns:
+        condorMonitor.QueryIndex: loaded index, use count((request_name, cred_id), state) and getView()
+    """
+    client_name = f"{frontend_name}.{group_name}"
+
+    def key_func(el):
+        if el.get("GLIDECLIENT_Name") != client_name:
+            return None
+        try:
+            request_name = "{}@{}@{}".format(el["GLIDEIN_Entry_Name"], el["GLIDEIN_Name"], el["GLIDEIN_Factory"])
+        except KeyError:
+            # Not a glidein, cannot match any request
+            return None
+        if "GLIDEIN_CredentialIdentifier" in el:
+            return [(request_name, None), (request_name, el["GLIDEIN_CredentialIdentifier"])]
+        return (request_name, None)
+
+    def total_cores(el):
+        if el.get("PartitionableSlot", False):
+            return el.get("TotalSlotCpus", 0)
+        return el.get("Cpus", 0)
+
+    def not_partitionable_cores(el):
+        if el.get("PartitionableSlot", False):
+            return 0
+        return el.get("Cpus", 0)
+
+    state_funcs = {
+        "Total": lambda el: True,
+        "Idle": lambda el: isIdleSlot(el, min_memory),
+        "Running": isRunningSlot,
+        "Failed": isFailedSlot,
+        "TotalCores": lambda el: el.get("SlotType") != "Dynamic",
+        # getIdleCoresCondorStatus uses the default minimum memory
+        "IdleCores": isIdleSlot,
+        "RunningCores": isRunningSlot,
+    }
+    counter_funcs = {
+        "Total": ("Total", lambda el: 1),
+        "Idle": ("Idle", lambda el: 1),
+        # the running slots include the p-slots with dynamic slots, not counted
+        "Running": ("Running", lambda el: 0 if el.get("PartitionableSlot", False) else 1),
+        "Failed": ("Failed", lambda el: 1),
+        "TotalCores": ("TotalCores", total_cores),
+        "IdleCores": ("IdleCores", lambda el: el.get("Cpus", 0)),
+        "RunningCores": ("RunningCores", not_partitionable_cores),
+    }
+    index = condorMonitor.QueryIndex(status_dict, key_func, state_funcs, counter_funcs)
+    index.load()
+    return index
+
+
 def countCondorStatus(status_dict):
     """Return the number of items (slots) in the dictionary
     Use the output of getCondorStatus
@@ -1267,8 +1619,35 @@ def getCondorStatusSchedds(collector_names, constraint=None, format_list=None, w
 # If not all the jobs of the schedd has to be considered,
 # specify the appropriate additional constraint
 #
-def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format_list=None):
-    out_condorq_dict = {}
+def getCondorQConstrained(
+    schedd_names,
+    type_constraint,
+    constraint=None,
+    format_list=None,
+    timeout=None,
+    query_stats=None,
+    job_cache_refresh=0,
+):
+    """Return a dictionary of schedds containing jobs of a certain type
+
+    The schedds are queried concurrently (condorMonitor.QueryOrchestrator), each with its own timeout:
+    the schedds not responding in time are left out of the results, like the ones failing.
+
+    Args:
+        schedd_names (list): schedd names
+        type_constraint (str): constraint for the type of jobs
+        constraint (str): additional constraint string or None
+        format_list (list): classad attr & type, None for all the attributes
+        timeout (float): timeout in seconds for each schedd query, None or 0 for no timeout
+        query_stats (dict): if not None, updated with "timed_out" (list of schedds not responding in time)
+            and "latency" (schedd name -> seconds to query the schedd)
+        job_cache_refresh (int): if > 0, keep a job cache per schedd (condorMonitor.CondorQCache in
+            condorMonitor.disk_cache) updated with the changed jobs and fully refreshed every job_cache_refresh seconds
+
+    Returns:
+        dict: schedd name -> condorQ, for the schedds with jobs
+    """
+    orchestrator = condorMonitor.QueryOrchestrator(timeout=timeout)
     for schedd in schedd_names:
         if schedd == "":
             logSupport.log.warning("Skipping empty schedd name")
@@ -1278,28 +1657,51 @@ def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format
             full_constraint = f"({full_constraint}) && ({constraint})"
 
         try:
-            condorq = condorMonitor.CondorQ(schedd)
-            condorq.load(full_constraint, format_list)
-            if len(condorq.fetchStored()) > 0:
-                out_condorq_dict[schedd] = condorq
-        except condorMonitor.QueryError:
-            logSupport.log.exception("Condor Error. Failed to talk to schedd: ")
-            # If schedd not found it is equivalent to no jobs in the queue
-            continue
-        except RuntimeError as e:
-            # schedd not found is common (for example, flocking host with 0 jobs)
-            # we do not need lots of stack traces in the logs for those
-            if "not found" in str(e):
-                logSupport.log.error("Failed to talk to schedd %s - not found" % schedd)
+            if job_cache_refresh:
+                condorq = condorMonitor.CondorQCache(schedd, full_refresh_interval=job_cache_refresh)
             else:
-                logSupport.log.exception("Runtime Error. Failed to talk to schedd %s" % schedd)
-            continue
-        except Exception:
-            logSupport.log.exception("Unknown Exception. Failed to talk to schedd %s" % schedd)
+                condorq = condorMonitor.CondorQ(schedd)
+            orchestrator.add_query(schedd, condorq, full_constraint, format_list)
+        except Exception as e:
+            _logCondorQError(schedd, e)
+
+    out_condorq_dict = {}
+    for schedd, condorq in orchestrator.run().items():
+        if len(condorq.fetchStored()) > 0:
+            out_condorq_dict[schedd] = condorq
+    for schedd, e in orchestrator.failed.items():
+        _logCondorQError(schedd, e)
+    for schedd in orchestrator.timed_out:
+        logSupport.log.error("Failed to talk to schedd %s - no answer in %s seconds" % (schedd, timeout))
+    if query_stats is not None:
+        query_stats.setdefault("timed_out", []).extend(orchestrator.timed_out)
+        query_stats.setdefault("latency", {}).update(orchestrator.latency)
 
     return out_condorq_dict
 
 
+def _logCondorQError(schedd, e):
+    """Log the error of a schedd query (getCondorQConstrained)
+
+    Args:
+        schedd (str): schedd name
+        e (Exception): exception raised by the query
+    """
+    tb = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+    if isinstance(e, condorMonitor.QueryError):
+        # If schedd not found it is equivalent to no jobs in the queue
+        logSupport.log.error("Condor Error. Failed to talk to schedd %s: %s" % (schedd, tb))
+    elif isinstance(e, RuntimeError):
+        # schedd not found is common (for example, flocking host with 0 jobs)
+        # we do not need lots of stack traces in the logs for those
+        if "not found" in str(e):
+            logSupport.log.error("Failed to talk to schedd %s - not found" % schedd)
+        else:
+            logSupport.log.error("Runtime Error. Failed to talk to schedd %s: %s" % (schedd, tb))
+    else:
+        logSupport.log.error("Unknown Exception. Failed to talk to schedd %s: %s" % (schedd, tb))
+
+
 #
 # Return a dictionary of collectors containing classads of a certain kind
 # Each element is a condorStatus
@@ -1362,71 +1764,55 @@ def getCondorStatusConstrained(
 #         21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35]))
 #
 def uniqueSets(in_sets):
-    # sets is a list of sets
-    sorted_sets = []
-    for i in in_sets:
-        common_list = []
-        common = set()
-        new_unique = set()
-        old_unique_list = []
-        old_unique = set()
-        new = []
-        # make a list of the elements common to i
-        # (current iteration of sets) and the existing
-        # sorted sets
-        for k in sorted_sets:
-            # for now, old unique is a set with all elements of
-            # sorted_sets
-            old_unique = old_unique | k
-            common = k & i
-            if common:
-                common_list.append(common)
-            else:
-                pass
-        # figure out which elements in i
-        # and which elements in old_uniques are unique
-        for j in common_list:
-            i = i - j
-            old_unique = old_unique - j
-        # make a list of all the unique elements in sorted_sets
-        for k in sorted_sets:
-            old_unique_list.append(k & old_unique)
-        new_unique = i
-        if new_unique:
-            new.append(new_unique)
-        for o in old_unique_list:
-            if o:
-                new.append(o)
-        for c in common_list:
-            if c:
-                new.append(c)
-        sorted_sets = new
-
-    # set with all unique elements
-    sum_set = set()
-    for s in sorted_sets:
-        sum_set = sum_set | s
-
-    sorted_sets.append(sum_set)
-
-    # index_list is a list of lists. Each list corresponds to
-    # an element in sorted_sets, and contains the indexes of
-    # that elements shared elements in the initial list of sets
-    index_list = []
-    for s in sorted_sets:
-        indexes = []
-        temp_sets = in_sets[:]
-        for t in temp_sets:
-            if s & t:
-                indexes.append(temp_sets.index(t))
-                temp_sets[temp_sets.index(t)] = set()
-        index_list.append(indexes)
-
-    # create output
+    """Partition the union of a list of sets in subsets of elements belonging to the same input sets
+
+    Each element is given a signature, the tuple of the indexes of the input sets containing it,
+    and elements are grouped by signature in a single pass, linear in the total size of the input sets.
+    The subsets are then sorted by a key as long as their signature.
+
+    The subsets are returned in the same order produced by the previous pairwise refinement:
+    elements are ordered by the membership in the last input set (elements first seen in it,
+    then the ones not in it, then the ones in it), then in the previous ones.
+
+    Args:
+        in_sets (list): list of sets
+
+    Returns:
+        tuple: (outvals, sum_set)
+            outvals is a list of tuples (set of the indexes of the input sets containing the elements,
+            set of elements), one for each unique subset
+            sum_set is the set with all the elements
+    """
+    # signature (tuple of indexes of the sets containing the element) -> set of elements
+    signatures = {}
+    members = {}
+    for idx, in_set in enumerate(in_sets):
+        for el in in_set:
+            try:
+                members[el].append(idx)
+            except KeyError:
+                members[el] = [idx]
+    for el, idx_list in members.items():
+        sig = tuple(idx_list)
+        try:
+            signatures[sig].add(el)
+        except KeyError:
+            signatures[sig] = {el}
+    del members
+
+    # Order key reproducing the pairwise refinement order, comparing the sets from the last one:
+    # the elements in a set come after the ones not in it, except for the set where they are first seen,
+    # that puts them before all the others (its index is mapped to a negative number, lower for higher sets)
+    def order_key(sig):
+        return sig[:0:-1] + (-1 - sig[0],)
+
     outvals = []
-    for i in range(len(index_list) - 1):  # last one contains all the values
-        outvals.append((set(index_list[i]), sorted_sets[i]))
-    return (outvals, sorted_sets[-1])
+    sum_set = set()
+    for sig in sorted(signatures, key=order_key):
+        elements = signatures[sig]
+        outvals.append((set(sig), elements))
+        sum_set |= elements
+    return (outvals, sum_set)
 
 
 def hashJob(condorq_el, condorq_match_list=None):
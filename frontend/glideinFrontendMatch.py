@@ -0,0 +1,715 @@
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Batched evaluation of the frontend match expression
+
+glideinFrontendLib.countMatch evaluates the match expression with ``eval()`` once per
+(entry, schedd, job cluster). The MatchEngine in this module analyzes the expression once
+and evaluates it over tables of distinct job and glidein attribute values instead:
+
+- the job and glidein attributes referenced by the expression are the columns of the tables,
+  so clusters (from any schedd) and entries with the same values share a single evaluation
+- the top level ``and`` terms of the expression are split and evaluated at the coarsest level possible:
+  terms using only job attributes are evaluated once per distinct job, terms using only glidein
+  attributes once per distinct glidein, and only the mixed terms are evaluated for each pair
+- job-only terms become sets of job rows, intersected for each glidein
+
+The result is identical to the one of the eval() loop, including the short-circuit of ``and``
+and the handling of the match policies.
+Expressions that cannot be analyzed (e.g. using the job or glidein dictionaries as a whole, or
+names that are not available to countMatch) are marked as not compiled and the caller
+should use the eval() path.
+
+The MatchCache keeps the match results of (job cluster, entry) pairs across the Frontend cycles,
+so countMatch evaluates only the clusters and entries that changed since the previous cycle.
+"""
+
+import ast
+import builtins
+import hashlib
+import os
+import pickle
+import sys
+import time
+import traceback
+
+from glideinwms.frontend import glideinFrontendLib
+from glideinwms.lib import logSupport
+from glideinwms.lib.util import safe_boolcomp
+
+# Sections of the glidein dictionary that can be referenced in the match expression
+GLIDEIN_SECTIONS = ("attrs", "params", "monitor")
+
+# Kinds of terms (top level "and" operands) of the match expression
+TERM_CONST = "const"
+TERM_JOB = "job"
+TERM_GLIDEIN = "glidein"
+TERM_PAIR = "pair"
+
+# Outcome of a term evaluation
+_CONTINUE = 0  # truthy, not the last term: evaluate the next one
+_NOMATCH = 1
+_MATCH = 2
+_POLICY = 3  # last term evaluated to True, the match policies decide
+
+# Placeholders used in the signatures for missing attributes or sections
+_MISSING = ("__glideinwms_missing__",)
+_NO_SECTION = ("__glideinwms_no_section__",)
+
+
+class MatchEngineError(Exception):
+    """Raised when the match expression cannot be compiled in the match engine"""
+
+    pass
+
+
+class _Failure:
+    """Exception raised by a term evaluation, formatted like in countMatch"""
+
+    __slots__ = ("missing_key", "traceback")
+
+    def __init__(self, exc):
+        self.missing_key = None
+        self.traceback = None
+        if isinstance(exc, KeyError):
+            self.missing_key = ((traceback.format_exception_only(type(exc), exc)[-1].split(":"))[1]).strip()
+        else:
+            self.traceback = traceback.format_exception(type(exc), exc, exc.__traceback__)
+
+
+class MatchStats:
+    """Evaluation errors and warnings collected for one glidein (entry)"""
+
+    __slots__ = ("missing_keys", "tb_count", "recent_tb", "non_boolean")
+
+    def __init__(self):
+        self.missing_keys = set()
+        self.tb_count = 0
+        self.recent_tb = None
+        self.non_boolean = False
+
+    def add_failure(self, failure, count=1):
+        if failure.missing_key is not None:
+            self.missing_keys.add(failure.missing_key)
+        else:
+            self.tb_count += count
+            self.recent_tb = failure.traceback
+
+
+def _str_const(node):
+    """Return the string value of a constant node (also wrapped in an Index), None otherwise"""
+    if isinstance(node, getattr(ast, "Index", ())):
+        node = node.value
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if sys.version_info < (3, 8) and isinstance(node, ast.Str):
+        # string literals are ast.Str before Python 3.8
+        return node.s
+    return None
+
+
+def _flatten_and(node):
+    """Return the list of the operands of the top level ``and``, flattening nested ``and``"""
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        out = []
+        for value in node.values:
+            out += _flatten_and(value)
+        return out
+    return [node]
+
+
+class _ReferenceCollector(ast.NodeVisitor):
+    """Collect the job and glidein attributes referenced by an expression
+
+    Supported references are ``job["A"]``, ``job.get("A", ...)``, ``"A" in job`` and the same
+    forms on ``glidein["attrs"]``, ``glidein["params"]`` and ``glidein["monitor"]``.
+    Any other use of ``job`` or ``glidein``, or names that are not builtins, module globals of
+    glideinFrontendLib, ``attr_dict`` or bound inside the expression, is recorded as unsupported.
+    """
+
+    def __init__(self, known_names, bound_names):
+        self.known_names = known_names
+        self.bound_names = bound_names
+        self.job_attrs = []
+        self.glidein_attrs = []
+        self.unsupported = []
+        self.nested_scope = 0
+
+    def _visit_nested_scope(self, outer_nodes, inner_nodes):
+        # eval() in countMatch passes job, glidein and attr_dict as locals, they are not visible
+        # in nested scopes (comprehensions, lambdas) while they would be in the compiled terms
+        for node in outer_nodes:
+            self.visit(node)
+        self.nested_scope += 1
+        for node in inner_nodes:
+            self.visit(node)
+        self.nested_scope -= 1
+
+    def _visit_comprehension(self, node):
+        # The first iterable is evaluated in the enclosing scope
+        first = node.generators[0]
+        inner = [getattr(node, field) for field in ("elt", "key", "value") if hasattr(node, field)]
+        inner += [first.target] + first.ifs + node.generators[1:]
+        self._visit_nested_scope([first.iter], inner)
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+    def visit_Lambda(self, node):
+        # Default values are evaluated in the enclosing scope
+        self._visit_nested_scope(node.args.defaults + [d for d in node.args.kw_defaults if d is not None], [node.body])
+
+    def _add(self, lst, el):
+        if el not in lst:
+            lst.append(el)
+
+    def _glidein_section(self, node):
+        """Return the section name if node is glidein["<section>"], None otherwise"""
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "glidein":
+            section = _str_const(node.slice)
+            if section in GLIDEIN_SECTIONS:
+                return section
+        return None
+
+    def _container(self, node):
+        """Return ("job", None), ("glidein", section) or None for the referenced container"""
+        if self.nested_scope:
+            return None
+        if isinstance(node, ast.Name) and node.id == "job":
+            return "job", None
+        section = self._glidein_section(node)
+        if section is not None:
+            return "glidein", section
+        return None
+
+    def _record(self, container, attr):
+        if container[0] == "job":
+            self._add(self.job_attrs, attr)
+        else:
+            self._add(self.glidein_attrs, (container[1], attr))
+
+    def visit_Subscript(self, node):
+        container = self._container(node.value)
+        attr = _str_const(node.slice)
+        if container is not None and attr is not None:
+            self._record(container, attr)
+            return
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == "get" and node.args:
+            container = self._container(func.value)
+            attr = _str_const(node.args[0])
+            if container is not None and attr is not None:
+                self._record(container, attr)
+                for arg in node.args[1:]:
+                    self.visit(arg)
+                for keyword in node.keywords:
+                    self.visit(keyword)
+                return
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            container = self._container(node.comparators[0])
+            attr = _str_const(node.left)
+            if container is not None and attr is not None:
+                self._record(container, attr)
+                return
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if self.nested_scope and node.id in ("job", "glidein", "attr_dict"):
+            self.unsupported.append("'%s' used in a comprehension or lambda" % node.id)
+        elif node.id in ("job", "glidein"):
+            self.unsupported.append("'%s' used as a whole" % node.id)
+        elif not (node.id == "attr_dict" or node.id in self.bound_names or node.id in self.known_names):
+            self.unsupported.append("unknown name '%s'" % node.id)
+
+
+def _bound_names(tree):
+    """Return the names bound inside the expression (comprehension targets, lambda arguments, :=)"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+    return names
+
+
+class _Term:
+    """One top level ``and`` operand of the match expression, compiled as a function"""
+
+    __slots__ = ("kind", "func", "job_attrs", "glidein_attrs", "is_last")
+
+    def __init__(self, kind, func, job_attrs, glidein_attrs, is_last):
+        self.kind = kind
+        self.func = func
+        self.job_attrs = job_attrs
+        self.glidein_attrs = glidein_attrs
+        self.is_last = is_last
+
+
+class _JobColumn:
+    """Outcome of a job-only term for all the job rows, as sets of row indexes"""
+
+    __slots__ = ("outcome_sets", "non_boolean", "failures")
+
+    def __init__(self):
+        self.outcome_sets = {_CONTINUE: set(), _MATCH: set(), _POLICY: set()}
+        self.non_boolean = set()
+        self.failures = {}
+
+
+class MatchEngine:
+    """Batched evaluator of the frontend match expression and match policies
+
+    Attributes:
+        match_expr (str): the match expression (python)
+        match_policies (list): MatchPolicy objects, their ``match(job, glidein)`` is ANDed to the expression
+        compiled (bool): True if the expression could be compiled, False if the eval() path must be used
+        reason (str): why the expression could not be compiled, None if compiled
+        job_attrs (list): job attributes used by the expression (columns of the job table)
+        glidein_attrs (list): (section, attribute) tuples of the glidein used by the expression
+    """
+
+    def __init__(self, match_expr, match_policies=None, namespace=None):
+        """Analyze and compile the match expression
+
+        Args:
+            match_expr (str): python match expression, the same compiled in MatchExprCompiledObj
+            match_policies (list): MatchPolicy objects (with pyObject, file, jobMatchAttrs)
+            namespace (dict): globals used to evaluate the expression, default: glideinFrontendLib globals,
+                the same available to eval() in countMatch
+        """
+        self.match_expr = match_expr
+        self.match_policies = list(match_policies) if match_policies else []
+        self.namespace = namespace if namespace is not None else vars(glideinFrontendLib)
+        self.compiled = False
+        self.reason = None
+        self.terms = []
+        self.job_attrs = []
+        self.glidein_attrs = []
+        try:
+            self._compile()
+            self.compiled = True
+        except (SyntaxError, MatchEngineError) as e:
+            self.reason = str(e)
+
+    def _compile(self):
+        try:
+            tree = ast.parse(self.match_expr.strip(), mode="eval")
+        except SyntaxError as e:
+            raise MatchEngineError("syntax error in match expression: %s" % e)
+        known_names = set(dir(builtins)) | set(self.namespace.keys())
+        bound_names = _bound_names(tree)
+        nodes = _flatten_and(tree.body)
+        for i, node in enumerate(nodes):
+            collector = _ReferenceCollector(known_names, bound_names)
+            collector.visit(node)
+            if collector.unsupported:
+                raise MatchEngineError("unsupported match expression: %s" % ", ".join(collector.unsupported))
+            if collector.job_attrs and collector.glidein_attrs:
+                kind = TERM_PAIR
+            elif collector.job_attrs:
+                kind = TERM_JOB
+            elif collector.glidein_attrs:
+                kind = TERM_GLIDEIN
+            else:
+                kind = TERM_CONST
+            self.terms.append(
+                _Term(
+                    kind,
+                    self._compile_term(node),
+                    collector.job_attrs,
+                    collector.glidein_attrs,
+                    i == len(nodes) - 1,
+                )
+            )
+            for attr in collector.job_attrs:
+                if attr not in self.job_attrs:
+                    self.job_attrs.append(attr)
+            for attr in collector.glidein_attrs:
+                if attr not in self.glidein_attrs:
+                    self.glidein_attrs.append(attr)
+        # Policies see the whole job, their job_match_attrs define the job columns they depend on
+        for policy in self.match_policies:
+            for attr in getattr(policy, "jobMatchAttrs", None) or {}:
+                if attr not in self.job_attrs:
+                    self.job_attrs.append(attr)
+
+    def _compile_term(self, node):
+        """Compile an expression node as ``lambda job, glidein, attr_dict: <node>``"""
+        func_tree = ast.parse("lambda job, glidein, attr_dict: None", mode="eval")
+        func_tree.body.body = node
+        ast.fix_missing_locations(func_tree)
+        return eval(compile(func_tree, "<match_expr>", "eval"), self.namespace)
+
+    def _outcome(self, value, is_last):
+        """Return the outcome of a term value and whether it is a non boolean result
+
+        Reproduces the evaluation of countMatch: ``and`` short-circuit, policies only for True and
+        ``match == True`` as final test.
+        """
+        if not is_last:
+            if value:
+                return _CONTINUE, False
+            return _NOMATCH, bool(self.match_policies) and value != False  # noqa: E712
+        if self.match_policies:
+            if value is True:
+                return _POLICY, False
+            return (_MATCH if value == True else _NOMATCH), value != False  # noqa: E712
+        return (_MATCH if value == True else _NOMATCH), False  # noqa: E712
+
+    def _evaluate(self, term, job, glidein, attr_dict):
+        """Evaluate a term and return (outcome, non_boolean) or a _Failure"""
+        try:
+            return self._outcome(term.func(job, glidein, attr_dict), term.is_last)
+        except Exception as e:
+            return _Failure(e)
+
+    @staticmethod
+    def _signature(values):
+        try:
+            hash(values)
+        except TypeError:
+            return None
+        return values
+
+    def _job_rows(self, jobs, job_keys):
+        """Group the job clusters in rows with the same values of the job attributes used in matching
+
+        Returns:
+            tuple: list of representative jobs, list of lists of cluster indexes (one per row)
+        """
+        row_jobs = []
+        row_clusters = []
+        row_index = {}
+        job_attrs = self.job_attrs
+        for idx, job in enumerate(jobs):
+            sig = tuple(job.get(attr, _MISSING) for attr in job_attrs)
+            if self.match_policies and job_keys is not None:
+                sig = (job_keys[idx], sig)
+            sig = self._signature(sig)
+            row = row_index.get(sig) if sig is not None else None
+            if row is None:
+                row = len(row_jobs)
+                row_jobs.append(job)
+                row_clusters.append([])
+                if sig is not None:
+                    row_index[sig] = row
+            row_clusters[row].append(idx)
+        return row_jobs, row_clusters
+
+    def _glidein_signature(self, glidename, glidein):
+        if self.match_policies:
+            # Policies see the whole glidein, do not merge entries
+            return glidename
+        sig = []
+        for section, attr in self.glidein_attrs:
+            try:
+                sig.append(glidein[section].get(attr, _MISSING))
+            except (KeyError, TypeError, AttributeError):
+                sig.append(_NO_SECTION)
+        return self._signature(tuple(sig))
+
+    def _job_column(self, term, row_jobs, attr_dict):
+        column = _JobColumn()
+        for j, job in enumerate(row_jobs):
+            res = self._evaluate(term, job, None, attr_dict)
+            if isinstance(res, _Failure):
+                column.failures[j] = res
+                continue
+            outcome, non_boolean = res
+            if outcome != _NOMATCH:
+                column.outcome_sets[outcome].add(j)
+            if non_boolean:
+                column.non_boolean.add(j)
+        return column
+
+    def _match_policies(self, job, glidein, stats):
+        """Apply the match policies to a job/glidein pair whose expression evaluated to True"""
+        match = True
+        try:
+            for policy in self.match_policies:
+                if match is True:
+                    # Policies are supposed to be ANDed: match AND policy == policy because match is True
+                    match = policy.pyObject.match(job, glidein)
+                else:
+                    if match != False:  # noqa: E712
+                        stats.non_boolean = True
+                    break
+            return match == True  # noqa: E712
+        except Exception as e:
+            stats.add_failure(_Failure(e))
+        return False
+
+    def _match_glidein(self, glidein, row_jobs, columns, const_values, attr_dict, stats):
+        """Match all the job rows against one glidein
+
+        Returns:
+            set: indexes of the job rows matching the glidein
+        """
+        pending = set(range(len(row_jobs)))
+        matched = set()
+        to_policy = set()
+        for t, term in enumerate(self.terms):
+            if not pending:
+                break
+            if term.kind in (TERM_CONST, TERM_GLIDEIN):
+                res = const_values[t] if term.kind == TERM_CONST else self._evaluate(term, None, glidein, attr_dict)
+                if isinstance(res, _Failure):
+                    stats.add_failure(res, len(pending))
+                    pending = set()
+                    break
+                outcome, non_boolean = res
+                stats.non_boolean |= non_boolean
+                if outcome == _CONTINUE:
+                    continue
+                if outcome == _MATCH:
+                    matched |= pending
+                elif outcome == _POLICY:
+                    to_policy |= pending
+                pending = set()
+            elif term.kind == TERM_JOB:
+                column = columns[t]
+                if column.failures:
+                    for j in pending.intersection(column.failures):
+                        stats.add_failure(column.failures[j])
+                if column.non_boolean and not pending.isdisjoint(column.non_boolean):
+                    stats.non_boolean = True
+                if term.is_last:
+                    matched |= pending & column.outcome_sets[_MATCH]
+                    to_policy |= pending & column.outcome_sets[_POLICY]
+                    pending = set()
+                else:
+                    pending &= column.outcome_sets[_CONTINUE]
+            else:
+                new_pending = set()
+                for j in pending:
+                    res = self._evaluate(term, row_jobs[j], glidein, attr_dict)
+                    if isinstance(res, _Failure):
+                        stats.add_failure(res)
+                        continue
+                    outcome, non_boolean = res
+                    stats.non_boolean |= non_boolean
+                    if outcome == _CONTINUE:
+                        new_pending.add(j)
+                    elif outcome == _MATCH:
+                        matched.add(j)
+                    elif outcome == _POLICY:
+                        to_policy.add(j)
+                pending = new_pending
+        for j in to_policy:
+            if self._match_policies(row_jobs[j], glidein, stats):
+                matched.add(j)
+        return matched
+
+    def match_clusters(self, jobs, glidein_dict, attr_dict, ignore_down_entries=False, job_keys=None):
+        """Match job clusters against all the glideins
+
+        Args:
+            jobs (list): one representative job (dict) for each job cluster
+            glidein_dict (dict): glidein_name -> dictionary of params and attrs (output of findGlideins)
+            attr_dict (dict): dictionary of constant attributes
+            ignore_down_entries (bool): if True glideins in downtime do not match any job
+            job_keys (list): hashJob() value of each cluster, used to tell apart jobs when there are match policies
+
+        Returns:
+            dict: glidein_name -> (list of matching cluster indexes, MatchStats)
+        """
+        row_jobs, row_clusters = self._job_rows(jobs, job_keys)
+        # Evaluate once the terms that do not depend on the glidein
+        const_values = {}
+        columns = {}
+        for t, term in enumerate(self.terms):
+            if term.kind == TERM_CONST:
+                const_values[t] = self._evaluate(term, None, None, attr_dict)
+            elif term.kind == TERM_JOB:
+                columns[t] = self._job_column(term, row_jobs, attr_dict)
+
+        out = {}
+        glidein_rows = {}
+        for glidename, glidein in glidein_dict.items():
+            stats = MatchStats()
+            try:
+                in_downtime = ignore_down_entries and safe_boolcomp(
+                    glidein["attrs"].get("GLIDEIN_In_Downtime", False), True
+                )
+            except Exception as e:
+                stats.add_failure(_Failure(e), len(row_jobs))
+                out[glidename] = ([], stats)
+                continue
+            if in_downtime:
+                # Do not match downtime entries
+                out[glidename] = ([], stats)
+                continue
+            sig = self._glidein_signature(glidename, glidein)
+            if sig is not None and sig in glidein_rows:
+                out[glidename] = glidein_rows[sig]
+                continue
+            matched_rows = self._match_glidein(glidein, row_jobs, columns, const_values, attr_dict, stats)
+            matched_clusters = []
+            for j in sorted(matched_rows):
+                matched_clusters += row_clusters[j]
+            out[glidename] = (matched_clusters, stats)
+            if sig is not None:
+                glidein_rows[sig] = out[glidename]
+        return out
+
+    def log_stats(self, stats, function_name="countMatch"):
+        """Log evaluation errors and warnings like the eval() path in countMatch"""
+        if stats.non_boolean and self.match_policies:
+            logSupport.log.warning(
+                "Match expression from policy file '%s' evaluated to non boolean result; assuming False"
+                % self.match_policies[0].file
+            )
+        if stats.missing_keys:
+            logSupport.log.debug(
+                "Failed to evaluate resource match in %s. Possibly match_expr has errors and trying to reference job or site attribute(s) '%s' in an inappropriate way."
+                % (function_name, ",".join(stats.missing_keys))
+            )
+        if stats.tb_count > 0:
+            logSupport.log.debug(
+                "There were %s exceptions in %s subprocess. Most recent traceback: %s "
+                % (stats.tb_count, function_name, stats.recent_tb)
+            )
+
+
+class MatchCache:
+    """Persistent cache of the match results of job clusters and entries
+
+    The key of a result is the hashJob() value of the job cluster and the fingerprint of the entry
+    (name, attrs and params). The match expression, the match policies (file and modification time),
+    the constant attributes and the other countMatch options are the context of the cache:
+    all the results are discarded when the context changes.
+    Only boolean results are cached, evaluations failing or with non boolean results are repeated every time.
+    NOTE: the results are correct as long as the match expression and policies use only the job attributes
+          in the match list and the entry attrs and params (e.g. not glidein["monitor"])
+
+    The results are evicted when not used for max_age seconds and, least recently used first,
+    when there are more than max_entries.
+
+    Attributes:
+        fname (str): file where the cache is saved
+        context (str): fingerprint of the context, see context_fingerprint()
+        max_entries (int): maximum number of results kept when saving
+        max_age (int): seconds a result is kept after its last use
+        hits (int): lookups answered by the cache
+        misses (int): lookups not in the cache
+        eval_time (float): seconds spent matching the missed pairs, used to estimate the time saved
+        miss_cost (float): average seconds to match a missed pair, also from the previous cycles
+    """
+
+    VERSION = 1
+
+    def __init__(self, fname, context, max_entries=1000000, max_age=86400):
+        self.fname = fname
+        self.context = context
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # (job key, glidein fingerprint) -> [match result, last used time]
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        self.eval_time = 0.0
+        self.miss_cost = 0.0
+        self.now = time.time()
+
+    @staticmethod
+    def _digest(obj):
+        return hashlib.sha1(repr(obj).encode()).digest()
+
+    @staticmethod
+    def context_fingerprint(match_expr, match_policies=None, attr_dict=None, **options):
+        """Return the fingerprint of the match expression, policies, constant attributes and options
+
+        Args:
+            match_expr (str): python match expression
+            match_policies (list): MatchPolicy objects, their files modification times are part of the fingerprint
+            attr_dict (dict): dictionary of constant attributes
+            **options: other options affecting the results (e.g. ignore_down_entries, condorq_match_list)
+
+        Returns:
+            bytes: the fingerprint
+        """
+        policies = []
+        for policy in match_policies or []:
+            try:
+                st = os.stat(policy.file)
+                policies.append((policy.file, st.st_mtime_ns, st.st_size))
+            except (AttributeError, OSError):
+                policies.append((getattr(policy, "file", repr(policy)), None, None))
+        items = sorted(attr_dict.items()) if attr_dict else []
+        return MatchCache._digest((match_expr, policies, items, sorted(options.items())))
+
+    @staticmethod
+    def job_key(jh):
+        """Return the key of a job cluster from its hashJob() value"""
+        return MatchCache._digest(jh)
+
+    @staticmethod
+    def glidein_fingerprint(glidename, glidein):
+        """Return the fingerprint of an entry (name, attrs and params), None if it cannot be computed"""
+        try:
+            return MatchCache._digest((glidename, sorted(glidein["attrs"].items()), sorted(glidein["params"].items())))
+        except Exception:
+            return None
+
+    def load(self):
+        """Load the results saved by the previous cycle, if the context did not change"""
+        self.results = {}
+        try:
+            with open(self.fname, "rb") as fd:
+                version, context, results, miss_cost = pickle.load(fd)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logSupport.log.warning("Ignoring the match cache %s, failed to load it: %s" % (self.fname, e))
+            return
+        if version == self.VERSION and context == self.context:
+            self.results = results
+            self.miss_cost = miss_cost
+
+    def save(self):
+        """Evict the old and least recently used results and save the cache for the next cycle"""
+        min_time = self.now - self.max_age
+        results = {k: v for k, v in self.results.items() if v[1] >= min_time}
+        if len(results) > self.max_entries:
+            keys = sorted(results, key=lambda k: results[k][1], reverse=True)[: self.max_entries]
+            results = {k: results[k] for k in keys}
+        self.results = results
+        if self.misses:
+            self.miss_cost = self.eval_time / self.misses
+        tmp_fname = "%s.tmp" % self.fname
+        try:
+            with open(tmp_fname, "wb") as fd:
+                pickle.dump((self.VERSION, self.context, results, self.miss_cost), fd, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_fname, self.fname)
+        except OSError as e:
+            logSupport.log.warning("Failed to save the match cache %s: %s" % (self.fname, e))
+
+    def get(self, job_key, glidein_fp):
+        """Return the cached match result of a job cluster and entry, None if not cached"""
+        el = self.results.get((job_key, glidein_fp))
+        if el is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        el[1] = self.now
+        return el[0]
+
+    def set(self, job_key, glidein_fp, match):
+        """Cache the match result of a job cluster and entry, if it is a boolean"""
+        if match is True or match is False:
+            self.results[(job_key, glidein_fp)] = [match, self.now]
+
+    def stats(self):
+        """Return the hits, misses and the estimated seconds saved (hits times the average time of a miss)"""
+        miss_cost = self.eval_time / self.misses if self.misses else self.miss_cost
+        saved_time = self.hits * miss_cost
+        return {"hits": self.hits, "misses": self.misses, "saved_time": saved_time}
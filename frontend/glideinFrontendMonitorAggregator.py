@@ -11,7 +11,7 @@ import os.path
 import time
 
 from glideinwms.frontend import glideinFrontendMonitoring
-from glideinwms.lib import logSupport, rrdSupport, xmlFormat, xmlParse
+from glideinwms.lib import logSupport, rrdSupport, snapshotSupport, xmlFormat, xmlParse
 
 ############################################################
 #
@@ -191,6 +191,11 @@ def write_one_rrd(name, updated, data, fact=0):
     glideinFrontendMonitoring.monitoringConfig.write_rrd_multi("%s" % name, "GAUGE", updated, val_dict)
 
 
+##############################################################################
+# Group status data from the snapshots (or the XML files they replace), reused while the files do not change
+status_snapshots = snapshotSupport.SnapshotCache()
+
+
 ##############################################################################
 # create an aggregate of status files, write it in an aggregate status file
 # end return the values
@@ -243,7 +248,10 @@ def aggregateStatus():
             monitorAggregatorConfig.monitor_dir, f"group_{group}", monitorAggregatorConfig.status_relname
         )
         try:
-            group_data = xmlParse.xmlfile2dict(status_fname)
+            # the data is reused while the files do not change, it must not be modified
+            group_data = status_snapshots.load(
+                snapshotSupport.get_snapshot_fname(status_fname), lambda data: data, status_fname, xmlParse.xmlfile2dict
+            )
         except xmlParse.CorruptXML:
             logSupport.log.error("Corrupt XML in %s; deleting (it will be recreated)." % (status_fname))
             os.unlink(status_fname)
@@ -330,6 +338,12 @@ def aggregateStatus():
         if global_total[w] is None:
             del global_total[w]  # remove group if not defined
 
+    snapshot_stats = status_snapshots.prune()
+    logSupport.log.debug(
+        "Group status files: %(reused)i unchanged, %(snapshots)i snapshots and %(fallbacks)i XML files loaded"
+        % snapshot_stats
+    )
+
     # Write xml files
 
     updated = time.time()
@@ -11,7 +11,7 @@ import os.path
 import string
 import time
 
-from glideinwms.lib import logSupport, rrdSupport, util, xmlFormat
+from glideinwms.lib import logSupport, rrdSupport, snapshotSupport, util, xmlFormat
 from glideinwms.lib.defaults import BINARY_ENCODING
 
 ############################################################
@@ -49,6 +49,17 @@ class MonitoringConfig:
         util.file_tmp2final(fname, mask_exceptions=(logSupport.log.error, f"Failed rename/write into {fname}"))
         return
 
+    def write_snapshot(self, relative_fname, data, data_time):
+        """Write the binary snapshot of a monitoring file (e.g. frontend_status.snap), read by the aggregator.
+
+        Errors are logged, the aggregator uses the monitoring file if the snapshot is older.
+        """
+        fname = snapshotSupport.get_snapshot_fname(os.path.join(self.monitor_dir, relative_fname))
+        try:
+            snapshotSupport.write_snapshot(fname, data, data_time)
+        except Exception as e:
+            logSupport.log.error(f"Failed to write the snapshot {fname}: {e}")
+
     def establish_dir(self, relative_dname):
         dname = os.path.join(self.monitor_dir, relative_dname)
         os.makedirs(dname, exist_ok=True)
@@ -301,15 +312,23 @@ class groupStats:
 
         monitoringConfig.write_file("frontend_status.xml", xml_str)
 
-        # update RRDs
         total_el = self.get_total()
+        factories_data = self.get_factories_data()
+        states_data = self.get_states_data()
+        monitoringConfig.write_snapshot(
+            "frontend_status.xml",
+            {"factories": factories_data, "states": states_data, "total": total_el},
+            self.updated,
+        )
+
+        # update RRDs
         self.write_one_rrd("total", total_el)
 
-        data = self.get_factories_data()
+        data = factories_data
         for fact in list(data.keys()):
             self.write_one_rrd("factory_%s" % sanitize(fact), data[fact], 1)
 
-        data = self.get_states_data()
+        data = states_data
         for fact in list(data.keys()):
             self.write_one_rrd("state_%s" % sanitize(fact), data[fact], 1)
 
@@ -3,7 +3,10 @@
 
 """This module describes base classes for classads and advertisers."""
 
+import fcntl
+import hashlib
 import os
+import pickle
 import time
 
 from . import condorManager, logSupport
@@ -100,6 +103,133 @@ class Classad:
         return ad
 
 
+###############################################################################
+# Cache of the published classads
+###############################################################################
+
+
+class AdvertiseCache:
+    """Content hash of the last published version of each classad, to advertise only the changed ones.
+
+    Unchanged classads are advertised again only after `keepalive` seconds, that must be smaller
+    than the classad lifetime in the Collector.
+    The state is kept in memory or, if `state_fname` is set, in a file (e.g. to share it with forked children).
+    Classads are marked as published only after a successful advertisement (`commit`)
+    and the cache must be reset when classads are invalidated.
+    """
+
+    def __init__(self, keepalive, state_fname=None):
+        """Constructor.
+
+        Args:
+            keepalive (int): Seconds after which unchanged classads are advertised again.
+            state_fname (str): File with the published hashes. None to keep them only in memory.
+        """
+        self.keepalive = keepalive
+        self.state_fname = state_fname
+        self.state = {}  # key -> (digest, publication time)
+
+    def _load(self):
+        """Return the published hashes, reading them from the state file if any."""
+        if self.state_fname is None:
+            return self.state
+        try:
+            with open(self.state_fname, "rb") as fd:
+                return pickle.load(fd)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logSupport.log.debug(f"Ignoring invalid advertise cache {self.state_fname}: {e}")
+            return {}
+
+    def select(self, ads):
+        """Select the classads to advertise.
+
+        Args:
+            ads (dict): Classads, {key: classad text}. Classads with a None key are always selected.
+
+        Returns:
+            dict: Classads to advertise, {key: digest}, to pass to `commit` after advertising them.
+        """
+        now = time.time()
+        state = self._load()
+        out = {}
+        for key, text in ads.items():
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if key is not None:
+                old = state.get(key)
+                if old is not None and old[0] == digest and now - old[1] < self.keepalive:
+                    continue
+            out[key] = digest
+        return out
+
+    def commit(self, published):
+        """Record the classads as published.
+
+        Args:
+            published (dict): Classads advertised successfully, {key: digest}, as returned by `select`.
+        """
+        now = time.time()
+        published = {k: (v, now) for k, v in published.items() if k is not None}
+        if self.state_fname is None:
+            self.state.update(published)
+            return
+        try:
+            with open(self.state_fname + ".lock", "a") as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    state = self._load()
+                    state.update(published)
+                    tmp_fname = f"{self.state_fname}.{os.getpid()}.tmp"
+                    with open(tmp_fname, "wb") as fd:
+                        pickle.dump(state, fd, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_fname, self.state_fname)
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        except Exception as e:
+            # the classads will be advertised again next time
+            logSupport.log.warning(f"Could not update the advertise cache {self.state_fname}: {e}")
+
+    def reset(self):
+        """Forget all the published classads, e.g. after invalidating them."""
+        self.state = {}
+        if self.state_fname is not None:
+            try:
+                os.remove(self.state_fname)
+            except FileNotFoundError:
+                pass
+
+    def filter_file(self, fname, prefix=""):
+        """Remove from a classad file the classads that do not need to be advertised.
+
+        The classads are identified by their Name attribute, prefixed by `prefix`
+        (e.g. the pool and command, if the same cache is used for multiple ones).
+
+        Args:
+            fname (str): File with one or more classads separated by empty lines.
+            prefix (str): Prefix for the keys of the classads.
+
+        Returns:
+            tuple: (number of classads in the file, dict of the classads to advertise for `commit`).
+                The file is rewritten only if some classads are removed.
+        """
+        with open(fname) as fd:
+            ads = split_classads(fd.read())
+        ads_dict = {}
+        for ad in ads:
+            name = get_classad_name(ad)
+            ads_dict[None if name is None else f"{prefix}{name}"] = ad
+        if None in ads_dict or len(ads_dict) != len(ads):
+            # classads without or with duplicate names, advertise all
+            return len(ads), {}
+        published = self.select(ads_dict)
+        if len(published) < len(ads):
+            with open(fname, "w") as fd:
+                # no empty line at the beginning of the file (HTCondor bug #5147)
+                fd.write("\n".join(ads_dict[k] for k in published))
+        return len(ads), published
+
+
 ###############################################################################
 # Generic Classad Advertiser
 ###############################################################################
@@ -137,6 +267,9 @@ class ClassadAdvertiser:
         # gcs_ac = glide-classad-support_advertise-classad
         self.advertiseFilePrefix = "gcs_ac"
 
+        # Optional AdvertiseCache, to advertise only the changed classads
+        self.advertiseCache = None
+
     def addClassad(self, name, ad_obj):
         """
         Adds the classad to the classad dictionary
@@ -232,16 +365,59 @@ class ClassadAdvertiser:
             logSupport.log.info("There are 0 classads to advertise")
             return
 
+        published = None
+        if self.advertiseCache is not None:
+            published = self.advertiseCache.select(
+                {f"{self.pool}:{self.adType}:{ad}": "%s" % self.classads[ad] for ad in ads}
+            )
+            unchanged = len(ads) - len(published)
+            ads = [ad for ad in ads if f"{self.pool}:{self.adType}:{ad}" in published]
+            if unchanged > 0:
+                logSupport.log.info("Skipping %i unchanged classads" % unchanged)
+            if len(ads) == 0:
+                return
+
         logSupport.log.info("There are %i classads to advertise" % len(ads))
 
-        if self.multiAdvertiseSupport:
+        if self.advertiseInMemory(ads):
+            if published is not None:
+                self.advertiseCache.commit(published)
+        elif self.multiAdvertiseSupport:
             fname = self.classadsToFile(ads)
             self.doAdvertise(fname)
+            if published is not None:
+                self.advertiseCache.commit(published)
         else:
             # There is no multi advertise support.
             # Advertise one classad at a time.
             for ad in ads:
                 self.advertiseClassad(ad)
+                if published is not None:
+                    key = f"{self.pool}:{self.adType}:{ad}"
+                    self.advertiseCache.commit({key: published[key]})
+
+    def advertiseInMemory(self, ads):
+        """
+        Advertise the classads in one update with the HTCondor Python bindings, without writing files,
+        if enabled in condorManager
+
+        @type ads: list
+        @param ads: classad names to advertise
+
+        @rtype: bool
+        @return: True if the classads were advertised, False if the bindings are not enabled or failed
+        """
+
+        if condorManager.bindings_advertiser is None:
+            return False
+        try:
+            condorManager.bindings_advertiser.advertise(
+                ["%s" % self.classads[ad] for ad in ads], self.adAdvertiseCmd, self.tcpAdvertiseSupport, self.pool
+            )
+        except Exception as e:
+            logSupport.log.warning("Advertising %s classads with the Python bindings failed: %s" % (self.adType, e))
+            return False
+        return True
 
     def advertiseClassad(self, ad):
         """
@@ -287,6 +463,9 @@ class ClassadAdvertiser:
         @param type: Condor constraints for filtering the classads
         """
 
+        if self.advertiseCache is not None:
+            self.advertiseCache.reset()
+
         try:
             fname = self.getUniqClassadFilename()
             with open(fname, "w") as fd:
@@ -355,6 +534,45 @@ def generate_classad_filename(prefix="gwms_classad"):
     return fname
 
 
+def split_classads(text):
+    """Split the text of multiple classads separated by empty lines.
+
+    Args:
+        text (str): Text of the classads, in the format of `condor_advertise -multiple`.
+
+    Returns:
+        list: Text of each classad, with the trailing newline.
+    """
+    ads = []
+    lines = []
+    for line in text.splitlines(True):
+        if line.strip() == "":
+            if lines:
+                ads.append("".join(lines))
+                lines = []
+        else:
+            lines.append(line)
+    if lines:
+        ads.append("".join(lines))
+    return [ad if ad.endswith("\n") else ad + "\n" for ad in ads]
+
+
+def get_classad_name(ad):
+    """Return the value of the Name attribute of a classad in text format.
+
+    Args:
+        ad (str): Text of the classad.
+
+    Returns:
+        str: Value of Name, None if the attribute is missing.
+    """
+    for line in ad.splitlines():
+        key, sep, value = line.partition("=")
+        if sep and key.strip() == "Name":
+            return value.strip().strip('"')
+    return None
+
+
 ############################################################
 #
 # I N T E R N A L - Do not use
@@ -1,10 +1,12 @@
 # SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
 # SPDX-License-Identifier: Apache-2.0
 
+import heapq
 import os
 import re
 import stat
 import time
+import zlib
 
 from . import logSupport
 from .pidSupport import register_sighandler, unregister_sighandler
@@ -103,12 +105,22 @@ cred_cleaners = CredCleanup()
 class DirCleanup:
     """A class used for cleaning up old files in a directory.
 
+    The directory is read with `os.scandir`, only the matching files are stat-ed.
+    With `max_removes` at most that many files are removed in each cleanup, the next cleanup continues
+    from the position where the previous one stopped (saved in `cursor_fname`) and wraps around.
+    With `bucket_format` the subdirectories named after a date (time-bucketed layout) contain the files
+    created starting from that date. The buckets more recent than `maxlife` are not scanned for the age cleanup,
+    the expired ones, with all files older than `maxlife`, are removed at once.
+
     Attributes:
         dirname (str): The directory to clean.
         fname_expression (str): A regular expression to match file names.
         maxlife (int): The maximum lifetime of files in seconds.
         should_log (bool): Whether to log information messages.
         should_log_warnings (bool): Whether to log warning messages.
+        max_removes (int): Maximum number of files removed in a cleanup, 0 means no limit.
+        bucket_format (str): `time.strftime` format of the bucket subdirectories, None if there are no buckets.
+        cursor_fname (str): File with the position where the next cleanup starts.
     """
 
     def __init__(
@@ -118,6 +130,8 @@ class DirCleanup:
         maxlife,
         should_log=True,
         should_log_warnings=True,
+        max_removes=0,
+        bucket_format=None,
     ):
         """Initializes a DirCleanup instance.
 
@@ -127,6 +141,10 @@ class DirCleanup:
             maxlife (int): The maximum lifetime of files in seconds.
             should_log (bool, optional): Whether to log information messages. Defaults to True.
             should_log_warnings (bool, optional): Whether to log warning messages. Defaults to True.
+            max_removes (int, optional): Maximum number of files removed in a cleanup, 0 means no limit.
+                Defaults to 0.
+            bucket_format (str, optional): `time.strftime` format of the names of the bucket subdirectories,
+                e.g. "%Y%m%d". Defaults to None (no buckets).
         """
         self.dirname = dirname
         self.fname_expression = fname_expression
@@ -134,34 +152,219 @@ class DirCleanup:
         self.maxlife = maxlife
         self.should_log = should_log
         self.should_log_warnings = should_log_warnings
+        self.max_removes = max_removes
+        self.bucket_format = bucket_format
+        # one cursor for each cleaner of the directory
+        self.cursor_fname = os.path.join(dirname, ".cleanup_cursor_%08x" % zlib.crc32(fname_expression.encode()))
 
     def cleanup(self):
         """Cleans up files in the directory that match the filename expression and are older than maxlife.
 
         This method removes files that are older than the specified maximum lifetime.
         """
+        count_removes, _, _ = self.cleanup_expired(time.time() - self.maxlife)
+
+        if count_removes > 0:
+            if self.should_log:
+                logSupport.log.info("Removed %i files." % count_removes)
+
+    # INTERNAL
+    def cleanup_expired(self, treshold_time, keep=None):
+        """Removes the matching files older than `treshold_time`, starting from the cursor position.
+
+        Args:
+            treshold_time (float): The files modified before this time are removed.
+            keep (function, optional): Called with the path and `os.stat_result` of each file not removed.
+                If None, the buckets more recent than `treshold_time` are not scanned. Defaults to None.
+
+        Returns:
+            tuple: Number of files removed, bytes removed, True if all the directory was scanned
+                (False if the cleanup stopped at `max_removes`).
+        """
         count_removes = 0
+        count_removes_bytes = 0
+        cursor = self.load_cursor()
+        for position, entry, bucket_time in self.scan_dir(cursor):
+            bucket_scanned = True
+            if bucket_time is not None:
+                max_removes = self.max_removes - count_removes if self.max_removes > 0 else 0
+                removes, removes_bytes, bucket_scanned = self.cleanup_bucket(
+                    entry, bucket_time, treshold_time, keep, max_removes
+                )
+                count_removes += removes
+                count_removes_bytes += removes_bytes
+            else:
+                try:
+                    fstat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # removed in the meantime
+                if stat.S_ISDIR(fstat.st_mode):
+                    continue  # ignore directories
+                if fstat.st_mtime < treshold_time:
+                    try:
+                        self.delete_file(entry.path)
+                        count_removes += 1
+                        count_removes_bytes += fstat.st_size
+                    except Exception:
+                        if self.should_log_warnings:
+                            logSupport.log.warning("Could not remove %s" % entry.path)
+                elif keep is not None:
+                    keep(entry.path, fstat)
+            if 0 < self.max_removes <= count_removes:
+                # a bucket left partway is the first entry of the next cleanup
+                self.save_cursor(position + 1 if bucket_scanned else position)
+                if self.should_log:
+                    logSupport.log.info(
+                        "Removed the maximum of %i files from %s, continuing in the next cleanup"
+                        % (self.max_removes, self.dirname)
+                    )
+                return count_removes, count_removes_bytes, False
+        if cursor > 0:
+            self.save_cursor(0)
+        return count_removes, count_removes_bytes, True
+
+    def scan_dir(self, cursor=0):
+        """Yields the matching files and the buckets, starting from the `cursor` position and wrapping around.
+
+        Only the names are read, the files are not stat-ed.
 
-        treshold_time = time.time() - self.maxlife
-        files_wstats = self.get_files_wstats()
+        Args:
+            cursor (int, optional): Position of the first entry, the previous ones are yielded at the end.
+                Defaults to 0.
 
-        for fpath in list(files_wstats.keys()):
-            fstat = files_wstats[fpath]
+        Yields:
+            tuple: Position, `os.DirEntry`, and start time of the bucket (None for files).
+        """
+        for wrapped in (False, True):
+            if wrapped and cursor == 0:
+                break
+            position = 0
+            with os.scandir(self.dirname) as dir_entries:
+                for entry in dir_entries:
+                    bucket_time = None
+                    if self.fname_expression_obj.match(entry.name) is None:
+                        bucket_time = self.get_bucket_time(entry)
+                        if bucket_time is None:
+                            continue  # ignore files that do not match
+                    if wrapped and position >= cursor:
+                        break
+                    if wrapped or position >= cursor:
+                        yield position, entry, bucket_time
+                    position += 1
+
+    def get_bucket_time(self, entry):
+        """Returns the start time of a bucket subdirectory.
 
-            update_time = fstat[stat.ST_MTIME]
-            if update_time < treshold_time:
+        Args:
+            entry (os.DirEntry): The directory entry.
+
+        Returns:
+            float: The time of the date in the name of the bucket, None if the entry is not a bucket.
+        """
+        if self.bucket_format is None:
+            return None
+        try:
+            if not entry.is_dir(follow_symlinks=False):
+                return None
+            return time.mktime(time.strptime(entry.name, self.bucket_format))
+        except (OSError, ValueError):
+            return None
+
+    def cleanup_bucket(self, entry, bucket_time, treshold_time, keep=None, max_removes=0):
+        """Removes the expired files of a bucket, and the bucket if it is expired and left empty.
+
+        The cleanup of the bucket stops after `max_removes` files, the remaining files are not checked.
+
+        Args:
+            entry (os.DirEntry): The bucket subdirectory.
+            bucket_time (float): The start time of the bucket, no file in it is older.
+            treshold_time (float): The files modified before this time are removed.
+            keep (function, optional): Called with the path and `os.stat_result` of each file not removed.
+                If None, the bucket is not scanned when more recent than `treshold_time`. Defaults to None.
+            max_removes (int, optional): Maximum number of files removed, 0 means no limit. Defaults to 0.
+
+        Returns:
+            tuple: Number of files removed, bytes removed, True if all the files of the bucket were checked
+                (False if the cleanup stopped at `max_removes`).
+        """
+        if keep is None and bucket_time >= treshold_time:
+            return 0, 0, True
+        files = []
+        try:
+            with os.scandir(entry.path) as dir_entries:
+                for file_entry in dir_entries:
+                    if self.fname_expression_obj.match(file_entry.name) is None:
+                        continue
+                    fstat = file_entry.stat(follow_symlinks=False)
+                    if not stat.S_ISDIR(fstat.st_mode):
+                        files.append((file_entry.path, fstat))
+            bucket_stat = entry.stat(follow_symlinks=False)
+            bucket_expired = bucket_stat.st_mtime < treshold_time
+        except OSError:
+            if self.should_log_warnings:
+                logSupport.log.warning("Could not scan %s" % entry.path)
+            return 0, 0, True
+        count_removes = 0
+        count_removes_bytes = 0
+        for fpath, fstat in files:
+            if 0 < max_removes <= count_removes:
+                if bucket_expired:
+                    # the removals changed the modification time, restore it so the bucket is still expired
+                    try:
+                        os.utime(entry.path, ns=(bucket_stat.st_atime_ns, bucket_stat.st_mtime_ns))
+                    except OSError:
+                        pass
+                return count_removes, count_removes_bytes, False
+            if fstat.st_mtime < treshold_time:
                 try:
                     self.delete_file(fpath)
                     count_removes += 1
+                    count_removes_bytes += fstat.st_size
                 except Exception:
                     if self.should_log_warnings:
                         logSupport.log.warning("Could not remove %s" % fpath)
+            elif keep is not None:
+                keep(fpath, fstat)
+        if bucket_expired and count_removes == len(files):
+            try:
+                os.rmdir(entry.path)
+            except OSError:
+                # the files not matching the expression are not checked, the bucket is kept with them
+                pass
+        return count_removes, count_removes_bytes, True
 
-        if count_removes > 0:
-            if self.should_log:
-                logSupport.log.info("Removed %i files." % count_removes)
+    def load_cursor(self):
+        """Returns the position where the cleanup starts, saved by the previous cleanup.
+
+        The cleanup runs in forked processes, so the position is saved in a file.
+
+        Returns:
+            int: The position, 0 if there is no cursor.
+        """
+        if self.max_removes <= 0:
+            return 0
+        try:
+            with open(self.cursor_fname) as f:
+                return max(int(f.read()), 0)
+        except (OSError, ValueError):
+            return 0
+
+    def save_cursor(self, position):
+        """Saves the position where the next cleanup starts.
+
+        Args:
+            position (int): The position, 0 removes the cursor.
+        """
+        try:
+            if position > 0:
+                with open(self.cursor_fname, "w") as f:
+                    f.write("%i" % position)
+            elif os.path.exists(self.cursor_fname):
+                os.unlink(self.cursor_fname)
+        except OSError as e:
+            if self.should_log_warnings:
+                logSupport.log.warning(f"Could not save the cleanup cursor {self.cursor_fname}: {e}")
 
-    # INTERNAL
     def get_files_wstats(self):
         """Retrieves a dictionary of file paths and their statistics.
 
@@ -173,18 +376,14 @@ class DirCleanup:
         """
         out_data = {}
 
-        fnames = os.listdir(self.dirname)
-        for fname in fnames:
-            if self.fname_expression_obj.match(fname) is None:
-                continue  # ignore files that do not match
-
-            fpath = os.path.join(self.dirname, fname)
-            fstat = os.lstat(fpath)
-            fmode = fstat[stat.ST_MODE]
-            isdir = stat.S_ISDIR(fmode)
-            if isdir:
-                continue  # ignore directories
-            out_data[fpath] = fstat
+        with os.scandir(self.dirname) as dir_entries:
+            for entry in dir_entries:
+                if self.fname_expression_obj.match(entry.name) is None:
+                    continue  # ignore files that do not match
+                fstat = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(fstat.st_mode):
+                    continue  # ignore directories
+                out_data[entry.path] = fstat
 
         return out_data
 
@@ -202,6 +401,10 @@ class DirCleanup:
 class DirCleanupWSpace(DirCleanup):
     """A class used for cleaning up files in a directory based on both age and total space used.
 
+    The files not expired are kept in a heap ordered by modification time, so only the ones removed
+    to free space are ordered. The space is checked only when the whole directory was scanned,
+    not when the cleanup stopped at `max_removes`.
+
     Attributes:
         dirname (str): The directory to clean.
         fname_expression (str): A regular expression to match file names.
@@ -210,6 +413,8 @@ class DirCleanupWSpace(DirCleanup):
         maxspace (int): The maximum allowed space for the files in bytes.
         should_log (bool): Whether to log information messages.
         should_log_warnings (bool): Whether to log warning messages.
+        max_removes (int): Maximum number of files removed in a cleanup, 0 means no limit.
+        bucket_format (str): `time.strftime` format of the bucket subdirectories, None if there are no buckets.
     """
 
     def __init__(
@@ -221,6 +426,8 @@ class DirCleanupWSpace(DirCleanup):
         maxspace,  # max space allowed for the sum of files, unless they are too young
         should_log=True,
         should_log_warnings=True,
+        max_removes=0,
+        bucket_format=None,
     ):
         """Initializes a DirCleanupWSpace instance.
 
@@ -232,8 +439,14 @@ class DirCleanupWSpace(DirCleanup):
             maxspace (int): The maximum allowed space for the files in bytes.
             should_log (bool, optional): Whether to log information messages. Defaults to True.
             should_log_warnings (bool, optional): Whether to log warning messages. Defaults to True.
+            max_removes (int, optional): Maximum number of files removed in a cleanup, 0 means no limit.
+                Defaults to 0.
+            bucket_format (str, optional): `time.strftime` format of the names of the bucket subdirectories.
+                Defaults to None (no buckets).
         """
-        DirCleanup.__init__(self, dirname, fname_expression, maxlife, should_log, should_log_warnings)
+        DirCleanup.__init__(
+            self, dirname, fname_expression, maxlife, should_log, should_log_warnings, max_removes, bucket_format
+        )
         self.minlife = minlife
         self.maxspace = maxspace
 
@@ -243,31 +456,25 @@ class DirCleanupWSpace(DirCleanup):
         This method removes files that are older than the specified maximum lifetime or if
         the total space used by the files exceeds the specified maximum space.
         """
-        count_removes = 0
-        count_removes_bytes = 0
-
         min_treshold_time = time.time() - self.minlife
         treshold_time = time.time() - self.maxlife
 
-        files_wstats = self.get_files_wstats()
-        fpaths = list(files_wstats.keys())
-        # Order based on time (older first)
-        fpaths.sort(key=lambda x: files_wstats[x][stat.ST_MTIME])
-
-        # First calculate the amount of space currently used
-        used_space = 0
-        for fpath in fpaths:
-            fstat = files_wstats[fpath]
-            fsize = fstat[stat.ST_SIZE]
-            used_space += fsize
-
-        for fpath in fpaths:
-            fstat = files_wstats[fpath]
-
-            update_time = fstat[stat.ST_MTIME]
-            fsize = fstat[stat.ST_SIZE]
-
-            if (update_time < treshold_time) or ((update_time < min_treshold_time) and (used_space > self.maxspace)):
+        # (mtime, size, path) of the files not expired
+        files = []
+        count_removes, count_removes_bytes, scanned = self.cleanup_expired(
+            treshold_time, lambda fpath, fstat: files.append((fstat.st_mtime, fstat.st_size, fpath))
+        )
+
+        if scanned:
+            used_space = sum(fsize for _, fsize, _ in files)
+            # Remove the older files first, until the space is within the limit
+            heapq.heapify(files)
+            while files and used_space > self.maxspace:
+                if 0 < self.max_removes <= count_removes:
+                    break
+                update_time, fsize, fpath = heapq.heappop(files)
+                if update_time >= min_treshold_time:
+                    break  # this and all the remaining files are too young
                 try:
                     os.unlink(fpath)
                     count_removes += 1
@@ -64,7 +64,7 @@ def set_path(new_condor_bin_path, new_condor_sbin_path=None):
         condor_sbin_path = new_condor_sbin_path
 
 
-def exe_cmd(condor_exe, args, stdin_data=None, env={}):
+def exe_cmd(condor_exe, args, stdin_data=None, env={}, stdout_handler=None, process_handler=None):
     """Execute an arbitrary condor command and return its output as a list of lines.
 
     Fails if stderr is not empty.
@@ -73,10 +73,14 @@ def exe_cmd(condor_exe, args, stdin_data=None, env={}):
         condor_exe (str): Condor executable, uses a relative path to $CONDOR_BIN.
         args (str): Arguments for the command.
         stdin_data (str, optional): Data that will be fed to the command via stdin. Defaults to None.
-        env (dict, optional): Environment to be set before execution. Defaults to {}.
+        env (dict, optional): Environment to be set before execution, None values are unset. Defaults to {}.
+        stdout_handler (callable, optional): If provided, stdout is passed to it in chunks of bytes
+            while the command is running, instead of being returned. Defaults to None.
+        process_handler (callable, optional): If provided with stdout_handler, it is invoked with
+            the `subprocess.Popen` object of the command once started. Defaults to None.
 
     Returns:
-        list: Lines of stdout from the command.
+        list: Lines of stdout from the command. Empty if stdout_handler consumed the output.
 
     Raises:
         UnconfigError: If condor_bin_path is undefined.
@@ -90,7 +94,7 @@ def exe_cmd(condor_exe, args, stdin_data=None, env={}):
 
     cmd = f"{condor_exe_path} {args}"
 
-    return iexe_cmd(cmd, stdin_data, env)
+    return iexe_cmd(cmd, stdin_data, env, stdout_handler=stdout_handler, process_handler=process_handler)
 
 
 def exe_cmd_sbin(condor_exe, args, stdin_data=None, env={}):
@@ -157,7 +161,7 @@ def generate_bash_script(cmd, environment):
     return "\n".join(script)
 
 
-def iexe_cmd(cmd, stdin_data=None, child_env=None, log=None):
+def iexe_cmd(cmd, stdin_data=None, child_env=None, log=None, stdout_handler=None, process_handler=None):
     """Fork a process and execute cmd - rewritten to use select to avoid filling up stderr and stdout queues.
 
     Args:
@@ -165,9 +169,12 @@ def iexe_cmd(cmd, stdin_data=None, child_env=None, log=None):
         stdin_data (str, optional): Data that will be fed to the command via stdin. Defaults to None.
         child_env (dict, optional): Environment to be set before execution. Defaults to None.
         log (optional): Logger instance. Defaults to None.
+        stdout_handler (callable, optional): If provided, stdout is streamed to it in chunks of bytes. Defaults to None.
+        process_handler (callable, optional): Invoked with the `subprocess.Popen` object of the command
+            when stdout_handler is provided. Defaults to None.
 
     Returns:
-        list: list of str. Lines of stdout from the command.
+        list: list of str. Lines of stdout from the command. Empty if stdout_handler is provided.
 
     Raises:
         ExeError: If there is an error executing the command.
@@ -176,6 +183,11 @@ def iexe_cmd(cmd, stdin_data=None, child_env=None, log=None):
     if log is None:
         log = logSupport.log
     try:
+        if stdout_handler is not None:
+            subprocessSupport.iexe_cmd_stream(
+                cmd, stdout_handler, stdin_data=stdin_data, child_env=child_env, process_handler=process_handler
+            )
+            return []
         # invoking subprocessSupport.iexe_cmd w/ text=True (default), stdin_data and returned output are str
         stdout_data = subprocessSupport.iexe_cmd(cmd, stdin_data=stdin_data, child_env=child_env)
     except CalledProcessError as ex:
@@ -16,6 +16,11 @@ import time
 
 from . import util
 
+# Incremental parsing of the log files: the state (offset and jobs) is saved in a pickle next to the cache
+INCR_STATE_VERSION = 1
+INCR_HEAD_LEN = 256  # bytes at the beginning of the log file used to recognize it
+INCR_CACHE_EXT = ".incr"
+
 # -------------- Single Log classes ------------------------
 
 
@@ -26,9 +31,13 @@ class cachedLogClass:
     The Constructor for inherited classes needs to define logname and cachename
     (possibly by using clInit) as well as the methods loadFromLog, merge, and isActive.
 
+    loadFromLog can parse only the part of the log added since the last load, using and updating `incr_state`,
+    which is saved together with the cache (see `parseSubmitLogFastRawIncr`).
+
     Attributes:
         logname (str): The name of the log file.
         cachename (str): The name of the cache file.
+        incr_state (dict): State of the incremental parsing of the log file, None if not available.
     """
 
     def clInit(self, logname, cache_dir, cache_ext):
@@ -44,6 +53,7 @@ class cachedLogClass:
             self.cachename = logname + cache_ext
         else:
             self.cachename = os.path.join(cache_dir, os.path.basename(logname) + cache_ext)
+        self.incr_state = None
 
     def has_changed(self):
         """Compares to cache, and tells if the log file has changed since last cached.
@@ -107,10 +117,28 @@ class cachedLogClass:
         """
         raise RuntimeError("loadFromLog not implemented!")
 
+    def loadIncrState(self):
+        """Returns the state of the incremental parsing of the log file.
+
+        The state is loaded from the file saved with the cache, if not already in memory.
+        The parsing functions verify that it is still valid for the log file.
+
+        Returns:
+            dict: The state, None if not available.
+        """
+        if self.incr_state is None:
+            try:
+                self.incr_state = loadCache(self.cachename + INCR_CACHE_EXT)
+            except RuntimeError:
+                pass  # missing or corrupted, the whole file will be parsed
+        return self.incr_state
+
     ####### PRIVATE ###########
     def saveCache(self):
-        """Saves data to the cache file."""
+        """Saves data to the cache file, and the incremental parsing state if any."""
         saveCache(self.cachename, self.data)
+        if self.incr_state is not None:
+            saveCache(self.cachename + INCR_CACHE_EXT, self.incr_state)
         return
 
 
@@ -135,7 +163,7 @@ class logSummary(cachedLogClass):
 
         Stores the result in `self.data`.
         """
-        jobs = parseSubmitLogFastRaw(self.logname)
+        jobs, self.incr_state = parseSubmitLogFastRawIncr(self.logname, self.loadIncrState())
         self.data = listAndInterpretRawStatuses(jobs, listStatuses)
         return
 
@@ -253,7 +281,7 @@ class logCompleted(cachedLogClass):
         Stores the result in `self.data`.
         """
         tmpdata = {}
-        jobs = parseSubmitLogFastRaw(self.logname)
+        jobs, self.incr_state = parseSubmitLogFastRawIncr(self.logname, self.loadIncrState())
         status = listAndInterpretRawStatuses(jobs, listStatuses)
         counts = {}
         for s in list(status.keys()):
@@ -384,7 +412,7 @@ class logCounts(cachedLogClass):
 
         Stores the result in `self.data`.
         """
-        jobs = parseSubmitLogFastRaw(self.logname)
+        jobs, self.incr_state = parseSubmitLogFastRawIncr(self.logname, self.loadIncrState())
         self.data = countAndInterpretRawStatuses(jobs)
         return
 
@@ -485,7 +513,9 @@ class logSummaryTimings(cachedLogClass):
 
         Stores the result in `self.data`.
         """
-        jobs, self.startTime, self.endTime = parseSubmitLogFastRawTimings(self.logname)
+        jobs, self.startTime, self.endTime, self.incr_state = parseSubmitLogFastRawTimingsIncr(
+            self.logname, self.loadIncrState()
+        )
         self.data = listAndInterpretRawStatuses(jobs, listStatusesTimings)
         return
 
@@ -1023,45 +1053,80 @@ def parseSubmitLogFastRaw(fname):
         dict: A dictionary where keys are job IDs and values are their corresponding statuses (statusString).
               For example, {'1583.004': '000', '3616.008': '009'}
     """
-    jobs = {}
+    return parseSubmitLogFastRawIncr(fname)[0]
 
-    size = os.path.getsize(fname)
-    if size == 0:
-        # nothing to read, if empty
-        return jobs
 
-    with open(fname) as fd:
-        buf = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ)
+def parseSubmitLogFastRawIncr(fname, state=None):
+    """Parses a HTCondor submit log file incrementally, starting from where the previous parse stopped.
 
-        idx = 0
+    The state returned by the previous call on the same file is used to parse only the events appended since then.
+    The whole file is parsed if there is no state or if the file has been replaced or truncated.
+    The state includes only complete events, an incomplete event at the end of the file is
+    added to the returned jobs but will be parsed again the next time.
 
-        while (idx + 5) < size:  # else we are at the end of the file
-            # format
-            # 023 (123.2332.000) Bla
+    Args:
+        fname (str): Filename of the log to parse.
+        state (dict): State returned by the previous call on the same file. Defaults to None, full parse.
 
-            # first 3 chars are status
-            status = buf[idx : idx + 3]
-            idx += 5
-            # extract job id
-            i1 = buf.find(b")", idx)
-            if i1 < 0:
-                break
-            jobid = buf[idx : i1 - 4]
-            idx = i1 + 1
+    Returns:
+        tuple: A tuple containing:
+                - dict: A dictionary where keys are job IDs and values are their corresponding statuses (statusString),
+                        like the output of `parseSubmitLogFastRaw`. Should not be modified.
+                - dict: The new state. None if the file is empty.
+    """
+    with open(fname, "rb") as fd:
+        fstat = os.fstat(fd.fileno())
+        size = fstat.st_size
+        if size == 0:
+            # nothing to read, if empty
+            return {}, None
 
-            if jobid in jobs:
-                jobs[jobid] = get_new_status(jobs[jobid], status)
+        buf = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            idx = _getIncrOffset(state, fstat, buf)
+            if idx > 0:
+                jobs = state["jobs"]
             else:
-                jobs[jobid] = status
-
-            i1 = buf.find(b"...", idx)
-            if i1 < 0:
-                break
-            idx = i1 + 4  # the 3 dots plus newline
-
-        buf.close()
-
-    return jobs
+                jobs = {}
+            tail = None
+
+            while (idx + 5) < size:  # else we are at the end of the file
+                # format
+                # 023 (123.2332.000) Bla
+
+                # first 3 chars are status
+                status = buf[idx : idx + 3]
+                # extract job id
+                i1 = buf.find(b")", idx + 5)
+                if i1 < 0:
+                    break
+                jobid = buf[idx + 5 : i1 - 4]
+
+                i2 = buf.find(b"...", i1 + 1)
+                if i2 < 0 or (i2 + 4) > size:
+                    # incomplete event, not saved in the state
+                    tail = (jobid, status)
+                    break
+
+                if jobid in jobs:
+                    jobs[jobid] = get_new_status(jobs[jobid], status)
+                else:
+                    jobs[jobid] = status
+                idx = i2 + 4  # the 3 dots plus newline
+
+            new_state = {"version": INCR_STATE_VERSION, "ino": fstat.st_ino, "head": buf[:INCR_HEAD_LEN], "offset": idx}
+        finally:
+            buf.close()
+
+    new_state["jobs"] = jobs
+    if tail is not None:
+        jobid, status = tail
+        jobs = dict(jobs)
+        if jobid in jobs:
+            jobs[jobid] = get_new_status(jobs[jobid], status)
+        else:
+            jobs[jobid] = status
+    return jobs, new_state
 
 
 def parseSubmitLogFastRawTimings(fname):
@@ -1086,63 +1151,145 @@ def parseSubmitLogFastRawTimings(fname):
                       '09/28 01:38:53', '09/28 20:31:53')
                ```
     """
-    jobs = {}
+    return parseSubmitLogFastRawTimingsIncr(fname)[:3]
 
-    first_time = None
-    last_time = None
 
-    size = os.path.getsize(fname)
-    if size == 0:
-        # nothing to read, if empty
-        return jobs, first_time, last_time
+def parseSubmitLogFastRawTimingsIncr(fname, state=None):
+    """Parses a HTCondor submit log file incrementally, extracting job statuses along with timing information.
 
-    with open(fname) as fd:
-        buf = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ)
+    Like `parseSubmitLogFastRawIncr`, the state of the previous call on the same file is used
+    to parse only the events appended since then.
 
-        idx = 0
+    Args:
+        fname (str): Filename of the log to parse.
+        state (dict): State returned by the previous call on the same file. Defaults to None, full parse.
 
-        while (idx + 5) < size:  # else we are at the end of the file
-            # format
-            # 023 (123.2332.000) MM/DD HH:MM:SS
+    Returns:
+        tuple: A tuple containing:
+                - dict: A dictionary of jobStrings, like in `parseSubmitLogFastRawTimings`. Should not be modified.
+                - str: The timestamp of the first log entry.
+                - str: The timestamp of the last log entry.
+                - dict: The new state. None if the file is empty.
+    """
+    with open(fname, "rb") as fd:
+        fstat = os.fstat(fd.fileno())
+        size = fstat.st_size
+        if size == 0:
+            # nothing to read, if empty
+            return {}, None, None, None
 
-            # first 3 chars are status
-            status = buf[idx : idx + 3]
-            idx += 5
-            # extract job id
-            i1 = buf.find(b")", idx)
-            if i1 < 0:
-                break
-            jobid = buf[idx : i1 - 4]
-            idx = i1 + 2
-            # extract time
-            line_time = buf[idx : idx + 14]
-            idx += 16
+        buf = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            idx = _getIncrOffset(state, fstat, buf)
+            if idx > 0:
+                jobs = state["jobs"]
+                first_time = state["first_time"]
+                last_time = state["last_time"]
+            else:
+                jobs = {}
+                first_time = None
+                last_time = None
+            tail = None
+
+            while (idx + 5) < size:  # else we are at the end of the file
+                # format
+                # 023 (123.2332.000) MM/DD HH:MM:SS
+
+                # first 3 chars are status
+                status = buf[idx : idx + 3]
+                # extract job id
+                i1 = buf.find(b")", idx + 5)
+                if i1 < 0:
+                    break
+                jobid = buf[idx + 5 : i1 - 4]
+                # extract time
+                line_time = buf[i1 + 2 : i1 + 16]
+
+                i2 = buf.find(b"...", i1 + 18)
+                if i2 < 0 or (i2 + 4) > size:
+                    # incomplete event, not saved in the state
+                    tail = (jobid, status, line_time)
+                    break
+
+                if first_time is None:
+                    first_time = line_time
+                last_time = line_time
+                _addTimingsEvent(jobs, jobid, status, line_time)
+                idx = i2 + 4  # the 3 dots plus newline
+
+            new_state = {
+                "version": INCR_STATE_VERSION,
+                "ino": fstat.st_ino,
+                "head": buf[:INCR_HEAD_LEN],
+                "offset": idx,
+                "first_time": first_time,
+                "last_time": last_time,
+            }
+        finally:
+            buf.close()
+
+    new_state["jobs"] = jobs
+    if tail is not None:
+        jobid, status, line_time = tail
+        jobs = dict(jobs)
+        if first_time is None:
+            first_time = line_time
+        last_time = line_time
+        _addTimingsEvent(jobs, jobid, status, line_time)
+    return jobs, first_time, last_time, new_state
+
+
+def _addTimingsEvent(jobs, jobid, status, line_time):
+    """Updates the timings of a job with a new event.
 
-            if first_time is None:
-                first_time = line_time
-            last_time = line_time
+    Args:
+        jobs (dict): Dictionary of jobStrings, like in `parseSubmitLogFastRawTimings`. Modified in place.
+        jobid (bytes): Job ID.
+        status (bytes): Status of the event.
+        line_time (bytes): Time of the event.
+    """
+    if jobid in jobs:
+        if status == b"001":
+            running_time = line_time
+        else:
+            running_time = jobs[jobid][2]
+        jobs[jobid] = (
+            get_new_status(jobs[jobid][0], status),
+            jobs[jobid][1],
+            running_time,
+            line_time,
+        )  # start time never changes
+    else:
+        jobs[jobid] = (status, line_time, b"", line_time)
 
-            if jobid in jobs:
-                if status == b"001":
-                    running_time = line_time
-                else:
-                    running_time = jobs[jobid][2]
-                jobs[jobid] = (
-                    get_new_status(jobs[jobid][0], status),
-                    jobs[jobid][1],
-                    running_time,
-                    line_time,
-                )  # start time never changes
-            else:
-                jobs[jobid] = (status, line_time, b"", line_time)
 
-            i1 = buf.find(b"...", idx)
-            if i1 < 0:
-                break
-            idx = i1 + 4  # the 3 dots plus newline
+def _getIncrOffset(state, fstat, buf):
+    """Returns the offset where to resume parsing a log file.
 
-        buf.close()
-    return jobs, first_time, last_time
+    The state can be used only if it is for the same file (same inode and same beginning)
+    and the file did not shrink.
+
+    Args:
+        state (dict): State of the incremental parsing (or None).
+        fstat (os.stat_result): Status of the log file.
+        buf (mmap.mmap): Content of the log file.
+
+    Returns:
+        int: The offset to resume from, 0 to parse the whole file.
+    """
+    if not state or state.get("version") != INCR_STATE_VERSION:
+        return 0
+    try:
+        offset = state["offset"]
+        if state["ino"] != fstat.st_ino or offset > fstat.st_size:
+            return 0
+        head = state["head"]
+        if buf[: len(head)] != head:
+            return 0
+    except (KeyError, TypeError):
+        # corrupted state
+        return 0
+    return offset
 
 
 def parseSubmitLogFastRawCallback(fname, callback):
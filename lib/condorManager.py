@@ -4,8 +4,9 @@
 """This module implements functions that will act on Condor."""
 
 import re
+import threading
 
-from . import condorExe, condorMonitor
+from . import condorExe, condorMonitor, logSupport
 
 
 ##############################################
@@ -253,11 +254,120 @@ def ismulti2str(is_multi):
         return ""
 
 
+#############################################
+# HTCondor Advertise with the Python bindings
+class CollectorAdvertiser:
+    """Advertise classads in process with `htcondor.Collector.advertise`.
+
+    One Collector object is kept per pool and reused, so the security session is negotiated once
+    instead of once per condor_advertise process. The HTCondor configuration is reloaded before each
+    advertisement (`condorMonitor.htcondor_full_reload`), because the security settings come from
+    the environment (e.g. X509_USER_PROXY, _CONDOR_ variables) and can change between advertisements.
+    The advertisements to the same pool are serialized, to keep their order.
+    """
+
+    def __init__(self, collector_factory=None):
+        """Constructor.
+
+        Args:
+            collector_factory (callable): Function returning the Collector object for a pool name (None for the
+                local pool). Defaults to `htcondor.Collector`.
+        """
+        self.collector_factory = collector_factory
+        self.collectors = {}
+        self.pool_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_available():
+        """Return True if the HTCondor Python bindings can be used."""
+        return condorMonitor.USE_HTCONDOR_PYTHON_BINDINGS
+
+    def _get_pool(self, pool_name):
+        """Return the Collector object and the lock for a pool, creating them if needed."""
+        with self._lock:
+            if pool_name not in self.collectors:
+                if self.collector_factory is None:
+                    if pool_name is None:
+                        collector = condorMonitor.htcondor.Collector()
+                    else:
+                        collector = condorMonitor.htcondor.Collector(str(pool_name))
+                else:
+                    collector = self.collector_factory(pool_name)
+                self.collectors[pool_name] = collector
+                self.pool_locks[pool_name] = threading.Lock()
+            return self.collectors[pool_name], self.pool_locks[pool_name]
+
+    def advertise(self, ads, command, use_tcp=False, pool_name=None):
+        """Advertise a list of classads to a pool in one update.
+
+        Args:
+            ads (list): classad.ClassAd objects, or classads in text format.
+            command (str): The HTCondor update command, e.g. UPDATE_AD_GENERIC.
+            use_tcp (bool): If True, use TCP.
+            pool_name (str): Collector to advertise to. None for the local pool.
+
+        Raises:
+            Exception: Any error from the bindings. The Collector object is discarded, to reconnect next time.
+        """
+        if not ads:
+            return
+        ads = [condorMonitor.classad.parseOne(ad) if isinstance(ad, str) else ad for ad in ads]
+        collector, pool_lock = self._get_pool(pool_name)
+        with pool_lock:
+            try:
+                condorMonitor.htcondor_full_reload()
+                collector.advertise(ads, command, use_tcp)
+            except Exception:
+                with self._lock:
+                    self.collectors.pop(pool_name, None)
+                raise
+
+    def advertise_file(self, classad_fname, command, use_tcp=False, pool_name=None):
+        """Advertise the classads in a file (one or more, separated by empty lines) to a pool.
+
+        Args:
+            classad_fname (str): File with the classads.
+            command (str): The HTCondor update command.
+            use_tcp (bool): If True, use TCP.
+            pool_name (str): Collector to advertise to. None for the local pool.
+        """
+        with open(classad_fname) as fd:
+            ads = list(condorMonitor.classad.parseAds(fd.read()))
+        self.advertise(ads, command, use_tcp, pool_name)
+
+
+# CollectorAdvertiser used by condorAdvertise, None to always run condor_advertise
+# Set with set_advertise_with_bindings()
+bindings_advertiser = None
+
+
+def set_advertise_with_bindings(enabled=True):
+    """Enable the advertisement with the HTCondor Python bindings in `condorAdvertise`, if available.
+
+    Args:
+        enabled (bool): True to use the bindings, False to run condor_advertise.
+
+    Returns:
+        bool: True if the bindings will be used.
+    """
+    global bindings_advertiser
+    if enabled and CollectorAdvertiser.is_available():
+        if bindings_advertiser is None:
+            bindings_advertiser = CollectorAdvertiser()
+    else:
+        bindings_advertiser = None
+    return bindings_advertiser is not None
+
+
 #############################################
 # HTCondor Advertise function
 def condorAdvertise(classad_fname, command, use_tcp=False, is_multi=False, pool_name=None):
     """Advertise a HTCondor ClassAd to the collector.
 
+    If enabled with `set_advertise_with_bindings`, the classads are advertised with the HTCondor Python bindings,
+    falling back to condor_advertise if that fails.
+
     Args:
         classad_fname (str): The filename of the classad.
         command (str): The Condor command to advertise.
@@ -268,5 +378,13 @@ def condorAdvertise(classad_fname, command, use_tcp=False, is_multi=False, pool_
     Returns:
         str: The output of the condor_advertise command.
     """
+    if bindings_advertiser is not None:
+        try:
+            bindings_advertiser.advertise_file(classad_fname, command, use_tcp, pool_name)
+            return []
+        except Exception as e:
+            logSupport.log.warning(
+                f"Advertising {classad_fname} to {pool_name} with the Python bindings failed, using condor_advertise: {e}"
+            )
     cmd_opts = f"{pool2str(pool_name)}{usetcp2str(use_tcp)}{ismulti2str(is_multi)}{command} {classad_fname}"
     return condorExe.exe_cmd_sbin("condor_advertise", cmd_opts)
@@ -6,10 +6,16 @@ Please notice that it also converts \" into "
 """
 
 import copy
+import hashlib
 import os
 import socket
+import sys
+import threading
+import time
 import xml.parsers.expat
 
+from collections.abc import MutableMapping
+from concurrent import futures
 from itertools import groupby
 
 from . import condorExe, condorSecurity
@@ -37,6 +43,16 @@ except ImportError:
     # logSupport has been initialized. But I'd try to put it log.debug
     pass
 
+# If True, the query results use CompactClassad records sharing the attribute names (ClassadSchema)
+# instead of one dictionary per classad. Can be changed per query with CondorQuery.compact_classads
+USE_COMPACT_CLASSADS = False
+
+_htcondor_reload_lock = threading.Lock()
+# The security settings of the bindings queries are set in os.environ, see CondorQuery.fetch_using_bindings
+_htcondor_security_lock = threading.Lock()
+# Protects CondorQuery.process and CondorQuery.cancelled (a lock in the query would prevent pickling)
+_query_process_lock = threading.Lock()
+
 
 def htcondor_full_reload():
     """Reloads the HTCondor configuration from the environment and updates HTCondor parameters.
@@ -49,12 +65,14 @@ def htcondor_full_reload():
     HTCONDOR_ENV_PREFIX_LEN = len(HTCONDOR_ENV_PREFIX)  # Length of _CONDOR_ = 8
     if not USE_HTCONDOR_PYTHON_BINDINGS:
         return
-    # Reload configuration reading CONDOR_CONFIG from the environment
-    htcondor.reload_config()
-    # _CONDOR_ variables need to be added manually to _Params
-    for i in os.environ:
-        if i.startswith(HTCONDOR_ENV_PREFIX):
-            htcondor.param[i[HTCONDOR_ENV_PREFIX_LEN:]] = os.environ[i]
+    # queries can run in concurrent threads (QueryOrchestrator)
+    with _htcondor_reload_lock:
+        # Reload configuration reading CONDOR_CONFIG from the environment
+        htcondor.reload_config()
+        # _CONDOR_ variables need to be added manually to _Params
+        for i in os.environ:
+            if i.startswith(HTCONDOR_ENV_PREFIX):
+                htcondor.param[i[HTCONDOR_ENV_PREFIX_LEN:]] = os.environ[i]
 
 
 #
@@ -495,6 +513,47 @@ class CondorQuery(StoredQuery):
             self.security_obj = copy.deepcopy(security_obj)
         else:
             self.security_obj = condorSecurity.ProtoRequest()
+        self.compact_classads = USE_COMPACT_CLASSADS
+        # command running the query and cancel() request, see cancel()
+        self.process = None
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop a query loading in another thread (e.g. timed out in `QueryOrchestrator`).
+
+        The command running the query is killed, now or as soon as it starts, and the query fails.
+        A query using the python bindings cannot be interrupted, it completes normally.
+        """
+        with _query_process_lock:
+            self.cancelled = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.kill()
+
+    def _set_process(self, process):
+        """Record the command running the query, killing it if the query has been cancelled.
+
+        Args:
+            process (subprocess.Popen or None): The command running the query, None when it is over.
+        """
+        with _query_process_lock:
+            self.process = process
+            if process is not None and self.cancelled:
+                process.kill()
+
+    def new_schema(self, format_list=None):
+        """Return the schema for the results of a query, or None if the results are dictionaries.
+
+        Args:
+            format_list (list, optional): Classad attr & type. Defaults to None (the names are added while parsing).
+
+        Returns:
+            ClassadSchema or None: A new schema with the format_list attributes (but the key ones),
+                None if `self.compact_classads` is False.
+        """
+        if not self.compact_classads:
+            return None
+        key_attrs = self.group_attribute if isinstance(self.group_attribute, (list, tuple)) else [self.group_attribute]
+        return ClassadSchema([el[0] for el in format_list or () if el[0] not in key_attrs])
 
     def require_integrity(self, requested_integrity):
         """Set client integrity settings to use for condor commands.
@@ -600,29 +659,47 @@ class CondorQuery(StoredQuery):
                 format_arr.append(f'-format "{attr_format}" "{attr_name}"')
             format_str = " ".join(format_arr)
 
-        # set environment for security settings
-        self.security_obj.save_state()
+        # The security settings are passed in the environment of the command instead of changing os.environ,
+        # so queries running in concurrent threads (QueryOrchestrator) do not interfere
+        env = dict(self.env)
+        env.update(self.security_obj.get_requests_env())
         try:
-            self.security_obj.enforce_requests()
+            # The output is parsed while the command is running, and the classads are moved to the dictionary
+            # as they are completed, so neither the XML text nor the full list of classads are held in memory
+            parser = ClassadXMLParser()
+            schema = self.new_schema(format_list)
+            dict_data = {} if schema is None else CompactClassadDict()
+
+            def stdout_handler(chunk):
+                parser.feed(chunk)
+                dict_data.update(list2dict(parser.pop_classads(), self.group_attribute, schema))
 
             if full_xml:
                 xml_data = condorExe.exe_cmd(
-                    self.exe_name, f"{self.resource_str} -xml {self.pool_str} {constraint_str}", env=self.env
+                    self.exe_name,
+                    f"{self.resource_str} -xml {self.pool_str} {constraint_str}",
+                    env=env,
+                    stdout_handler=stdout_handler,
+                    process_handler=self._set_process,
                 )
             else:
                 # format_str is defined because full_xml False means (format_list is not None)
                 xml_data = condorExe.exe_cmd(
                     self.exe_name,
                     f"{self.resource_str} {format_str} -xml {self.pool_str} {constraint_str}",  # pylint: disable=E0606
-                    env=self.env,
+                    env=env,
+                    stdout_handler=stdout_handler,
+                    process_handler=self._set_process,
                 )
         finally:
-            # restore old security context
-            self.security_obj.restore_state()
-
-        list_data = xml2list(xml_data)
-        del xml_data
-        dict_data = list2dict(list_data, self.group_attribute)
+            self._set_process(None)
+
+        if xml_data:
+            # output returned as list of lines instead of being streamed
+            parser.feed_lines(xml_data)
+            del xml_data
+        parser.close()
+        dict_data.update(list2dict(parser.pop_classads(), self.group_attribute, schema))
         return dict_data
 
     def fetch_using_bindings(self, constraint=None, format_list=None):
@@ -726,6 +803,9 @@ class CondorQ(CondorQuery):
         constraint = bindings_friendly_constraint(constraint)
         attrs = bindings_friendly_attrs(format_list)
 
+        # the security settings are set in os.environ and the configuration is process wide,
+        # the queries running in concurrent threads (QueryOrchestrator) must not overlap
+        _htcondor_security_lock.acquire()
         self.security_obj.save_state()
         try:
             self.security_obj.enforce_requests()
@@ -744,7 +824,7 @@ class CondorQ(CondorQuery):
                     disk_cache.save(self.schedd_name + ".locate", schedd_ad)
                 schedd = htcondor.Schedd(schedd_ad)
             results = schedd.query(constraint, attrs)
-            results_dict = list2dict(results, self.group_attribute)
+            results_dict = list2dict(results, self.group_attribute, self.new_schema(format_list))
         except Exception as ex:
             s = "default"
             if self.schedd_name is not None:
@@ -756,10 +836,153 @@ class CondorQ(CondorQuery):
             raise PBError(err_str) from ex
         finally:
             self.security_obj.restore_state()
+            _htcondor_security_lock.release()
 
         return results_dict
 
 
+class CondorQCache(CondorQ):
+    """condor_q with a persistent job cache, updated with the jobs changed since the previous query.
+
+    The first load is a full query. The following ones query only:
+    1. the IDs of the jobs matching the constraint (with ServerTime), to drop the jobs that left the queue
+       or do not match anymore and to refresh ServerTime of the cached ones
+    2. the jobs with one of the `change_time_attrs` after the previous sync (minus `sync_margin`), to add the new
+       jobs and replace the changed ones: `EnteredCurrentStatus` (status changes, including the holds and
+       releases with HoldReason, NumSystemHolds and LastHoldReason), `QDate` (new jobs) and
+       `LastRemoteStatusUpdate` (grid jobs, updated with GridJobStatus and the resubmissions like NumGlobusSubmits)
+    A full query is done again every `full_refresh_interval` seconds, when jobs in the queue are
+    missing from the cache, or when the constraint or format list change.
+    NOTE: attributes changing without updating any of `change_time_attrs` (e.g. condor_qedit) are updated
+          only by the full refresh.
+    The cache is saved with `cache.save()` and retrieved with `cache.get()`, like `DiskCache`, so it persists
+    across processes. `fetchStored()` is the same of `CondorQ()`.
+
+    Attributes:
+        cache (DiskCache): Cache for the job snapshot. None to use the module `disk_cache`.
+        full_refresh_interval (int): Seconds between full queries.
+        sync_margin (int): Seconds before the previous sync also included in the changes query.
+        change_time_attrs (tuple): Job attributes with the time of the changes, see above.
+        last_load_type (str): "full" or "delta", the kind of the last load.
+        last_load_stats (dict): Number of jobs updated ("changed") and dropped ("removed") by the last load.
+    """
+
+    CACHE_VERSION = 2
+    CHANGE_TIME_ATTRS = ("EnteredCurrentStatus", "QDate", "LastRemoteStatusUpdate")
+
+    def __init__(
+        self,
+        schedd_name=None,
+        pool_name=None,
+        security_obj=None,
+        schedd_lookup_cache=local_schedd_cache,
+        cache=None,
+        full_refresh_interval=3600,
+        sync_margin=60,
+        change_time_attrs=None,
+    ):
+        """Initializes a new instance of the class.
+
+        Args:
+            schedd_name (str, optional): The name of the schedd. Defaults to None.
+            pool_name (str, optional): The name of the pool. Defaults to None.
+            security_obj (object, optional): The security object. Defaults to None.
+            schedd_lookup_cache (object, optional): The cache object used for schedd lookup.
+            cache (DiskCache, optional): Cache for the job snapshot. Defaults to None, the module `disk_cache`.
+            full_refresh_interval (int, optional): Seconds between full queries. Defaults to 3600.
+            sync_margin (int, optional): Seconds of overlap of the changes queries. Defaults to 60.
+            change_time_attrs (tuple, optional): Job attributes with the time of the changes.
+                Defaults to None, `CHANGE_TIME_ATTRS`.
+        """
+        CondorQ.__init__(self, schedd_name, pool_name, security_obj, schedd_lookup_cache)
+        self.cache = cache
+        self.full_refresh_interval = full_refresh_interval
+        self.sync_margin = sync_margin
+        self.change_time_attrs = change_time_attrs or self.CHANGE_TIME_ATTRS
+        self.last_load_type = None
+        self.last_load_stats = {}
+
+    def get_cache_id(self, constraint=None, format_list=None):
+        """Return the ID of the job snapshot in the cache, different for each schedd, pool and query.
+
+        Args:
+            constraint (str, optional): Query constraint. Defaults to None.
+            format_list (list, optional): Classad attr & type. Defaults to None.
+
+        Returns:
+            str: The cache object ID.
+        """
+        query_hash = hashlib.sha1(repr((constraint, format_list)).encode()).hexdigest()[:16]
+        return f"{self.schedd_name}@{self.pool_name}.condorq.{query_hash}"
+
+    def load(self, constraint=None, format_list=None):
+        """Load the jobs, querying only the changes since the previous load if possible.
+
+        Args:
+            constraint (str, optional): Constraints to be applied to the query. Defaults to None.
+            format_list (list, optional): Classad attr & type. Defaults to None.
+        """
+        if format_list is not None:
+            # ServerTime is needed to sync and it is refreshed in the cached jobs
+            format_list = complete_format_list(format_list, [("ServerTime", "i")])
+        cache = disk_cache if self.cache is None else self.cache
+        cache_id = self.get_cache_id(constraint, format_list)
+        state = cache.get(cache_id)
+        now = time.time()
+        if (
+            state is None
+            or state.get("version") != self.CACHE_VERSION
+            or state["query"] != (constraint, format_list)
+            or now - state["full_time"] >= self.full_refresh_interval
+            or not self._load_delta(constraint, format_list, state)
+        ):
+            self.stored_data = self.fetch(constraint, format_list)
+            self.last_load_type = "full"
+            self.last_load_stats = {"changed": len(self.stored_data), "removed": 0}
+            state = {"version": self.CACHE_VERSION, "query": (constraint, format_list), "full_time": now}
+        state["sync_time"] = max((el.get("ServerTime", 0) for el in self.stored_data.values()), default=0) or int(now)
+        state["data"] = self.stored_data
+        cache.save(cache_id, state)
+
+    def _load_delta(self, constraint, format_list, state):
+        """Update the cached jobs with the changes since the previous sync and store them in self.stored_data.
+
+        Args:
+            constraint (str): Query constraint.
+            format_list (list): Classad attr & type.
+            state (dict): The cached state, with the previous jobs ("data") and "sync_time".
+
+        Returns:
+            bool: True if the jobs have been updated, False if a full query is needed.
+        """
+        since = state["sync_time"] - self.sync_margin
+        changed_constraint = " || ".join(f"({attr} >= {since})" for attr in self.change_time_attrs)
+        if constraint is not None:
+            changed_constraint = f"({constraint}) && ({changed_constraint})"
+        job_ids = self.fetch(constraint, [("ServerTime", "i")])
+        changed = self.fetch(changed_constraint, format_list)
+        cached = state["data"]
+        new_data = {} if not self.compact_classads else CompactClassadDict()
+        for job_id, id_el in job_ids.items():
+            el = changed.get(job_id)
+            if el is None:
+                el = cached.get(job_id)
+                if el is None:
+                    # in the queue but neither changed nor cached (e.g. matching after an attribute change)
+                    return False
+                if "ServerTime" in id_el:
+                    el["ServerTime"] = id_el["ServerTime"]
+            new_data[job_id] = el
+        # jobs in the queue after the IDs query
+        for job_id, el in changed.items():
+            if job_id not in new_data:
+                new_data[job_id] = el
+        self.stored_data = new_data
+        self.last_load_type = "delta"
+        self.last_load_stats = {"changed": len(changed), "removed": len(set(cached) - set(new_data))}
+        return True
+
+
 class CondorStatus(CondorQuery):
     """Class to implement the condor_status command. Uses htcondor-python bindings if possible."""
 
@@ -809,6 +1032,9 @@ class CondorStatus(CondorQuery):
         attrs = bindings_friendly_attrs(format_list)
 
         adtype = resource_str_to_py_adtype(self.resource_str)
+        # the security settings are set in os.environ and the configuration is process wide,
+        # the queries running in concurrent threads (QueryOrchestrator) must not overlap
+        _htcondor_security_lock.acquire()
         self.security_obj.save_state()
         try:
             self.security_obj.enforce_requests()
@@ -819,7 +1045,7 @@ class CondorStatus(CondorQuery):
                 collector = htcondor.Collector()
 
             results = collector.query(adtype, constraint, attrs)
-            results_dict = list2dict(results, self.group_attribute)
+            results_dict = list2dict(results, self.group_attribute, self.new_schema(format_list))
         except Exception as ex:
             p = "default"
             if self.pool_name is not None:
@@ -828,10 +1054,136 @@ class CondorStatus(CondorQuery):
             raise PBError(err_str) from ex
         finally:
             self.security_obj.restore_state()
+            _htcondor_security_lock.release()
 
         return results_dict
 
 
+#
+# Concurrent queries
+#
+
+
+class QueryOrchestrator:
+    """Run multiple queries (e.g. `CondorQ()` of different schedds and `CondorStatus()`) concurrently.
+
+    Each query is loaded in a thread of a pool, so the time is the one of the slowest query instead of the sum.
+    Each query has its own deadline (timeout since the start of `run()`): the queries completed in time are
+    returned, the others are reported in `timed_out` and their results are discarded.
+    The command of a late query is killed (`CondorQuery.cancel()`). A bindings call cannot be interrupted,
+    it continues in background until it returns, so use the orchestrator in a process that ends or moves on
+    (e.g. a forked child).
+    NOTE: the security settings (`condorSecurity`) of the command queries are passed in the environment
+          of each command. The bindings queries set them in the process environment and run one at a time.
+
+    Attributes:
+        max_workers (int): Maximum number of concurrent queries. None for one thread per query.
+        timeout (float): Default timeout in seconds for the queries. None or 0 for no timeout.
+        queries (dict): Key -> (query, constraint, format_list, timeout) of the queries added.
+        results (dict): Key -> loaded query, for the queries completed successfully.
+        timed_out (list): Keys of the queries that did not complete in time.
+        failed (dict): Key -> exception, for the queries that raised an exception.
+        latency (dict): Key -> time in seconds to load the query (the timeout for the timed out ones).
+    """
+
+    def __init__(self, max_workers=None, timeout=None):
+        """Constructor.
+
+        Args:
+            max_workers (int, optional): Maximum number of concurrent queries. Defaults to None, all concurrent.
+            timeout (float, optional): Default timeout in seconds. Defaults to None, no timeout.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.queries = {}
+        self.results = {}
+        self.timed_out = []
+        self.failed = {}
+        self.latency = {}
+
+    def add_query(self, key, query, constraint=None, format_list=None, timeout=None):
+        """Add a query to run.
+
+        Args:
+            key: Key identifying the query in the results, e.g. the schedd name.
+            query (CondorQuery): The query to load.
+            constraint (str, optional): Query constraint. Defaults to None.
+            format_list (list, optional): Classad attr & type. Defaults to None.
+            timeout (float, optional): Timeout in seconds for this query. Defaults to None, the default timeout.
+        """
+        self.queries[key] = (query, constraint, format_list, timeout)
+
+    def _load(self, key):
+        """Load a query, in a worker thread.
+
+        Args:
+            key: Key of the query.
+
+        Returns:
+            float: Time in seconds to load the query.
+        """
+        query, constraint, format_list, _ = self.queries[key]
+        t_begin = time.time()
+        query.load(constraint, format_list)
+        return time.time() - t_begin
+
+    def run(self):
+        """Run all the queries and wait for them to complete or time out.
+
+        Returns:
+            dict: Key -> loaded query, for the queries completed successfully in time (also in `self.results`).
+        """
+        self.results = {}
+        self.timed_out = []
+        self.failed = {}
+        self.latency = {}
+        if not self.queries:
+            return self.results
+        max_workers = self.max_workers or len(self.queries)
+        executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="condor_query")
+        t_begin = time.time()
+        deadlines = {}
+        future_keys = {}
+        pending = set()
+        for key, (query, _, _, timeout) in self.queries.items():
+            if isinstance(query, CondorQuery):
+                query.cancelled = False
+            future = executor.submit(self._load, key)
+            future_keys[future] = key
+            if timeout is None:
+                timeout = self.timeout
+            deadlines[future] = t_begin + timeout if timeout else None
+            pending.add(future)
+        try:
+            while pending:
+                next_deadlines = [deadlines[f] for f in pending if deadlines[f] is not None]
+                wait_time = max(0, min(next_deadlines) - time.time()) if next_deadlines else None
+                done, pending = futures.wait(pending, timeout=wait_time, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    key = future_keys[future]
+                    try:
+                        self.latency[key] = future.result()
+                        self.results[key] = self.queries[key][0]
+                    except Exception as e:
+                        self.latency[key] = time.time() - t_begin
+                        self.failed[key] = e
+                now = time.time()
+                for future in [f for f in pending if deadlines[f] is not None and deadlines[f] <= now]:
+                    # the command of a running query is killed, the result will be discarded
+                    query = self.queries[future_keys[future]][0]
+                    if not future.cancel() and isinstance(query, CondorQuery):
+                        query.cancel()
+                    pending.discard(future)
+                    self.timed_out.append(future_keys[future])
+                    self.latency[future_keys[future]] = deadlines[future] - t_begin
+        finally:
+            # the queries not started yet are dropped (shutdown cancel_futures is available only from Python 3.9)
+            for future in future_keys:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return self.results
+
+
 #
 # Subquery classes
 #
@@ -1051,6 +1403,365 @@ class Summarize:
             return hash_func
 
 
+class IndexedView(StoredQuery):
+    """Read only query returning a part of the data already loaded by other queries.
+
+    Used for the views returned by `QueryIndex`. It behaves like a loaded `SubQuery()`.
+    """
+
+    def __init__(self, stored_data):
+        """Constructor.
+
+        Args:
+            stored_data (dict): The classads of the view, keyed like the original query.
+        """
+        self.stored_data = stored_data
+
+    def fetch(self, constraint=None, format_list=None):
+        """Return the stored data. There is no query to run.
+
+        Args:
+            constraint (function, optional): A boolean function, with only one argument (data el). Defaults to None.
+            format_list (list, optional): Ignored, here for compatibility with the other queries.
+
+        Returns:
+            dict: The stored data, limited to `constraint(el)==True`.
+        """
+        return self.fetchStored(constraint)
+
+    def load(self, constraint=None, format_list=None):
+        """Nothing to do, the data is loaded when the view is created."""
+        pass
+
+
+class QueryIndex:
+    """Hash index on the stored data of a set of queries (e.g. the condorStatus of multiple collectors).
+
+    The index is built with a single pass on all the classads, so it is meant to be built once
+    per cycle and then used for many lookups, instead of running a `SubQuery()` on all the data for each lookup.
+    Each classad is grouped by the keys returned by `key_func`. For each key the index stores
+    the counters in `counter_funcs`. The views for a key and a state are built the first time they are
+    requested, filtering only the classads of that key, and cached.
+
+    Attributes:
+        queries (dict): Queries to index, e.g. collector name -> condorStatus.
+        key_func (function): Key extraction function. One argument: classad dictionary.
+                             Returns the key: if None, the element is not indexed; if a list, all elements are used.
+        state_funcs (dict): State name -> boolean function with one argument (classad dictionary).
+        counter_funcs (dict): Counter name -> (state name, value function).
+                              The value function has one argument (classad dictionary) and returns a number.
+                              The counter is the sum of the values of all the classads in that state.
+                              A state of None means all the classads of the key.
+    """
+
+    def __init__(self, queries, key_func, state_funcs=None, counter_funcs=None):
+        """Constructor. Call `load()` to build the index.
+
+        Args:
+            queries (dict): Queries to index (name -> loaded query).
+            key_func (function): Key extraction function.
+            state_funcs (dict, optional): State name -> boolean function. Defaults to no states.
+            counter_funcs (dict, optional): Counter name -> (state name, value function). Defaults to no counters.
+        """
+        self.queries = queries
+        self.key_func = key_func
+        self.state_funcs = state_funcs or {}
+        self.counter_funcs = counter_funcs or {}
+        self.index = {}
+        self.counters = {}
+        self.views = {}
+
+    def load(self):
+        """Build the index from the stored data of the queries. Replaces any previous content."""
+        index = {}
+        counters = {}
+        # state name -> list of (counter name, value function)
+        state_counters = {}
+        for counter_name, (state, value_func) in self.counter_funcs.items():
+            state_counters.setdefault(state, []).append((counter_name, value_func))
+        stateless_counters = state_counters.pop(None, [])
+        state_checks = [(self.state_funcs[state], state_counters[state]) for state in state_counters]
+        key_func = self.key_func
+        for query_name, query in self.queries.items():
+            for el_name, el in query.fetchStored().items():
+                keys = key_func(el)
+                if keys is None:
+                    continue
+                if not isinstance(keys, list):
+                    keys = [keys]
+                # evaluate each state once per classad, not once per key
+                values = [(counter_name, value_func(el)) for counter_name, value_func in stateless_counters]
+                for state_func, counter_list in state_checks:
+                    if state_func(el):
+                        values.extend((counter_name, value_func(el)) for counter_name, value_func in counter_list)
+                for key in keys:
+                    index.setdefault(key, {}).setdefault(query_name, {})[el_name] = el
+                    key_counters = counters.get(key)
+                    if key_counters is None:
+                        key_counters = counters[key] = dict.fromkeys(self.counter_funcs, 0)
+                    for counter_name, value in values:
+                        key_counters[counter_name] += value
+        self.index = index
+        self.counters = counters
+        self.views = {}
+
+    def keys(self):
+        """Return the list of keys in the index.
+
+        Returns:
+            list: All the keys with at least one classad.
+        """
+        return list(self.index.keys())
+
+    def count(self, key, counter_name):
+        """Return a counter for a key.
+
+        Args:
+            key: The index key.
+            counter_name (str): One of the counters in `counter_funcs`.
+
+        Returns:
+            int|float: The value of the counter, 0 if there are no classads for the key.
+
+        Raises:
+            KeyError: If `counter_name` is not a known counter.
+        """
+        if counter_name not in self.counter_funcs:
+            raise KeyError(f"Unknown counter {counter_name}")
+        try:
+            return self.counters[key][counter_name]
+        except KeyError:
+            return 0
+
+    def getView(self, key, state=None):
+        """Return the classads of a key and state, in the same format of the indexed queries.
+
+        Args:
+            key: The index key.
+            state (str, optional): One of the states in `state_funcs`. Defaults to None, all the classads of the key.
+
+        Returns:
+            dict: Query name -> `IndexedView()` with the matching classads. All the queries are in the dictionary.
+
+        Raises:
+            KeyError: If `state` is not None and not a known state.
+        """
+        view_key = (key, state)
+        out = self.views.get(view_key)
+        if out is None:
+            state_func = None if state is None else self.state_funcs[state]
+            key_data = self.index.get(key, {})
+            out = {
+                query_name: IndexedView(applyConstraint(key_data.get(query_name, {}), state_func))
+                for query_name in self.queries
+            }
+            self.views[view_key] = out
+        return out
+
+
+#
+# Compact classads
+#
+
+
+class _Missing:
+    """Type of the marker of the attributes not defined in a CompactClassad."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<missing>"
+
+    def __reduce__(self):
+        # pickled by reference, the marker is a singleton also after unpickling
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+class ClassadSchema:
+    """Attribute names shared by the `CompactClassad` records of a query result.
+
+    The names are stored only once, also when the records are pickled together (pickle keeps
+    a single copy of the shared schema), and each record has only the values.
+    Names are added when a record defines a new attribute, so the schema can grow while parsing
+    queries without a format list.
+
+    Attributes:
+        names (list): Attribute names, in the order of the record values.
+        positions (dict): Attribute name -> position in the record values.
+    """
+
+    __slots__ = ("names", "positions")
+
+    def __init__(self, names=()):
+        """Constructor.
+
+        Args:
+            names (iterable, optional): Initial attribute names, e.g. from the format list. Defaults to none.
+        """
+        self.names = []
+        self.positions = {}
+        for name in names:
+            self.position(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __reduce__(self):
+        return (ClassadSchema, (tuple(self.names),))
+
+    def position(self, name):
+        """Return the position of an attribute in the record values, adding it to the schema if needed.
+
+        Args:
+            name (str): Attribute name.
+
+        Returns:
+            int: Position of the attribute.
+        """
+        pos = self.positions.get(name)
+        if pos is None:
+            if type(name) is str:
+                name = sys.intern(name)
+            pos = self.positions[name] = len(self.names)
+            self.names.append(name)
+        return pos
+
+    def new_classad(self, attrs):
+        """Return a `CompactClassad` with this schema and the given attributes.
+
+        Args:
+            attrs (dict): Attribute name -> value.
+
+        Returns:
+            CompactClassad: The new record.
+        """
+        values = [_MISSING] * len(self.names)
+        for name, value in attrs.items():
+            pos = self.position(name)
+            if pos >= len(values):
+                values.extend([_MISSING] * (pos + 1 - len(values)))
+            values[pos] = value
+        return CompactClassad(self, tuple(values))
+
+
+class CompactClassad(MutableMapping):
+    """Classad stored as a tuple of values with the names in a shared `ClassadSchema`.
+
+    It can be used instead of the classad dictionaries in the query results: it supports item access,
+    `get`, `in`, iteration, `keys`/`items`/`values` and comparison with dictionaries.
+    Setting a new attribute adds it to the shared schema (the other records will not have it).
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema, values=()):
+        """Constructor.
+
+        Args:
+            schema (ClassadSchema): Shared schema.
+            values (tuple, optional): Values in the order of the schema names. `_MISSING` marks the attributes
+                not in this classad, values after the end of the tuple are missing as well. Defaults to empty.
+        """
+        self._schema = schema
+        self._values = values
+
+    def __reduce__(self):
+        return (CompactClassad, (self._schema, self._values))
+
+    def __getitem__(self, name):
+        pos = self._schema.positions.get(name)
+        if pos is not None and pos < len(self._values):
+            value = self._values[pos]
+            if value is not _MISSING:
+                return value
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        pos = self._schema.positions.get(name)
+        if pos is not None and pos < len(self._values):
+            value = self._values[pos]
+            if value is not _MISSING:
+                return value
+        return default
+
+    def __contains__(self, name):
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __setitem__(self, name, value):
+        pos = self._schema.position(name)
+        values = list(self._values)
+        if pos >= len(values):
+            values.extend([_MISSING] * (pos + 1 - len(values)))
+        values[pos] = value
+        self._values = tuple(values)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        values = list(self._values)
+        values[self._schema.positions[name]] = _MISSING
+        self._values = tuple(values)
+
+    def __iter__(self):
+        for name, value in zip(self._schema.names, self._values):
+            if value is not _MISSING:
+                yield name
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def copy(self):
+        """Return a shallow copy, with the same schema.
+
+        Returns:
+            CompactClassad: The copy.
+        """
+        return CompactClassad(self._schema, self._values)
+
+
+def _rebuild_compact_classads(schema, keys, values):
+    """Unpickle a CompactClassadDict pickled by columns.
+
+    Args:
+        schema (ClassadSchema): Schema of all the records.
+        keys (list): Keys of the dictionary.
+        values (list): Values tuples of the records, in the same order of the keys.
+
+    Returns:
+        CompactClassadDict: The dictionary of records.
+    """
+    out = CompactClassadDict()
+    out.update(zip(keys, [CompactClassad(schema, el) for el in values]))
+    return out
+
+
+class CompactClassadDict(dict):
+    """Dictionary of `CompactClassad` records, e.g. the result of a query with compact classads.
+
+    When all the records have the same schema it is pickled by columns (the schema, the keys and the
+    values tuples), faster than pickling each record.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        schema = None
+        for el in self.values():
+            if type(el) is not CompactClassad or (schema is not None and el._schema is not schema):
+                # mixed content, pickle each value
+                return (CompactClassadDict, (dict(self),))
+            schema = el._schema
+        if schema is None:
+            return (CompactClassadDict, ())
+        return (_rebuild_compact_classads, (schema, list(self.keys()), [el._values for el in self.values()]))
+
+
 ############################################################
 #
 # P R I V A T E, do not use
@@ -1107,191 +1818,230 @@ def complete_format_list(in_format_list, req_format_els):
 #
 
 
-# 3 xml2list XML handler functions
-def xml2list_start_element(name, attrs):
-    """XML handler function called when starting an XML element.
+class ClassadXMLParser:
+    """Re-entrant incremental parser of the HTCondor XML classads format.
 
-    Args:
-        name (str): The name of the XML element.
-        attrs (dict): The attributes of the XML element.
+    The data is fed to expat in chunks, as it is received (e.g. from the pipe of a condor command),
+    and the classads are returned as dictionaries as soon as they are complete.
+    Attribute names are interned, to share the keys of the many similar classads.
 
-    Raises:
-        TypeError: If the XML element type is not supported.
+    Anything before the line starting with the XML header is skipped.
+    Line breaks are parsed as spaces, like in the lines joined by `xml2list`,
+    and \\" in string values is converted into ".
     """
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-    if name == "c":
-        xml2list_inclassad = {}
-    elif name == "a":
-        xml2list_inattr = {"name": attrs["n"], "val": ""}
-        xml2list_intype = "s"
-    elif name == "i":
-        xml2list_intype = "i"
-    elif name == "r":
-        xml2list_intype = "r"
-    elif name == "b":
-        xml2list_intype = "b"
-        if "v" in attrs:
-            xml2list_inattr["val"] = attrs["v"] in ("T", "t", "1")  # pylint: disable=unsupported-assignment-operation
+
+    # Lines joined in a single Parse call by feed_lines
+    LINES_BATCH = 1024
+
+    def __init__(self):
+        """Initialize the parser state. A new parser should be used for each XML document."""
+        self._parser = None
+        self._pending = None  # data received before the XML header
+        self._classads = []  # completed classads, not consumed yet
+        self._inclassad = None
+        self._attr_name = None
+        self._attr_type = None
+        self._attr_val = None
+        self._attr_text = None  # list of text fragments of the current value, None if not collecting
+
+    def _start_parser(self):
+        p = xml.parsers.expat.ParserCreate()
+        p.buffer_text = True
+        p.StartElementHandler = self._start_element
+        p.EndElementHandler = self._end_element
+        p.CharacterDataHandler = self._char_data
+        self._parser = p
+
+    def _parse(self, data, final=False):
+        try:
+            self._parser.Parse(data, final)
+        except TypeError as e:
+            raise RuntimeError("Failed to parse XML data, TypeError: %s" % e) from e
+        except Exception as e:
+            raise RuntimeError("Failed to parse XML data, generic error") from e
+
+    def feed(self, data):
+        """Parse a chunk of the condor command output.
+
+        Args:
+            data (str|bytes): Next chunk of the output. All chunks must be of the same type.
+
+        Returns:
+            list: Classads completed so far and not yet returned by `pop_classads`
+        """
+        if isinstance(data, str):
+            newline, space, header = "\n", " ", "<?xml"
         else:
-            # extended syntax... value in text area
-            xml2list_inattr["val"] = None  # pylint: disable=unsupported-assignment-operation
-    elif name == "un":
-        xml2list_intype = "un"
-        xml2list_inattr["val"] = None  # pylint: disable=unsupported-assignment-operation
-    elif name in ("s", "e"):
-        pass  # nothing to do
-    elif name == "classads":
-        pass  # top element, nothing to do
-    else:
-        raise TypeError("Unsupported type: %s" % name)
+            newline, space, header = b"\n", b" ", b"<?xml"
+        if self._parser is None:
+            # look for the xml header at the beginning of a line
+            if self._pending:
+                data = self._pending + data
+            self._pending = None
+            found_xml = data.find(header)
+            while found_xml > 0 and data[found_xml - 1 : found_xml] != newline:
+                found_xml = data.find(header, found_xml + 1)
+            if found_xml < 0:
+                # keep only the last line, the only one that can still start with the header
+                self._pending = data[data.rfind(newline) + 1 :]
+                return []
+            self._start_parser()
+            data = data[found_xml:]
+        self._parse(data.replace(newline, space))
+        return self._classads
+
+    def feed_lines(self, lines):
+        """Parse the condor command output provided as list of lines (like the one returned by condorExe.exe_cmd).
+
+        Lines are joined with spaces and parsed in batches starting from the one with the XML header.
 
+        Args:
+            lines (list): List of str with the lines of the output
+        """
+        found_xml = -1
+        if self._parser is None:
+            for i in range(len(lines)):
+                if lines[i][:5] == "<?xml":
+                    found_xml = i
+                    self._start_parser()
+                    break
+            if found_xml < 0:
+                # no xml
+                return
+        else:
+            found_xml = 0
+        for i in range(found_xml, len(lines), self.LINES_BATCH):
+            self._parse(" ".join(lines[i : i + self.LINES_BATCH]) + " ")
 
-def xml2list_end_element(name):
-    """XML handler function called when encountering the end of an XML element.
+    def close(self):
+        """Finish parsing the document. Incomplete XML raises an error.
 
-    Args:
-        name (str): The name of the XML element.
+        Raises:
+            RuntimeError: If the XML data is not valid
+        """
+        if self._parser is not None:
+            self._parse("", True)
+            self._parser = None
 
-    Global Variables:
-        xml2list_data (list): A list containing parsed classad dictionaries.
-        xml2list_inclassad (dict): The current classad dictionary being parsed.
-        xml2list_inattr (dict): The current attribute dictionary within the classad being parsed.
-        xml2list_intype (str): The data type of the current attribute value ('i' for integer, 'r' for float,
-                               'b' for boolean, 'un' for unknown type).
+    def pop_classads(self):
+        """Return the classads completed so far and not yet returned.
 
-    Raises:
-        TypeError: If an unexpected XML element type is encountered.
-
-    Notes:
-        - If the XML element is 'c' (classad), appends the current classad dictionary to xml2list_data.
-        - If the XML element is 'a' (attribute), adds the attribute to the current classad dictionary.
-        - Resets xml2list_intype to 's' (string) if the XML element is one of 'i', 'b', 'un', or 'r'.
-        - Handles cases where the XML element name is 's' (string), 'e' (end), or 'classads' by passing silently.
-        - Raises a TypeError if an unexpected XML element type is encountered.
-    """
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-    # Would like to reset, but the following would be resetting global variables and failing ./test_frontend.py
-    # xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype = {}
-
-    if name == "c":
-        xml2list_data.append(xml2list_inclassad)
-        xml2list_inclassad = None
-    elif name == "a":
-        xml2list_inclassad[xml2list_inattr["name"]] = xml2list_inattr["val"]  # pylint: disable=unsubscriptable-object
-        xml2list_inattr = None
-    elif name in ("i", "b", "un", "r"):
-        xml2list_intype = "s"
-    elif name in ("s", "e"):
-        pass  # Nothing to do for string and expression markers
-    elif name == "classads":
-        pass  # Top element, nothing to do
-    else:
-        raise TypeError("Unexpected type: %s" % name)
+        Returns:
+            list: List of dictionaries, one per classad
+        """
+        out = self._classads
+        self._classads = []
+        return out
 
+    def iterparse(self, chunks):
+        """Parse all the chunks of a document and yield the classads one at a time.
 
-def xml2list_char_data(data):
-    """XML handler function called when receiving character data within an XML element.
+        Args:
+            chunks (iterable): Iterable of str or bytes chunks of the XML document
 
-    Args:
-        data (str): The character data received.
-
-    Global Variables:
-        xml2list_data (list): A list containing parsed classad dictionaries.
-        xml2list_inclassad (dict): The current classad dictionary being parsed.
-        xml2list_inattr (dict): The current attribute dictionary within the classad being parsed.
-        xml2list_intype (str): The data type of the current attribute value ('i' for integer, 'r' for float,
-                               'b' for boolean, 'un' for unknown type).
-
-    Notes:
-        - This function updates the xml2list_inattr["val"] with parsed data based on xml2list_intype.
-        - If xml2list_intype is 'b' and xml2list_inattr["val"] is None, it interprets the data as boolean.
-        - Handles unescaped double quotes in the data by replacing '\\"' with '"'.
-    """
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
+        Yields:
+            dict: Classad
+        """
+        for chunk in chunks:
+            self.feed(chunk)
+            yield from self.pop_classads()
+        self.close()
+        yield from self.pop_classads()
 
-    if xml2list_inattr is None:
-        # Only process when inside an attribute
-        return
+    def _start_element(self, name, attrs):
+        """XML handler called when starting an XML element.
 
-    if xml2list_intype == "i":
-        xml2list_inattr["val"] = int(data)
-    elif xml2list_intype == "r":
-        xml2list_inattr["val"] = float(data)
-    elif xml2list_intype == "b":
-        if xml2list_inattr["val"] is not None:
-            # Value was already in attribute, nothing to do
-            pass
+        Raises:
+            TypeError: If the XML element type is not supported.
+        """
+        if name == "a":
+            self._attr_name = sys.intern(attrs["n"])
+            self._attr_type = "s"
+            self._attr_val = None
+            self._attr_text = []
+        elif name == "c":
+            self._inclassad = {}
+        elif name in ("i", "r"):
+            self._attr_type = name
+            self._attr_text = []
+        elif name == "b":
+            self._attr_type = "b"
+            if "v" in attrs:
+                self._attr_val = attrs["v"] in ("T", "t", "1")
+                self._attr_text = None
+            else:
+                # extended syntax... value in text area
+                self._attr_text = []
+        elif name == "un":
+            self._attr_type = "un"
+            self._attr_text = None
+        elif name in ("s", "e", "classads"):
+            pass  # nothing to do for string, expression and top element
         else:
-            # Interpret the first character of data as boolean value
-            xml2list_inattr["val"] = data[0] in ("T", "t", "1")
-    elif xml2list_intype == "un":
-        # Value was already in attribute, nothing to do
-        pass
-    else:
-        # Append unescaped data to the current attribute value
-        unescaped_data = data.replace('\\"', '"')
-        xml2list_inattr["val"] += unescaped_data
+            raise TypeError("Unsupported type: %s" % name)
+
+    def _end_element(self, name):
+        """XML handler called when ending an XML element.
+
+        Raises:
+            TypeError: If an unexpected XML element type is encountered.
+        """
+        if name == "a":
+            if self._attr_type == "s":
+                # string or expression, \\" converted into "
+                self._attr_val = "".join(self._attr_text).replace('\\"', '"')
+            self._inclassad[self._attr_name] = self._attr_val
+            self._attr_name = self._attr_val = self._attr_text = None
+        elif name == "c":
+            self._classads.append(self._inclassad)
+            self._inclassad = None
+        elif name in ("i", "r", "b"):
+            if self._attr_text is not None:
+                text = "".join(self._attr_text)
+                if not text:
+                    # no value, like in the old parser
+                    self._attr_val = "" if name != "b" else None
+                elif name == "i":
+                    self._attr_val = int(text)
+                elif name == "r":
+                    self._attr_val = float(text)
+                else:
+                    self._attr_val = text[0] in ("T", "t", "1")
+            self._attr_type = None
+            self._attr_text = None
+        elif name == "un":
+            self._attr_type = None
+        elif name in ("s", "e", "classads"):
+            pass  # nothing to do for string, expression and top element
+        else:
+            raise TypeError("Unexpected type: %s" % name)
+
+    def _char_data(self, data):
+        """XML handler called when receiving character data. Only the values of the attributes are collected."""
+        if self._attr_text is not None:
+            self._attr_text.append(data)
 
 
 def xml2list(xml_data):
     """Parse XML data representing Condor classads and convert it into a list of dictionaries.
 
-    This function parses the XML data using the Expat parser and extracts classads and their attributes.
-
     Args:
-        xml_data (list of str): The XML data representing Condor classads.
+        xml_data (list of str): The XML data representing Condor classads, as list of lines.
 
     Returns:
         list of dict: A list containing dictionaries, where each dictionary represents a classad.
-
-    Global Variables:
-        xml2list_data (list): A list containing parsed classad dictionaries.
-        xml2list_inclassad (dict): The current classad dictionary being parsed.
-        xml2list_inattr (dict): The current attribute dictionary within the classad being parsed.
-        xml2list_intype (str): The data type of the current attribute value ('i' for integer, 'r' for float,
-                               'b' for boolean, 'un' for unknown type).
+            Empty if there is no XML header.
 
     Raises:
         RuntimeError: If there's an error parsing the XML data.
     """
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-
-    # Initialize global variables
-    xml2list_data = []
-    xml2list_inclassad = None
-    xml2list_inattr = None
-    xml2list_intype = None
-
-    # Create an Expat parser
-    p = xml.parsers.expat.ParserCreate()
-
-    # Set XML handler functions
-    p.StartElementHandler = xml2list_start_element
-    p.EndElementHandler = xml2list_end_element
-    p.CharacterDataHandler = xml2list_char_data
-
-    # Find the position of the XML header
-    found_xml = -1
-    for line in range(len(xml_data)):
-        # Look for the xml header
-        if xml_data[line][:5] == "<?xml":
-            found_xml = line
-            break
-
-    # Parse XML data
-    if found_xml >= 0:
-        try:
-            p.Parse(" ".join(xml_data[found_xml:]), 1)
-        except TypeError as e:
-            raise RuntimeError("Failed to parse XML data, TypeError: %s" % e) from e
-        except Exception as e:
-            raise RuntimeError("Failed to parse XML data, generic error") from e
-    # else no xml, so return an empty list
-
-    return xml2list_data
+    parser = ClassadXMLParser()
+    parser.feed_lines(xml_data)
+    parser.close()
+    return parser.pop_classads()
 
 
-def list2dict(list_data, attr_name):
+def list2dict(list_data, attr_name, schema=None):
     """Convert a list to a dictionary where the keys are tuples with the values of the attributes listed in attr_name.
 
     Original description: Convert a list to a dictionary and group the results based on
@@ -1314,9 +2064,11 @@ def list2dict(list_data, attr_name):
     Args:
         list_data: list of dictionaries to convert.
         attr_name: string (1 attribute) or list or tuple (one or more attributes) with the attributes to use as key.
+        schema (ClassadSchema, optional): if not None, the values are `CompactClassad` records using this schema
+            instead of dictionaries. Defaults to None.
 
     Returns:
-        dict: dictionary of dictionaries.
+        dict: dictionary of dictionaries (CompactClassadDict of CompactClassad if schema is not None).
 
     """
 
@@ -1325,7 +2077,7 @@ def list2dict(list_data, attr_name):
     else:
         attr_list = [attr_name]
 
-    dict_data = {}
+    dict_data = {} if schema is None else CompactClassadDict()
     for list_el in list_data:
         if type(attr_name) in (type([]), type((1, 2))):
             dict_name = []
@@ -1365,6 +2117,8 @@ def list2dict(list_data, attr_name):
                     # Do not fail
                     pass
 
+        if schema is not None:
+            dict_el = schema.new_classad(dict_el)
         dict_data[dict_name] = dict_el
     return dict_data
 
@@ -1379,13 +2133,14 @@ def applyConstraint(data, constraint_func):
                                             If None, return all the data.
 
     Returns:
-        dict: Dictionary with constrained data.
+        dict: Dictionary with constrained data. A CompactClassadDict if data is one.
     """
 
     if constraint_func is None:
         return data
     else:
-        outdata = {}
+        # keep the columnar pickling of compact classads
+        outdata = CompactClassadDict() if isinstance(data, CompactClassadDict) else {}
         for key, val in data.items():
             if constraint_func(val):
                 outdata[key] = val
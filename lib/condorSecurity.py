@@ -225,6 +225,22 @@ class SecEnvRequest:
                         del os.environ[env_key]
         return
 
+    def get_requests_env(self):
+        """Returns the environment enforcing the security requests, without changing os.environ.
+
+        This is the thread safe alternative to `save_state`, `enforce_requests` and `restore_state`
+        for commands run in a subprocess.
+
+        Returns:
+            dict: Environment variables to set in the subprocess, the variables to unset have a None value.
+        """
+        env = {}
+        for context in list(self.requests.keys()):
+            for feature in list(self.requests[context].keys()):
+                val = self.requests[context][feature]
+                env[f"_CONDOR_SEC_{context}_{feature}"] = val if val != UNSET_VALUE else None
+        return env
+
 
 ########################################################################
 #
@@ -441,3 +457,14 @@ class GSIRequest(ProtoRequest):
         ProtoRequest.enforce_requests(self)
         if self.x509_proxy:
             os.environ["X509_USER_PROXY"] = self.x509_proxy
+
+    def get_requests_env(self):
+        """Returns the environment enforcing the security requests, including the X.509 proxy.
+
+        Returns:
+            dict: Environment variables to set in the subprocess, the variables to unset have a None value.
+        """
+        env = ProtoRequest.get_requests_env(self)
+        if self.x509_proxy:
+            env["X509_USER_PROXY"] = self.x509_proxy
+        return env
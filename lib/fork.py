@@ -7,13 +7,19 @@
 #       not needed anymore (currently there is an external structure and the poll object is a new one each time)
 
 import errno
+import mmap
 import os
 import pickle
 import select
+import signal
+import struct
 import subprocess
 import sys
+import tempfile
 import time
 
+from collections import deque
+
 from . import logSupport
 from .pidSupport import register_sighandler, unregister_sighandler
 
@@ -49,11 +55,65 @@ class ForkResultError(ForkError):
 # Low level fork and collect functions
 
 
+# Result channel of fork_in_bg: the child pickles the result into a memory file created by the parent before forking
+# and writes on the pipe only a header with magic, size of the result and serialization time
+_RESULT_HEADER = struct.Struct("!8sQd")
+_RESULT_MAGIC = b"GWMSRES1"
+# Memory files of the running children, by read end of the pipe
+_result_files = {}
+
+
+def _create_result_file():
+    """Create an anonymous file to receive the result of a child.
+
+    A memfd is used if available (Linux), otherwise an unlinked temporary file.
+
+    Returns:
+        int: File descriptor, None if it was not possible to create the file (the pipe is used for the result).
+    """
+    try:
+        return os.memfd_create("glideinwms_fork_result", os.MFD_CLOEXEC)
+    except (AttributeError, OSError):
+        pass
+    try:
+        fd, fname = tempfile.mkstemp(prefix="glideinwms_fork_result")
+        os.unlink(fname)
+        return fd
+    except OSError:
+        return None
+
+
+def _load_result_file(fd, size):
+    """Unpickle the result written by a child in the result file, directly from its memory mapping.
+
+    Args:
+        fd (int): File descriptor of the result file.
+        size (int): Size of the pickled result.
+
+    Returns:
+        object: Unpickled object.
+
+    Raises:
+        EOFError: If the result is empty.
+    """
+    if size == 0:
+        raise EOFError("Empty result file")
+    buf = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    try:
+        with memoryview(buf) as view:
+            return pickle.loads(view)
+    finally:
+        buf.close()
+
+
 def fork_in_bg(function_torun, *args):
     """Forks and calls a function with args.
 
     This function returns right away, returning the pid and a pipe to the stdout of the function process
     where the output of the function will be pickled.
+    The output is pickled (highest protocol) in a memory file (memfd) and only its size is written on the pipe,
+    so the parent can unpickle it without copying it. If the memory file is not available the
+    pickled output is written on the pipe.
 
     Example:
         def add(i, j): return i + j
@@ -64,32 +124,48 @@ def fork_in_bg(function_torun, *args):
         *args: Arguments list to pass to the function.
 
     Returns:
-        dict: Dictionary with {'r': fd, 'pid': pid} where fd is the stdout from a pipe.
+        dict: Dictionary with {'r': fd, 'pid': pid, 'stats': {}} where fd is the stdout from a pipe.
+            'stats' is filled when the result is fetched, see `fetch_fork_result`.
     """
     r, w = os.pipe()
+    result_fd = _create_result_file()
     unregister_sighandler()
     pid = os.fork()
     if pid == 0:
         logSupport.disable_rotate = True
         os.close(r)
+        # result files of the other children
+        for fd in _result_files.values():
+            os.close(fd)
+        _result_files.clear()
         try:
             out = function_torun(*args)
-            os.write(w, pickle.dumps(out))
+            t_start = time.time()
+            if result_fd is None:
+                os.write(w, pickle.dumps(out))
+            else:
+                with open(result_fd, "wb", buffering=1024 * 1024, closefd=False) as result_file:
+                    pickle.dump(out, result_file, protocol=pickle.HIGHEST_PROTOCOL)
+                    size = result_file.tell()
+                os.write(w, _RESULT_HEADER.pack(_RESULT_MAGIC, size, time.time() - t_start))
         except Exception:
             logSupport.log.warning(f"Forked process '{function_torun}' failed")
             logSupport.log.exception(f"Forked process '{function_torun}' failed")
         finally:
             os.close(w)
+            logSupport.flush_log_writer()
             # Exit, immediately. Don't want any cleanup, since I was created just for performing the work
             os._exit(0)
     else:
         register_sighandler()
         os.close(w)
+        if result_fd is not None:
+            _result_files[r] = result_fd
 
-    return {"r": r, "pid": pid}
+    return {"r": r, "pid": pid, "stats": {}}
 
 
-def fetch_fork_result(r, pid):
+def fetch_fork_result(r, pid, stats=None):
     """Used with fork clients to retrieve results.
 
     Can raise OSError and FetchError.
@@ -99,9 +175,15 @@ def fetch_fork_result(r, pid):
       - OSError other system-related error (includes both former OSError and IOError since Py3.4).
       - pickle.UnpicklingError incomplete pickled data.
 
+    The result is unpickled from the memory file of the child (see `fork_in_bg`), or from the pipe
+    for children writing the pickled result on the pipe.
+
     Args:
         r (int): Input pipe.
         pid (int): PID of the child.
+        stats (dict): If provided, filled with the size in bytes of the pickled result (`bytes`),
+            the time spent by the child serializing it (`serialize_time`, None if not known),
+            and the time spent by the parent reading and unpickling it (`fetch_time`).
 
     Returns:
         object: Unpickled object.
@@ -114,17 +196,31 @@ def fetch_fork_result(r, pid):
         OSError: Other system-related error (includes both former OSError and IOError since Py3.4).
         pickle.UnpicklingError: Incomplete pickled data.
     """
-    r_in = b""
+    chunks = []
     out = None
+    result_fd = _result_files.pop(r, None)
     try:
+        t_start = time.time()
         s = os.read(r, 1024 * 1024)
         while s != b"":  # "" means EOF
-            r_in += s
+            chunks.append(s)
             s = os.read(r, 1024 * 1024)
-        # pickle can fail w/ EOFError if r_in is empty.
-        # Any output from pickle is never an empty string, e.g. None is 'N.'
-        out = pickle.loads(r_in)
-    except (OSError, EOFError, pickle.UnpicklingError) as err:
+        r_in = b"".join(chunks)
+        del chunks
+        if result_fd is not None and len(r_in) == _RESULT_HEADER.size and r_in[: len(_RESULT_MAGIC)] == _RESULT_MAGIC:
+            _, size, serialize_time = _RESULT_HEADER.unpack(r_in)
+            out = _load_result_file(result_fd, size)
+        else:
+            # pickle can fail w/ EOFError if r_in is empty.
+            # Any output from pickle is never an empty string, e.g. None is 'N.'
+            size = len(r_in)
+            serialize_time = None
+            out = pickle.loads(r_in)
+        if stats is not None:
+            stats["bytes"] = size
+            stats["serialize_time"] = serialize_time
+            stats["fetch_time"] = time.time() - t_start
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError) as err:
         etype, evalue, etraceback = sys.exc_info()
         # Adding message in case close/waitpid fail and preempt raise
         logSupport.log.exception(f"Re-raising exception during read: {err}")
@@ -134,6 +230,8 @@ def fetch_fork_result(r, pid):
         ) from err
     finally:
         os.close(r)
+        if result_fd is not None:
+            os.close(result_fd)
         os.waitpid(pid, 0)
     return out
 
@@ -156,7 +254,7 @@ def fetch_fork_result_list(pipe_ids):
     for key in pipe_ids:
         try:
             # Collect the results
-            out[key] = fetch_fork_result(pipe_ids[key]["r"], pipe_ids[key]["pid"])
+            out[key] = fetch_fork_result(pipe_ids[key]["r"], pipe_ids[key]["pid"], pipe_ids[key].get("stats"))
         except (KeyError, OSError, FetchError) as err:
             # fetch_fork_result can raise OSError and FetchError
             errmsg = f"Failed to extract info from child '{key}': {err}"
@@ -261,7 +359,7 @@ def fetch_ready_fork_result_list(pipe_ids):
         try:
             key = fds_to_entry[fd]
             pid = pipe_ids[key]["pid"]
-            out = fetch_fork_result(fd, pid)
+            out = fetch_fork_result(fd, pid, pipe_ids[key].get("stats"))
             try:
                 if poll_obj:
                     poll_obj.unregister(fd)  # Is this needed? Lots of hoops to jump through here
@@ -318,16 +416,25 @@ def wait_for_pids(pid_list):
                 s = os.read(r, 1024)
         finally:
             os.close(r)
+            result_fd = _result_files.pop(r, None)
+            if result_fd is not None:
+                os.close(result_fd)
             os.waitpid(pid, 0)
 
 
 class ForkManager:
-    """Manages the forking of processes and the collection of results."""
+    """Manages the forking of processes and the collection of results.
+
+    Attributes:
+        fork_stats (dict): Per-child statistics of the collected results, key -> dict with
+            bytes (size of the pickled result), serialize_time (in the child) and fetch_time (in the parent).
+    """
 
     def __init__(self):
         self.functions_tofork = {}
         # Needs a separate list to keep the order
         self.key_list = []
+        self.fork_stats = {}
 
     def __len__(self):
         return len(self.functions_tofork)
@@ -364,7 +471,11 @@ class ForkManager:
         pipe_ids = {}
         for key in self.key_list:
             pipe_ids[key] = fork_in_bg(*self.functions_tofork[key])
-        results = fetch_fork_result_list(pipe_ids)
+            self.fork_stats[key] = pipe_ids[key]["stats"]
+        try:
+            results = fetch_fork_result_list(pipe_ids)
+        finally:
+            self.log_fork_stats()
         return results
 
     def bounded_fork_and_collect(self, max_forks, log_progress=True, sleep_time=0.01):
@@ -424,6 +535,7 @@ class ForkManager:
 
             # Yes, we can fork, do it
             pipe_ids[key] = fork_in_bg(*self.functions_tofork[key])
+            self.fork_stats[key] = pipe_ids[key]["stats"]
             forks_remaining -= 1
         # end for
 
@@ -462,11 +574,451 @@ class ForkManager:
                 )
         # end while
 
+        self.log_fork_stats()
         if nr_errors > 0:
             raise ForkResultError(nr_errors, post_work_info)
 
         return post_work_info
 
+    def log_fork_stats(self):
+        """Log at debug level the size and serialization time of the results of the children."""
+        for key, stats in self.fork_stats.items():
+            if stats:
+                logSupport.log.debug(
+                    "Fork %s: result of %s bytes, serialization %s, fetch %.3fs"
+                    % (
+                        key,
+                        stats["bytes"],
+                        "n/a" if stats["serialize_time"] is None else "%.3fs" % stats["serialize_time"],
+                        stats["fetch_time"],
+                    )
+                )
+
+
+################################################
+# Persistent worker pool
+
+
+# Out-of-band buffers need pickle protocol 5 (Python 3.8+)
+PICKLE_OUT_OF_BAND = pickle.HIGHEST_PROTOCOL >= 5
+
+
+def _pickle_frame(obj):
+    """Pickle an object (protocol 5) and return the raw buffers of the frame to send.
+
+    The frame is: number of buffers (4 bytes), length of each buffer (8 bytes each), then the buffers:
+    the pickle data followed by the out-of-band buffers, that are not copied into the pickle data.
+    Without protocol 5 (`PICKLE_OUT_OF_BAND` False) the highest protocol is used and the frame has only
+    the pickle data.
+
+    Args:
+        obj: Object to pickle.
+
+    Returns:
+        list: List of bytes-like objects.
+    """
+    buffers = []
+    if PICKLE_OUT_OF_BAND:
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    else:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    raws = [memoryview(data)] + [buf.raw() for buf in buffers]
+    header = struct.pack("!I%dQ" % len(raws), len(raws), *[raw.nbytes for raw in raws])
+    return [header] + raws
+
+
+def _write_frame(fd, raws):
+    """Write all the buffers of a frame to a file descriptor.
+
+    Args:
+        fd (int): File descriptor.
+        raws (list): List of bytes-like objects, from `_pickle_frame`.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    total = 0
+    for raw in raws:
+        view = memoryview(raw).cast("B")
+        total += view.nbytes
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    return total
+
+
+def _read_exact(fd, size):
+    """Read exactly `size` bytes from a file descriptor into a new bytearray, without intermediate copies.
+
+    Args:
+        fd (int): File descriptor.
+        size (int): Number of bytes to read.
+
+    Returns:
+        bytearray: The data.
+
+    Raises:
+        EOFError: If the file is closed before `size` bytes are read.
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        nread = os.readv(fd, [view[pos:]])
+        if nread == 0:
+            raise EOFError(f"Unexpected EOF after {pos} of {size} bytes")
+        pos += nread
+    return buf
+
+
+def _read_frame(fd):
+    """Read a frame written by `_write_frame` and unpickle it.
+
+    Args:
+        fd (int): File descriptor.
+
+    Returns:
+        tuple: (object, number of bytes read)
+    """
+    (nr_buffers,) = struct.unpack("!I", _read_exact(fd, 4))
+    lengths = struct.unpack("!%dQ" % nr_buffers, _read_exact(fd, 8 * nr_buffers))
+    data = _read_exact(fd, lengths[0])
+    if nr_buffers == 1:
+        obj = pickle.loads(data)
+    else:
+        obj = pickle.loads(data, buffers=[_read_exact(fd, length) for length in lengths[1:]])
+    return obj, 4 + 8 * nr_buffers + sum(lengths)
+
+
+def _worker_loop(task_r, result_w, recycle_after):
+    """Main loop of a WorkerPool worker: read tasks, run them and write back the results.
+
+    For each task 2 frames are written: the task information (key, success, run time, serialization time,
+    retiring) and the result.
+    The loop ends when the pipe is closed, a None task is received, or after `recycle_after` tasks.
+
+    Args:
+        task_r (int): Pipe to read the tasks from.
+        result_w (int): Pipe to write the results to.
+        recycle_after (int): Number of tasks after which the worker exits. 0 to never exit.
+    """
+    nr_tasks = 0
+    while True:
+        try:
+            task, _ = _read_frame(task_r)
+        except EOFError:
+            break
+        if task is None:
+            break
+        key, function_torun, args = task
+        nr_tasks += 1
+        retire = 0 < recycle_after <= nr_tasks
+        t_start = time.time()
+        try:
+            out = function_torun(*args)
+            success = True
+        except Exception:
+            logSupport.log.warning(f"Worker task '{key}' ('{function_torun}') failed")
+            logSupport.log.exception(f"Worker task '{key}' ('{function_torun}') failed")
+            out = None
+            success = False
+        run_time = time.time() - t_start
+        try:
+            out_frame = _pickle_frame(out)
+        except Exception:
+            logSupport.log.exception(
+                f"Worker task '{key}' ('{function_torun}') returned a result that cannot be pickled"
+            )
+            out_frame = _pickle_frame(None)
+            success = False
+        serialize_time = time.time() - t_start - run_time
+        _write_frame(result_w, _pickle_frame((key, success, run_time, serialize_time, retire)))
+        _write_frame(result_w, out_frame)
+        del out, out_frame
+        if retire:
+            break
+
+
+class _PoolWorker:
+    """A WorkerPool worker process, with its pipes and current task."""
+
+    def __init__(self, pid, task_w, result_r):
+        self.pid = pid
+        self.task_w = task_w
+        self.result_r = result_r
+        self.key = None
+        self.t_start = None
+
+
+class WorkerPool:
+    """Pool of long-lived forked worker processes, an alternative to ForkManager with the same API.
+
+    ForkManager forks a new process for each task. Workers are forked once and then receive the tasks (function
+    and arguments) pickled through a pipe, so functions and arguments must be picklable (e.g. module level functions)
+    and the workers do not see the changes made in the parent after they were forked.
+    Tasks and results use pickle protocol 5 where available (Python 3.8+): out-of-band buffers (e.g. bytearray,
+    PickleBuffer) are sent separately and received without intermediate copies.
+
+    Workers are replaced after `recycle_after` tasks (0 never), to contain memory leaks, or when they die.
+    Timing of the tasks of the last collection is in `task_stats`.
+
+    Attributes:
+        nr_workers (int): Number of workers.
+        recycle_after (int): Number of tasks after which a worker is replaced, 0 for never.
+        task_stats (dict): Per-task statistics of the last collection, key -> dict with
+            worker (pid), wait_time (in the queue), run_time, serialize_time (in the worker),
+            transfer_time (reading and unpickling in the parent), total_time, result_bytes.
+    """
+
+    def __init__(self, nr_workers, recycle_after=0):
+        """Initialize the pool. Workers are started at the first collection or with `start()`.
+
+        Args:
+            nr_workers (int): Number of workers.
+            recycle_after (int): Number of tasks after which a worker is replaced, 0 for never. Defaults to 0.
+        """
+        if nr_workers < 1:
+            raise ValueError(f"Invalid number of workers: {nr_workers}")
+        self.nr_workers = nr_workers
+        self.recycle_after = recycle_after
+        self.workers = []
+        self.functions_tofork = {}
+        # Needs a separate list to keep the order
+        self.key_list = []
+        self.task_stats = {}
+
+    def __len__(self):
+        return len(self.functions_tofork)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_fork(self, key, function, *args):
+        """Adds a task to be executed by the workers at the next collection.
+
+        Args:
+            key (str): Unique key for the task.
+            function (function): Function to run. Must be picklable.
+            *args: Arguments to be passed to the function. Must be picklable.
+
+        Raises:
+            KeyError: If the key is already in use.
+        """
+        if key in self.functions_tofork:
+            raise KeyError(f"Fork key '{key}' already in use")
+        self.functions_tofork[key] = (function,) + args
+        self.key_list.append(key)
+
+    def start(self):
+        """Start the missing workers."""
+        while len(self.workers) < self.nr_workers:
+            self.workers.append(self._start_worker())
+
+    def close(self):
+        """Stop all the workers. The pool can be restarted later."""
+        workers = self.workers
+        self.workers = []
+        for worker in workers:
+            self._stop_worker(worker)
+
+    def fork_and_wait(self):
+        """Runs all the tasks and waits for them to complete, discarding the results."""
+        try:
+            self.bounded_fork_and_collect(self.nr_workers, log_progress=False)
+        except ForkResultError:
+            pass  # errors are already logged
+
+    def fork_and_collect(self):
+        """Runs all the tasks and collects the results.
+
+        Returns:
+            dict: Dictionary of results.
+
+        Raises:
+            ForkResultError: If there are errors in the tasks.
+        """
+        return self.bounded_fork_and_collect(self.nr_workers, log_progress=False)
+
+    def bounded_fork_and_collect(self, max_forks, log_progress=True, sleep_time=0.01):
+        """Runs all the tasks, with at most max_forks running at the same time, and collects the results.
+
+        The tasks are removed from the pool, which can be reused for new tasks.
+
+        Args:
+            max_forks (int): Maximum number of concurrent tasks, also limited by the number of workers.
+            log_progress (bool): Whether to log progress.
+            sleep_time (float): Not used, results are read as soon as they are ready. For ForkManager compatibility.
+
+        Returns:
+            dict: Dictionary of results.
+
+        Raises:
+            ForkResultError: If there are errors in the tasks.
+        """
+        results = {}
+        failed = []
+        self.task_stats = {}
+        pending = deque(self.key_list)
+        functions_tofork = self.functions_tofork
+        self.functions_tofork = {}
+        self.key_list = []
+        if not pending:
+            return results
+
+        self.start()
+        t_queued = time.time()
+        idle = self.workers[: max(1, min(max_forks, self.nr_workers))]
+        busy = {}
+        poll_obj = select.poll()
+        while pending or busy:
+            while pending and idle:
+                worker = idle.pop()
+                key = pending.popleft()
+                function_and_args = functions_tofork[key]
+                try:
+                    task_frame = _pickle_frame((key, function_and_args[0], function_and_args[1:]))
+                except Exception as err:
+                    logSupport.log.warning(f"Failed to send task '{key}' to the worker, cannot pickle it: {err}")
+                    failed.append(key)
+                    idle.append(worker)
+                    continue
+                try:
+                    _write_frame(worker.task_w, task_frame)
+                except OSError as err:
+                    logSupport.log.warning(f"Failed to send task '{key}' to worker {worker.pid}: {err}")
+                    failed.append(key)
+                    idle.append(self._replace_worker(worker, kill=True))
+                    continue
+                worker.key = key
+                worker.t_start = time.time()
+                busy[worker.result_r] = worker
+                poll_obj.register(worker.result_r, select.POLLIN | select.POLLHUP | select.POLLERR)
+
+            for fd, _ in poll_obj.poll():
+                worker = busy.pop(fd)
+                poll_obj.unregister(fd)
+                key = worker.key
+                try:
+                    t_read = time.time()
+                    (_, success, run_time, serialize_time, retire), _ = _read_frame(fd)
+                    out, result_bytes = _read_frame(fd)
+                    t_done = time.time()
+                except (OSError, EOFError, pickle.UnpicklingError, struct.error) as err:
+                    errmsg = f"Failed to extract info from worker {worker.pid} for task '{key}': {err}"
+                    logSupport.log.warning(errmsg)
+                    failed.append(key)
+                    idle.append(self._replace_worker(worker, kill=True))
+                    continue
+                self.task_stats[key] = {
+                    "worker": worker.pid,
+                    "wait_time": worker.t_start - t_queued,
+                    "run_time": run_time,
+                    "serialize_time": serialize_time,
+                    "transfer_time": t_done - t_read,
+                    "total_time": t_done - worker.t_start,
+                    "result_bytes": result_bytes,
+                }
+                if success:
+                    results[key] = out
+                else:
+                    failed.append(key)
+                worker.key = None
+                if retire:
+                    idle.append(self._replace_worker(worker))
+                else:
+                    idle.append(worker)
+                if log_progress:
+                    logSupport.log.info(f"Active forks = {len(busy)}, Forks to finish = {len(pending) + len(busy)}")
+
+        for key, stats in self.task_stats.items():
+            logSupport.log.debug(
+                "Task %s: worker %s, wait %.3fs, run %.3fs, serialize %.3fs, transfer %.3fs, %s bytes"
+                % (
+                    key,
+                    stats["worker"],
+                    stats["wait_time"],
+                    stats["run_time"],
+                    stats["serialize_time"],
+                    stats["transfer_time"],
+                    stats["result_bytes"],
+                )
+            )
+        if failed:
+            raise ForkResultError(len(failed), results, failed=failed)
+        return results
+
+    def _start_worker(self):
+        """Fork a new worker.
+
+        Returns:
+            _PoolWorker: The new worker.
+        """
+        task_r, task_w = os.pipe()
+        result_r, result_w = os.pipe()
+        unregister_sighandler()
+        pid = os.fork()
+        if pid == 0:
+            logSupport.disable_rotate = True
+            os.close(task_w)
+            os.close(result_r)
+            # The pipes of the other workers must be closed, to let them see EOF
+            for worker in self.workers:
+                os.close(worker.task_w)
+                os.close(worker.result_r)
+            try:
+                _worker_loop(task_r, result_w, self.recycle_after)
+            except Exception:
+                logSupport.log.exception("Worker pool process failed")
+            finally:
+                logSupport.flush_log_writer()
+                # Exit, immediately. Don't want any cleanup, since I was created just for performing the work
+                os._exit(0)
+        register_sighandler()
+        os.close(task_r)
+        os.close(result_w)
+        return _PoolWorker(pid, task_w, result_r)
+
+    def _stop_worker(self, worker, kill=False):
+        """Stop a worker: closing the task pipe makes it exit.
+
+        Args:
+            worker (_PoolWorker): The worker to stop.
+            kill (bool): Kill the worker instead of waiting for it to exit. Defaults to False.
+        """
+        for fd in (worker.task_w, worker.result_r):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if kill:
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        try:
+            os.waitpid(worker.pid, 0)
+        except ChildProcessError:
+            pass
+
+    def _replace_worker(self, worker, kill=False):
+        """Stop a worker and start a new one in its place.
+
+        Args:
+            worker (_PoolWorker): The worker to replace.
+            kill (bool): Kill the worker instead of waiting for it to exit. Defaults to False.
+
+        Returns:
+            _PoolWorker: The new worker.
+        """
+        self.workers.remove(worker)
+        self._stop_worker(worker, kill)
+        new_worker = self._start_worker()
+        self.workers.append(new_worker)
+        return new_worker
+
 
 ####################
 # Utilities
@@ -5,10 +5,16 @@
 #   Uses the Python built-in logging to log anything anywhere
 #   and structlog to improve machine parsing
 
+import json
 import logging
 import os
 import re
+import selectors
+import signal
+import socket
+import struct
 import sys  # for alternate_log
+import tempfile
 import time
 
 from logging.handlers import BaseRotatingHandler
@@ -46,6 +52,40 @@ log_dir = None
 disable_rotate = False
 handlers = []
 
+# Address of the log writer process receiving the records of this process (see start_log_writer),
+# None if the process writes its log files
+log_writer_address = None
+# Passes the log writer address to the processes started by the Factory or Frontend
+LOG_WRITER_ENV = "GLIDEINWMS_LOG_WRITER"
+# Length of each message sent to the log writer
+LOG_FRAME_HEADER = struct.Struct("!I")
+# Credentials of the peer of a unix socket (SO_PEERCRED): pid, uid, gid
+PEER_CRED = struct.Struct("3i")
+# The DEBUG records are sent to the log writer in batches of up to LOG_WRITER_BATCH_SIZE bytes, at least
+# every LOG_WRITER_BATCH_TIME seconds. The other records are sent immediately, with the DEBUG ones before them
+LOG_WRITER_BATCH_SIZE = 16384
+LOG_WRITER_BATCH_TIME = 1.0
+# Handlers sending records to the log writer, flushed by flush_log_writer
+log_writer_handlers = []
+# Attributes of the log records sent to the log writer, the message is formatted before sending
+LOG_RECORD_ATTRIBUTES = (
+    "name",
+    "levelno",
+    "levelname",
+    "pathname",
+    "filename",
+    "module",
+    "lineno",
+    "funcName",
+    "created",
+    "msecs",
+    "relativeCreated",
+    "thread",
+    "threadName",
+    "process",
+    "processName",
+)
+
 DEFAULT_FORMATTER = logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s")
 DEBUG_FORMATTER = logging.Formatter("[%(asctime)s] %(levelname)s: %(module)s:%(lineno)d: %(message)s")
 
@@ -101,6 +141,8 @@ class GlideinHandler(BaseRotatingHandler):
         extMatch (re.Pattern): Regex pattern to match the suffix of the rotated files.
         rolloverAt (int): Time of the next time-based rollover in seconds from Epoch. 0 to disable.
         rollover_not_before (int): Earliest time (seconds from Epoch) when size-based rollover can happen.
+        stream_size (int): Size of the log file counted in memory, None if the size is read from the file
+            (see `use_size_counter`).
     """
 
     def __init__(self, filename, maxDays=1.0, minDays=0.0, maxMBytes=10.0, backupCount=5, compression=None):
@@ -135,6 +177,7 @@ class GlideinHandler(BaseRotatingHandler):
             pass
         mode = "a"
         BaseRotatingHandler.__init__(self, filename, mode, encoding=None)
+        self.stream_size = None
         self.backupCount = backupCount
         self.maxBytes = int(maxMBytes * 1024.0 * 1024.0)  # Convert the MB to bytes as needed by the base class
         self.min_lifetime = int(minDays * 24 * 60 * 60)  # Convert min days to seconds
@@ -203,6 +246,9 @@ class GlideinHandler(BaseRotatingHandler):
         if disable_rotate:
             return False
 
+        if self.stream_size is not None:
+            return self.rollover_due(0 if empty_record else len(f"{self.format(record)}\n"))
+
         t = int(time.time())
 
         do_timed_rollover = False
@@ -221,6 +267,49 @@ class GlideinHandler(BaseRotatingHandler):
 
         return do_timed_rollover or do_size_rollover
 
+    def use_size_counter(self):
+        """Count the bytes written in memory and flush only when `flush` is called.
+
+        The size rollover is decided from the counter, without seeking to the end of the file and formatting
+        the records twice. Only for handlers writing alone to their file, as in the log writer process.
+        """
+        self.stream.seek(0, 2)
+        self.stream_size = self.stream.tell()
+
+    def rollover_due(self, msg_len):
+        """Returns True if the time is over or the counted size plus `msg_len` is over the limit.
+
+        Args:
+            msg_len (int): Length of the message to write.
+
+        Returns:
+            bool: True if rollover should be performed, False otherwise.
+        """
+        t = int(time.time())
+        if 0 < self.rolloverAt <= t:  # 0 means that timed rollover is disabled
+            return True
+        return self.maxBytes > 0 and t >= self.rollover_not_before and self.stream_size + msg_len >= self.maxBytes
+
+    def emit(self, record):
+        """Writes a record, rotating the file if needed.
+
+        With the size counter (see `use_size_counter`) the record is formatted once and not flushed.
+
+        Args:
+            record (logging.LogRecord): The record to write.
+        """
+        if self.stream_size is None:
+            BaseRotatingHandler.emit(self, record)
+            return
+        try:
+            msg = f"{self.format(record)}\n"
+            if self.rollover_due(len(msg)):
+                self.doRollover()
+            self.stream.write(msg)
+            self.stream_size += len(msg)
+        except Exception:
+            self.handleError(record)
+
     def getFilesToDelete(self):
         """Gets the list of files that should be deleted during rollover.
 
@@ -278,6 +367,8 @@ class GlideinHandler(BaseRotatingHandler):
         # Open a new log file
         self.mode = "w"
         self.stream = self._open()
+        if self.stream_size is not None:
+            self.stream_size = 0
 
         # determine the next rollover time for the timed rollover check
         currentTime = int(time.time())
@@ -322,6 +413,25 @@ def roll_all_logs():
         handler.check_and_perform_rollover()
 
 
+def get_processlog_file(log_file_name, log_dir, msg_types, extension):
+    """Returns the path of a log file, see `get_processlog_handler`.
+
+    Args:
+        log_file_name (str): Log file name (same as the logger name).
+        log_dir (str|Path): Log directory.
+        msg_types (str): Log levels to include (comma separated list), ADMIN adds the "admin" prefix.
+        extension (str): File name extension.
+
+    Returns:
+        str: The path of the log file.
+    """
+    # Parameter adjustments
+    if "ADMIN" in msg_types.upper():
+        if not log_file_name.endswith("admin"):
+            log_file_name = log_file_name + "admin"
+    return os.path.expandvars(f"{log_dir}/{log_file_name}.{extension.lower()}.log")
+
+
 def get_processlog_handler(
     log_file_name, log_dir, msg_types, extension, maxDays, minDays, maxMBytes, backupCount=5, compression=None
 ):
@@ -347,15 +457,7 @@ def get_processlog_handler(
     Returns:
         GlideinHandler: Configured logging handler.
     """
-    # Parameter adjustments
-    msg_types = msg_types.upper()
-    if "ADMIN" in msg_types:
-        msg_types = "DEBUG,INFO,WARN,ERR"
-        if not log_file_name.endswith("admin"):
-            log_file_name = log_file_name + "admin"
-    if "ALL" in msg_types:
-        msg_types = "DEBUG,INFO,WARN,ERR"
-    logfile = os.path.expandvars(f"{log_dir}/{log_file_name}.{extension.lower()}.log")
+    logfile = get_processlog_file(log_file_name, log_dir, msg_types, extension)
 
     handler = GlideinHandler(logfile, maxDays, minDays, maxMBytes, backupCount, compression)
     handler.setFormatter(DEFAULT_FORMATTER)
@@ -364,7 +466,32 @@ def get_processlog_handler(
     # min level selection.
     # TODO: Check if min level should be used instead and if the handler level should be logging.NOTSET (0) ?
     handler.setLevel(logging.DEBUG)
-    has_debug = False
+    msg_type_list = get_msg_type_list(msg_types)
+
+    if logging.DEBUG in msg_type_list:
+        handler.setFormatter(DEBUG_FORMATTER)
+    else:
+        handler.setFormatter(DEFAULT_FORMATTER)
+
+    handler.addFilter(MsgFilter(msg_type_list))
+
+    handlers.append(handler)
+    return handler
+
+
+def get_msg_type_list(msg_types):
+    """Returns the log levels of a list of message types.
+
+    Args:
+        msg_types (str): Log levels to include (comma separated list). Keywords are:
+            DEBUG,INFO,WARN,ERR, ADMIN or ALL (ADMIN and ALL both mean all the previous)
+
+    Returns:
+        list: The log levels.
+    """
+    msg_types = msg_types.upper()
+    if "ADMIN" in msg_types or "ALL" in msg_types:
+        msg_types = "DEBUG,INFO,WARN,ERR"
     msg_type_list = []
     for msg_type in msg_types.split(","):
         msg_type = msg_type.upper().strip()
@@ -378,17 +505,7 @@ def get_processlog_handler(
             msg_type_list.append(logging.CRITICAL)
         elif msg_type == "DEBUG":
             msg_type_list.append(logging.DEBUG)
-            has_debug = True
-
-    if has_debug:
-        handler.setFormatter(DEBUG_FORMATTER)
-    else:
-        handler.setFormatter(DEFAULT_FORMATTER)
-
-    handler.addFilter(MsgFilter(msg_type_list))
-
-    handlers.append(handler)
-    return handler
+    return msg_type_list
 
 
 class MsgFilter(logging.Filter):
@@ -441,6 +558,353 @@ def format_dict(unformated_dict, log_format="   %-25s : %s\n"):
     return formatted_string
 
 
+def start_log_writer(log_base_dir=None):
+    """Sends the log records of this process, and of the forked children, to a single log writer process.
+
+    The writer is started by the first process calling this, the Factory or Frontend, and its address
+    is passed in the environment to the processes started afterward (Entry groups, Frontend groups), which
+    use the same writer. The loggers created by `get_logger_with_handlers` after this call send the
+    configuration of their log files and their records to the writer. The writer formats and buffers
+    the records, rotates and compresses the log files, and exits after the process that started it.
+    Since it is the only process writing the log files, the children do not need to disable the rotation.
+
+    Args:
+        log_base_dir (str, optional): The writer writes only log files in this directory or its subdirectories.
+            Used only when starting the writer. Defaults to `log_dir`.
+
+    Returns:
+        str: The address of the log writer, the path of its socket.
+    """
+    global log_writer_address
+    if log_writer_address is None:
+        address = os.environ.get(LOG_WRITER_ENV)
+        if not address:
+            address = start_log_writer_process(log_dir if log_base_dir is None else log_base_dir)
+            os.environ[LOG_WRITER_ENV] = address
+        log_writer_address = address
+    return log_writer_address
+
+
+def start_log_writer_process(log_base_dir):
+    """Forks the log writer process.
+
+    The writer listens on a unix socket in a new directory accessible only by the user (mode 0700),
+    and accepts only connections from processes of the same user.
+
+    Args:
+        log_base_dir (str): The writer writes only log files in this directory or its subdirectories.
+
+    Returns:
+        str: The address of the log writer, the path of its socket.
+    """
+    if log_base_dir is None:
+        raise ValueError("The log writer needs the log directory")
+    socket_dir = tempfile.mkdtemp(prefix="glideinwms-log-writer-")
+    address = os.path.join(socket_dir, "writer.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(address)
+    sock.listen(128)
+    pid = os.fork()
+    if pid == 0:
+        # log writer process
+        exit_code = 0
+        try:
+            LogWriter(sock, os.getppid(), log_base_dir).run()
+        except Exception as e:
+            alternate_log(f"Log writer failed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    sock.close()
+    return address
+
+
+def flush_log_writer():
+    """Sends to the log writer the records buffered by this process.
+
+    Called before forking and by the children before `os._exit`, which skips the flush done by `logging.shutdown`.
+    """
+    for handler in log_writer_handlers:
+        handler.flush()
+
+
+class LogWriter:
+    """Writes the log files of all the processes using a log writer, see `start_log_writer`.
+
+    Each process connects to the stream socket of the writer and sends length-prefixed JSON messages:
+    the configuration of the log files of each logger, [`"handler"`, logger name, `get_processlog_handler`
+    arguments], and the records, [`"record"`, logger name, `LOG_RECORD_ATTRIBUTES` values, message].
+    The connections from processes of other users are closed (where `SO_PEERCRED` is available) and
+    the log files outside `log_base_dir` are refused.
+    Each log file has one `GlideinHandler`, counting the size in memory, flushed when there are no more
+    records to write or at least once a second.
+
+    Attributes:
+        sock (socket.socket): The listening socket.
+        parent_pid (int): The PID of the process that started the writer, the writer exits after it.
+        log_base_dir (str): The real path of the directory containing all the log files.
+        handlers (dict): The handlers of each logger name.
+        files (dict): The handler of each log file, by `get_processlog_handler` arguments.
+    """
+
+    def __init__(self, sock, parent_pid, log_base_dir):
+        self.sock = sock
+        self.parent_pid = parent_pid
+        self.log_base_dir = os.path.realpath(log_base_dir)
+        self.handlers = {}
+        self.files = {}
+
+    def run(self):
+        """Writes the records until the process that started the writer exits."""
+        # the writer is stopped by its parent, so it can write the records of a shutdown
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        selector = selectors.DefaultSelector()
+        selector.register(self.sock, selectors.EVENT_READ)
+        pending = False
+        last_flush = time.time()
+        while True:
+            events = selector.select(0 if pending else 1)
+            for key, _ in events:
+                if key.fileobj is self.sock:
+                    conn = self.sock.accept()[0]
+                    if self.check_peer(conn):
+                        selector.register(conn, selectors.EVENT_READ, b"")
+                    else:
+                        conn.close()
+                    continue
+                data = key.fileobj.recv(262144)
+                if data:
+                    selector.modify(key.fileobj, selectors.EVENT_READ, self.process_frames(key.data + data))
+                    pending = True
+                else:
+                    # the process closed the connection or exited
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+            if events:
+                if time.time() - last_flush < 1:
+                    continue
+            elif not pending and os.getppid() != self.parent_pid:
+                break
+            if pending:
+                self.flush()
+                pending = False
+                last_flush = time.time()
+        selector.close()
+        self.close()
+
+    def check_peer(self, conn):
+        """Checks that a connection comes from a process of the same user.
+
+        Args:
+            conn (socket.socket): The accepted connection.
+
+        Returns:
+            bool: True if the peer is a process of the same user, or if the peer cannot be checked
+                on this platform (the socket directory is accessible only by the user).
+        """
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        try:
+            _, uid, _ = PEER_CRED.unpack(conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CRED.size))
+        except OSError as e:
+            alternate_log(f"Log writer could not check a connection: {e}")
+            return False
+        if uid != os.getuid():
+            alternate_log(f"Log writer refused a connection from UID {uid}")
+            return False
+        return True
+
+    def process_frames(self, data):
+        """Processes the complete messages received on a connection.
+
+        Args:
+            data (bytes): The data received and not yet processed.
+
+        Returns:
+            bytes: The beginning of the next message, still incomplete.
+        """
+        start = 0
+        while len(data) - start >= LOG_FRAME_HEADER.size:
+            (length,) = LOG_FRAME_HEADER.unpack_from(data, start)
+            end = start + LOG_FRAME_HEADER.size + length
+            if end > len(data):
+                break
+            self.process(data[start + LOG_FRAME_HEADER.size : end])
+            start = end
+        return data[start:]
+
+    def process(self, data):
+        """Configures a log file or writes a record.
+
+        Args:
+            data (bytes): The JSON message.
+        """
+        try:
+            msg = json.loads(data)
+            if msg[0] == "record":
+                record = logging.makeLogRecord(dict(zip(LOG_RECORD_ATTRIBUTES, msg[2]), msg=msg[3]))
+                for handler in self.handlers.get(msg[1], ()):
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            elif msg[0] == "handler":
+                handler_args = tuple(msg[2])
+                handler = self.files.get(handler_args)
+                if handler is None:
+                    logfile = os.path.realpath(get_processlog_file(*handler_args[:4]))
+                    if os.path.commonpath([self.log_base_dir, logfile]) != self.log_base_dir:
+                        alternate_log(f"Log writer refused the log file {logfile}, not in {self.log_base_dir}")
+                        return
+                    handler = self.files[handler_args] = get_processlog_handler(*handler_args)
+                    handler.use_size_counter()
+                logger_handlers = self.handlers.setdefault(msg[1], [])
+                if handler not in logger_handlers:
+                    logger_handlers.append(handler)
+        except Exception as e:
+            alternate_log(f"Log writer failed to process a message: {e}")
+
+    def flush(self):
+        """Flushes all the log files."""
+        for handler in self.files.values():
+            try:
+                handler.flush()
+            except Exception as e:
+                alternate_log(f"Log writer failed to flush {handler.baseFilename}: {e}")
+
+    def close(self):
+        """Flushes and closes all the log files."""
+        for handler in self.files.values():
+            handler.close()
+        address = self.sock.getsockname()
+        self.sock.close()
+        try:
+            os.remove(address)
+            os.rmdir(os.path.dirname(address))
+        except OSError as e:
+            alternate_log(f"Log writer failed to remove its socket {address}: {e}")
+
+
+class LogWriterHandler(logging.Handler):
+    """Sends the records of a logger to the log writer process, see `start_log_writer`.
+
+    Like logging.handlers.QueueHandler, the message (with the exception) is formatted before sending and
+    the writer formats the record with the formatters of the log files.
+    The DEBUG records are buffered and sent in batches, see `LOG_WRITER_BATCH_SIZE`, the other records are
+    sent immediately, after the buffered ones. Each process uses its own connection, so forked children
+    can use the handler of their parent.
+
+    Attributes:
+        address (str): The socket path of the log writer.
+        logger_name (str): The name of the logger, selecting the log files in the writer.
+        sock (socket.socket): The connection used by the process `sock_pid`.
+        buffer (bytearray): The DEBUG records not sent yet.
+        buffer_time (float): Time of the oldest record in the buffer.
+    """
+
+    def __init__(self, address, logger_name):
+        logging.Handler.__init__(self)
+        self.address = address
+        self.logger_name = logger_name
+        self.sock = None
+        self.sock_pid = None
+        self.buffer = bytearray()
+        self.buffer_time = None
+        log_writer_handlers.append(self)
+
+    def check_connection(self):
+        """Connects to the log writer if this process is not connected yet."""
+        if self.sock is None or self.sock_pid != os.getpid():
+            # a forked child does not send the records buffered by its parent
+            self.buffer = bytearray()
+            self.buffer_time = None
+            self.sock = None
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            self.sock = sock
+            self.sock_pid = os.getpid()
+
+    def send_frame(self, frame):
+        """Sends the buffered records followed by a message.
+
+        Args:
+            frame (bytes): The length-prefixed message, can be empty.
+        """
+        self.check_connection()
+        if self.buffer:
+            self.buffer += frame
+            frame = self.buffer
+            self.buffer = bytearray()
+            self.buffer_time = None
+        if frame:
+            self.sock.sendall(frame)
+
+    def send(self, msg):
+        """Sends a message to the log writer.
+
+        Args:
+            msg (tuple): The message, must be JSON serializable.
+        """
+        data = json.dumps(msg).encode()
+        self.send_frame(LOG_FRAME_HEADER.pack(len(data)) + data)
+
+    def emit(self, record):
+        """Sends a record to the log writer, buffering the DEBUG ones.
+
+        Args:
+            record (logging.LogRecord): The record to send.
+        """
+        try:
+            attrs = tuple([getattr(record, attr, None) for attr in LOG_RECORD_ATTRIBUTES])
+            data = json.dumps(("record", self.logger_name, attrs, self.format(record)), default=str).encode()
+            frame = LOG_FRAME_HEADER.pack(len(data)) + data
+            if record.levelno <= logging.DEBUG:
+                self.check_connection()
+                self.buffer += frame
+                if self.buffer_time is None:
+                    self.buffer_time = record.created
+                if (
+                    len(self.buffer) < LOG_WRITER_BATCH_SIZE
+                    and record.created - self.buffer_time < LOG_WRITER_BATCH_TIME
+                ):
+                    return
+                frame = b""
+            self.send_frame(frame)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Sends the buffered records to the log writer."""
+        with self.lock:
+            if self.buffer and self.sock_pid == os.getpid():
+                try:
+                    self.send_frame(b"")
+                except OSError as e:
+                    self.buffer = bytearray()
+                    self.buffer_time = None
+                    alternate_log(f"Failed to send the log records of {self.logger_name} to the log writer: {e}")
+
+    def close(self):
+        """Sends the buffered records and closes the connection."""
+        self.flush()
+        with self.lock:
+            if self.sock is not None and self.sock_pid == os.getpid():
+                self.sock.close()
+            self.sock = None
+        if self in log_writer_handlers:
+            log_writer_handlers.remove(self)
+        logging.Handler.close(self)
+
+
+# The buffered records are sent before forking, so that the children do not inherit them
+# (Python 3.7+, before the parent keeps them until its next flush, the children never send them)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=flush_log_writer)
+
+
 if USE_STRUCTLOG:
     try:
         # From structlog 23.1.0 suggested configurations - separate rendering, using same output
@@ -542,6 +1006,7 @@ def get_logger_with_handlers(name, directory, config_data, level=logging.DEBUG):
     """Creates or retrieves a logger, sets the handlers, sets the starting logging level, and returns the logger.
 
     The file name is `{name}.{plog["extension"].lower()}.log`.
+    If the process uses a log writer (see `start_log_writer`), the writer writes the log files.
 
     Args:
         name (str): Logger name.
@@ -556,23 +1021,40 @@ def get_logger_with_handlers(name, directory, config_data, level=logging.DEBUG):
     # Contains a dictionary in a string
     process_logs = eval(config_data["ProcessLogs"])
     is_structured = False
-    handlers_list = []
+    handlers_args = []
     for plog in process_logs:
         # If at least one handler is structured, it will use structured logging
         # All handlers should be consistent and use the same
         is_structured = is_structured or util.is_true(plog["structured"])
-        handler = get_processlog_handler(
-            name,
-            directory,
-            plog["msg_types"],
-            plog["extension"],
-            float(plog["max_days"]),
-            float(plog["min_days"]),
-            float(plog["max_mbytes"]),
-            int(float(plog["backup_count"])),
-            plog["compression"],
+        handlers_args.append(
+            (
+                name,
+                str(directory),
+                plog["msg_types"],
+                plog["extension"],
+                float(plog["max_days"]),
+                float(plog["min_days"]),
+                float(plog["max_mbytes"]),
+                int(float(plog["backup_count"])),
+                plog["compression"],
+            )
         )
-        handlers_list.append(handler)
+    handlers_list = []
+    if log_writer_address is not None:
+        # the log files are written by the log writer, send it only the levels used in them
+        writer_handler = LogWriterHandler(log_writer_address, name)
+        writer_levels = set()
+        try:
+            for handler_args in handlers_args:
+                writer_handler.send(("handler", name, handler_args))
+                writer_levels.update(get_msg_type_list(handler_args[2]))
+            writer_handler.addFilter(MsgFilter(sorted(writer_levels)))
+            handlers_list.append(writer_handler)
+        except OSError as e:
+            alternate_log(f"Log writer {log_writer_address} not available, writing the log files of {name}: {e}")
+    if not handlers_list:
+        for handler_args in handlers_args:
+            handlers_list.append(get_processlog_handler(*handler_args))
     if is_structured and USE_STRUCTLOG:
         mylog = structlog.get_logger(name)
     else:
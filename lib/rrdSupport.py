@@ -5,10 +5,11 @@
 
 import os
 import shutil
+import subprocess
 import tempfile
 import time
 
-from . import defaults, subprocessSupport
+from . import defaults, logSupport, subprocessSupport
 
 try:
     import rrdtool  # pylint: disable=import-error
@@ -144,6 +145,9 @@ class BaseRRDSupport:
     def update_rrd_multi(self, rrdfname, time, val_dict):
         """Update an RRD archive with multiple values.
 
+        If the update service is enabled (see `set_update_service`), the update is queued and
+        written at the next flush.
+
         Args:
             rrdfname (str): The file path name of the RRD archive.
             time (int): The time at which the values were taken.
@@ -152,6 +156,10 @@ class BaseRRDSupport:
         if self.rrd_obj is None:
             return  # nothing to do in this case
 
+        if update_service is not None:
+            update_service.add(self, rrdfname, time, val_dict)
+            return
+
         args = [str(rrdfname)]
         ds_names = sorted(val_dict.keys())
 
@@ -375,6 +383,9 @@ class BaseRRDSupport:
 
         args.append("COMMENT:Created on %s" % time.strftime(r"%b %d %H\:%M\:%S %Z %Y"))
 
+        if update_service is not None:
+            update_service.flush()  # write the queued updates before reading
+
         try:
             lck = self.get_graph_lock(fname)
             try:
@@ -453,6 +464,9 @@ class BaseRRDSupport:
         if self.rrd_obj is None:
             return  # nothing to do in this case
 
+        if update_service is not None:
+            update_service.flush()  # write the queued updates before reading
+
         if CF not in ("AVERAGE", "MIN", "MAX", "LAST"):
             raise RuntimeError("Invalid consolidation function %s" % CF)
         args = [str(filename), str(CF)]
@@ -542,6 +556,217 @@ class rrdSupport(BaseRRDSupport):
         super().__init__(rrd_obj)
 
 
+class RRDUpdateService:
+    """In-memory queue of RRD updates, written in batches.
+
+    The updates are coalesced per file: the values with the same time are merged (the last value wins)
+    and the values with different times but the same data sources are written with a single update command.
+    With the rrdtool command-line client, the commands are sent to one long-lived `rrdtool -` process
+    instead of starting a process per update. Optionally the updates are sent to an rrdcached daemon.
+
+    Attributes:
+        max_queue (int): Number of queued values triggering a flush.
+        daemon (str): Address of the rrdcached daemon receiving the updates, None to write the files.
+        queue (dict): The queued updates, `{rrdfname: (rrd_support, {time: {ds_name: value}})}`.
+        depth (int): Number of values (file and time pairs) in the queue.
+        stats (dict): Counters since the service started, see `get_stats`.
+    """
+
+    def __init__(self, max_queue=10000, daemon=None):
+        """Initialize the service.
+
+        Args:
+            max_queue (int, optional): Number of queued values triggering a flush. Defaults to 10000.
+            daemon (str, optional): Address of the rrdcached daemon, e.g. unix:/var/run/rrdcached.sock.
+                rrdtool must support templates with `--daemon` (1.5 or later). Defaults to None.
+        """
+        self.max_queue = max_queue
+        self.daemon = daemon
+        self.queue = {}
+        self.depth = 0
+        self.pipe = None
+        self.stats = {
+            "queued": 0,  # values added
+            "coalesced": 0,  # values merged into a queued one with the same file and time
+            "updates": 0,  # values written
+            "commands": 0,  # update commands run
+            "errors": 0,  # failed update commands
+            "flushes": 0,
+            "max_depth": 0,
+            "last_flush_latency": 0.0,  # seconds
+            "last_flush_rate": 0.0,  # values written per second
+        }
+
+    def add(self, rrd_support, rrdfname, time, val_dict):
+        """Queue an update, flushing the queue if full.
+
+        Args:
+            rrd_support (BaseRRDSupport): The object used to write the file.
+            rrdfname (str): The file path name of the RRD archive.
+            time (int): The time at which the values were taken.
+            val_dict (dict): A dictionary of data source names to values, None values are ignored.
+        """
+        values = {str(k): "%s" % v for k, v in val_dict.items() if v is not None}
+        if not values:
+            return
+        rrdfname = str(rrdfname)
+        time = int(time)
+        self.stats["queued"] += 1
+        file_updates = self.queue.setdefault(rrdfname, (rrd_support, {}))[1]
+        if time in file_updates:
+            file_updates[time].update(values)
+            self.stats["coalesced"] += 1
+        else:
+            file_updates[time] = values
+            self.depth += 1
+            self.stats["max_depth"] = max(self.stats["max_depth"], self.depth)
+            if self.depth >= self.max_queue:
+                self.flush()
+
+    def flush(self):
+        """Write all the queued updates.
+
+        Failures are logged and counted, the failed updates are discarded.
+        """
+        if not self.queue:
+            return
+        queue = self.queue
+        self.queue = {}
+        depth = self.depth
+        self.depth = 0
+        start_time = time.time()
+        for rrdfname, (rrd_support, file_updates) in queue.items():
+            lck = rrd_support.get_disk_lock(rrdfname)
+            try:
+                for args in self.get_update_args(rrdfname, file_updates):
+                    self.update(rrd_support.rrd_obj, args)
+            finally:
+                lck.close()
+        latency = time.time() - start_time
+        self.stats["flushes"] += 1
+        self.stats["updates"] += depth
+        self.stats["last_flush_latency"] = latency
+        self.stats["last_flush_rate"] = depth / latency if latency > 0 else 0.0
+        logSupport.log.debug(
+            "Flushed %i RRD updates of %i files in %.3fs (%.0f updates/s)"
+            % (depth, len(queue), latency, self.stats["last_flush_rate"])
+        )
+
+    def get_update_args(self, rrdfname, file_updates):
+        """Return the arguments of the update commands for a file, one for each run of values with the same
+        data sources, in time order.
+
+        Args:
+            rrdfname (str): The file path name of the RRD archive.
+            file_updates (dict): The values to write, `{time: {ds_name: value}}`.
+
+        Returns:
+            list: The list of arguments of each update command.
+        """
+        commands = []
+        last_names = None
+        for update_time in sorted(file_updates):
+            values = file_updates[update_time]
+            ds_names = sorted(values)
+            if ds_names != last_names:
+                args = [rrdfname]
+                if self.daemon:
+                    args += ["--daemon", self.daemon]
+                args += ["-t", ":".join(ds_names)]
+                commands.append(args)
+                last_names = ds_names
+            args.append(("%li:" % update_time) + ":".join(values[ds_name] for ds_name in ds_names))
+        return commands
+
+    def update(self, rrd_obj, args):
+        """Run one update command, using the `rrdtool -` process for the command-line client.
+
+        A failed command with more values is retried one value at a time, so that one bad value
+        (e.g. a time older than the last update) does not discard the others.
+
+        Args:
+            rrd_obj: The rrdtool module or `rrdtool_exe` object.
+            args (list): The update arguments.
+        """
+        self.stats["commands"] += 1
+        try:
+            if isinstance(rrd_obj, rrdtool_exe):
+                if self.pipe is None or not self.pipe.is_usable():
+                    self.pipe = RRDToolPipe(rrd_obj.rrd_bin)
+                self.pipe.run("update", args)
+            else:
+                rrd_obj.update(*args)
+        except Exception as e:
+            first_value = args.index("-t") + 2
+            if len(args) - first_value > 1:
+                for value in args[first_value:]:
+                    self.update(rrd_obj, args[:first_value] + [value])
+            else:
+                self.stats["errors"] += 1
+                logSupport.log.warning(f"Failed to update {args[0]}: {e}")
+
+    def get_stats(self):
+        """Return the metrics of the service.
+
+        Returns:
+            dict: The counters in `stats` and the current queue depth ("depth").
+        """
+        stats = dict(self.stats)
+        stats["depth"] = self.depth
+        return stats
+
+
+# Service queuing the updates of all the rrdSupport objects in the process, None to write them immediately
+update_service = None
+
+
+def set_update_service(enabled=True, max_queue=10000, daemon=None):
+    """Enable or disable the batched RRD updates for all the rrdSupport objects in the process.
+
+    When enabled, the updates are written by `flush_updates`, or when the queue is full
+    or before reading the RRD files.
+    Disabling the service writes the queued updates.
+
+    Args:
+        enabled (bool, optional): True to queue the updates. Defaults to True.
+        max_queue (int, optional): Number of queued values triggering a flush. Defaults to 10000.
+        daemon (str, optional): Address of an rrdcached daemon receiving the updates. Defaults to None.
+
+    Returns:
+        RRDUpdateService: The service, None if disabled.
+    """
+    global update_service
+    if update_service is not None:
+        update_service.flush()
+    if enabled:
+        if update_service is None:
+            update_service = RRDUpdateService(max_queue, daemon)
+        else:
+            update_service.max_queue = max_queue
+            update_service.daemon = daemon
+    else:
+        update_service = None
+    return update_service
+
+
+def flush_updates():
+    """Write the RRD updates queued by the update service, if enabled, and log the metrics of the service.
+
+    Returns:
+        dict: The metrics of the update service (see `RRDUpdateService.get_stats`), None if not enabled.
+    """
+    if update_service is None:
+        return None
+    update_service.flush()
+    stats = update_service.get_stats()
+    logSupport.log.info(
+        "RRD update service: %(updates)i updates written with %(commands)i commands (%(errors)i failed), "
+        "%(coalesced)i coalesced, max queue depth %(max_depth)i, last flush %(last_flush_latency).3fs "
+        "(%(last_flush_rate).0f updates/s)" % stats
+    )
+    return stats
+
+
 ##################################################################
 # INTERNAL, do not use directly
 ##################################################################
@@ -686,6 +911,71 @@ class rrdtool_exe:
         return times, headers, lines
 
 
+class RRDToolPipe:
+    """Long-lived `rrdtool -` process running the rrdtool commands read from its standard input.
+
+    The process is started again if it died or after a fork (a child does not use the parent's process).
+    """
+
+    def __init__(self, rrd_bin):
+        """Start the rrdtool process.
+
+        Args:
+            rrd_bin (str): Path of the rrdtool executable.
+        """
+        self.pid = os.getpid()
+        self.process = subprocess.Popen(
+            [rrd_bin, "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding=defaults.BINARY_ENCODING_DEFAULT,
+        )
+
+    def is_usable(self):
+        """Check if the process can run commands.
+
+        Returns:
+            bool: True if the process is alive and was started by this process.
+        """
+        return self.pid == os.getpid() and self.process.poll() is None
+
+    def run(self, command, args):
+        """Run a command and return its output.
+
+        Args:
+            command (str): The rrdtool command, e.g. update.
+            args (list): The arguments of the command.
+
+        Returns:
+            list: The output lines of the command.
+
+        Raises:
+            RuntimeError: If the command failed or the process terminated.
+        """
+        try:
+            self.process.stdin.write(f"{command} {string_quote_join(args)}\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise RuntimeError(f"rrdtool process terminated: {e}") from e
+        output = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("rrdtool process terminated")
+            if line.startswith("OK "):
+                return output
+            if line.startswith("ERROR"):
+                raise RuntimeError(line.strip())
+            output.append(line.rstrip("\n"))
+
+    def close(self):
+        """Terminate the process, if started by this process."""
+        if self.pid == os.getpid() and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
 def addDataStore(filenamein, filenameout, attrlist):
     """Add a list of data stores to an RRD export file.
 
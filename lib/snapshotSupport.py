@@ -0,0 +1,184 @@
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Versioned binary snapshots of the monitoring data, read by the monitoring aggregators.
+
+A snapshot is a fixed-size header (magic string, format version, sequence number and time of the data)
+followed by the pickled data. Writers replace the snapshot atomically and increment the sequence number,
+so readers can tell from the header alone whether a snapshot changed since they last read it.
+The XML and JSON files are still written, the aggregators use them only when the snapshot is missing or older.
+"""
+
+import os
+import pickle
+import struct
+
+from . import logSupport
+
+SNAPSHOT_MAGIC = b"GWMSSNAP"
+# Increment when the format or the content of any snapshot changes
+SNAPSHOT_VERSION = 1
+# magic, version, sequence number, time of the data
+SNAPSHOT_HEADER = struct.Struct("!8sHQd")
+SNAPSHOT_EXT = ".snap"
+
+
+def get_snapshot_fname(fname):
+    """Return the name of the snapshot of a monitoring file, e.g. schedd_status.snap for schedd_status.xml.
+
+    Args:
+        fname (str): The monitoring file name.
+
+    Returns:
+        str: The snapshot file name.
+    """
+    return os.path.splitext(fname)[0] + SNAPSHOT_EXT
+
+
+def read_header(fd):
+    """Read the header of a snapshot.
+
+    Args:
+        fd (file): The snapshot, open in binary mode at the beginning.
+
+    Returns:
+        tuple: The sequence number and the time of the data.
+
+    Raises:
+        ValueError: If the file is not a snapshot with the current format version.
+    """
+    header = fd.read(SNAPSHOT_HEADER.size)
+    if len(header) != SNAPSHOT_HEADER.size:
+        raise ValueError("Truncated snapshot header")
+    magic, version, sequence, data_time = SNAPSHOT_HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    return sequence, data_time
+
+
+def write_snapshot(fname, data, data_time):
+    """Atomically write a snapshot, with the sequence number of the previous one incremented.
+
+    Args:
+        fname (str): The snapshot file name.
+        data: The data, must be picklable.
+        data_time (float): The time of the data.
+
+    Returns:
+        int: The sequence number of the snapshot.
+    """
+    try:
+        with open(fname, "rb") as fd:
+            sequence = read_header(fd)[0] + 1
+    except (OSError, ValueError):
+        sequence = 1
+    tmp_fname = f"{fname}.tmp"
+    with open(tmp_fname, "wb") as fd:
+        fd.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sequence, data_time))
+        pickle.dump(data, fd, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_fname, fname)
+    return sequence
+
+
+def load_snapshot(fname):
+    """Load a snapshot.
+
+    Args:
+        fname (str): The snapshot file name.
+
+    Returns:
+        tuple: The sequence number, the time of the data and the data.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a snapshot with the current format version.
+    """
+    with open(fname, "rb") as fd:
+        sequence, data_time = read_header(fd)
+        return sequence, data_time, pickle.load(fd)
+
+
+class SnapshotCache:
+    """Values computed by an aggregator from the snapshots, reused while the snapshots do not change.
+
+    Each value is computed from a snapshot or, if the snapshot is missing, older or unreadable,
+    from the file it replaces (e.g. the XML file). The values are shared: callers must not modify them.
+
+    Attributes:
+        cache (dict): The cached values, `{snapshot file name: (key, value)}`.
+        stats (dict): Number of values reused ("reused"), computed from snapshots ("snapshots")
+            and computed from the files replaced by the snapshots ("fallbacks"), reset by `prune`.
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.used = set()
+        self.stats = {"reused": 0, "snapshots": 0, "fallbacks": 0}
+
+    def _get(self, fname, key, compute, stat_name):
+        """Return the cached value if the key did not change, otherwise compute and cache it."""
+        self.used.add(fname)
+        cached = self.cache.get(fname)
+        if cached is not None and cached[0] == key:
+            self.stats["reused"] += 1
+            return cached[1]
+        value = compute()
+        self.cache[fname] = (key, value)
+        self.stats[stat_name] += 1
+        return value
+
+    def load(self, fname, from_snapshot, fallback_fname=None, from_fallback=None):
+        """Return the value computed from a snapshot, reusing the cached value if the snapshot did not change.
+
+        Args:
+            fname (str): The snapshot file name.
+            from_snapshot (function): Computes the value from the data of the snapshot.
+            fallback_fname (str, optional): The file replaced by the snapshot, used if it is more recent
+                or the snapshot is not usable.
+            from_fallback (function, optional): Computes the value from `fallback_fname`.
+
+        Returns:
+            The value.
+
+        Raises:
+            OSError: If neither the snapshot nor the fallback file can be read.
+            Exception: Any exception raised by `from_fallback`.
+        """
+        fallback_stat = None
+        if fallback_fname is not None:
+            try:
+                fallback_stat = os.stat(fallback_fname)
+            except OSError:
+                pass  # the snapshot may still be there
+        try:
+            with open(fname, "rb") as fd:
+                snap_stat = os.fstat(fd.fileno())
+                # the snapshot is written after the file it replaces
+                if fallback_stat is None or snap_stat.st_mtime >= fallback_stat.st_mtime:
+                    sequence, data_time = read_header(fd)
+                    key = (snap_stat.st_ino, sequence, data_time)
+                    return self._get(fname, key, lambda: from_snapshot(pickle.load(fd)), "snapshots")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logSupport.log.warning(f"Unable to use the snapshot {fname}, using {fallback_fname}: {e}")
+        if fallback_stat is None or from_fallback is None:
+            raise FileNotFoundError(f"No snapshot {fname} or file {fallback_fname}")
+        key = (fallback_stat.st_ino, fallback_stat.st_mtime_ns, fallback_stat.st_size)
+        return self._get(fname, key, lambda: from_fallback(fallback_fname), "fallbacks")
+
+    def prune(self):
+        """Remove the values not used since the previous call and reset the statistics.
+
+        Returns:
+            dict: The statistics since the previous call.
+        """
+        for fname in list(self.cache):
+            if fname not in self.used:
+                del self.cache[fname]
+        self.used = set()
+        stats = self.stats
+        self.stats = {"reused": 0, "snapshots": 0, "fallbacks": 0}
+        return stats
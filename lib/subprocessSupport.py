@@ -6,6 +6,7 @@
 import os
 import shlex
 import subprocess
+import tempfile
 
 from subprocess import CalledProcessError
 
@@ -16,6 +17,25 @@ from . import defaults
 # __str__ of this class is not printing the stdout in the error message
 
 
+def _get_child_env(child_env):
+    """Return the environment of a subprocess: the parent environment overridden by `child_env`.
+
+    The dictionaries passed are not modified. A None value in `child_env` removes the variable.
+
+    Args:
+        child_env (dict or None): Environment variables to set (or unset if None) in the subprocess.
+
+    Returns:
+        dict or os._Environ: The environment of the subprocess, `os.environ` if `child_env` is empty.
+    """
+    if not child_env:
+        return os.environ
+    # Add in parent process environment, make sure that env overrides parent
+    env = dict(os.environ)
+    env.update(child_env)
+    return {k: v for k, v in env.items() if v is not None}
+
+
 def iexe_cmd(cmd, useShell=False, stdin_data=None, child_env=None, text=True, encoding=None, timeout=None, log=None):
     """Fork a process and execute a command.
 
@@ -36,7 +56,7 @@ def iexe_cmd(cmd, useShell=False, stdin_data=None, child_env=None, text=True, en
         cmd (str): The command to execute, including all arguments.
         useShell (bool): Whether to execute the command in a shell. If True, the command is not tokenized. Defaults to False.
         stdin_data (str or bytes, optional): Data to be passed to the command's standard input. Should be bytes if `text` is False and `encoding` is None, str otherwise. Defaults to None.
-        child_env (dict, optional): Environment variables to be set before execution. If None, the current environment is used. Defaults to None.
+        child_env (dict, optional): Environment variables to be set before execution, None values are unset. If None, the current environment is used. Defaults to None.
         text (bool): Whether to treat stdin, stdout, and stderr as text (str) or not (bytes). Defaults to True.
         encoding (str, optional): Encoding to use for the streams if `text` is True. Defaults to None, which uses `defaults.BINARY_ENCODING_DEFAULT` (utf-8).
         timeout (int, optional): Timeout in seconds for the command's execution. Defaults to None.
@@ -60,14 +80,7 @@ def iexe_cmd(cmd, useShell=False, stdin_data=None, child_env=None, text=True, en
     exit_status = 0
 
     try:
-        if child_env:
-            # Add in parent process environment, make sure that env overrides parent
-            for k in os.environ:
-                if k not in child_env:
-                    child_env[k] = os.environ[k]
-        else:
-            # otherwise just use the parent environment
-            child_env = os.environ
+        child_env = _get_child_env(child_env)
 
         # Tokenize the commandline that should be executed.
         if useShell:
@@ -129,3 +142,68 @@ def iexe_cmd(cmd, useShell=False, stdin_data=None, child_env=None, text=True, en
         raise CalledProcessError(exit_status, cmd, output="".join(stdoutdata), stderr="".join(stderrdata))
 
     return stdoutdata
+
+
+def iexe_cmd_stream(
+    cmd, stdout_handler, stdin_data=None, child_env=None, chunk_size=1048576, log=None, process_handler=None
+):
+    """Fork a process and execute a command, passing its standard output to a handler while it is produced.
+
+    Unlike `iexe_cmd`, the output is never held in memory as a whole: it is read from the pipe
+    in chunks of bytes and each chunk is passed to `stdout_handler`.
+    stdin and stderr are buffered in temporary files, so there is no risk of deadlock.
+
+    Args:
+        cmd (str): The command to execute, including all arguments. The string is tokenized, no shell is used.
+        stdout_handler (callable): Function invoked with each chunk (bytes) of the standard output.
+        stdin_data (str or bytes, optional): Data to be passed to the command's standard input. Defaults to None.
+        child_env (dict, optional): Environment variables to be set before execution, None values are unset. If None, the current environment is used. Defaults to None.
+        chunk_size (int): Maximum size in bytes of the chunks passed to the handler. Defaults to 1MiB.
+        log (logger, optional): Logger for debug and error messages. Defaults to None.
+        process_handler (callable, optional): Function invoked with the `subprocess.Popen` object once the command
+            is started, e.g. to kill it from another thread. Defaults to None.
+
+    Raises:
+        subprocess.CalledProcessError: If the command returns a non-zero exit code. stderr is in the exception.
+        RuntimeError: If the command execution fails.
+        Exception: Exceptions raised by `stdout_handler` are propagated after terminating the command.
+    """
+    child_env = _get_child_env(child_env)
+    command_list = shlex.split(cmd)
+
+    with tempfile.TemporaryFile() as stdin_file, tempfile.TemporaryFile() as stderr_file:
+        if stdin_data:
+            if isinstance(stdin_data, str):
+                stdin_data = stdin_data.encode(defaults.BINARY_ENCODING_DEFAULT)
+            stdin_file.write(stdin_data)
+            stdin_file.seek(0)
+        try:
+            process = subprocess.Popen(
+                command_list, stdin=stdin_file, stdout=subprocess.PIPE, stderr=stderr_file, env=child_env
+            )
+        except OSError as e:
+            err_str = f"Error running '{cmd}'\nException OSError:{e}"
+            if log is not None:
+                log.error(err_str)
+            raise RuntimeError(err_str) from e
+        if log is not None:
+            log.debug(f"Spawned subprocess {process.pid} (stream, {chunk_size}) for {command_list}")
+
+        try:
+            if process_handler is not None:
+                process_handler(process)
+            with process.stdout:
+                for chunk in iter(lambda: process.stdout.read(chunk_size), b""):
+                    stdout_handler(chunk)
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        exit_status = process.wait()
+
+        if exit_status:  # True if the subprocess exit status<>0 (error)
+            stderr_file.seek(0)
+            stderrdata = stderr_file.read().decode(defaults.BINARY_ENCODING_DEFAULT, errors="replace")
+            if log is not None:
+                log.warning(f"Command '{cmd}' failed with exit code: {exit_status}\nStderr:{stderrdata}")
+            raise CalledProcessError(exit_status, cmd, output="", stderr=stderrdata)
@@ -6,6 +6,8 @@
 Functions:
     token_file_expired: Checks if the token file has expired.
     token_str_expired: Checks if the token string has expired.
+    token_file_times: Returns the expiration and not-before times of a token file.
+    token_times_expired: Checks the expiration and not-before times of a token.
     simple_scramble: Performs a simple scramble (XOR) of HTCondor data.
     derive_master_key: Derives an encryption/decryption key from a password.
     sign_token: Assembles and signs an IDTOKEN.
@@ -88,6 +90,63 @@ def token_str_expired(token_str):
     return expired
 
 
+def token_file_times(token_file):
+    """Returns the expiration (`exp`) and not-before (`nbf`) claims of a token file.
+
+    The token is decoded without verification, so the times can be cached and checked
+    later with `token_times_expired`.
+
+    Args:
+        token_file (Path or str): A file containing a JWT (text file with default encoding expected).
+
+    Returns:
+        tuple: `exp` and `nbf` claims, None if absent. None if the token cannot be decoded.
+
+    Raises:
+        FileNotFoundError: If the token file does not exist.
+    """
+    with open(token_file) as tf:
+        token_str = tf.read().strip()
+    if not token_str:
+        logSupport.log.debug(f"The token file '{token_file}' is empty. Considering it expired.")
+        return None
+    try:
+        decoded = jwt.decode(token_str, options={"verify_signature": False, "verify_aud": False, "verify_exp": False})
+    except jwt.exceptions.DecodeError as e:
+        logSupport.log.error(f"Bad token in '{token_file}': {e}")
+        return None
+    except Exception as e:
+        logSupport.log.exception(f"Unknown exception decoding token in '{token_file}': {e}")
+        return None
+    return decoded.get("exp"), decoded.get("nbf")
+
+
+def token_times_expired(exp, nbf, now=None):
+    """Checks the expiration (`exp`) and not-before (`nbf`) claims of a token, as `token_str_expired`.
+
+    Args:
+        exp (int): Expiration time, None if absent.
+        nbf (int): Not-before time, None if absent.
+        now (float, optional): Current time. Defaults to None (time.time()).
+
+    Returns:
+        bool: True if `exp` is in the past, or `nbf` in the future. False otherwise.
+    """
+    if now is None:
+        now = time.time()
+    try:
+        if exp is not None and int(exp) <= now:
+            logSupport.log.error(f"Expired token: expiration {exp}")
+            return True
+        if nbf is not None and int(nbf) > now:
+            logSupport.log.error(f"Token not yet valid: not before {nbf}")
+            return True
+    except (TypeError, ValueError):
+        logSupport.log.error(f"Bad token: invalid times exp={exp}, nbf={nbf}")
+        return True
+    return False
+
+
 def simple_scramble(in_buf):
     """Performs a simple scramble (XOR) on a binary string using HTCondor's algorithm.
 
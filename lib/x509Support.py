@@ -56,3 +56,22 @@ def extract_DN(fname):
     #         return m2.x509_name_oneline(self.x509_name)
     # Forcing to return str (unicode string)
     return defaults.force_str(str(m.get_subject()))
+
+
+def extract_not_after(fname):
+    """Extract the expiration time of an X.509 proxy or certificate.
+
+    The expiration (notAfter) of the first certificate in the file (PEM format),
+    as `openssl x509 -noout -enddate`, but parsed in process.
+
+    Args:
+        fname(str): Filename containing the X.509 proxy or certificate
+
+    Returns:
+        float: Expiration time, seconds from the Epoch
+
+    Raises:
+        M2Crypto.X509.X509Error: If the file does not contain a valid certificate
+    """
+    m = M2Crypto.X509.load_cert(fname)
+    return m.get_not_after().get_datetime().timestamp()
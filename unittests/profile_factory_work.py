@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   micro-benchmark of the parsing of the request classads in findGroupWork
+#   compares the single-pass attribute bucketing (cold and with the parsed requests of the previous cycle)
+#   with the previous version scanning all the attributes once per prefix
+#   The requests are a synthetic Collector dump, no Collector is needed
+#
+
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+
+from glideinwms.factory import glideFactoryInterface as gfi
+from glideinwms.lib import logSupport
+
+
+# Replicating the class since this should be executed standalone
+class FakeLogger:
+    """Super simple logger printing to stderr"""
+
+    def __init__(self, in_file=sys.stderr):
+        self.file = in_file
+
+    def debug(self, msg, *args):
+        pass
+
+    def info(self, msg, *args):
+        print(str(msg) % args, file=self.file)
+
+    def warning(self, msg, *args):
+        print(str(msg) % args, file=self.file)
+
+    def error(self, msg, *args):
+        print(str(msg) % args, file=self.file)
+
+    def exception(self, msg, *args):
+        print(str(msg) % args, file=self.file)
+
+
+class FakeCondorStatus:
+    """CondorStatus returning the synthetic dump"""
+
+    dump = {}
+
+    def __init__(self, subsystem_name=None, pool_name=None):
+        pass
+
+    def require_integrity(self, value):
+        pass
+
+    def load(self, constraint):
+        pass
+
+    def fetchStored(self):
+        return self.dump
+
+
+def make_dump(nr_ads, nr_entries=100, seed=1):
+    """Return a synthetic Collector dump of request classads, {name: classad}"""
+    rnd = random.Random(seed)
+    dump = {}
+    for i in range(nr_ads):
+        entry = "entry_%i@gl@fact" % (i % nr_entries)
+        client = "fe%i.group_%i" % (i // nr_entries % 10, i // nr_entries)
+        kel = {
+            "MyType": "glideclient",
+            "GlideinMyType": "glideclient",
+            "Name": f"{entry}@{client}",
+            "ReqName": entry,
+            "ReqGlidein": entry,
+            "ClientName": client,
+            "FrontendName": client.split(".")[0],
+            "GroupName": client.split(".")[1],
+            "LastHeardFrom": 1700000000 + i,
+            "AuthenticatedIdentity": "frontend@example.com",
+            "ReqIdleGlideins": rnd.randint(0, 100),
+            "ReqMaxGlideins": rnd.randint(0, 1000),
+            "ReqRemoveExcess": "NO",
+            "ReqRemoveExcessMargin": 0,
+            "ReqIdleLifetime": 0,
+            "WebURL": "http://frontend.example.com/vofrontend/stage",
+            "WebSignType": "sha1",
+            "WebDescriptFile": "description.abc.cfg",
+            "WebDescriptSign": "%040x" % rnd.getrandbits(160),
+            "WebGroupURL": "http://frontend.example.com/vofrontend/stage/group_main",
+            "WebGroupDescriptFile": "description.abc.cfg",
+            "WebGroupDescriptSign": "%040x" % rnd.getrandbits(160),
+            "GlideinEncParamSecurityName": "frontend",
+            "GlideinEncParamSecurityClass": "frontend",
+        }
+        for j in range(30):
+            kel["GlideinParamPARAM_%i" % j] = str(rnd.random())
+        for j in range(20):
+            kel["GlideinMonitor%s%i" % (rnd.choice(("Idle", "Running", "Glideins")), j)] = rnd.randint(0, 1000)
+        for j in range(15):
+            kel["Other_%i" % j] = j
+        dump[kel["Name"]] = kel
+    return dump
+
+
+def reference_parse(data):
+    """Previous version of the findGroupWork parsing (no keys), scanning the attributes once per prefix"""
+    factoryConfig = gfi.factoryConfig
+    reserved_names = (
+        "ReqName",
+        "ReqGlidein",
+        "ClientName",
+        "FrontendName",
+        "GroupName",
+        "ReqPubKeyID",
+        "ReqEncKeyCode",
+        "ReqEncIdentity",
+        "AuthenticatedIdentity",
+    )
+    out = {}
+    for k in data:
+        kel = data[k]
+        el = {"requests": {}, "web": {}, "params": {}, "params_decrypted": {}, "monitor": {}, "internals": {}}
+        for key, prefix in (
+            ("requests", factoryConfig.client_req_prefix),
+            ("web", factoryConfig.client_web_prefix),
+            ("params", factoryConfig.glidein_param_prefix),
+            ("monitor", factoryConfig.glidein_monitor_prefix),
+        ):
+            plen = len(prefix)
+            for attr in kel:
+                if attr in reserved_names:
+                    continue
+                if attr[:plen] == prefix:
+                    el[key][attr[plen:]] = kel[attr]
+        for key, prefix in (("params_decrypted", factoryConfig.encrypted_param_prefix),):
+            plen = len(prefix)
+            for attr in kel:
+                if attr in reserved_names:
+                    continue
+                if attr[:plen] == prefix:
+                    el[key][attr[plen:]] = None
+        for attr in kel:
+            if attr in (
+                "ClientName",
+                "FrontendName",
+                "GroupName",
+                "ReqName",
+                "LastHeardFrom",
+                "ReqPubKeyID",
+                "AuthenticatedIdentity",
+            ):
+                el["internals"][attr] = kel[attr]
+        out[k] = el
+    return gfi.workGroupByEntries(out)
+
+
+def timeit(func, repeat):
+    """Return the result of func() and the best time of `repeat` executions"""
+    best = None
+    for _ in range(repeat):
+        stime = time.perf_counter()
+        out = func()
+        etime = time.perf_counter() - stime
+        if best is None or etime < best:
+            best = etime
+    return out, best
+
+
+def main():
+    logSupport.log = FakeLogger()
+
+    parser = argparse.ArgumentParser(description="Benchmark the parsing of the request classads in findGroupWork")
+    parser.add_argument("--ads", type=int, default=10000, help="number of request classads in the dump")
+    parser.add_argument("--entries", type=int, default=100, help="number of entries")
+    parser.add_argument("--repeat", type=int, default=3, help="number of benchmark iterations")
+    args = parser.parse_args()
+
+    FakeCondorStatus.dump = make_dump(args.ads, args.entries)
+    gfi.condorMonitor.CondorStatus = FakeCondorStatus
+    entries = ["entry_%i" % i for i in range(args.entries)]
+
+    with tempfile.TemporaryDirectory() as lock_dir:
+        gfi.factoryConfig.lock_dir = lock_dir
+
+        def find_cold():
+            gfi._parsed_requests.clear()
+            return gfi.findGroupWork("fact", "gl", entries, None)
+
+        def find_warm():
+            return gfi.findGroupWork("fact", "gl", entries, None)
+
+        ref, ref_time = timeit(lambda: reference_parse(FakeCondorStatus.dump), args.repeat)
+        cold, cold_time = timeit(find_cold, args.repeat)
+        warm, warm_time = timeit(find_warm, args.repeat)
+
+    if ref != cold or ref != warm:
+        print("ERROR: the work differs from the reference")
+        return 1
+    print(f"{args.ads} request classads, best of {args.repeat}")
+    print(f"  per-prefix scans (previous): {ref_time:.3f}s")
+    print(f"  single-pass bucketing:       {cold_time:.3f}s ({ref_time / cold_time:.1f}x)")
+    print(f"  unchanged requests reused:   {warm_time:.3f}s ({ref_time / warm_time:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@
 #   glideinWMS
 #
 # Description:
-#   profile the countMatch frontend function
+#   profile the countMatch frontend function and benchmark the eval() path against the match engine
+#   benchmark countRealRunning against the previous version evaluating every entry
 #   Uncomment lines in glideinFrontendElement.subprocess_count_dt to get the data to execute this script
 #
 # Author:
@@ -16,16 +17,19 @@
 #
 
 
+import argparse
 import cProfile
 import glob
 import os
 import pickle
+import random
 import sys
+import time
 
+from glideinwms.frontend.glideinFrontendLib import appendRealRunning, countMatch, countRealRunning, hashJob
+from glideinwms.frontend.glideinFrontendMatch import MatchEngine
 from glideinwms.lib import logSupport
 
-# from glideinwms.frontend.glideinFrontendLib import countMatch
-
 
 # Replicating the class since this should be executed standalone on a production frontend
 class FakeLogger:
@@ -89,15 +93,15 @@ class mock_condorq_el:
         return self.obj
 
 
-def main():
-    # Need to be global for cProfile to work
-    global cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list
-    dumpdir = "/tmp/frontend_dump/main/"  # This will profile the main group. Change it to profile another one
-    # The CMS matching expression as of April 17th 2019
-    mexpr = """(((glidein["attrs"].get("GLIDEIN_MaxMemMBs", 0) == 0) or (job.get("RequestMemory", 0)<=glidein["attrs"]["GLIDEIN_MaxMemMBs"])) and ((job.get("REQUIRED_OS", "any")=="any") or (glidein["attrs"].get("GLIDEIN_REQUIRED_OS", "any")=="any") or (job.get("REQUIRED_OS")==glidein["attrs"]["GLIDEIN_REQUIRED_OS"])) and ((job.get("MaxWallTimeMins", 0)*60)>=glidein["attrs"].get("GLIDEIN_Job_Min_Time", 0)) and ((job.get("MaxWallTimeMins", 0)+10)<(glidein["attrs"]["GLIDEIN_Max_Walltime"]-glidein["attrs"]["GLIDEIN_Retire_Time_Spread"])/60))"""
-    logSupport.log = FakeLogger()
+def load_dump(dumpdir):
+    """Load the data structures saved by countMatch in dumpdir
 
-    # Load the saved dictionaries
+    Args:
+        dumpdir (str): directory with the pickle files of one group
+
+    Returns:
+        tuple: condorq_dict, glidein_dict, attr_dict, condorq_match_list
+    """
     with open(os.path.join(dumpdir, "glidein_dict.pickle"), "rb") as fd:
         glidein_dict = pickle.load(fd)
     with open(os.path.join(dumpdir, "attr_dict.pickle"), "rb") as fd:
@@ -105,23 +109,179 @@ def main():
     with open(os.path.join(dumpdir, "condorq_match_list.pickle"), "rb") as fd:
         condorq_match_list = pickle.load(fd)
 
+    # The condor_q dictionary names depend on the schedd names, use glob to get them
+    condorq_dict = {}
+    for schedd_file in glob.glob(os.path.join(dumpdir, "condorq_dict*.pickle")):
+        with open(schedd_file, "rb") as fd:
+            condorq_dict[os.path.basename(schedd_file)] = mock_condorq_el(pickle.load(fd))
+    return condorq_dict, glidein_dict, attr_dict, condorq_match_list
+
+
+def benchmark(mexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list, repeat=1):
+    """Run countMatch with eval() and with the match engine, compare results and times"""
     cexpr = compile(mexpr, "<string>", "eval")
+    start = time.time()
+    engine = MatchEngine(mexpr)
+    compile_time = time.time() - start
+    if not engine.compiled:
+        print("The match engine cannot compile the expression: %s" % engine.reason)
+        return False
+    timings = {"eval": [], "engine": []}
+    results = {}
+    for _ in range(repeat):
+        for name, match_engine in (("eval", None), ("engine", engine)):
+            start = time.time()
+            results[name] = countMatch(
+                cexpr, condorq_dict, glidein_dict, attr_dict, False, condorq_match_list, match_engine=match_engine
+            )
+            timings[name].append(time.time() - start)
+    print("Match engine compile time: %.3fs" % compile_time)
+    for name in ("eval", "engine"):
+        print(
+            "countMatch with %-6s: best %.3fs, average %.3fs" % (name, min(timings[name]), sum(timings[name]) / repeat)
+        )
+    print("Speedup: %.1fx" % (min(timings["eval"]) / max(min(timings["engine"]), 1e-9)))
+    same = results["eval"] == results["engine"]
+    print("Same results: %s" % same)
+    return same
+
+
+def countRealRunningAllEntries(match_obj, condorq_dict, glidein_dict, attr_dict, condorq_match_list=None):
+    """Previous countRealRunning, evaluating all the job clusters for every entry (without policies and logging)"""
+    if condorq_match_list is not None:
+        condorq_match_list = condorq_match_list + ["RunningOn"]
+    schedds = list(condorq_dict.keys())
+    cq_dict_clusters = {}
+    for scheddIdx, schedd in enumerate(schedds):
+        cq_dict_clusters[scheddIdx] = {}
+        condorq_data = condorq_dict[schedd].fetchStored()
+        for jid in condorq_data:
+            cq_dict_clusters[scheddIdx].setdefault(hashJob(condorq_data[jid], condorq_match_list), []).append(jid)
+    out_job_counts = {}
+    out_glidein_counts = {}
+    for glidename in glidein_dict:
+        glide_str = "{}@{}".format(glidename[1], glidename[0].split(":")[0])
+        glidein = glidein_dict[glidename]  # noqa: F841  # used in match_obj
+        job_ids = set()
+        glidein_ids = set()
+        for scheddIdx, schedd in enumerate(schedds):
+            condorq_data = condorq_dict[schedd].fetchStored()
+            for cluster in cq_dict_clusters[scheddIdx].values():
+                job = condorq_data[cluster[0]]
+                try:
+                    if not ((job["RunningOn"] == glide_str) and eval(match_obj)):
+                        continue
+                except Exception:
+                    continue
+                for jid in cluster:
+                    job_ids.add("%d %s" % (scheddIdx, jid))
+                    try:
+                        token = condorq_data[jid]["RemoteHost"].split("@")
+                        glidein_ids.add(f"{token[-2]}@{token[-1]}")
+                    except (KeyError, IndexError):
+                        glidein_ids.add("%d %s" % (scheddIdx, jid))
+        out_job_counts[glidename] = len(job_ids)
+        out_glidein_counts[glidename] = len(glidein_ids)
+    return out_job_counts, out_glidein_counts
+
+
+def replay_running(condorq_dict, glidein_dict, seed=1):
+    """Make the dumped jobs run on the dumped entries: return the running jobs and the collector slots
+
+    Each job runs on a random entry, in a slot of a collector advertised like a glidein of that entry
+    """
+    rnd = random.Random(seed)
+    glidenames = list(glidein_dict)
+    running_dict = {}
+    status_data = {}
+    for schedd, condorq in condorq_dict.items():
+        running_data = {}
+        for jid, job in condorq.fetchStored().items():
+            glidename = rnd.choice(glidenames)
+            entry, name, factory = glidename[1].split("@")[:3]
+            remote_host = "slot1_%d@glidein_%d@%s" % (len(status_data) % 8, len(status_data) // 8, schedd)
+            status_data[remote_host] = {
+                "GLIDEIN_Entry_Name": entry,
+                "GLIDEIN_Name": name,
+                "GLIDEIN_Factory": factory,
+                "GLIDEIN_Schedd": "schedd_glideins@%s" % glidename[0],
+            }
+            running_data[jid] = dict(job, JobStatus=2, RemoteHost=remote_host)
+        running_dict[schedd] = mock_condorq_el(running_data)
+    return running_dict, {"collector": mock_condorq_el(status_data)}
+
+
+def benchmark_running(mexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list, repeat=1):
+    """Run countRealRunning and its previous version on the dumped jobs made running, compare results and times"""
+    cexpr = compile(mexpr, "<string>", "eval")
+    running_dict, status_dict = replay_running(condorq_dict, glidein_dict)
+    start = time.time()
+    running_index = appendRealRunning(running_dict, status_dict)
+    print("appendRealRunning (and running job index): %.3fs" % (time.time() - start))
+    timings = {"all entries": [], "indexed": []}
+    results = {}
+    for _ in range(repeat):
+        start = time.time()
+        results["all entries"] = countRealRunningAllEntries(
+            cexpr, running_dict, glidein_dict, attr_dict, condorq_match_list
+        )
+        timings["all entries"].append(time.time() - start)
+        start = time.time()
+        results["indexed"] = countRealRunning(
+            cexpr, running_dict, glidein_dict, attr_dict, condorq_match_list, running_index=running_index
+        )
+        timings["indexed"].append(time.time() - start)
+    for name in ("all entries", "indexed"):
+        print(
+            "countRealRunning %-11s: best %.3fs, average %.3fs"
+            % (name, min(timings[name]), sum(timings[name]) / repeat)
+        )
+    print("Speedup: %.1fx" % (min(timings["all entries"]) / max(min(timings["indexed"]), 1e-9)))
+    same = results["all entries"] == results["indexed"]
+    print("Same results: %s" % same)
+    return same
 
-    # The condor_q dictionary names depend on the schedd names, use glob to get them
-    cwd = os.getcwd()
-    os.chdir(dumpdir)
-    qdicts = glob.glob("condorq_dict*.pickle")
-    os.chdir(cwd)
 
-    condorq_dict = {}
-    for schedd_name in qdicts:
-        with open(os.path.join(dumpdir, schedd_name), "rb") as fd:
-            condorq_dict[schedd_name] = mock_condorq_el(pickle.load(fd))
+def main():
+    # Need to be global for cProfile to work
+    global cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list, engine
+    parser = argparse.ArgumentParser(description="Profile and benchmark countMatch using a frontend dump")
+    # This will profile the main group by default. Change it to profile another one
+    parser.add_argument("dumpdir", nargs="?", default="/tmp/frontend_dump/main/", help="group dump directory")
+    parser.add_argument(
+        "--mode",
+        choices=("benchmark", "benchmark-running", "profile-eval", "profile-engine"),
+        default="benchmark",
+        help="compare the eval() path and the match engine, or profile one of them, "
+        "or compare countRealRunning with its previous version (benchmark-running)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of benchmark iterations")
+    parser.add_argument("--expr", default=None, help="match expression (default: CMS expression of April 2019)")
+    args = parser.parse_args()
 
+    # The CMS matching expression as of April 17th 2019
+    mexpr = """(((glidein["attrs"].get("GLIDEIN_MaxMemMBs", 0) == 0) or (job.get("RequestMemory", 0)<=glidein["attrs"]["GLIDEIN_MaxMemMBs"])) and ((job.get("REQUIRED_OS", "any")=="any") or (glidein["attrs"].get("GLIDEIN_REQUIRED_OS", "any")=="any") or (job.get("REQUIRED_OS")==glidein["attrs"]["GLIDEIN_REQUIRED_OS"])) and ((job.get("MaxWallTimeMins", 0)*60)>=glidein["attrs"].get("GLIDEIN_Job_Min_Time", 0)) and ((job.get("MaxWallTimeMins", 0)+10)<(glidein["attrs"]["GLIDEIN_Max_Walltime"]-glidein["attrs"]["GLIDEIN_Retire_Time_Spread"])/60))"""
+    if args.expr:
+        mexpr = args.expr
+    logSupport.log = FakeLogger()
+
+    # Load the saved dictionaries
+    condorq_dict, glidein_dict, attr_dict, condorq_match_list = load_dump(args.dumpdir)
     print("Frontend dump loaded")
 
-    cProfile.run("countMatch(cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list)")
+    if args.mode == "benchmark":
+        return 0 if benchmark(mexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list, args.repeat) else 1
+    if args.mode == "benchmark-running":
+        same = benchmark_running(mexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list, args.repeat)
+        return 0 if same else 1
+
+    cexpr = compile(mexpr, "<string>", "eval")
+    engine = MatchEngine(mexpr) if args.mode == "profile-engine" else None
+    cProfile.run(
+        "countMatch(cexpr, condorq_dict, glidein_dict, attr_dict, False, condorq_match_list, match_engine=engine)"
+    )
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
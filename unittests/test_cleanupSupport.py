@@ -14,10 +14,10 @@ Project:
    tiradani: <tiradani@fnal.gov>
 """
 
-
 import os
 import shutil
 import tempfile
+import time
 import unittest
 
 import xmlrunner
@@ -132,5 +132,103 @@ class TestCleanupSupport(unittest.TestCase):
         )
 
 
+class TestDirCleanup(unittest.TestCase):
+    """Test the cap on the removals, the cursor and the time buckets of the directory cleaners"""
+
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.cleanup_dir = tempfile.mkdtemp()
+        self.now = time.time()
+
+    def tearDown(self):
+        shutil.rmtree(self.cleanup_dir)
+
+    def create_file(self, fname, age, size=10):
+        fpath = os.path.join(self.cleanup_dir, fname)
+        with open(fpath, "w") as f:
+            f.write("x" * size)
+        os.utime(fpath, (self.now - age, self.now - age))
+        return fpath
+
+    def create_bucket(self, age, files_age):
+        bucket_time = self.now - age
+        bucket = os.path.join(self.cleanup_dir, time.strftime("%Y%m%d", time.localtime(bucket_time)))
+        os.mkdir(bucket)
+        for i, file_age in enumerate(files_age):
+            self.create_file(os.path.join(bucket, "job.%i.out" % i), file_age)
+        os.utime(bucket, (bucket_time, bucket_time))
+        return bucket
+
+    def remaining(self):
+        return sorted(os.listdir(self.cleanup_dir))
+
+    def test_max_removes(self):
+        for i in range(10):
+            self.create_file("job.%i.out" % i, 1000)
+        self.create_file("job.young.out", 10)
+        self.create_file("other.out", 1000)
+        cleaner = cleanupSupport.DirCleanup(self.cleanup_dir, r"job\..*\.out", 100, max_removes=4)
+        cleaner.cleanup()
+        # 8 files and the cursor
+        self.assertEqual(9, len(self.remaining()))
+        self.assertIn(os.path.basename(cleaner.cursor_fname), self.remaining())
+        cleaner.cleanup()
+        cleaner.cleanup()
+        # the last cleanup wrapped around and removed the cursor
+        self.assertEqual(["job.young.out", "other.out"], self.remaining())
+
+    def test_bucket_max_removes(self):
+        bucket = self.create_bucket(10 * 86400, [10 * 86400] * 5)
+        cleaner = cleanupSupport.DirCleanup(
+            self.cleanup_dir, r"job\..*\.out", 2 * 86400, max_removes=2, bucket_format="%Y%m%d"
+        )
+        cleaner.cleanup()
+        # the cleanup stops within the bucket and the next ones continue from it
+        self.assertEqual(3, len(os.listdir(bucket)))
+        cleaner.cleanup()
+        self.assertEqual(1, len(os.listdir(bucket)))
+        # the expired bucket is removed once empty, despite the removals changing its modification time
+        cleaner.cleanup()
+        self.assertEqual([], self.remaining())
+
+    def test_buckets(self):
+        self.create_bucket(10 * 86400, [10 * 86400, 9 * 86400])  # expired, removed at once
+        partial = self.create_bucket(5 * 86400, [5 * 86400, 10])  # one file still recent
+        young = self.create_bucket(0, [0])
+        self.create_file("job.old.out", 3 * 86400)
+        cleaner = cleanupSupport.DirCleanup(self.cleanup_dir, r"job\..*\.out", 2 * 86400, bucket_format="%Y%m%d")
+        cleaner.cleanup()
+        self.assertEqual(sorted([os.path.basename(partial), os.path.basename(young)]), self.remaining())
+        self.assertEqual(["job.1.out"], os.listdir(partial))
+        self.assertEqual(["job.0.out"], os.listdir(young))
+
+    def test_bucket_other_files(self):
+        bucket = self.create_bucket(10 * 86400, [10 * 86400, 9 * 86400])
+        self.create_file(os.path.join(bucket, "other.out"), 10 * 86400)
+        os.utime(bucket, (self.now - 10 * 86400, self.now - 10 * 86400))
+        cleaner = cleanupSupport.DirCleanup(self.cleanup_dir, r"job\..*\.out", 2 * 86400, bucket_format="%Y%m%d")
+        cleaner.cleanup()
+        # only the matching files are removed, the bucket is kept with the others
+        self.assertEqual([os.path.basename(bucket)], self.remaining())
+        self.assertEqual(["other.out"], os.listdir(bucket))
+
+    def test_space(self):
+        for i in range(5):
+            self.create_file("job.%i.out" % i, 1000 * (i + 1), 100)
+        young = self.create_bucket(0, [0])
+        # 600 bytes, max 250: removes the oldest, not younger than minlife
+        cleaner = cleanupSupport.DirCleanupWSpace(
+            self.cleanup_dir, r"job\..*\.out", 10000, 2500, 250, bucket_format="%Y%m%d"
+        )
+        cleaner.cleanup()
+        self.assertEqual([os.path.basename(young), "job.0.out", "job.1.out"], self.remaining())
+        # the cleanup stopping at max_removes does not check the space
+        cleaner = cleanupSupport.DirCleanupWSpace(self.cleanup_dir, r"job\..*\.out", 1500, 0, 0, max_removes=1)
+        cleaner.cleanup()
+        self.assertEqual(
+            [os.path.basename(cleaner.cursor_fname), os.path.basename(young), "job.0.out"], self.remaining()
+        )
+
+
 if __name__ == "__main__":
     unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -96,6 +96,19 @@ class TestGlideinDicts(unittest.TestCase):
         nmd = self.cgpd.new_MainDicts()
         nmd.populate()
 
+    def test_performance_knobs(self):
+        glidein_dict = self.cgpd.main_dicts["glidein"]
+        self.assertEqual("0", glidein_dict["JobCacheFullRefresh"])
+        self.assertEqual("0", glidein_dict["WorkSnapshotMaxAge"])
+        self.assertEqual("0", glidein_dict["AdvertiseKeepAlive"])
+        self.assertEqual("False", glidein_dict["AdvertiseWithBindings"])
+        self.assertEqual("False", glidein_dict["RRDBatchUpdates"])
+        self.assertEqual("", glidein_dict["RRDCachedDaemon"])
+        self.assertEqual("False", glidein_dict["RRDStatusWindows"])
+        self.assertEqual("False", glidein_dict["LogSingleWriter"])
+        self.assertEqual("0", glidein_dict["CleanupMaxRemoves"])
+        self.assertEqual("False", glidein_dict["ClientLogBuckets"])
+
     def test_reuse(self):
         nmd = self.cgpd.new_MainDicts()
         self.cgpd.main_dicts.reuse(nmd)
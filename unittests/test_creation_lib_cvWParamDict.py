@@ -12,7 +12,7 @@ import unittest
 
 import xmlrunner
 
-from glideinwms.creation.lib import xslt
+from glideinwms.creation.lib import cWDictFile, xslt
 from glideinwms.creation.lib.cvWParamDict import (
     apply_group_singularity_policy,
     apply_multicore_policy,
@@ -162,16 +162,19 @@ class TestFrontendDicts(unittest.TestCase):
 
 
 class TestPopulateGroupDescript(unittest.TestCase):
-    @unittest.skip("for now")
     def test_populate_group_descript(self):
-        # self.assertEqual(
-        #    expected,
-        #    populate_group_descript(
-        #        work_dir,
-        #        group_descript_dict,
-        #        sub_name,
-        #        sub_params))
-        assert False  # TODO: implement your test here
+        fe_params = VOFrontendParams(USAGE_PREFIX, "fixtures/frontend", ["fixtures/frontend.xml"] * 2)
+        group_descript_dict = cWDictFile.StrDictFile("fixtures/frontend/work-dir", "group.descript")
+        populate_group_descript("fixtures/frontend/work-dir", group_descript_dict, "main", fe_params.groups["main"])
+        self.assertEqual("main", group_descript_dict["GroupName"])
+        # the performance options not set in the group use the global value
+        self.assertEqual("", group_descript_dict["MatchEngine"])
+        self.assertEqual("", group_descript_dict["CompactClassads"])
+        self.assertEqual("", group_descript_dict["ScheddQueryTimeout"])
+        self.assertEqual("", group_descript_dict["JobCacheFullRefresh"])
+        self.assertEqual("", group_descript_dict["MatchCacheSize"])
+        self.assertEqual("", group_descript_dict["MatchCacheMaxAge"])
+        self.assertEqual("", group_descript_dict["AdvertiseKeepAlive"])
 
 
 class TestGetPoolList(unittest.TestCase):
@@ -106,6 +106,28 @@ class TestVOFrontendParams(unittest.TestCase):
         except RuntimeError as err:
             self.fail(err)
 
+    def test_performance_defaults(self):
+        p = self.v_o_frontend_params
+        self.assertEqual("batched", p.config.match_engine)
+        self.assertEqual("False", p.config.compact_classads)
+        self.assertEqual("0", p.config.schedd_query_timeout)
+        self.assertEqual("0", p.config.job_cache_full_refresh)
+        self.assertEqual("0", p.config.match_cache_size)
+        self.assertEqual("86400", p.config.match_cache_max_age)
+        self.assertEqual("0", p.config.advertise_keepalive)
+        self.assertEqual("False", p.advertise_with_bindings)
+        self.assertEqual("False", p.rrd_batch_updates)
+        self.assertEqual("", p.rrd_cached_daemon)
+        self.assertEqual("False", p.log_single_writer)
+        # empty group values, the global ones are used
+        self.assertEqual("", p.groups["main"].config.match_engine)
+        self.assertEqual("", p.groups["main"].config.compact_classads)
+        self.assertEqual("", p.groups["main"].config.schedd_query_timeout)
+        self.assertEqual("", p.groups["main"].config.job_cache_full_refresh)
+        self.assertEqual("", p.groups["main"].config.match_cache_size)
+        self.assertEqual("", p.groups["main"].config.match_cache_max_age)
+        self.assertEqual("", p.groups["main"].config.advertise_keepalive)
+
     def test_validate_names(self):
         try:
             self.v_o_frontend_params.validate_names()
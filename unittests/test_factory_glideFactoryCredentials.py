@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the credential store in glideinwms/factory/glideFactoryCredentials.py"""
+
+import os
+import tempfile
+import unittest
+
+import xmlrunner
+
+from glideinwms.factory import glideFactoryCredentials, glideFactoryLib
+from glideinwms.lib import logSupport
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+
+class TestCredentialStore(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.factory_config = glideFactoryLib.factoryConfig
+        glideFactoryLib.factoryConfig = glideFactoryLib.FactoryConfig()
+        glideFactoryLib.factoryConfig.config_whoamI("factory", "glidein")
+        glideFactoryLib.factoryConfig.config_dirs("submit", "log", "client_log", self.tmpdir.name)
+        os.makedirs(glideFactoryLib.factoryConfig.get_client_proxies_dir("user"))
+        self.store = glideFactoryCredentials.CredentialStore()
+
+    def tearDown(self):
+        glideFactoryLib.factoryConfig = self.factory_config
+        self.tmpdir.cleanup()
+
+    def test_update(self):
+        fname, fname_compressed = self.store.update("user", "cred1", b"proxy", "frontend")
+        self.assertEqual("credential_frontend_cred1", os.path.basename(fname))
+        with open(fname, "rb") as f:
+            self.assertEqual(b"proxy", f.read())
+        with open(fname_compressed, "rb") as f:
+            self.assertTrue(f.read().startswith(b"glidein_credentials="))
+        self.assertEqual({"writes": 2, "unchanged": 0}, self.store.get_stats())
+        self.assertEqual(
+            glideFactoryCredentials.get_credential_digest(b"proxy"), self.store.get_digest("user", "cred1")
+        )
+
+        # unchanged
+        self.store.update("user", "cred1", b"proxy", "frontend")
+        self.assertEqual({"writes": 0, "unchanged": 2}, self.store.get_stats())
+        # the mapped IDTOKEN changes only the compressed file
+        with open(f"{fname}_idtoken", "w") as f:
+            f.write("token")
+        self.store.update("user", "cred1", b"proxy", "frontend")
+        self.assertEqual({"writes": 1, "unchanged": 1}, self.store.get_stats())
+        with open(fname_compressed, "rb") as f:
+            self.assertTrue(f.read().startswith(b"token####glidein_credentials="))
+        # changed, with a backup of the previous one
+        self.store.update("user", "cred1", b"proxy2", "frontend")
+        self.assertEqual({"writes": 2, "unchanged": 0}, self.store.get_stats())
+        with open(f"{fname}.old", "rb") as f:
+            self.assertEqual(b"proxy", f.read())
+        # removed by the cleanup
+        os.remove(fname)
+        self.store.update("user", "cred1", b"proxy2", "frontend")
+        self.assertEqual({"writes": 1, "unchanged": 1}, self.store.get_stats())
+        # after a restart the credential file is compared with the one on disk
+        store = glideFactoryCredentials.CredentialStore()
+        store.update("user", "cred1", b"proxy2", "frontend")
+        self.assertEqual({"writes": 1, "unchanged": 1}, store.get_stats())
+
+    def test_safe_update(self):
+        fname = os.path.join(self.tmpdir.name, "credential")
+        self.assertTrue(glideFactoryCredentials.safe_update(fname, b"data"))
+        self.assertEqual(0o600, os.stat(fname).st_mode & 0o777)
+        self.assertFalse(glideFactoryCredentials.safe_update(fname, "data"))
+        self.assertTrue(glideFactoryCredentials.safe_update(fname, b"new"))
+        self.assertFalse(os.path.exists(f"{fname}.new"))
+
+    def test_check_security_credentials(self):
+        check = glideFactoryCredentials.check_security_credentials
+        check("grid_proxy", {"SubmitProxy": "p1"}, "client", "entry")
+        with self.assertRaises(glideFactoryCredentials.CredentialError):
+            check("grid_proxy", {"SubmitProxy": "p1", "Username": "u"}, "client", "entry")
+        check("grid_proxy", {"SubmitProxy": "p2"}, "client", "entry")
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the symmetric key cache in glideinwms/factory/glideFactoryInterface.py"""
+
+import os
+import re
+import stat
+import tempfile
+import unittest
+
+import xmlrunner
+
+from glideinwms.lib import logSupport
+from glideinwms.unittests.unittest_utils import FakeLogger, TestImportError
+
+try:
+    from glideinwms.factory import glideFactoryInterface as gfi
+    from glideinwms.factory.glideFactoryInterface import SymKeyCache
+    from glideinwms.lib.pubCrypto import RSAKey
+    from glideinwms.lib.symCrypto import AutoSymKey, SymAES128Key
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+class CountingKey:
+    """Factory key (like GlideinKey) counting the RSA decryptions"""
+
+    sym_class = AutoSymKey
+
+    def __init__(self, pub_key_id="factory-key"):
+        self.pub_key_id = pub_key_id
+        self.rsa_key = RSAKey()
+        self.rsa_key.new(2048)
+        self.extracted = 0
+
+    def extract_sym_key(self, enc_sym_key):
+        self.extracted += 1
+        return self.sym_class(self.rsa_key.decrypt_hex(enc_sym_key))
+
+
+class TestSymKeyCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logSupport.log = FakeLogger()
+        cls.pub_key = CountingKey()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = os.path.join(self.tmpdir.name, "sym_key_cache.pickle")
+        self.pub_key.extracted = 0
+        self.sym_key = SymAES128Key()
+        self.sym_key.new()
+        self.enc_key_code = self.pub_key.rsa_key.PubRSAKey().encrypt_hex(self.sym_key.get_code()).decode("utf-8")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_memory_cache(self):
+        cache = SymKeyCache()
+        for _ in range(3):
+            sym_key_obj = cache.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+            self.assertEqual(self.sym_key.get_code(), sym_key_obj.get_code())
+        self.assertEqual(1, self.pub_key.extracted)
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+        # a different Frontend key ID does not match
+        cache.extract_sym_key(self.pub_key, "other-key", self.enc_key_code)
+        self.assertEqual(2, self.pub_key.extracted)
+
+    def test_ttl_and_size(self):
+        cache = SymKeyCache(ttl=-1)
+        cache.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        cache.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        self.assertEqual(2, self.pub_key.extracted)
+        cache = SymKeyCache(max_entries=2)
+        for i in range(5):
+            cache.extract_sym_key(self.pub_key, "frontend-key-%i" % i, self.enc_key_code)
+        self.assertEqual(2, len(cache.keys))
+
+    def test_shared_store(self):
+        cache1 = SymKeyCache(self.store)
+        cache1.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.store).st_mode))
+        # another process (new cache object) finds the key in the file
+        cache2 = SymKeyCache(self.store)
+        sym_key_obj = cache2.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        self.assertEqual(self.sym_key.get_code(), sym_key_obj.get_code())
+        self.assertEqual(1, self.pub_key.extracted)
+        self.assertEqual((1, 0), (cache2.store_hits, cache2.misses))
+        # a corrupted file is ignored and rewritten
+        with open(self.store, "wb") as f:
+            f.write(b"not a pickle")
+        cache3 = SymKeyCache(self.store)
+        cache3.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        self.assertEqual(2, self.pub_key.extracted)
+        self.assertEqual(1, len(cache3._read_store()))
+
+    def test_invalid_key_not_cached(self):
+        cache = SymKeyCache(self.store)
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                cache.extract_sym_key(self.pub_key, "frontend-key", "00ff")
+        self.assertEqual(2, self.pub_key.extracted)
+        self.assertEqual({}, cache._read_store())
+
+    def test_decrypt_hex(self):
+        cache = SymKeyCache(max_values=2)
+        sym_key_obj = cache.extract_sym_key(self.pub_key, "frontend-key", self.enc_key_code)
+        values = ["value%i" % i for i in range(3)]
+        encrypted = [self.sym_key.encrypt_hex(v).decode("utf-8") for v in values]
+        for _ in range(2):
+            for value, enc_value in zip(values, encrypted):
+                self.assertEqual(value.encode("utf-8"), cache.decrypt_hex(sym_key_obj, enc_value))
+        self.assertEqual(2, len(cache.values))
+        # the same encrypted value with a different key is not taken from the cache
+        other_key = SymAES128Key()
+        other_key.new()
+        self.assertNotEqual(values[2].encode("utf-8"), cache.decrypt_hex(other_key, encrypted[2]))
+
+
+class FakeCondorStatus:
+    """CondorStatus returning the request classads matching the ReqGlidein list in the constraint"""
+
+    queries = 0
+    classads = {}
+
+    def __init__(self, subsystem_name=None, pool_name=None):
+        self.stored_data = {}
+
+    def require_integrity(self, value):
+        pass
+
+    def load(self, constraint):
+        FakeCondorStatus.queries += 1
+        match = re.search(r'stringListMember\(ReqGlidein,"([^"]*)"\)', constraint)
+        if match:
+            req_glideins = match.group(1).split(",")
+        else:
+            req_glideins = [re.search(r'ReqGlidein=\?="([^"]*)"', constraint).group(1)]
+        self.stored_data = {k: dict(v) for k, v in self.classads.items() if v["ReqGlidein"] in req_glideins}
+
+    def fetchStored(self):
+        return self.stored_data
+
+
+class TestFindGroupWorkSnapshot(unittest.TestCase):
+    entries = ["entry_%i" % i for i in range(6)]
+    groups = (entries[:2], entries[2:4], entries[4:])
+
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved = (
+            gfi.condorMonitor.CondorStatus,
+            gfi.factoryConfig.lock_dir,
+            gfi.factoryConfig.work_snapshot_max_age,
+            gfi.factoryConfig.work_snapshot_entries,
+        )
+        gfi.condorMonitor.CondorStatus = FakeCondorStatus
+        gfi.factoryConfig.lock_dir = self.tmpdir.name
+        FakeCondorStatus.queries = 0
+        FakeCondorStatus.classads = {}
+        for i, entry in enumerate(self.entries):
+            for fe in ("fe1", "fe2"):
+                name = f"{entry}@gl@fact_{fe}"
+                FakeCondorStatus.classads[name] = {
+                    "ReqGlidein": f"{entry}@gl@fact",
+                    "ReqName": f"{entry}@gl@fact",
+                    "ClientName": fe,
+                    "ReqIdleGlideins": i,
+                    "GlideinParamX": fe,
+                }
+
+    def tearDown(self):
+        (
+            gfi.condorMonitor.CondorStatus,
+            gfi.factoryConfig.lock_dir,
+            gfi.factoryConfig.work_snapshot_max_age,
+            gfi.factoryConfig.work_snapshot_entries,
+        ) = self.saved
+        self.tmpdir.cleanup()
+
+    def find_all(self):
+        return [gfi.findGroupWork("fact", "gl", group, None) for group in self.groups]
+
+    def test_snapshot(self):
+        reference = self.find_all()
+        self.assertEqual(len(self.groups), FakeCondorStatus.queries)
+        gfi.factoryConfig.work_snapshot_max_age = 60
+        gfi.factoryConfig.work_snapshot_entries = self.entries
+        FakeCondorStatus.queries = 0
+        self.assertEqual(reference, self.find_all())
+        self.assertEqual(1, FakeCondorStatus.queries)
+        for group, work in zip(self.groups, reference):
+            self.assertEqual(sorted(group), sorted(work))
+            for entry in group:
+                self.assertEqual(2, len(work[entry]))
+        # a stale snapshot is refreshed
+        snapshots = [f for f in os.listdir(self.tmpdir.name) if f.startswith("gfi_work.")]
+        self.assertEqual(1, len(snapshots))
+        fname = os.path.join(self.tmpdir.name, snapshots[0])
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(fname).st_mode))
+        with open(fname, "rb") as f:
+            snapshot = gfi.pickle.load(f)
+        snapshot["time"] -= 120
+        with open(fname, "wb") as f:
+            gfi.pickle.dump(snapshot, f)
+        self.assertEqual(reference, self.find_all())
+        self.assertEqual(2, FakeCondorStatus.queries)
+
+    def test_find_work(self):
+        # findWork queries a single entry and never uses the snapshot
+        gfi.factoryConfig.work_snapshot_max_age = 60
+        gfi.factoryConfig.work_snapshot_entries = self.entries
+        work = gfi.findWork("fact", "gl", "entry_1", None)
+        self.assertEqual(["entry_1@gl@fact_fe1", "entry_1@gl@fact_fe2"], sorted(work))
+        self.assertEqual(1, work["entry_1@gl@fact_fe1"]["requests"]["IdleGlideins"])
+        self.assertEqual([], [f for f in os.listdir(self.tmpdir.name) if f.startswith("gfi_work.")])
+
+    def test_corrupted_snapshot(self):
+        gfi.factoryConfig.work_snapshot_max_age = 60
+        gfi.factoryConfig.work_snapshot_entries = self.entries
+        reference = self.find_all()
+        for f in os.listdir(self.tmpdir.name):
+            if f.startswith("gfi_work."):
+                with open(os.path.join(self.tmpdir.name, f), "wb") as fd:
+                    fd.write(b"corrupted")
+        self.assertEqual(reference, self.find_all())
+        self.assertEqual(2, FakeCondorStatus.queries)
+
+
+class TestRequestParsing(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+
+    def test_classify(self):
+        classifier = gfi.get_attr_classifier()
+        classify = classifier.classify
+        self.assertEqual((("requests", "IdleGlideins"),), classify("ReqIdleGlideins"))
+        self.assertEqual((("web", "URL"),), classify("WebURL"))
+        self.assertEqual((("params", "GLIDEIN_Cpus"),), classify("GlideinParamGLIDEIN_Cpus"))
+        self.assertEqual((("monitor", "Idle"),), classify("GlideinMonitorIdle"))
+        self.assertEqual((("params_decrypted", "SecurityName"),), classify("GlideinEncParamSecurityName"))
+        self.assertEqual((), classify("ReqName"))
+        self.assertEqual((), classify("MyType"))
+        self.assertIs(classifier, gfi.get_attr_classifier())
+        # overlapping prefixes put the attribute in both buckets
+        classifier = gfi.RequestAttrClassifier((("params", "Glidein"), ("monitor", "GlideinMon")))
+        self.assertEqual((("params", "MonIdle"), ("monitor", "Idle")), classifier.classify("GlideinMonIdle"))
+
+    def test_parse_request(self):
+        kel = {
+            "ReqName": "entry@gl@fact",
+            "ReqGlidein": "entry@gl@fact",
+            "ClientName": "fe1",
+            "LastHeardFrom": 100,
+            "ReqIdleGlideins": 3,
+            "WebURL": "http://fe",
+            "GlideinParamA": "a",
+            "GlideinMonitorIdle": 7,
+            "GlideinEncParamB": "00",
+        }
+        el = gfi._parse_request("fe1", kel, None)
+        self.assertEqual(
+            {
+                "requests": {"IdleGlideins": 3},
+                "web": {"URL": "http://fe"},
+                "params": {"A": "a"},
+                "params_decrypted": {"B": None},
+                "monitor": {"Idle": 7},
+                "internals": {"ReqName": "entry@gl@fact", "ClientName": "fe1", "LastHeardFrom": 100},
+            },
+            el,
+        )
+        # unchanged requests are not parsed again and the returned work can be modified
+        old_parsed = {}
+        gfi._parse_request("fe1", kel, None, None, old_parsed)
+        old_parsed["fe1"][1]["params"]["A"] = "cached"
+        new_parsed = {}
+        el2 = gfi._parse_request("fe1", kel, None, old_parsed, new_parsed)
+        self.assertEqual("cached", el2["params"]["A"])
+        self.assertIs(old_parsed["fe1"], new_parsed["fe1"])
+        el2["params"]["A"] = "modified"
+        self.assertEqual("cached", old_parsed["fe1"][1]["params"]["A"])
+        # a new advertisement is parsed again
+        kel["LastHeardFrom"] = 101
+        self.assertEqual("a", gfi._parse_request("fe1", kel, None, old_parsed, {})["params"]["A"])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -5,7 +5,6 @@
 
 """Unit test for glideinwms/factory/glideFactoryLib.py"""
 
-
 # from glideinwms.factory import glideFactoryConfig
 import os
 import unittest
@@ -147,6 +146,7 @@ class TestFactoryConfig(unittest.TestCase):
         expected = "client_log_base_dir/user_username/"
         expected += "glidein_glidein_name/entry_entry_name"
         self.assertEqual(expected, cldr)
+        self.assertEqual(expected + "/20240131", self.cnf.get_client_log_dir(entry_name, username, "20240131"))
 
     def test_get_client_proxies_dir(self):
         username = "username"
@@ -15,11 +15,13 @@
 #
 
 
+import os
+import tempfile
 import unittest
 
 import xmlrunner
 
-from glideinwms.factory.glideFactoryLogParser import _extract_log_data
+from glideinwms.factory.glideFactoryLogParser import _extract_log_data, logSummaryTimingsOut
 
 
 class TestUtils(unittest.TestCase):
@@ -34,5 +36,18 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(out["condor_duration"], 8307)
 
 
+class TestLogSummaryTimingsOut(unittest.TestCase):
+    def test_get_job_dirname(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            logname = os.path.join(log_dir, "condor_activity_20240131_frontend.log")
+            summary = logSummaryTimingsOut(logname, log_dir, "user")
+            self.assertEqual(log_dir, summary.get_job_dirname())
+            # time-bucketed job files
+            os.mkdir(os.path.join(log_dir, "20240131"))
+            self.assertEqual(os.path.join(log_dir, "20240131"), summary.get_job_dirname())
+            summary = logSummaryTimingsOut(os.path.join(log_dir, "submit_frontend.log"), log_dir, "user")
+            self.assertEqual(log_dir, summary.get_job_dirname())
+
+
 if __name__ == "__main__":
     unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
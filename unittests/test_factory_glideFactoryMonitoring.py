@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the columnar condorQStats and the RRD rolling windows in glideinwms/factory/glideFactoryMonitoring.py
+and the aggregation from snapshots in glideinwms/factory/glideFactoryMonitorAggregator.py
+"""
+
+import os
+import pickle
+import re
+import tempfile
+import unittest
+
+from unittest import mock
+
+import xmlrunner
+
+from glideinwms.factory import glideFactoryMonitorAggregator, glideFactoryMonitoring
+from glideinwms.lib import logSupport, snapshotSupport
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+NOW = 1700000000.0
+
+
+class FakeRRD:
+    """rrdSupport stub recording the updates"""
+
+    def __init__(self):
+        self.updates = {}
+
+    def isDummy(self):
+        return False
+
+    def create_rrd_multi(self, *args, **kwargs):
+        pass
+
+    def update_rrd_multi(self, fname, time, val_dict):
+        self.updates[fname] = dict(val_dict)
+
+
+def fill_stats(qc_stats, nr_frontends):
+    """Log some requests, schedd status and client monitoring in qc_stats"""
+    for j in range(nr_frontends):
+        fe = "fe%i" % j
+        if j % 2 == 0:
+            qc_stats.logSchedd(fe, {1: 3 + j, 2: 4, 5: 1}, {"entry_x/job.ent1.condor": {1: 3}})
+        qc_stats.logRequest(fe, {"IdleGlideins": 5, "MaxGlideins": 10 * j})
+        if j != 1:
+            qc_stats.logClientMonitor(
+                fe, {"Idle": 3, "Running": 2 + j, "GlideinsRunning": 1}, {"LastHeardFrom": NOW - 100 * (j + 1)}, 1.0
+            )
+    qc_stats.finalizeClientMonitor()
+
+
+class TestQStatsRow(unittest.TestCase):
+    def test_sum(self):
+        row1 = glideFactoryMonitoring.QStatsRow()
+        row1.add("Requested", [1, 2, 3, 4])
+        row2 = glideFactoryMonitoring.QStatsRow()
+        row2.add("Requested", [1, 1, 1, 1])
+        row2.add("Status", list(range(9)))
+        total = glideFactoryMonitoring.QStatsRow.sum([row1, row2])
+        self.assertEqual({"Status", "Requested"}, total.types)
+        self.assertEqual({"Idle": 2, "MaxGlideins": 3, "IdleCores": 4, "MaxCores": 5}, total.get_type_dict("Requested"))
+        self.assertEqual(["Status", "Requested"], list(total.get_dict()))
+        row1.add_row(row2)
+        self.assertEqual(total.get_dict(), row1.get_dict())
+        self.assertEqual(set(), glideFactoryMonitoring.QStatsRow.sum([]).types)
+
+    def test_dict(self):
+        row = glideFactoryMonitoring.QStatsRow()
+        row.add("ClientMonitor", [1, 2, 3, 4, 5, 6, 7, 8, 9, 30, 3])
+        el = row.get_dict()
+        # internal counters are not published
+        self.assertNotIn("InfoAgeAvgCounter", el["ClientMonitor"])
+        row.average_info_age()
+        self.assertEqual(10, row.get_type_dict("ClientMonitor")["InfoAge"])
+        # from the XML files, everything is a string
+        xml_el = {"ClientMonitor": {k: str(v) for k, v in row.get_dict()["ClientMonitor"].items()}, "Downtime": {}}
+        self.assertEqual(row.get_dict(), glideFactoryMonitoring.QStatsRow.from_dict(xml_el).get_dict())
+        rrd_values = row.get_rrd_values()
+        self.assertEqual(10, rrd_values["ClientInfoAge"])
+        self.assertIsNone(rrd_values["StatusIdle"])
+        self.assertEqual(23, len(rrd_values))
+        row2 = pickle.loads(pickle.dumps(row))
+        self.assertEqual((row.types, row.values), (row2.types, row2.values))
+
+
+class TestCondorQStats(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+
+    @mock.patch("time.time", return_value=NOW)
+    def test_total(self, mock_time):
+        qc_stats = glideFactoryMonitoring.condorQStats(log=FakeLogger(), cores=2)
+        fill_stats(qc_stats, 3)
+        data = qc_stats.get_data()
+        self.assertEqual(
+            {
+                "Idle": 8,
+                "Running": 8,
+                "Held": 2,
+                "Wait": 0,
+                "Pending": 0,
+                "StageIn": 0,
+                "IdleOther": 0,
+                "StageOut": 0,
+                "RunningCores": 16,
+            },
+            qc_stats.get_total()["Status"],
+        )
+        total = qc_stats.get_total()
+        self.assertEqual({"Idle": 15, "MaxGlideins": 30, "IdleCores": 30, "MaxCores": 60}, total["Requested"])
+        # InfoAge is the average of the frontends with ClientMonitor
+        self.assertEqual(200, total["ClientMonitor"]["InfoAge"])
+        self.assertEqual(6, total["ClientMonitor"]["JobsRunning"])
+        # the counters have the same values of the dictionaries
+        for fe in data:
+            self.assertEqual(
+                {tp: el for tp, el in data[fe].items() if tp in glideFactoryMonitoring.QSTATS_TYPES},
+                {tp: {**el, **data[fe][tp]} for tp, el in qc_stats.columns[fe].get_dict().items()},
+            )
+
+    def test_total_zero(self):
+        qc_stats = glideFactoryMonitoring.condorQStats(log=FakeLogger())
+        history = {"set_to_zero": False}
+        self.assertEqual({"Status": qc_stats.get_zero_data_element()["Status"]}, qc_stats.get_total(history))
+        self.assertTrue(history["set_to_zero"])
+        qc_stats.logRequest("fe1", {"IdleGlideins": 1})
+        self.assertEqual(["Status", "Requested"], list(qc_stats.get_total(history)))
+        self.assertTrue(history["set_to_zero"])
+
+
+class TestAggregateStatus(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.monitor_dir = self.tmpdir.name
+        self.rrd = FakeRRD()
+        self.entries = ["e1", "e2", "e3"]
+        with mock.patch("time.time", return_value=NOW):
+            for i, entry in enumerate(self.entries):
+                config = glideFactoryMonitoring.MonitoringConfig(log=FakeLogger())
+                config.rrd_obj = self.rrd
+                config.monitor_dir = os.path.join(self.monitor_dir, f"entry_{entry}")
+                os.makedirs(config.monitor_dir)
+                qc_stats = glideFactoryMonitoring.condorQStats(log=FakeLogger(), cores=i + 1)
+                fill_stats(qc_stats, i + 1)
+                qc_stats.write_file(config)
+                config.write_completed_json("completed_data", NOW, {})
+        glideFactoryMonitorAggregator.monitorAggregatorConfig.config_factory(
+            self.monitor_dir, self.entries, FakeLogger()
+        )
+        glideFactoryMonitoring.monitoringConfig.rrd_obj = self.rrd
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def aggregate(self):
+        """Return the aggregate status XML, without the update time, and RRD updates"""
+        self.rrd.updates = {}
+        glideFactoryMonitorAggregator.aggregateStatus(False)
+        with open(os.path.join(self.monitor_dir, "schedd_status.xml")) as f:
+            xml_str = re.sub(r"<updated>.*?</updated>", "", f.read(), flags=re.S)
+        return xml_str, self.rrd.updates
+
+    def test_snapshot(self):
+        with mock.patch("glideinwms.lib.xmlParse.xmlfile2dict") as mock_parse:
+            from_snapshot = self.aggregate()
+            self.assertFalse(mock_parse.called)
+        self.assertIn('<ClientMonitor CoresIdle="0"', from_snapshot[0])
+        total_rrd = from_snapshot[1][os.path.join(self.monitor_dir, "total", "Status_Attributes.rrd")]
+        self.assertEqual(70, total_rrd["ReqIdleCores"])
+        # unchanged entries are reused
+        logSupport.log = mock.Mock()
+        self.assertEqual(from_snapshot, self.aggregate())
+        logSupport.log.debug.assert_any_call("Entry status files: 6 unchanged, 0 snapshots and 0 XML/JSON files loaded")
+        logSupport.log = FakeLogger()
+        # the XML files give the same result
+        for entry in self.entries:
+            os.remove(os.path.join(self.monitor_dir, f"entry_{entry}", "schedd_status.snap"))
+        self.assertEqual(from_snapshot, self.aggregate())
+
+    def test_stale_snapshot(self):
+        # a snapshot older than the XML file is ignored
+        snapshot = os.path.join(self.monitor_dir, "entry_e1", "schedd_status.snap")
+        status_fname = os.path.join(self.monitor_dir, "entry_e1", "schedd_status.xml")
+        snapshotSupport.write_snapshot(snapshot, {}, NOW)
+        os.utime(snapshot, (NOW, NOW))
+        entry_data = glideFactoryMonitorAggregator.load_entry_status("e1")
+        self.assertIn("total_row", entry_data)
+        self.assertEqual(["fe0"], list(entry_data["columns"]))
+        # and a corrupted one as well
+        with open(snapshot, "wb") as f:
+            f.write(b"corrupted")
+        os.utime(snapshot, None)
+        os.utime(status_fname, (NOW, NOW))
+        self.assertEqual(["fe0"], list(glideFactoryMonitorAggregator.load_entry_status("e1")["columns"]))
+
+
+class TestRRDWindow(unittest.TestCase):
+    def test_update(self):
+        window = glideFactoryMonitoring.RRDWindow(300, 1800)
+        window.add_archive(300, 0.8, 10)
+        window.add_archive(1200, 0.5, 3)
+        types = {"Entered": "ABSOLUTE"}
+        # no previous update, the interval is unknown
+        self.assertTrue(window.update(1000, types, {"Idle": 4, "Entered": 10}))
+        self.assertFalse(window.update(1000, types, {"Idle": 5}))
+        window.update(1100, types, {"Idle": 10, "Entered": 100})
+        window.update(1250, types, {"Idle": 20, "Entered": 300})
+        window.update(1500, types, {"Idle": 30, "Entered": 0})
+        # Entered is unknown after 1500
+        window.update(1800, types, {"Idle": 30, "Entered": None})
+        self.assertEqual(
+            {"Idle": [15.0, 85 / 3, 30.0], "Entered": [1.5, 1 / 3]},
+            window.archives[300].get_data_sets(900, 1800, window.ds_names),
+        )
+        # longer than the heartbeat
+        window.update(3601, types, {"Idle": 1})
+        window.update(3900, types, {"Idle": 2})
+        self.assertEqual(
+            {"Idle": [2.0], "Entered": []}, window.archives[300].get_data_sets(1800, 3900, window.ds_names)
+        )
+        self.assertEqual({}, window.archives[300].get_data_sets(1800, 3600, window.ds_names))
+        # 1 of 4 PDPs known at 1200 and 2 at 2400
+        self.assertEqual(
+            {"Idle": [(85 / 3 + 30) / 2], "Entered": []},
+            window.archives[1200].get_data_sets(0, 3600, window.ds_names),
+        )
+
+
+class TestFactoryStatusData(unittest.TestCase):
+    T = 1700002800  # multiple of 1 hour
+
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = glideFactoryMonitoring.MonitoringConfig(log=FakeLogger())
+        self.config.rrd_obj = FakeRRD()
+        self.config.monitor_dir = self.tmpdir.name
+        self.status = glideFactoryMonitoring.FactoryStatusData(
+            log=FakeLogger(), base_dir=self.tmpdir.name, use_windows=True
+        )
+        self.config.status_data = self.status
+        self.fetched = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def fetch_rrd(self, filename, CF, resolution=None, start=None, end=None):
+        """The values in the RRD files: Idle is 1 every 5 minutes and 2 every hour, Running unknown.
+        The last value, ending now, is not complete.
+        """
+        if not os.path.exists(filename):
+            raise RuntimeError("RRD file '%s' does not exist" % filename)
+        self.fetched.append((filename, resolution))
+        rows = [(1.0 if resolution == 300 else 2.0, None)] * ((end - start) // resolution - 1) + [(None, None)]
+        return (start, end, resolution), ("Idle", "Running"), rows
+
+    def test_windows(self):
+        os.makedirs(os.path.join(self.tmpdir.name, "total"))
+        rrd_fname = os.path.join(self.tmpdir.name, "total", "Status_Attributes.rrd")
+        with open(rrd_fname, "w"):
+            pass
+        with mock.patch.object(glideFactoryMonitoring.rrdSupport.BaseRRDSupport, "fetch_rrd", self.fetch_rrd):
+            for k in range(1, 13):
+                with mock.patch("time.time", return_value=self.T + 300 * k):
+                    self.config.write_rrd_multi(
+                        "total/Status_Attributes", "GAUGE", self.T + 300 * k, {"Idle": 3, "Running": k}
+                    )
+            # seeded once, when the first update was written
+            self.assertEqual([(rrd_fname, 300), (rrd_fname, 3600)], self.fetched)
+            with mock.patch("time.time", return_value=self.T + 3900):
+                data = self.status.getData(self.status.total, self.config)
+            self.assertEqual(2, len(self.fetched))
+        total = data["Status_Attributes.rrd"]["total/"]
+        # seeded values before T, the first interval after the seeding is unknown
+        self.assertEqual({"Idle": (12 + 11 * 3) / 23, "Running": 7.0}, total[7200])
+        self.assertEqual({"Idle": (276 + 11 * 3) / 287, "Running": 7.0}, total[86400])
+        self.assertEqual({"Idle": 2.0, "Running": 0}, total[604800])
+        # the other files are missing
+        self.assertEqual({7200: {}, 86400: {}, 604800: {}}, data["Log_Counts.rrd"]["total/"])
+        # the windows are part of the entry state, pickled without the logger
+        self.status.log = None
+        status = pickle.loads(pickle.dumps(self.status))
+        status.log = FakeLogger()
+        with mock.patch("time.time", return_value=self.T + 3900):
+            self.assertEqual(data, status.getData(status.total, self.config))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
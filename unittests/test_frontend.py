@@ -10,12 +10,16 @@
 
 import dis
 import io
+import random
 import re
 import sys
+import time
 import unittest
 
 from unittest import mock
 
+import hypothesis
+import hypothesis.strategies as st
 import xmlrunner
 
 import glideinwms.frontend.glideinFrontendLib as glideinFrontendLib
@@ -58,6 +62,174 @@ def compareLambdas(func1, func2):
     return code1 == code2
 
 
+def referenceUniqueSets(in_sets):
+    """Pairwise refinement implementation of uniqueSets, used as reference for the results"""
+    sorted_sets = []
+    for i in in_sets:
+        common_list = []
+        old_unique = set()
+        for k in sorted_sets:
+            old_unique = old_unique | k
+            common = k & i
+            if common:
+                common_list.append(common)
+        for j in common_list:
+            i = i - j
+            old_unique = old_unique - j
+        new = []
+        if i:
+            new.append(i)
+        for k in sorted_sets:
+            if k & old_unique:
+                new.append(k & old_unique)
+        new.extend(common_list)
+        sorted_sets = new
+
+    sum_set = set()
+    for s in sorted_sets:
+        sum_set = sum_set | s
+    sorted_sets.append(sum_set)
+
+    index_list = []
+    for s in sorted_sets:
+        indexes = []
+        temp_sets = in_sets[:]
+        for t in temp_sets:
+            if s & t:
+                indexes.append(temp_sets.index(t))
+                temp_sets[temp_sets.index(t)] = set()
+        index_list.append(indexes)
+
+    outvals = []
+    for i in range(len(index_list) - 1):
+        outvals.append((set(index_list[i]), sorted_sets[i]))
+    return (outvals, sorted_sets[-1])
+
+
+def referenceClientCounts(status_dict, frontend_name, group_name, request_name, cred_id=None, min_memory=2500):
+    """Counts per request (and credential) with the SubQuery functions, used as reference for the index"""
+    req_dict = glideinFrontendLib.getClientCondorStatus(status_dict, frontend_name, group_name, request_name)
+    if cred_id is not None:
+        req_dict = glideinFrontendLib.getClientCondorStatusCredIdOnly(req_dict, cred_id)
+    return {
+        "Total": glideinFrontendLib.countCondorStatus(req_dict),
+        "Idle": glideinFrontendLib.countCondorStatus(glideinFrontendLib.getIdleCondorStatus(req_dict, min_memory)),
+        "Running": glideinFrontendLib.countRunningCondorStatus(glideinFrontendLib.getRunningCondorStatus(req_dict)),
+        "Failed": glideinFrontendLib.countCondorStatus(glideinFrontendLib.getFailedCondorStatus(req_dict)),
+        "TotalCores": glideinFrontendLib.countCoresCondorStatus(
+            glideinFrontendLib.getCondorStatusNonDynamic(req_dict), "TotalCores"
+        ),
+        "IdleCores": glideinFrontendLib.countCoresCondorStatus(
+            glideinFrontendLib.getIdleCoresCondorStatus(req_dict), "IdleCores"
+        ),
+        "RunningCores": glideinFrontendLib.countCoresCondorStatus(
+            glideinFrontendLib.getRunningCoresCondorStatus(req_dict), "RunningCores"
+        ),
+    }
+
+
+def makeSlotStatusDict(nr_slots=300, seed=5):
+    """Random slots of 2 collectors, from 2 frontend groups, with and without credential IDs"""
+    rnd = random.Random(seed)
+    status_dict = {}
+    for collector_name in ("coll1", "coll2"):
+        data = {}
+        for i in range(nr_slots):
+            entry = "Site_Name%d" % rnd.randint(1, 4)
+            el = {
+                "GLIDEIN_Entry_Name": entry,
+                "GLIDEIN_Name": "v3_0",
+                "GLIDEIN_Factory": "factory1",
+                "State": rnd.choice(["Unclaimed", "Claimed", "Drained", "Owner"]),
+                "Activity": rnd.choice(["Idle", "Busy", "Retiring"]),
+                "Cpus": rnd.randint(0, 8),
+                "Memory": rnd.choice([1000, 2000, 3000]),
+                "SlotType": rnd.choice(["Static", "Partitionable", "Dynamic"]),
+            }
+            if el["SlotType"] == "Partitionable":
+                el["PartitionableSlot"] = True
+                el["TotalSlots"] = rnd.randint(1, 3)
+                el["TotalSlotCpus"] = 8
+                if rnd.random() < 0.3:
+                    el["TotalGpus"] = 1
+                    el["Gpus"] = rnd.randint(0, 1)
+            client = rnd.choice(["group", "group", "other", "none"])
+            if client == "group":
+                el["GLIDECLIENT_Name"] = "frontend_v3.%s" % rnd.choice(["main", "other"])
+            elif client == "other":
+                el["GLIDECLIENT_Name"] = "frontend_other.main"
+            if rnd.random() < 0.7:
+                el["GLIDEIN_CredentialIdentifier"] = rnd.choice(["cred1", "cred2"])
+            data["slot%d@%s" % (i, collector_name)] = el
+        status_dict[collector_name] = condorMonitor.IndexedView(data)
+    return status_dict
+
+
+def referenceCountRealRunning(match_obj, condorq_dict, glidein_dict, condorq_match_list=None):
+    """countRealRunning evaluating all the job clusters for every entry, used as reference for the results"""
+    if condorq_match_list is not None:
+        condorq_match_list = condorq_match_list + ["RunningOn"]
+    schedds = list(condorq_dict.keys())
+    out_job_counts = {}
+    out_glidein_counts = {}
+    for glidename in glidein_dict:
+        glide_str = "{}@{}".format(glidename[1], glidename[0].split(":")[0])
+        glidein = glidein_dict[glidename]  # noqa: F841  # used in match_obj
+        job_ids = set()
+        glidein_ids = set()
+        for scheddIdx, schedd in enumerate(schedds):
+            condorq_data = condorq_dict[schedd].fetchStored()
+            clusters = {}
+            for jid in condorq_data:
+                clusters.setdefault(glideinFrontendLib.hashJob(condorq_data[jid], condorq_match_list), []).append(jid)
+            for cluster in clusters.values():
+                job = condorq_data[cluster[0]]
+                try:
+                    if not ((job["RunningOn"] == glide_str) and eval(match_obj)):
+                        continue
+                except Exception:
+                    continue
+                for jid in cluster:
+                    job_ids.add("%d %s" % (scheddIdx, jid))
+                    try:
+                        token = condorq_data[jid]["RemoteHost"].split("@")
+                        glidein_ids.add(f"{token[-2]}@{token[-1]}")
+                    except (KeyError, IndexError):
+                        glidein_ids.add("%d %s" % (scheddIdx, jid))
+        out_job_counts[glidename] = len(job_ids)
+        out_glidein_counts[glidename] = len(glidein_ids)
+    return out_job_counts, out_glidein_counts
+
+
+def makeRunningJobs(glidein_dict, nr_jobs=500, seed=11):
+    """Random running jobs on 2 schedds and the slots of 2 collectors they run on"""
+    rnd = random.Random(seed)
+    entries = [glidename[1].split("@") + [glidename[0]] for glidename in glidein_dict]
+    entries.append(["Other_Site", "v3_0", "factory1", "submit.local"])
+    status_dict = {"coll1": {}, "coll2": {}}
+    condorq_dict = {"sched1": {}, "sched2": {}}
+    for i in range(nr_jobs):
+        entry, name, factory, pool = rnd.choice(entries)
+        remote_host = "slot1_%d@glidein_%d@host%d" % (i % 4, i // 4, i // 40)
+        status_dict[rnd.choice(["coll1", "coll2"])][remote_host] = {
+            "GLIDEIN_Entry_Name": entry,
+            "GLIDEIN_Name": name,
+            "GLIDEIN_Factory": factory,
+            "GLIDEIN_Schedd": "schedd_glideins2@%s:9618" % pool,
+        }
+        job = {"JobStatus": 2, "RequestCpus": rnd.randint(1, 2), "DESIRED_Sites": rnd.choice(["Site_Name1", "All"])}
+        rnd_host = rnd.random()
+        if rnd_host < 0.9:
+            job["RemoteHost"] = remote_host
+        elif rnd_host < 0.95:
+            job["RemoteHost"] = "unknown_slot@host"
+        condorq_dict[rnd.choice(["sched1", "sched2"])][(i, 0)] = job
+    return (
+        {k: condorMonitor.IndexedView(v) for k, v in condorq_dict.items()},
+        {k: condorMonitor.IndexedView(v) for k, v in status_dict.items()},
+    )
+
+
 class FETestCaseBase(unittest.TestCase):
     def setUp(self):
         glideinwms.frontend.glideinFrontendLib.logSupport.log = FakeLogger()
@@ -235,6 +407,46 @@ class FETestCaseCount(FETestCaseBase):
         )
         self.assertEqual(expected, actual)
 
+    def test_countRealRunning_reference(self):
+        condorq_dict, status_dict = makeRunningJobs(self.glidein_dict)
+        running_index = glideinFrontendLib.appendRealRunning(condorq_dict, status_dict)
+        self.assertEqual(
+            sorted(
+                ["UNKNOWN", "Other_Site@v3_0@factory1@submit.local"] + [g[1] + "@" + g[0] for g in self.glidein_dict]
+            ),
+            sorted(running_index),
+        )
+        for match_expr in (
+            "True",
+            'job["DESIRED_Sites"] in (glidein["attrs"]["GLIDEIN_Site"], "All")',
+            'job["RequestCpus"] <= glidein["attrs"]["GLIDEIN_CPUS"]',
+        ):
+            match_obj = compile(match_expr, "<string>", "eval")
+            for match_list in (None, ["DESIRED_Sites"]):
+                expected = referenceCountRealRunning(match_obj, condorq_dict, self.glidein_dict, match_list)
+                self.assertEqual(
+                    expected,
+                    glideinFrontendLib.countRealRunning(
+                        match_obj, condorq_dict, self.glidein_dict, {}, match_list, running_index=running_index
+                    ),
+                    match_expr,
+                )
+                self.assertEqual(
+                    expected,
+                    glideinFrontendLib.countRealRunning(match_obj, condorq_dict, self.glidein_dict, {}, match_list),
+                    match_expr,
+                )
+
+    def test_countRealRunning_noRunningOn(self):
+        with mock.patch.object(glideinwms.frontend.glideinFrontendLib.logSupport.log, "debug") as m_debug:
+            match_obj = compile("True", "<string>", "eval")
+            actual = glideinFrontendLib.countRealRunning(match_obj, self.condorq_dict, self.glidein_dict, {})
+            self.assertEqual(({k: 0 for k in self.glidein_dict}, {k: 0 for k in self.glidein_dict}), actual)
+            m_debug.assert_any_call(
+                "Failed to evaluate resource match in countRealRunning. Possibly match_expr has "
+                "errors and trying to reference job or site attribute(s) ''RunningOn'' in an inappropriate way."
+            )
+
     def test_countRealRunning_missingKey(self):
         cq_run_dict = glideinFrontendLib.getRunningCondorQ(self.condorq_dict)
         glideinFrontendLib.appendRealRunning(cq_run_dict, self.status_dict)
@@ -300,6 +512,38 @@ class FETestCaseCondorStatus(FETestCaseBase):
             ],
         )
 
+    def test_getClientCondorStatusIndex(self):
+        index = glideinFrontendLib.getClientCondorStatusIndex(self.status_dict, "frontend_v3", "maingroup")
+        self.assertEqual(
+            referenceClientCounts(self.status_dict, "frontend_v3", "maingroup", "Site_Name1@v3_0@factory1"),
+            {st: index.count(("Site_Name1@v3_0@factory1", None), st) for st in index.counter_funcs},
+        )
+        machines = list(index.getView(("Site_Name1@v3_0@factory1", None))["coll1"].stored_data.keys())
+        self.assertCountEqual(machines, ["glidein_1@cmswn001.local"])
+
+    def test_getClientCondorStatusIndex_reference(self):
+        status_dict = makeSlotStatusDict()
+        for min_memory in (2500, 1500):
+            index = glideinFrontendLib.getClientCondorStatusIndex(status_dict, "frontend_v3", "main", min_memory)
+            for i in range(1, 6):
+                request_name = "Site_Name%d@v3_0@factory1" % i
+                for cred_id in (None, "cred1", "cred2", "cred3"):
+                    expected = referenceClientCounts(
+                        status_dict, "frontend_v3", "main", request_name, cred_id, min_memory
+                    )
+                    actual = {st: index.count((request_name, cred_id), st) for st in expected}
+                    self.assertEqual(expected, actual, (request_name, cred_id, min_memory))
+                    if cred_id is None:
+                        continue
+                    expected_dict = getClientCondorStatusPerCredId(
+                        status_dict, "frontend_v3", "main", request_name, cred_id
+                    )
+                    actual_dict = index.getView((request_name, cred_id), "Total")
+                    for collector_name in status_dict:
+                        self.assertEqual(
+                            expected_dict[collector_name].fetchStored(), actual_dict[collector_name].fetchStored()
+                        )
+
     def test_getClientCondorStatus(self):
         condorStatus = glideinFrontendLib.getClientCondorStatus(
             self.status_dict, "frontend_v3", "maingroup", "Site_Name1@v3_0@factory1"
@@ -425,6 +669,12 @@ class FETestCaseMisc(FETestCaseBase):
         )
 
         self.assertCountEqual(expected, glideinFrontendLib.uniqueSets(input))
+        self.assertEqual(referenceUniqueSets(input), glideinFrontendLib.uniqueSets(input))
+
+    @hypothesis.given(st.lists(st.sets(st.integers(min_value=0, max_value=40), max_size=25), max_size=8))
+    def test_uniqueSets_reference(self, in_sets):
+        # Same partitions, in the same order, as the pairwise refinement
+        self.assertEqual(referenceUniqueSets(in_sets), glideinFrontendLib.uniqueSets(in_sets))
 
     def test_hashJob(self):
         in1 = {1: "a", 2: "b", 3: "c"}
@@ -552,6 +802,32 @@ class FETestCaseCondorQ(FETestCaseBase):
 
         self.assertCountEqual(condor_ids, [(12345, x) for x in range(0, self.total_jobs)])
 
+    @mock.patch("glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv")
+    @mock.patch("glideinwms.lib.condorExe.exe_cmd")
+    def test_getCondorQ_timeout(self, m_exe_cmd, m_iGetEnv):
+        with open("cq.fixture") as f:
+            lines = f.readlines()
+
+        def exe_cmd(exe_name, args, **kwargs):
+            # sched2 does not answer in time, sched3 fails
+            if "-name sched2" in args:
+                time.sleep(2)
+            elif "-name sched3" in args:
+                raise RuntimeError("sched3 failing")
+            return lines
+
+        # no local schedd, the name is in the command options
+        m_iGetEnv.return_value = None
+        m_exe_cmd.side_effect = exe_cmd
+        query_stats = {}
+        t_begin = time.time()
+        cq = glideinFrontendLib.getCondorQ(["sched1", "sched2", "sched3"], timeout=0.5, query_stats=query_stats)
+        self.assertLess(time.time() - t_begin, 1.5)
+        self.assertEqual(["sched1"], list(cq))
+        self.assertEqual(["sched2"], query_stats["timed_out"])
+        self.assertCountEqual(["sched1", "sched2", "sched3"], query_stats["latency"])
+        self.assertEqual(0.5, query_stats["latency"]["sched2"])
+
 
 if __name__ == "__main__":
     unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -5,8 +5,9 @@
 
 """Unit test for glideinwms/frontend/glideinFrontendElement"""
 
-
 import os
+import shutil
+import tempfile
 import unittest
 
 from unittest import mock
@@ -18,6 +19,7 @@ import glideinwms.lib.condorExe
 import glideinwms.lib.condorMonitor as condorMonitor
 
 from glideinwms.frontend import glideinFrontendInterface, glideinFrontendMonitoring
+from glideinwms.lib import classadSupport, servicePerformance
 from glideinwms.lib.fork import ForkManager
 from glideinwms.lib.util import safe_boolcomp
 from glideinwms.unittests.unittest_utils import FakeLogger, TestImportError
@@ -116,6 +118,43 @@ def bounded_fork_and_collect_side_effect():
     return pipe_out_objs
 
 
+class FakeCredential:
+    """Grid proxy credential returned by the proxy plugin, with only what the advertisement uses"""
+
+    type = "grid_proxy"
+    trust_domain = "Grid"
+    security_class = "frontend"
+    key_fname = None
+    pilot_fname = None
+    remote_username = None
+    project_id = None
+    advertise = True
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def supports_auth_method(self, auth_method):
+        return auth_method in self.type
+
+    def file_id(self, filename, ignoredn=False):
+        return "cred1"
+
+    def getId(self):
+        return "cred1"
+
+    def get_usage_details(self):
+        return 10, 100
+
+    def renew(self):
+        pass
+
+    def createIfNotExist(self):
+        pass
+
+    def getString(self, cred_file):
+        return "proxy data"
+
+
 class FEElementTestCase(unittest.TestCase):
     def setUp(self):
         self.debug_output = os.environ.get("DEBUG_OUTPUT")
@@ -221,9 +260,11 @@ class FEElementTestCase(unittest.TestCase):
             with mock.patch("glideinwms.lib.condorExe.exe_cmd") as m_exe_cmd:
                 f = open("cq.fixture")
                 m_exe_cmd.return_value = f.readlines()
-                cq = self.gfe.get_condor_q("schedd1")
+                cq, query_stats = self.gfe.get_condor_q(["schedd1"])
 
         self.assertCountEqual(list(cq["schedd1"].fetchStored().keys()), [(12345, x) for x in range(0, 13)])
+        self.assertEqual([], query_stats["timed_out"])
+        self.assertEqual(["schedd1"], list(query_stats["latency"]))
 
     def test_compute_glidein_max_run(self):
         self.assertEqual(self.gfe.compute_glidein_max_run({"Idle": 412}, 971, 0), 1591)
@@ -274,6 +315,12 @@ class FEElementTestCase(unittest.TestCase):
                                 # finally run iterate_one and collect the log data
                                 self.gfe.iterate_one()
 
+        # per schedd query time, published with the group performance metrics
+        self.assertEqual(
+            0.05,
+            servicePerformance.getPerfMetricEventLifetime(self.gfe.group_name, "condor_q_fermicloud365_fnal_gov"),
+        )
+
         # go through glideinFrontendElement data structures
         # collecting data to match against log output
         glideid_list = sorted(
@@ -323,6 +370,62 @@ class FEElementTestCase(unittest.TestCase):
                     self.assertTrue(upordown == "Up", f"{gid} logs this as {upordown}")
             idx += 1
 
+    def test_iterate_one_advertise_cache(self):
+        """The glideclient classads of unchanged requests are not advertised again in the next cycle"""
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        group_dir = glideinFrontendConfig.get_group_dir(work_dir, self.gfe.group_name)
+        os.mkdir(group_dir)
+        self.gfe.work_dir = work_dir
+        self.gfe.published_frontend_name = f"{self.gfe.frontend_name}.XPVO_{self.gfe.group_name}"
+        credential = FakeCredential(os.path.join(work_dir, "proxy"))
+        self.gfe.x509_proxy_plugin = mock.MagicMock()
+        self.gfe.x509_proxy_plugin.get_credentials.return_value = [credential]
+        self.gfe.x509_proxy_plugin.cred_list = [credential]
+        cache = classadSupport.AdvertiseCache(3600, os.path.join(group_dir, "advertise_cache.pickle"))
+        advertised = []
+
+        def exe_condor_advertise(fname, command, pool, is_multi=False):
+            with open(fname) as fd:
+                advertised.extend(classadSupport.split_classads(fd.read()))
+
+        patchers = [
+            mock.patch.object(glideinFrontendInterface.frontendConfig, "advertise_cache", cache),
+            mock.patch.object(glideinFrontendInterface, "exe_condor_advertise", side_effect=exe_condor_advertise),
+            mock.patch.object(ForkManager, "fork_and_collect", return_value=fork_and_collect_side_effect()),
+            mock.patch.object(
+                ForkManager, "bounded_fork_and_collect", return_value=bounded_fork_and_collect_side_effect()
+            ),
+            mock.patch.object(glideinFrontendInterface, "ResourceClassadAdvertiser"),
+            # advertise in this process
+            mock.patch.object(
+                glideinFrontendElement, "fork_in_bg", side_effect=lambda function, *args: function(*args)
+            ),
+            mock.patch.object(glideinFrontendElement, "wait_for_pids"),
+            mock.patch.object(self.gfe, "refresh_entry_token", return_value=refresh_entry_token_side_effect()),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def run_cycle():
+            """Run iterate_one like a new group process and return the glideclient classads advertised"""
+            del advertised[:]
+            glideinFrontendInterface.advertizeGCCounter.clear()
+            glideinFrontendInterface.advertizeGCGounter.clear()
+            self.gfe.stats = {"group": glideinFrontendMonitoring.groupStats()}
+            self.gfe.iterate_one()
+            return [ad for ad in advertised if 'MyType = "glideclient"' in ad]
+
+        first = run_cycle()
+        self.assertTrue(first)
+        self.assertTrue(all("ReqEncKeyCode" in ad for ad in first))
+        # same requests, same symkey
+        self.assertEqual([], run_cycle())
+        # a new symkey changes the encrypted attributes, all the classads are advertised again
+        os.remove(os.path.join(group_dir, "symkeys.json"))
+        self.assertEqual(len(first), len(run_cycle()))
+
     def test_populate_pubkey(self):
         """test that good public keys get populated
         and bad public keys get removed
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the credential metadata cache in glideinwms/frontend/glideinFrontendInterface.py"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import jwt
+import xmlrunner
+
+from glideinwms.lib import logSupport, x509Support
+from glideinwms.unittests.unittest_utils import FakeLogger, TestImportError
+
+try:
+    from glideinwms.frontend.glideinFrontendInterface import CredentialMetadataCache
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+class TestCredentialMetadataCache(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = CredentialMetadataCache()
+        self.parsed = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_token(self, fname, **claims):
+        fpath = os.path.join(self.tmpdir.name, fname)
+        with open(fpath, "w") as f:
+            f.write(jwt.encode(claims, "secret", algorithm="HS256"))
+        return fpath
+
+    def parse(self, fname):
+        self.parsed.append(fname)
+        with open(fname) as f:
+            return f.read()
+
+    def test_cache(self):
+        fname = os.path.join(self.tmpdir.name, "cred")
+        with open(fname, "w") as f:
+            f.write("one")
+        self.assertEqual("one", self.cache.get_value(fname, "data", self.parse))
+        self.assertEqual("one", self.cache.get_value(fname, "data", self.parse))
+        self.assertEqual(1, len(self.parsed))
+        # a new file replacing the old one
+        with open(fname + ".new", "w") as f:
+            f.write("two")
+        os.rename(fname + ".new", fname)
+        self.assertEqual("two", self.cache.get_value(fname, "data", self.parse))
+        self.assertEqual(2, len(self.parsed))
+        os.remove(fname)
+        with self.assertRaises(OSError):
+            self.cache.get_value(fname, "data", self.parse)
+
+    def test_x509(self):
+        fname = os.path.join(self.tmpdir.name, "hostcert.pem")
+        shutil.copy("fixtures/hostcert.pem", fname)
+        self.assertEqual(x509Support.extract_DN(fname), self.cache.get_dn(fname))
+        self.assertEqual(x509Support.extract_not_after(fname), self.cache.get_not_after(fname))
+        self.assertEqual({"dn", "not_after"}, set(self.cache.entries[fname][1]))
+
+    def test_token_expired(self):
+        now = int(time.time())
+        self.assertFalse(self.cache.token_expired(self.write_token("valid", exp=now + 3600, nbf=now - 60)))
+        self.assertFalse(self.cache.token_expired(self.write_token("noexp", sub="user")))
+        self.assertTrue(self.cache.token_expired(self.write_token("expired", exp=now - 60)))
+        self.assertTrue(self.cache.token_expired(self.write_token("notyet", exp=now + 3600, nbf=now + 600)))
+        bad = os.path.join(self.tmpdir.name, "bad")
+        with open(bad, "w") as f:
+            f.write("not a token")
+        self.assertTrue(self.cache.token_expired(bad))
+        self.assertTrue(self.cache.token_expired(os.path.join(self.tmpdir.name, "missing")))
+        # the cached times are checked at every call
+        fname = self.write_token("expiring", exp=now + 3600)
+        self.assertFalse(self.cache.token_expired(fname))
+        self.cache.entries[fname][1]["token_times"] = (now - 1, None)
+        self.assertTrue(self.cache.token_expired(fname))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
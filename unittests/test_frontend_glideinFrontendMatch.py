@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for glideinwms/frontend/glideinFrontendMatch.py
+   The match engine must give the same results of the eval() path of countMatch
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from unittest import mock
+
+import xmlrunner
+
+import glideinwms.frontend.glideinFrontendLib as glideinFrontendLib
+import glideinwms.lib.condorMonitor as condorMonitor
+
+from glideinwms.frontend.glideinFrontendMatch import (
+    MatchCache,
+    MatchEngine,
+    TERM_CONST,
+    TERM_GLIDEIN,
+    TERM_JOB,
+    TERM_PAIR,
+)
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+
+class FakeCondorQ:
+    """Minimal CondorQ replacement returning stored data"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def fetchStored(self):
+        return self.data
+
+
+class FakePolicy:
+    """Minimal MatchPolicy replacement"""
+
+    def __init__(self, match_function, job_match_attrs=None):
+        self.file = "fake_policy.py"
+        self.pyObject = mock.Mock()
+        self.pyObject.match = match_function
+        self.jobMatchAttrs = job_match_attrs or {}
+
+
+def make_condorq_dict(nr_schedds=3, nr_jobs=200, seed=1):
+    rnd = random.Random(seed)
+    condorq_dict = {}
+    for s in range(nr_schedds):
+        data = {}
+        for i in range(nr_jobs):
+            job = {
+                "ClusterId": 100 + i // 10,
+                "ProcId": i % 10,
+                "JobStatus": 1,
+                "RequestCpus": rnd.choice([1, 1, 4, 8]),
+                "RequestMemory": rnd.choice([1000, 2000, 4000]),
+            }
+            if rnd.random() < 0.8:
+                job["DESIRED_Sites"] = ",".join(rnd.sample(["Site1", "Site2", "Site3", "Site4"], rnd.randint(1, 3)))
+            if rnd.random() < 0.3:
+                job["REQUIRED_OS"] = rnd.choice(["rhel8", "rhel9", "any"])
+            data[(job["ClusterId"], job["ProcId"])] = job
+        condorq_dict["schedd%d" % s] = FakeCondorQ(data)
+    return condorq_dict
+
+
+def make_glidein_dict(nr_entries=40, seed=2):
+    rnd = random.Random(seed)
+    glidein_dict = {}
+    for i in range(nr_entries):
+        attrs = {
+            "GLIDEIN_Site": "Site%d" % rnd.randint(1, 5),
+            "GLIDEIN_CPUS": rnd.choice([1, 4, 8, "auto"]),
+            "GLIDEIN_MaxMemMBs": rnd.choice([0, 2000, 8000]),
+        }
+        if rnd.random() < 0.5:
+            attrs["GLIDEIN_REQUIRED_OS"] = rnd.choice(["rhel8", "rhel9", "any"])
+        if rnd.random() < 0.1:
+            attrs["GLIDEIN_In_Downtime"] = "True"
+        glidein_dict[("factory%d" % (i % 3), "entry%d@inst@factory" % i, "frontend@factory")] = {
+            "attrs": attrs,
+            "params": {},
+            "monitor": {},
+        }
+    return glidein_dict
+
+
+MATCH_EXPRESSIONS = (
+    "True",
+    "False",
+    '(not "DESIRED_Sites" in job) or glidein["attrs"].get("GLIDEIN_Site") in job["DESIRED_Sites"].split(",")',
+    '(True) and (glidein["attrs"].get("GLIDEIN_Site") in job.get("DESIRED_Sites", "").split(","))',
+    '((glidein["attrs"].get("GLIDEIN_MaxMemMBs", 0) == 0) or (job.get("RequestMemory", 0)<=glidein["attrs"]["GLIDEIN_MaxMemMBs"]))'
+    ' and ((job.get("REQUIRED_OS", "any")=="any") or (glidein["attrs"].get("GLIDEIN_REQUIRED_OS", "any")=="any")'
+    ' or (job.get("REQUIRED_OS")==glidein["attrs"]["GLIDEIN_REQUIRED_OS"]))',
+    '(job["RequestCpus"] > 1) and (glidein["attrs"]["GLIDEIN_CPUS"] != 1) and job.get("RequestMemory")',
+    'job["DESIRED_Sites"] and glidein["attrs"]["GLIDEIN_Site"] != "Site5"',
+    '(glidein["attrs"]["GLIDEIN_Site"] == "Site1") and (1 // (job["RequestCpus"] - 1) >= 0)',
+    '"REQUIRED_OS" in job and any(s in ("rhel8", "rhel9") for s in job["REQUIRED_OS"].split(","))',
+)
+
+
+class TestMatchEngineCompile(unittest.TestCase):
+    def test_terms(self):
+        engine = MatchEngine(
+            '(True) and (job.get("A", 0) > 1 and glidein["attrs"]["B"] == 2) and (job["C"] == glidein["params"].get("D"))'
+        )
+        self.assertTrue(engine.compiled, engine.reason)
+        self.assertEqual([TERM_CONST, TERM_JOB, TERM_GLIDEIN, TERM_PAIR], [t.kind for t in engine.terms])
+        self.assertEqual(["A", "C"], engine.job_attrs)
+        self.assertEqual([("attrs", "B"), ("params", "D")], engine.glidein_attrs)
+
+    def test_in_operator(self):
+        engine = MatchEngine('"A" in job and "B" not in glidein["attrs"]')
+        self.assertTrue(engine.compiled, engine.reason)
+        self.assertEqual(["A"], engine.job_attrs)
+        self.assertEqual([("attrs", "B")], engine.glidein_attrs)
+
+    def test_policy_attrs(self):
+        engine = MatchEngine("True", [FakePolicy(lambda job, glidein: True, {"P": {"type": "string"}})])
+        self.assertTrue(engine.compiled, engine.reason)
+        self.assertEqual(["P"], engine.job_attrs)
+
+    def test_not_compiled(self):
+        for expr in (
+            "len(job) > 1",
+            'glidein["attrs"] == {}',
+            'job[glidein["attrs"]["X"]]',
+            'schedd == "x"',
+            'job.get("A") ==',
+            'any(s in job["A"] for s in ("x", "y"))',
+        ):
+            engine = MatchEngine(expr)
+            self.assertFalse(engine.compiled, expr)
+            self.assertIsNotNone(engine.reason)
+
+
+class TestMatchEngineCountMatch(unittest.TestCase):
+    def setUp(self):
+        glideinFrontendLib.logSupport.log = FakeLogger()
+        self.condorq_dict = make_condorq_dict()
+        self.glidein_dict = make_glidein_dict()
+        self.match_list = ["RequestCpus", "RequestMemory", "DESIRED_Sites", "REQUIRED_OS"]
+
+    def assertSameMatch(self, match_expr, ignore_down_entries=False, match_policies=(), match_list=None):
+        match_obj = compile(match_expr, "<string>", "eval")
+        engine = MatchEngine(match_expr, match_policies)
+        self.assertTrue(engine.compiled, engine.reason)
+        expected = glideinFrontendLib.countMatch(
+            match_obj,
+            self.condorq_dict,
+            self.glidein_dict,
+            {},
+            ignore_down_entries,
+            match_list,
+            match_policies=list(match_policies),
+        )
+        actual = glideinFrontendLib.countMatch(
+            match_obj,
+            self.condorq_dict,
+            self.glidein_dict,
+            {},
+            ignore_down_entries,
+            match_list,
+            match_policies=list(match_policies),
+            match_engine=engine,
+        )
+        self.assertEqual(expected, actual, match_expr)
+
+    def test_same_results(self):
+        for match_expr in MATCH_EXPRESSIONS:
+            for ignore_down_entries in (False, True):
+                self.assertSameMatch(match_expr, ignore_down_entries, match_list=self.match_list)
+
+    def test_same_results_no_match_list(self):
+        for match_expr in MATCH_EXPRESSIONS:
+            self.assertSameMatch(match_expr, True)
+
+    def test_same_results_policies(self):
+        policies = (
+            FakePolicy(lambda job, glidein: job["RequestCpus"] <= 4, {"RequestCpus": {}}),
+            FakePolicy(lambda job, glidein: glidein["attrs"]["GLIDEIN_MaxMemMBs"] != 2000 or 1),
+        )
+        for match_expr in MATCH_EXPRESSIONS:
+            self.assertSameMatch(match_expr, True, policies, self.match_list)
+            self.assertSameMatch(match_expr, False, policies[:1], self.match_list)
+
+    def test_missing_key(self):
+        engine = MatchEngine('glidein["attrs"]["FOO"] == 3')
+        with mock.patch.object(glideinFrontendLib.logSupport.log, "debug") as m_debug:
+            glideinFrontendLib.countMatch(
+                compile(engine.match_expr, "<string>", "eval"),
+                self.condorq_dict,
+                self.glidein_dict,
+                {},
+                False,
+                match_engine=engine,
+            )
+            m_debug.assert_called_with(
+                "Failed to evaluate resource match in countMatch. Possibly match_expr has "
+                "errors and trying to reference job or site attribute(s) ''FOO'' in an inappropriate way."
+            )
+
+    def test_other_exception(self):
+        engine = MatchEngine("3//0")
+        with mock.patch.object(glideinFrontendLib.logSupport.log, "debug") as m_debug:
+            glideinFrontendLib.countMatch(
+                compile(engine.match_expr, "<string>", "eval"),
+                self.condorq_dict,
+                self.glidein_dict,
+                {},
+                False,
+                match_engine=engine,
+            )
+            log_msg = m_debug.call_args[0]
+            self.assertTrue("Most recent traceback" in str(log_msg), log_msg)
+            self.assertTrue("ZeroDivisionError: integer division or modulo by zero" in str(log_msg), log_msg)
+
+    def test_fixture(self):
+        # Same data used in test_frontend.py
+        condorMonitor.USE_HTCONDOR_PYTHON_BINDINGS = False
+        with mock.patch("glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv"):
+            cq = condorMonitor.CondorQ(schedd_name="sched1", pool_name="pool1")
+        with mock.patch("glideinwms.lib.condorExe.exe_cmd") as m_exe_cmd:
+            with open("cq.fixture") as f:
+                m_exe_cmd.return_value = f.readlines()
+            cq.load()
+        self.condorq_dict = {"sched1": cq}
+        self.assertSameMatch(MATCH_EXPRESSIONS[2].replace('.split(",")', ""), True)
+
+    def test_compact_classads(self):
+        # Same results with the jobs stored as CompactClassad
+        expected = {}
+        for match_expr in MATCH_EXPRESSIONS:
+            match_obj = compile(match_expr, "<string>", "eval")
+            expected[match_expr] = glideinFrontendLib.countMatch(
+                match_obj, self.condorq_dict, self.glidein_dict, {}, False, self.match_list
+            )
+        schema = condorMonitor.ClassadSchema()
+        for schedd_name, condorq in self.condorq_dict.items():
+            condorq.data = {k: schema.new_classad(v) for k, v in condorq.data.items()}
+        for match_expr in MATCH_EXPRESSIONS:
+            match_obj = compile(match_expr, "<string>", "eval")
+            self.assertEqual(
+                expected[match_expr],
+                glideinFrontendLib.countMatch(
+                    match_obj, self.condorq_dict, self.glidein_dict, {}, False, self.match_list
+                ),
+                match_expr,
+            )
+            self.assertSameMatch(match_expr, False, match_list=self.match_list)
+
+
+class TestMatchCache(unittest.TestCase):
+    def setUp(self):
+        glideinFrontendLib.logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmpdir.name, "match_cache.Idle.pickle")
+        self.match_list = ["RequestCpus", "RequestMemory", "DESIRED_Sites", "REQUIRED_OS"]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def new_cache(self, match_expr, **kwargs):
+        context = MatchCache.context_fingerprint(
+            match_expr, [], {}, ignore_down_entries=True, condorq_match_list=self.match_list
+        )
+        cache = MatchCache(self.fname, context, **kwargs)
+        cache.load()
+        return cache
+
+    def run_cycles(self, match_expr, use_engine):
+        """Match 3 cycles with the cache, changing jobs and entries in the second one, return the cache stats"""
+        condorq_dict = make_condorq_dict(nr_jobs=80)
+        glidein_dict = make_glidein_dict()
+        match_obj = compile(match_expr, "<string>", "eval")
+        engine = MatchEngine(match_expr) if use_engine else None
+        cycles_stats = []
+        for cycle in range(3):
+            if cycle == 1:
+                for glidein in list(glidein_dict.values())[:5]:
+                    glidein["attrs"]["GLIDEIN_Site"] = "Site1"
+                condorq_dict["schedd0"] = make_condorq_dict(1, 20, seed=cycle)["schedd0"]
+            expected = glideinFrontendLib.countMatch(match_obj, condorq_dict, glidein_dict, {}, True, self.match_list)
+            cache = self.new_cache(match_expr)
+            actual = glideinFrontendLib.countMatch(
+                match_obj, condorq_dict, glidein_dict, {}, True, self.match_list, match_engine=engine, match_cache=cache
+            )
+            cache.save()
+            self.assertEqual(expected, actual, "%s, cycle %d" % (match_expr, cycle))
+            cycles_stats.append(cache.stats())
+        return cycles_stats
+
+    def test_same_results(self):
+        for use_engine in (False, True):
+            for match_expr in MATCH_EXPRESSIONS:
+                cycles_stats = self.run_cycles(match_expr, use_engine)
+                # the first cycle has hits only for the clusters in multiple schedds
+                self.assertGreater(cycles_stats[0]["misses"], cycles_stats[0]["hits"])
+                self.assertGreater(cycles_stats[1]["hits"], cycles_stats[0]["hits"])
+                self.assertGreater(cycles_stats[2]["hits"], cycles_stats[1]["hits"], match_expr)
+                os.unlink(self.fname)
+
+    def test_no_misses_when_unchanged(self):
+        for use_engine in (False, True):
+            cycles_stats = self.run_cycles(MATCH_EXPRESSIONS[4], use_engine)
+            self.assertGreater(cycles_stats[1]["misses"], 0)
+            self.assertEqual(0, cycles_stats[2]["misses"])
+            self.assertGreater(cycles_stats[2]["saved_time"], 0)
+            os.unlink(self.fname)
+
+    def test_context_change(self):
+        self.run_cycles(MATCH_EXPRESSIONS[0], False)
+        self.assertGreater(len(self.new_cache(MATCH_EXPRESSIONS[0]).results), 0)
+        self.assertEqual({}, self.new_cache(MATCH_EXPRESSIONS[1]).results)
+
+    def test_eviction(self):
+        cache = self.new_cache("True", max_entries=10, max_age=100)
+        for i in range(20):
+            cache.now = 1000 + i
+            cache.set(MatchCache.job_key(("A", i)), b"fp", True)
+        cache.set(MatchCache.job_key(("B", 0)), b"fp", 1)
+        cache.now = 1020
+        # the least recently used ones are evicted
+        self.assertTrue(cache.get(MatchCache.job_key(("A", 0)), b"fp"))
+        cache.save()
+        self.assertEqual(10, len(cache.results))
+        self.assertIn((MatchCache.job_key(("A", 0)), b"fp"), cache.results)
+        self.assertNotIn((MatchCache.job_key(("A", 1)), b"fp"), cache.results)
+        # not used in the last 100 seconds: A11-A14
+        cache.now = 1115
+        cache.save()
+        self.assertEqual(6, len(cache.results))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
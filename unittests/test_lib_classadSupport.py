@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the advertise cache in glideinwms/lib/classadSupport.py"""
+
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+import xmlrunner
+
+from glideinwms.lib import classadSupport, logSupport
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+
+def make_ad(name, value):
+    ad = classadSupport.Classad("glideresource", "UPDATE_AD_GENERIC", "INVALIDATE_ADS_GENERIC")
+    ad.adParams["Name"] = name
+    ad.adParams["Value"] = value
+    return ad
+
+
+class TestAdvertiseCache(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmpdir.name, "ads")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_ads(self, ads):
+        with open(self.fname, "w") as f:
+            f.write("\n".join("%s" % ad for ad in ads))
+
+    def read_names(self):
+        with open(self.fname) as f:
+            return [classadSupport.get_classad_name(ad) for ad in classadSupport.split_classads(f.read())]
+
+    def test_split_classads(self):
+        ads = [make_ad("a", 1), make_ad("b", 'x = "y"'), make_ad("c", 3)]
+        text = "\n".join("%s" % ad for ad in ads)
+        self.assertEqual(["%s" % ad for ad in ads], classadSupport.split_classads(text))
+        self.assertEqual(["%s" % ad for ad in ads], classadSupport.split_classads(text.replace("\n\n", "\n\n\n")))
+        self.assertEqual([], classadSupport.split_classads(""))
+        self.assertEqual(
+            ["b"], [classadSupport.get_classad_name(ad) for ad in classadSupport.split_classads(text)][1:2]
+        )
+
+    def test_select_commit(self):
+        for state_fname in (None, os.path.join(self.tmpdir.name, "state")):
+            cache = classadSupport.AdvertiseCache(300, state_fname)
+            ads = {"a": "x=1\n", "b": "x=2\n", None: "x=3\n"}
+            published = cache.select(ads)
+            self.assertEqual(["a", "b", None], list(published))
+            # not committed (e.g. advertise failed), still to publish
+            self.assertEqual(published, cache.select(ads))
+            cache.commit(published)
+            ads["b"] = "x=4\n"
+            self.assertEqual(["b", None], list(cache.select(ads)))
+            # a new object finds the state in the file
+            if state_fname:
+                self.assertEqual(["b", None], list(classadSupport.AdvertiseCache(300, state_fname).select(ads)))
+            # keepalive
+            cache.keepalive = 0
+            self.assertEqual(["a", "b", None], list(cache.select(ads)))
+            cache.keepalive = 300
+            cache.reset()
+            self.assertEqual(["a", "b", None], list(cache.select(ads)))
+
+    def test_filter_file(self):
+        cache = classadSupport.AdvertiseCache(300)
+        ads = [make_ad("a", 1), make_ad("b", 2), make_ad("c", 3)]
+        self.write_ads(ads)
+        nr_ads, published = cache.filter_file(self.fname, "pool:")
+        self.assertEqual((3, ["pool:a", "pool:b", "pool:c"]), (nr_ads, list(published)))
+        self.assertEqual(["a", "b", "c"], self.read_names())
+        cache.commit(published)
+        ads[1].adParams["Value"] = 5
+        self.write_ads(ads)
+        nr_ads, published = cache.filter_file(self.fname, "pool:")
+        self.assertEqual((3, ["pool:b"]), (nr_ads, list(published)))
+        self.assertEqual(["b"], self.read_names())
+        with open(self.fname) as f:
+            self.assertFalse(f.read().startswith("\n"))
+        # the same ads for another pool
+        self.write_ads(ads)
+        self.assertEqual(3, len(cache.filter_file(self.fname, "pool2:")[1]))
+        # classads without name are always advertised
+        self.write_ads(ads + ['MyType = "Query"\n'])
+        self.assertEqual((4, {}), cache.filter_file(self.fname, "pool:"))
+        self.assertEqual(4, len(self.read_names()))
+
+    @mock.patch("glideinwms.lib.classadSupport.exe_condor_advertise")
+    def test_advertiser(self, mock_advertise):
+        sent = []
+        mock_advertise.side_effect = lambda fname, *args, **kwargs: sent.append(open(fname).read())
+        advertiser = classadSupport.ClassadAdvertiser(pool="pool", multi_support=True)
+        advertiser.advertiseCache = classadSupport.AdvertiseCache(300)
+        for name in "abc":
+            advertiser.addClassad(name, make_ad(name, 1))
+        advertiser.advertiseAllClassads()
+        self.assertEqual(1, len(sent))
+        self.assertEqual(3, len(classadSupport.split_classads(sent[0])))
+        advertiser.advertiseAllClassads()
+        self.assertEqual(1, len(sent))
+        advertiser.classads["c"].adParams["Value"] = 2
+        advertiser.advertiseAllClassads()
+        self.assertEqual(2, len(sent))
+        self.assertEqual(["c"], [classadSupport.get_classad_name(ad) for ad in classadSupport.split_classads(sent[1])])
+        # a failed advertisement is retried next time
+        advertiser.classads["a"].adParams["Value"] = 2
+        mock_advertise.side_effect = RuntimeError("failed")
+        with self.assertRaises(RuntimeError):
+            advertiser.advertiseAllClassads()
+        mock_advertise.side_effect = lambda fname, *args, **kwargs: sent.append(open(fname).read())
+        advertiser.advertiseAllClassads()
+        self.assertEqual(["a"], [classadSupport.get_classad_name(ad) for ad in classadSupport.split_classads(sent[2])])
+        # invalidating resets the cache
+        advertiser.invalidateConstrainedClassads("true")
+        advertiser.advertiseAllClassads()
+        self.assertEqual(3, len(classadSupport.split_classads(sent[-1])))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -79,6 +79,23 @@ class TestCondorExe(unittest.TestCase):
         for script in self.abnormal_exit_scripts:
             self.assertRaises(ExeError, exe_cmd, script, self.dummy_args)
 
+    def test_exe_cmd_env(self):
+        """The environment passed is added to the parent one without changing either, None values are unset"""
+        os.environ["GLIDEINWMS_TEST_UNSET"] = "parent"
+        self.addCleanup(os.environ.pop, "GLIDEINWMS_TEST_UNSET", None)
+        env = {"GLIDEINWMS_TEST_SET": "child", "GLIDEINWMS_TEST_UNSET": None}
+        lines = []
+        iexe_cmd("env", child_env=env, stdout_handler=lambda chunk: lines.extend(chunk.decode().splitlines()))
+        self.assertIn("GLIDEINWMS_TEST_SET=child", lines)
+        self.assertNotIn("GLIDEINWMS_TEST_UNSET=parent", lines)
+        self.assertIn("PATH=%s" % os.environ["PATH"], lines)
+        self.assertEqual({"GLIDEINWMS_TEST_SET": "child", "GLIDEINWMS_TEST_UNSET": None}, env)
+        self.assertEqual("parent", os.environ["GLIDEINWMS_TEST_UNSET"])
+        self.assertNotIn("GLIDEINWMS_TEST_SET", os.environ)
+        lines = iexe_cmd("env", child_env=env)
+        self.assertIn("GLIDEINWMS_TEST_SET=child", lines)
+        self.assertNotIn("GLIDEINWMS_TEST_UNSET=parent", lines)
+
     def test_exe_cmd_sbin(self):
         """
         exe_cmd_sbin is a wrapper for iexe_cmd.  See test_iexe_cmd docstring
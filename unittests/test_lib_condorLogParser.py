@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for the incremental parsing in glideinwms/lib/condorLogParser.py
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+import xmlrunner
+
+from glideinwms.lib import condorLogParser
+
+EVENTS = ("000", "001", "006", "022", "023", "012", "013", "004", "005", "009", "028")
+
+
+def make_events(nr_events, seed=3):
+    """Return a list of HTCondor user log events (as bytes)"""
+    rnd = random.Random(seed)
+    events = []
+    for i in range(nr_events):
+        status = rnd.choice(EVENTS)
+        jobid = "%i.%03i" % (100 + rnd.randint(0, 20), rnd.randint(0, 5))
+        events.append(
+            (
+                "%s (%s.000) 09/28 %02i:%02i:%02i Event %s\n"
+                "    some details (with parenthesis)\n"
+                "...\n" % (status, jobid, i // 3600 % 24, i // 60 % 60, i % 60, status)
+            ).encode()
+        )
+    return events
+
+
+class TestIncrementalParse(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.logname = os.path.join(self.tmpdir.name, "job.log")
+        self.data = b"".join(make_events(300))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data, mode="wb"):
+        with open(self.logname, mode) as f:
+            f.write(data)
+
+    def test_raw_incremental(self):
+        state = None
+        # growing file, also with events cut in the middle
+        for end in list(range(0, len(self.data), 997)) + [len(self.data)]:
+            self.write(self.data[:end])
+            jobs, state = condorLogParser.parseSubmitLogFastRawIncr(self.logname, state)
+            self.assertEqual(condorLogParser.parseSubmitLogFastRaw(self.logname), jobs, end)
+            if end > 0:
+                self.assertLessEqual(state["offset"], end)
+        self.assertEqual(len(self.data), state["offset"])
+
+    def test_timings_incremental(self):
+        state = None
+        for end in list(range(0, len(self.data), 1013)) + [len(self.data)]:
+            self.write(self.data[:end])
+            jobs, first_time, last_time, state = condorLogParser.parseSubmitLogFastRawTimingsIncr(self.logname, state)
+            self.assertEqual(
+                condorLogParser.parseSubmitLogFastRawTimings(self.logname), (jobs, first_time, last_time), end
+            )
+
+    def test_state_not_modified_by_tail(self):
+        # cut after the time of the event, before its end
+        cut = len(b"".join(make_events(300)[:150])) + 40
+        self.write(self.data[:cut])
+        jobs, state = condorLogParser.parseSubmitLogFastRawIncr(self.logname)
+        self.assertIsNot(jobs, state["jobs"])
+        self.write(self.data[cut:], "ab")
+        jobs, state = condorLogParser.parseSubmitLogFastRawIncr(self.logname, state)
+        self.assertIs(jobs, state["jobs"])
+        self.assertEqual(condorLogParser.parseSubmitLogFastRaw(self.logname), jobs)
+
+    def test_truncated_or_replaced(self):
+        self.write(self.data)
+        _, state = condorLogParser.parseSubmitLogFastRawIncr(self.logname)
+        other = b"".join(make_events(200, seed=7))
+        for data in (self.data[:1000], other, other + other):
+            # truncated, rewritten, rewritten with a longer file
+            self.write(data)
+            jobs, _ = condorLogParser.parseSubmitLogFastRawIncr(self.logname, state)
+            self.assertEqual(condorLogParser.parseSubmitLogFastRaw(self.logname), jobs)
+        # replaced by a new file (different inode)
+        os.unlink(self.logname)
+        self.write(self.data + self.data)
+        state["head"] = b""
+        jobs, _ = condorLogParser.parseSubmitLogFastRawIncr(self.logname, state)
+        self.assertEqual(condorLogParser.parseSubmitLogFastRaw(self.logname), jobs)
+
+    def test_cached_classes(self):
+        # The state is saved with the cache and used by the next object
+        events = make_events(300)
+        full_cache_dir = os.path.join(self.tmpdir.name, "full")
+        os.mkdir(full_cache_dir)
+        for log_class in (
+            condorLogParser.logSummary,
+            condorLogParser.logCompleted,
+            condorLogParser.logCounts,
+            condorLogParser.logSummaryTimings,
+        ):
+            self.write(b"")
+            for i in range(0, 301, 50):
+                self.write(b"".join(events[i : i + 50]), "ab")
+                obj = log_class(self.logname, self.tmpdir.name)
+                os.utime(self.logname, (0, 2 * i + 100))
+                if os.path.isfile(obj.cachename):
+                    os.utime(obj.cachename, (0, 2 * i))
+                obj.load()
+                full = log_class(self.logname, full_cache_dir)
+                full.loadFromLog()
+                self.assertEqual(full.data, obj.data, log_class.__name__)
+                self.assertTrue(os.path.isfile(obj.cachename + condorLogParser.INCR_CACHE_EXT))
+                self.assertEqual(os.path.getsize(self.logname), obj.loadIncrState()["offset"], log_class.__name__)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
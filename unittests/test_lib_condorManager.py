@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the advertisement with the Python bindings in glideinwms/lib/condorManager.py"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+import xmlrunner
+
+from glideinwms.lib import classadSupport, condorManager, condorMonitor, logSupport
+from glideinwms.unittests.unittest_utils import FakeLogger, TestImportError
+
+if not condorMonitor.USE_HTCONDOR_PYTHON_BINDINGS:
+    raise TestImportError("HTCondor Python bindings not available")
+
+
+class FakeCollector:
+    """Collector stub recording the updates"""
+
+    created = []
+
+    def __init__(self, pool_name, delay=0, fail=False):
+        self.pool_name = pool_name
+        self.delay = delay
+        self.fail = fail
+        self.updates = []
+        self.active = 0
+        self.max_active = 0
+        FakeCollector.created.append(self)
+
+    def advertise(self, ad_list, command="UPDATE_AD_GENERIC", use_tcp=True):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("advertise failed")
+            self.updates.append((command, use_tcp, [ad["Name"] for ad in ad_list]))
+        finally:
+            self.active -= 1
+
+
+def make_ads(names):
+    ads = []
+    for name in names:
+        ad = classadSupport.Classad("glideclient", "UPDATE_MASTER_AD", "INVALIDATE_MASTER_ADS")
+        ad.adParams["Name"] = name
+        ad.adParams["Value"] = 'with "quotes"'
+        ads.append(ad)
+    return ads
+
+
+class TestCollectorAdvertiser(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        FakeCollector.created = []
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        condorManager.bindings_advertiser = None
+
+    def test_batching_and_ordering(self):
+        advertiser = condorManager.CollectorAdvertiser(collector_factory=FakeCollector)
+        fname = os.path.join(self.tmpdir.name, "ads")
+        for batch in (["a", "b", "c"], ["d"], ["e", "f"]):
+            with open(fname, "w") as f:
+                f.write("\n".join("%s" % ad for ad in make_ads(batch)))
+            advertiser.advertise_file(fname, "UPDATE_MASTER_AD", False, "pool1")
+        advertiser.advertise(["%s" % ad for ad in make_ads(["g"])], "UPDATE_AD_GENERIC", True, "pool1")
+        # one Collector object, reused, and one update per batch in order
+        self.assertEqual(1, len(FakeCollector.created))
+        self.assertEqual(
+            [
+                ("UPDATE_MASTER_AD", False, ["a", "b", "c"]),
+                ("UPDATE_MASTER_AD", False, ["d"]),
+                ("UPDATE_MASTER_AD", False, ["e", "f"]),
+                ("UPDATE_AD_GENERIC", True, ["g"]),
+            ],
+            FakeCollector.created[0].updates,
+        )
+
+    @mock.patch("glideinwms.lib.condorMonitor.htcondor_full_reload")
+    def test_pools(self, mock_reload):
+        advertiser = condorManager.CollectorAdvertiser(
+            collector_factory=lambda pool: FakeCollector(pool, fail=pool == "bad")
+        )
+        ads = ["%s" % ad for ad in make_ads(["a", "b"])]
+        for pool in ("p1", "p2", "p1"):
+            advertiser.advertise(ads, "UPDATE_AD_GENERIC", pool_name=pool)
+        self.assertEqual(["p1", "p2"], [collector.pool_name for collector in FakeCollector.created])
+        self.assertEqual(2, len(FakeCollector.created[0].updates))
+        # the configuration from the environment is reloaded for each advertisement, also reusing the Collector
+        self.assertEqual(3, mock_reload.call_count)
+        # a failed Collector is discarded and created again
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                advertiser.advertise(ads, "UPDATE_AD_GENERIC", pool_name="bad")
+        self.assertEqual(4, len(FakeCollector.created))
+
+    def test_same_pool_serialized(self):
+        advertiser = condorManager.CollectorAdvertiser(collector_factory=lambda pool: FakeCollector(pool, delay=0.05))
+        threads = [
+            threading.Thread(target=advertiser.advertise, args=(["%s" % make_ads([str(i)])[0]], "UPDATE_AD_GENERIC"))
+            for i in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(FakeCollector.created))
+        self.assertEqual(1, FakeCollector.created[0].max_active)
+        self.assertEqual(4, len(FakeCollector.created[0].updates))
+
+    @mock.patch("glideinwms.lib.condorExe.exe_cmd_sbin")
+    def test_condorAdvertise(self, mock_exe):
+        fname = os.path.join(self.tmpdir.name, "ads")
+        with open(fname, "w") as f:
+            f.write("\n".join("%s" % ad for ad in make_ads(["a", "b"])))
+        condorManager.bindings_advertiser = condorManager.CollectorAdvertiser(collector_factory=FakeCollector)
+        condorManager.condorAdvertise(fname, "UPDATE_MASTER_AD", True, True, "pool1")
+        self.assertFalse(mock_exe.called)
+        self.assertEqual([("UPDATE_MASTER_AD", True, ["a", "b"])], FakeCollector.created[0].updates)
+        # fall back to condor_advertise
+        condorManager.bindings_advertiser = condorManager.CollectorAdvertiser(
+            collector_factory=lambda pool: FakeCollector(pool, fail=True)
+        )
+        condorManager.condorAdvertise(fname, "UPDATE_MASTER_AD", True, True, "pool1")
+        mock_exe.assert_called_once_with("condor_advertise", f"-pool pool1 -tcp -multiple UPDATE_MASTER_AD {fname}")
+        condorManager.bindings_advertiser = None
+        condorManager.condorAdvertise(fname, "UPDATE_MASTER_AD", False, False, None)
+        self.assertEqual(2, mock_exe.call_count)
+
+    def test_classad_advertiser_in_memory(self):
+        condorManager.bindings_advertiser = condorManager.CollectorAdvertiser(collector_factory=FakeCollector)
+        advertiser = classadSupport.ClassadAdvertiser(pool="pool1")
+        for ad in make_ads(["a", "b", "c"]):
+            advertiser.addClassad(ad.adParams["Name"], ad)
+        with mock.patch("glideinwms.lib.classadSupport.exe_condor_advertise") as mock_exe:
+            advertiser.advertiseAllClassads()
+            self.assertFalse(mock_exe.called)
+        self.assertEqual([("UPDATE_AD_GENERIC", False, ["a", "b", "c"])], FakeCollector.created[0].updates)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
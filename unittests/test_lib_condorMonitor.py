@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for the XML parsing and the indexes in glideinwms/lib/condorMonitor.py
+"""
+
+import os
+import pickle
+import re
+import subprocess
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+import xmlrunner
+
+from glideinwms.lib import condorExe, condorMonitor, condorSecurity
+from glideinwms.lib.condorMonitor import (
+    ClassadSchema,
+    ClassadXMLParser,
+    CompactClassad,
+    CompactClassadDict,
+    CondorQCache,
+    IndexedView,
+    QueryIndex,
+    QueryOrchestrator,
+    xml2list,
+)
+from glideinwms.lib.disk_cache import DiskCache
+
+XML_LINES = [
+    "Some warning printed before the XML <?xml",
+    '<?xml version="1.0"?>',
+    '<!DOCTYPE classads SYSTEM "classads.dtd">',
+    "<classads>",
+    "<c>",
+    '    <a n="ClusterId"><i>12345</i></a>',
+    '    <a n="Rank"><r>1.5</r></a>',
+    '    <a n="ExitBySignal"><b v="f"/></a>',
+    '    <a n="OnExitRemove"><b>t</b></a>',
+    '    <a n="TransferOutputRemaps"><un/></a>',
+    '    <a n="Cmd"><s>echo \\"a &amp; b\\"</s></a>',
+    '    <a n="Requirements"><e>(TARGET.Arch == "X86_64")</e></a>',
+    "</c>",
+    "<c>",
+    '    <a n="ClusterId"><i>12346</i></a>',
+    '    <a n="Cmd"><s>multi',
+    "line</s></a>",
+    "</c>",
+    "</classads>",
+]
+
+EXPECTED = [
+    {
+        "ClusterId": 12345,
+        "Rank": 1.5,
+        "ExitBySignal": False,
+        "OnExitRemove": True,
+        "TransferOutputRemaps": None,
+        "Cmd": 'echo "a & b"',
+        "Requirements": '(TARGET.Arch == "X86_64")',
+    },
+    {"ClusterId": 12346, "Cmd": "multi line"},
+]
+
+
+def chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestClassadXMLParser(unittest.TestCase):
+    def test_xml2list(self):
+        self.assertEqual(EXPECTED, xml2list(XML_LINES))
+        self.assertEqual([], xml2list(XML_LINES[:1]))
+
+    def test_chunks(self):
+        # Any split of the text gives the same result, both str and bytes
+        text = "\n".join(XML_LINES) + "\n"
+        for size in (1, 2, 3, 7, 64, len(text)):
+            self.assertEqual(EXPECTED, list(ClassadXMLParser().iterparse(chunks(text, size))), size)
+            self.assertEqual(EXPECTED, list(ClassadXMLParser().iterparse(chunks(text.encode(), size))), size)
+
+    def test_fixture(self):
+        with open("cq.fixture") as f:
+            lines = f.readlines()
+        with open("cq.fixture", "rb") as f:
+            data = f.read()
+        expected = xml2list(lines)
+        self.assertEqual(13, len(expected))
+        self.assertEqual(expected, list(ClassadXMLParser().iterparse(chunks(data, 100))))
+
+    def test_reentrant(self):
+        # Two parsers used alternately do not interfere
+        text = "\n".join(XML_LINES)
+        parser1 = ClassadXMLParser()
+        parser2 = ClassadXMLParser()
+        for chunk in chunks(text, 10):
+            parser1.feed(chunk)
+            parser2.feed(chunk)
+        parser1.close()
+        parser2.close()
+        self.assertEqual(EXPECTED, parser1.pop_classads())
+        self.assertEqual(EXPECTED, parser2.pop_classads())
+        self.assertEqual([], parser1.pop_classads())
+
+    def test_interned_names(self):
+        classads = xml2list(XML_LINES)
+        names = [k for k in classads[0] if k == "ClusterId"] + [k for k in classads[1] if k == "ClusterId"]
+        self.assertIs(names[0], names[1])
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError):
+            xml2list(XML_LINES[:-1])
+        with self.assertRaises(RuntimeError):
+            xml2list(XML_LINES[:4] + ["<c><x/></c>", "</classads>"])
+
+    def test_stream_from_command(self):
+        # Output streamed from the pipe of a command
+        parser = ClassadXMLParser()
+        out = condorExe.iexe_cmd("cat cq.fixture", stdout_handler=parser.feed)
+        self.assertEqual([], out)
+        parser.close()
+        with open("cq.fixture") as f:
+            self.assertEqual(xml2list(f.readlines()), parser.pop_classads())
+
+    def test_stream_errors(self):
+        with self.assertRaises(condorExe.ExeError):
+            condorExe.iexe_cmd("cat %s" % os.path.join("nonexistent", "cq.fixture"), stdout_handler=lambda x: None)
+        parser = ClassadXMLParser()
+        with self.assertRaises(condorExe.ExeError):
+            # the handler fails parsing the text
+            condorExe.iexe_cmd("cat cs.fixture test_lib_condorMonitor.py", stdout_handler=parser.feed)
+
+
+class TestQueryIndex(unittest.TestCase):
+    def setUp(self):
+        self.queries = {
+            "coll1": IndexedView(
+                {
+                    "s1": {"Owner": "a", "Group": "g1", "Cpus": 1, "State": "Idle"},
+                    "s2": {"Owner": "a", "Group": "g2", "Cpus": 4, "State": "Busy"},
+                    "s3": {"Owner": "b", "Cpus": 8, "State": "Busy"},
+                    "s4": {"Cpus": 2, "State": "Busy"},
+                }
+            ),
+            "coll2": IndexedView({"s1": {"Owner": "a", "Group": "g1", "Cpus": 2, "State": "Busy"}}),
+        }
+
+        def key_func(el):
+            if "Owner" not in el:
+                return None
+            if "Group" in el:
+                return [(el["Owner"], None), (el["Owner"], el["Group"])]
+            return (el["Owner"], None)
+
+        self.index = QueryIndex(
+            self.queries,
+            key_func,
+            {"Busy": lambda el: el["State"] == "Busy"},
+            {"Total": (None, lambda el: 1), "BusyCpus": ("Busy", lambda el: el["Cpus"])},
+        )
+        self.index.load()
+
+    def test_keys(self):
+        self.assertCountEqual([("a", None), ("a", "g1"), ("a", "g2"), ("b", None)], self.index.keys())
+
+    def test_count(self):
+        self.assertEqual(3, self.index.count(("a", None), "Total"))
+        self.assertEqual(6, self.index.count(("a", None), "BusyCpus"))
+        self.assertEqual(2, self.index.count(("a", "g1"), "Total"))
+        self.assertEqual(2, self.index.count(("a", "g1"), "BusyCpus"))
+        self.assertEqual(8, self.index.count(("b", None), "BusyCpus"))
+        self.assertEqual(0, self.index.count(("c", None), "Total"))
+        with self.assertRaises(KeyError):
+            self.index.count(("a", None), "Idle")
+
+    def test_view(self):
+        view = self.index.getView(("a", None))
+        self.assertEqual(["coll1", "coll2"], sorted(view))
+        self.assertEqual(["s1", "s2"], sorted(view["coll1"].fetchStored()))
+        view = self.index.getView(("a", "g1"), "Busy")
+        self.assertEqual({}, view["coll1"].fetchStored())
+        self.assertEqual(self.queries["coll2"].fetchStored(), view["coll2"].fetchStored())
+        self.assertIs(view, self.index.getView(("a", "g1"), "Busy"))
+        self.assertEqual({}, self.index.getView(("c", None))["coll1"].fetchStored())
+        with self.assertRaises(KeyError):
+            self.index.getView(("a", None), "Idle")
+
+    def test_reload(self):
+        self.queries["coll2"].stored_data = {}
+        self.index.load()
+        self.assertEqual(2, self.index.count(("a", None), "Total"))
+        self.assertEqual({}, self.index.getView(("a", None))["coll2"].fetchStored())
+
+
+def load_condorq(compact, format_list=None):
+    """Return a CondorQ loaded from cq.fixture"""
+    condorMonitor.USE_HTCONDOR_PYTHON_BINDINGS = False
+    with mock.patch("glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv"):
+        cq = condorMonitor.CondorQ(schedd_name="sched1", pool_name="pool1")
+    cq.compact_classads = compact
+    with mock.patch("glideinwms.lib.condorExe.exe_cmd") as m_exe_cmd:
+        with open("cq.fixture") as f:
+            m_exe_cmd.return_value = f.readlines()
+        cq.load(format_list=format_list)
+    return cq
+
+
+class TestCompactClassad(unittest.TestCase):
+    def test_mapping(self):
+        schema = ClassadSchema(["A", "B", "C"])
+        ad = schema.new_classad({"A": 1, "C": None, "D": "x"})
+        self.assertEqual(["A", "B", "C", "D"], schema.names)
+        self.assertEqual({"A": 1, "C": None, "D": "x"}, ad)
+        self.assertEqual(ad, {"A": 1, "C": None, "D": "x"})
+        self.assertEqual(3, len(ad))
+        self.assertEqual(["A", "C", "D"], list(ad))
+        self.assertEqual([1, None, "x"], list(ad.values()))
+        self.assertIn("C", ad)
+        self.assertNotIn("B", ad)
+        self.assertIsNone(ad.get("B"))
+        self.assertEqual(3, ad.get("B", 3))
+        with self.assertRaises(KeyError):
+            ad["B"]
+        with self.assertRaises(KeyError):
+            ad["Z"]
+        # records created before a name is added to the schema
+        other = schema.new_classad({"B": 2})
+        ad["E"] = 5
+        self.assertEqual({"B": 2}, other)
+        self.assertEqual(5, ad["E"])
+        del ad["A"]
+        self.assertEqual({"C": None, "D": "x", "E": 5}, ad)
+        with self.assertRaises(KeyError):
+            del ad["A"]
+        copy_ad = ad.copy()
+        copy_ad["C"] = 3
+        self.assertIsNone(ad["C"])
+
+    def test_pickle(self):
+        schema = ClassadSchema(["Attribute%d" % i for i in range(20)])
+        dicts = [{"Attribute%d" % i: j * i for i in range(20) if (i + j) % 7} for j in range(1000)]
+        compact = [schema.new_classad(d) for d in dicts]
+        unpickled = pickle.loads(pickle.dumps(compact))
+        self.assertEqual(dicts, unpickled)
+        # a single schema is shared also after unpickling
+        self.assertIs(unpickled[0]._schema, unpickled[1]._schema)
+        self.assertLess(2 * len(pickle.dumps(compact)), len(pickle.dumps(dicts)))
+        # by columns
+        compact_dict = CompactClassadDict(enumerate(compact))
+        unpickled = pickle.loads(pickle.dumps(compact_dict))
+        self.assertIsInstance(unpickled, CompactClassadDict)
+        self.assertEqual(dict(enumerate(dicts)), unpickled)
+        self.assertIs(unpickled[0]._schema, unpickled[1]._schema)
+        # mixed records and empty
+        compact_dict[1000] = {"A": 1}
+        compact_dict[1001] = ClassadSchema().new_classad({"B": 2})
+        self.assertEqual(compact_dict, pickle.loads(pickle.dumps(compact_dict)))
+        self.assertEqual(CompactClassadDict(), pickle.loads(pickle.dumps(CompactClassadDict())))
+
+    def test_condorq(self):
+        expected = load_condorq(False).fetchStored()
+        cq = load_condorq(True)
+        data = cq.fetchStored()
+        self.assertEqual(expected, data)
+        self.assertIsInstance(data, CompactClassadDict)
+        self.assertIsInstance(data[(12345, 0)], CompactClassad)
+        self.assertIsInstance(cq.fetchStored(lambda el: True), CompactClassadDict)
+        # the query classes work on the compact classads
+        self.assertEqual(
+            condorMonitor.SubQuery(load_condorq(False), lambda el: el.get("JobStatus") == 2).fetchStored(),
+            condorMonitor.SubQuery(cq, lambda el: el.get("JobStatus") == 2).fetchStored(),
+        )
+        self.assertEqual(
+            condorMonitor.Summarize(load_condorq(False), lambda el: el.get("JobStatus")).countStored(),
+            condorMonitor.Summarize(cq, lambda el: el.get("JobStatus")).countStored(),
+        )
+
+    def test_format_list(self):
+        format_list = [("JobStatus", "i"), ("Owner", "s")]
+        cq = load_condorq(True, format_list)
+        el = next(iter(cq.fetchStored().values()))
+        self.assertEqual(["JobStatus", "Owner"], el._schema.names[:2])
+        self.assertNotIn("ClusterId", el._schema.names)
+
+
+class SleepQuery(condorMonitor.StoredQuery):
+    """Query taking some time to load, or failing"""
+
+    def __init__(self, delay, fail=False):
+        self.delay = delay
+        self.fail = fail
+
+    def load(self, constraint=None, format_list=None):
+        time.sleep(self.delay)
+        if self.fail:
+            raise condorMonitor.QueryError("query failed")
+        self.stored_data = {"el": {"constraint": constraint, "format_list": format_list}}
+
+
+class TestQueryOrchestrator(unittest.TestCase):
+    def test_concurrent(self):
+        orchestrator = QueryOrchestrator()
+        queries = {"q%d" % i: SleepQuery(0.3) for i in range(10)}
+        for key, query in queries.items():
+            orchestrator.add_query(key, query, "True", [("A", "s")])
+        t_begin = time.time()
+        self.assertEqual(queries, orchestrator.run())
+        self.assertLess(time.time() - t_begin, 2)
+        self.assertEqual({"constraint": "True", "format_list": [("A", "s")]}, queries["q1"].fetchStored()["el"])
+        self.assertEqual(sorted(queries), sorted(orchestrator.latency))
+        self.assertGreaterEqual(min(orchestrator.latency.values()), 0.3)
+
+    def test_timeout_and_failure(self):
+        orchestrator = QueryOrchestrator(timeout=0.5)
+        orchestrator.add_query("fast", SleepQuery(0))
+        orchestrator.add_query("slow", SleepQuery(3))
+        orchestrator.add_query("slow_allowed", SleepQuery(0.8), timeout=2)
+        orchestrator.add_query("failing", SleepQuery(0, True))
+        t_begin = time.time()
+        results = orchestrator.run()
+        self.assertLess(time.time() - t_begin, 1.5)
+        self.assertEqual(["fast", "slow_allowed"], sorted(results))
+        self.assertEqual(["slow"], orchestrator.timed_out)
+        self.assertEqual(["failing"], list(orchestrator.failed))
+        self.assertIsInstance(orchestrator.failed["failing"], condorMonitor.QueryError)
+        self.assertEqual(0.5, orchestrator.latency["slow"])
+        self.assertEqual(4, len(orchestrator.latency))
+
+    def test_max_workers(self):
+        orchestrator = QueryOrchestrator(max_workers=2)
+        for i in range(4):
+            orchestrator.add_query(i, SleepQuery(0.2))
+        t_begin = time.time()
+        self.assertEqual(4, len(orchestrator.run()))
+        self.assertGreaterEqual(time.time() - t_begin, 0.4)
+        self.assertEqual({}, QueryOrchestrator().run())
+
+    @mock.patch.object(condorMonitor, "USE_HTCONDOR_PYTHON_BINDINGS", False)
+    @mock.patch("glideinwms.lib.condorExe.exe_cmd")
+    def test_security_env(self, m_exe_cmd):
+        # The security settings are passed to each command, the process environment is not changed
+        envs = []
+
+        def exe_cmd(exe_name, args, env=None, stdout_handler=None, process_handler=None):
+            envs.append(env)
+            return XML_LINES
+
+        m_exe_cmd.side_effect = exe_cmd
+        environ = dict(os.environ)
+        orchestrator = QueryOrchestrator()
+        for i, integrity in enumerate(("REQUIRED", "NEVER")):
+            security_obj = condorSecurity.ProtoRequest({"CLIENT": {"INTEGRITY": integrity, "ENCRYPTION": "UNSET"}})
+            query = condorMonitor.CondorQ(security_obj=security_obj)
+            query.env = {"CONDOR_CONFIG": "/etc/condor/condor_config.%d" % i}
+            orchestrator.add_query(integrity, query)
+        self.assertEqual(2, len(orchestrator.run()))
+        self.assertCountEqual(
+            [
+                {
+                    "CONDOR_CONFIG": "/etc/condor/condor_config.%d" % i,
+                    "_CONDOR_SEC_CLIENT_INTEGRITY": integrity,
+                    "_CONDOR_SEC_CLIENT_ENCRYPTION": None,
+                }
+                for i, integrity in enumerate(("REQUIRED", "NEVER"))
+            ],
+            envs,
+        )
+        self.assertEqual({"CONDOR_CONFIG": "/etc/condor/condor_config.0"}, orchestrator.queries["REQUIRED"][0].env)
+        self.assertEqual(environ, dict(os.environ))
+
+    @mock.patch.object(condorMonitor, "USE_HTCONDOR_PYTHON_BINDINGS", False)
+    @mock.patch("glideinwms.lib.condorExe.exe_cmd")
+    def test_timeout_kills_command(self, m_exe_cmd):
+        processes = []
+
+        def exe_cmd(exe_name, args, env=None, stdout_handler=None, process_handler=None):
+            process = subprocess.Popen(["sleep", "30"])
+            processes.append(process)
+            process_handler(process)
+            if process.wait():
+                raise condorExe.ExeError("sleep failed")
+            return []
+
+        m_exe_cmd.side_effect = exe_cmd
+        orchestrator = QueryOrchestrator(timeout=0.5)
+        query = condorMonitor.CondorQ()
+        orchestrator.add_query("slow", query)
+        self.assertEqual({}, orchestrator.run())
+        self.assertEqual(["slow"], orchestrator.timed_out)
+        self.assertEqual(1, len(processes))
+        self.assertEqual(-9, processes[0].wait(timeout=5))
+        # a command starting after the query has been cancelled is killed right away
+        process = subprocess.Popen(["sleep", "30"])
+        query._set_process(process)
+        self.assertEqual(-9, process.wait(timeout=5))
+
+
+class FakeSchedd:
+    """Job queue answering the queries of CondorQCache, counting the jobs returned"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.now = 1000
+        self.returned = 0
+
+    def set_job(self, job_id, status, **attrs):
+        self.jobs[job_id] = dict(attrs, JobStatus=status, EnteredCurrentStatus=self.now)
+        self.jobs[job_id].setdefault("QDate", self.now)
+
+    def set_grid_status(self, job_id, grid_status):
+        self.jobs[job_id].update(GridJobStatus=grid_status, LastRemoteStatusUpdate=self.now)
+
+    def fetch(self, constraint=None, format_list=None):
+        # changes query: "(Attr >= since) || ..."
+        since = re.findall(r"\((\w+) >= (-?\d+)\)", constraint or "")
+        out = {}
+        for job_id, job in self.jobs.items():
+            if job["JobStatus"] not in (1, 2):
+                continue
+            if since and not any(job.get(attr, -1000) >= int(time) for attr, time in since):
+                continue
+            el = dict(job, ServerTime=self.now)
+            if format_list is not None:
+                el = {k: el[k] for k, _ in format_list if k in el}
+            out[job_id] = el
+        self.returned += len(out)
+        return out
+
+
+class TestCondorQCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.tmpdir.name)
+        self.schedd = FakeSchedd()
+        self.schedd.now = 0
+        for i in range(100):
+            self.schedd.set_job((i, 0), 1, Owner="user%d" % (i % 3))
+        self.schedd.now = 1000
+        self.format_list = [("JobStatus", "i"), ("EnteredCurrentStatus", "i"), ("GridJobStatus", "s")]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def load(self, full_refresh_interval=3600):
+        """Load a new CondorQCache (like in a new process) and check it against a full query"""
+        with mock.patch("glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv"):
+            cq = CondorQCache("sched1", "pool1", cache=self.cache, full_refresh_interval=full_refresh_interval)
+        with mock.patch.object(cq, "fetch", side_effect=self.schedd.fetch):
+            cq.load("JobUniverse =!= 7", self.format_list)
+        returned = self.schedd.returned
+        full = self.schedd.fetch(None, self.format_list + [("ServerTime", "i")])
+        self.schedd.returned = returned
+        self.assertEqual(full, cq.fetchStored())
+        self.schedd.now += 100
+        return cq
+
+    def test_delta(self):
+        self.assertEqual("full", self.load().last_load_type)
+        self.schedd.returned = 0
+        self.schedd.set_job((5, 0), 2)
+        self.schedd.set_job((200, 0), 1)
+        self.schedd.set_job((7, 0), 4)
+        del self.schedd.jobs[(8, 0)]
+        cq = self.load()
+        self.assertEqual("delta", cq.last_load_type)
+        self.assertEqual({"changed": 2, "removed": 2}, cq.last_load_stats)
+        # the IDs of the 99 jobs plus the 2 changed ones
+        self.assertEqual(101, self.schedd.returned)
+        self.assertEqual(2, cq.fetchStored()[(5, 0)]["JobStatus"])
+        # the changes within sync_margin are retrieved again
+        self.assertEqual({"changed": 2, "removed": 0}, self.load().last_load_stats)
+        self.assertEqual({"changed": 0, "removed": 0}, self.load().last_load_stats)
+
+    def test_delta_grid_status(self):
+        # GridJobStatus and the hold attributes change without a status change in the factory queue
+        self.load()
+        self.schedd.set_grid_status((3, 0), "RUNNING")
+        self.schedd.jobs[(4, 0)].update(QDate=self.schedd.now, EnteredCurrentStatus=0)
+        cq = self.load()
+        self.assertEqual("delta", cq.last_load_type)
+        self.assertEqual({"changed": 2, "removed": 0}, cq.last_load_stats)
+        self.assertEqual("RUNNING", cq.fetchStored()[(3, 0)]["GridJobStatus"])
+
+    def test_full_refresh(self):
+        self.load(full_refresh_interval=0)
+        self.assertEqual("full", self.load(full_refresh_interval=0).last_load_type)
+        # a job in the queue but neither changed nor cached
+        self.load()
+        self.schedd.jobs[(300, 0)] = {"JobStatus": 1, "EnteredCurrentStatus": 0}
+        self.assertEqual("full", self.load().last_load_type)
+        self.assertEqual("delta", self.load().last_load_type)
+
+    def test_no_cache(self):
+        self.cache = condorMonitor.NoneDiskCache()
+        self.load()
+        self.assertEqual("full", self.load().last_load_type)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
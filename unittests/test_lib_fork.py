@@ -6,12 +6,15 @@
 """Unit test for glideinwms/lib/fork.py"""
 
 import os
+import pickle
 import sys
 
 # import select
 import time
 import unittest
 
+from unittest import mock
+
 import xmlrunner
 
 import glideinwms.lib.logSupport
@@ -26,12 +29,10 @@ from glideinwms.lib.fork import (
     ForkManager,
     ForkResultError,
     wait_for_pids,
+    WorkerPool,
 )
 from glideinwms.unittests.unittest_utils import create_temp_file, FakeLogger
 
-# from unittest import mock
-
-
 LOGFILE = None
 LOGDICT = {}
 
@@ -76,6 +77,16 @@ def sleep_fn(sleep_tm=None):
     return str(sleep_tm)
 
 
+def fail_fn(exit_process=False):
+    if exit_process:
+        os._exit(1)
+    raise ValueError("Task failed")
+
+
+def buffer_fn(size):
+    return {"pid": os.getpid(), "data": bytearray(b"x" * size)}
+
+
 class TestForkResultError(unittest.TestCase):
     def test___init__(self):
         fork_result_error = "FAILED"
@@ -87,6 +98,51 @@ class TestForkResultError(unittest.TestCase):
         return
 
 
+class TestForkResultChannel(unittest.TestCase):
+    def setUp(self):
+        init_log("TestForkResultChannel")
+
+    def test_large_result(self):
+        pipe_id = fork_in_bg(buffer_fn, 50 * 1024 * 1024)
+        stats = {}
+        result = fetch_fork_result(pipe_id["r"], pipe_id["pid"], stats)
+        self.assertEqual(50 * 1024 * 1024, len(result["data"]))
+        self.assertTrue(stats["bytes"] > 50 * 1024 * 1024)
+        self.assertIsNotNone(stats["serialize_time"])
+        self.assertNotIn(pipe_id["r"], fork._result_files)
+
+    def test_pipe_result(self):
+        # Children writing the pickled result on the pipe, like the Factory ones
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, pickle.dumps({"entry": "state"}))
+            os.close(w)
+            os._exit(0)
+        os.close(w)
+        pipe_ids = {"cpu0": {"r": r, "pid": pid}}
+        self.assertEqual({"cpu0": {"entry": "state"}}, fetch_fork_result_list(pipe_ids))
+
+    def test_no_result_file(self):
+        with mock.patch.object(fork, "_create_result_file", return_value=None):
+            pipe_id = fork_in_bg(sleep_fn, 0.1)
+        self.assertEqual("0.1", fetch_fork_result(pipe_id["r"], pipe_id["pid"], pipe_id["stats"]))
+        self.assertIsNone(pipe_id["stats"]["serialize_time"])
+
+    def test_failed_child(self):
+        pipe_id = fork_in_bg(fail_fn)
+        self.assertRaises(fork.FetchError, fetch_fork_result, pipe_id["r"], pipe_id["pid"])
+
+    def test_fork_manager_stats(self):
+        fork_manager = ForkManager()
+        for i in range(3):
+            fork_manager.add_fork(i, buffer_fn, 1000 * (i + 1))
+        fork_manager.bounded_fork_and_collect(max_forks=2, log_progress=False, sleep_time=0.01)
+        self.assertEqual([0, 1, 2], sorted(fork_manager.fork_stats))
+        self.assertTrue(fork_manager.fork_stats[2]["bytes"] > 3000)
+
+
 class TestForkInBg(unittest.TestCase):
     def test_fork_in_bg(self):
         init_log("TestForkInBg")
@@ -237,6 +293,95 @@ class TestForkManager(unittest.TestCase):
         self.assertTrue("module 'select' has no attribute 'poll'" in log_contents)
 
 
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        init_log("TestWorkerPool")
+        self.pool = WorkerPool(4)
+
+    def tearDown(self):
+        self.pool.close()
+        global_log_cleanup()
+
+    def load_tasks(self, num_tasks=20, sleep_val=0.1):
+        expected = {}
+        for i in range(0, num_tasks):
+            expected[i] = str(sleep_val)
+            self.pool.add_fork(i, sleep_fn, sleep_val)
+        return expected
+
+    def test_add_fork_and_len(self):
+        self.load_tasks(10)
+        self.assertEqual(10, len(self.pool))
+        self.assertRaises(KeyError, self.pool.add_fork, 1, sleep_fn)
+
+    def test_bounded_fork_and_collect(self):
+        expected = self.load_tasks()
+        results = self.pool.bounded_fork_and_collect(max_forks=2, log_progress=True)
+        self.assertEqual(expected, results)
+        self.assertEqual(0, len(self.pool))
+        self.assertEqual(set(expected), set(self.pool.task_stats))
+        # max_forks limits the workers used
+        self.assertEqual(2, len({stats["worker"] for stats in self.pool.task_stats.values()}))
+        with open(LOGFILE) as fd:
+            self.assertTrue("Forks to finish =" in fd.read())
+
+    def test_workers_reused(self):
+        self.load_tasks(8, 0.01)
+        self.pool.fork_and_collect()
+        pids = {worker.pid for worker in self.pool.workers}
+        expected = self.load_tasks(8, 0.01)
+        self.assertEqual(expected, self.pool.fork_and_collect())
+        self.assertEqual(pids, {worker.pid for worker in self.pool.workers})
+        self.assertTrue(set(stats["worker"] for stats in self.pool.task_stats.values()) <= pids)
+
+    def test_recycle_after(self):
+        pool = WorkerPool(2, recycle_after=3)
+        try:
+            for i in range(12):
+                pool.add_fork(i, buffer_fn, 10)
+            results = pool.fork_and_collect()
+            pids_per_task = {}
+            for i in range(12):
+                pids_per_task.setdefault(results[i]["pid"], []).append(i)
+            self.assertTrue(len(pids_per_task) >= 4)
+            self.assertTrue(max(len(x) for x in pids_per_task.values()) <= 3)
+        finally:
+            pool.close()
+
+    def test_out_of_band_buffers(self):
+        self.pool.add_fork("big", buffer_fn, 10 * 1024 * 1024)
+        results = self.pool.fork_and_collect()
+        self.assertEqual(bytearray(b"x" * 10 * 1024 * 1024), results["big"]["data"])
+        self.assertTrue(self.pool.task_stats["big"]["result_bytes"] > 10 * 1024 * 1024)
+
+    def test_no_out_of_band_buffers(self):
+        # the workers are forked after the patch, so they use the same frames
+        self.pool.close()
+        with mock.patch.object(fork, "PICKLE_OUT_OF_BAND", False):
+            self.pool = WorkerPool(2)
+            self.pool.add_fork("big", buffer_fn, 1024 * 1024)
+            expected = self.load_tasks(4, 0.01)
+            results = self.pool.fork_and_collect()
+            # header and pickle data, no out-of-band buffers
+            self.assertEqual(2, len(fork._pickle_frame(bytearray(b"x" * 1024))))
+        self.assertEqual(bytearray(b"x" * 1024 * 1024), results.pop("big")["data"])
+        self.assertEqual(expected, results)
+
+    def test_failures(self):
+        expected = self.load_tasks(6, 0.01)
+        self.pool.add_fork("error", fail_fn)
+        self.pool.add_fork("exit", fail_fn, True)
+        with self.assertRaises(ForkResultError) as cm:
+            self.pool.fork_and_collect()
+        self.assertEqual(2, cm.exception.nr_errors)
+        self.assertCountEqual(["error", "exit"], cm.exception.failed)
+        self.assertEqual(expected, cm.exception.good_results)
+        # the pool is still working
+        self.assertEqual(4, len(self.pool.workers))
+        expected = self.load_tasks(6, 0.01)
+        self.assertEqual(expected, self.pool.fork_and_collect())
+
+
 class TestWaitForPids(unittest.TestCase):
     def test_wait_for_pids(self):
         init_log("TestWaitForPids")
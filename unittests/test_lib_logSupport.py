@@ -10,6 +10,7 @@ Purpose:
 
 import logging
 import os
+import re
 import shutil
 import sys
 import tempfile
@@ -209,5 +210,125 @@ class TestLogSupport(unittest.TestCase):
         self.assertTrue(len(file_list) == len(gzip_list) + 1, "Log file rotate didn't compress the files.")
 
 
+def process_logs(max_mbytes):
+    """ProcessLogs configuration with an INFO and a DEBUG log file"""
+    plog = {"structured": "False", "max_days": "7", "min_days": "0", "backup_count": "5", "compression": ""}
+    return str(
+        [
+            {**plog, "msg_types": "INFO,WARN,ERR", "extension": "info", "max_mbytes": max_mbytes},
+            {**plog, "msg_types": "DEBUG", "extension": "debug", "max_mbytes": "100"},
+        ]
+    )
+
+
+class TestLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        logSupport.log_writer_address = None
+        os.environ.pop(logSupport.LOG_WRITER_ENV, None)
+
+    def tearDown(self):
+        # the writer exits after this process
+        logSupport.log_writer_address = None
+        os.environ.pop(logSupport.LOG_WRITER_ENV, None)
+        shutil.rmtree(self.log_dir)
+
+    def read_lines(self, prefix, nr_lines):
+        """Return the lines of the log files starting with prefix, waiting for the writer to write them"""
+        for _ in range(50):
+            lines = []
+            # the current file, named prefix, is the last one
+            for fname in sorted(os.listdir(self.log_dir), key=lambda fname: (fname == prefix, fname)):
+                if fname.startswith(prefix):
+                    with open(os.path.join(self.log_dir, fname)) as f:
+                        lines += f.readlines()
+            if len(lines) >= nr_lines:
+                break
+            time.sleep(0.1)
+        return lines
+
+    def test_size_counter(self):
+        handler = logSupport.GlideinHandler(os.path.join(self.log_dir, "counted.log"), maxMBytes=0.001, backupCount=2)
+        handler.setFormatter(logSupport.DEFAULT_FORMATTER)
+        handler.use_size_counter()
+        log = logSupport.get_logging_logger("counted")
+        log.addHandler(handler)
+        for i in range(15):
+            log.info("%02i %s", i, "x" * 90)
+        handler.flush()
+        self.assertEqual(os.path.getsize(handler.baseFilename), handler.stream_size)
+        self.assertEqual(2, len(os.listdir(self.log_dir)))
+        log.removeHandler(handler)
+        handler.close()
+
+    def test_writer(self):
+        address = logSupport.start_log_writer(self.log_dir)
+        self.assertEqual(address, os.environ[logSupport.LOG_WRITER_ENV])
+        # the socket directory is accessible only by the user
+        self.assertEqual(0o700, os.stat(os.path.dirname(address)).st_mode & 0o777)
+        # the processes started later use the same writer
+        logSupport.log_writer_address = None
+        self.assertEqual(address, logSupport.start_log_writer())
+
+        log = logSupport.get_logger_with_handlers("writer", self.log_dir, {"ProcessLogs": process_logs("0.01")})
+        self.assertEqual([logSupport.LogWriterHandler], [type(h) for h in log.handlers])
+        log.info("parent")
+        pids = []
+        for child in range(4):
+            pid = os.fork()
+            if pid == 0:
+                for i in range(40):
+                    log.info("child %i line %02i %s", child, i, "x" * 60)
+                log.debug("child %i debug", child)
+                logSupport.flush_log_writer()
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        log.debug("debug")
+        try:
+            raise ValueError("failed")
+        except ValueError:
+            log.exception("error")
+
+        lines = self.read_lines("writer.info.log", 163)
+        # whole lines from all the processes, rotated once by size
+        self.assertEqual(2, len([fname for fname in os.listdir(self.log_dir) if fname.startswith("writer.info")]))
+        self.assertEqual(162, len([line for line in lines if line.startswith("[")]))
+        self.assertEqual(
+            160, len([line for line in lines if re.match(r"^\[.*\] INFO: child \d line \d\d x{60}$", line)])
+        )
+        self.assertTrue(lines[-1].startswith("ValueError: failed"))
+        # the buffered DEBUG records, sent before exiting or before the error
+        debug_lines = self.read_lines("writer.debug.log", 5)
+        self.assertEqual(5, len(debug_lines))
+        self.assertEqual(4, len([line for line in debug_lines if re.search(r"DEBUG: .*: child \d debug$", line)]))
+        self.assertRegex(debug_lines[-1], r"DEBUG: test_lib_logSupport:\d+: debug$")
+
+    def test_writer_refused_messages(self):
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir)
+        logSupport.start_log_writer(self.log_dir)
+        handler = logSupport.LogWriterHandler(logSupport.log_writer_address, "outside")
+        # a log file outside the log directory, and a message that is not JSON
+        handler.send(("handler", "outside", ("outside", other_dir, "INFO", "info", 7.0, 0.0, 10.0, 5, "")))
+        handler.send(("handler", "outside", ("../outside", self.log_dir, "INFO", "info", 7.0, 0.0, 10.0, 5, "")))
+        handler.send_frame(logSupport.LOG_FRAME_HEADER.pack(4) + b"\x80\x04N.")
+        handler.close()
+        # the writer keeps writing the log files in the log directory
+        log = logSupport.get_logger_with_handlers("inside", self.log_dir, {"ProcessLogs": process_logs("10")})
+        log.info("inside")
+        self.assertEqual(1, len(self.read_lines("inside.info.log", 1)))
+        self.assertEqual([], os.listdir(other_dir))
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.log_dir), "outside.info.log")))
+
+    def test_writer_not_available(self):
+        logSupport.log_writer_address = os.path.join(self.log_dir, "missing.sock")
+        log = logSupport.get_logger_with_handlers("nowriter", self.log_dir, {"ProcessLogs": process_logs("10")})
+        self.assertEqual([logSupport.GlideinHandler] * 2, [type(h) for h in log.handlers])
+        for handler in log.handlers:
+            handler.close()
+
+
 if __name__ == "__main__":
     unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the batched RRD updates in glideinwms/lib/rrdSupport.py"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import xmlrunner
+
+from glideinwms.lib import logSupport, rrdSupport
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+# Fake `rrdtool -`: logs the commands and fails the ones with "bad"
+FAKE_RRDTOOL = """#!%s
+import sys
+with open(sys.argv[0] + ".log", "a") as log:
+    for line in sys.stdin:
+        log.write(line)
+        log.flush()
+        if "bad" in line:
+            print("ERROR: bad value", flush=True)
+        else:
+            print("OK u:0.00 s:0.00 r:0.00", flush=True)
+"""
+
+
+class FakeRRDModule:
+    """rrdtool module stub recording the updates"""
+
+    def __init__(self):
+        self.updates = []
+
+    def update(self, *args):
+        if any("bad" in arg for arg in args):
+            raise RuntimeError("bad value")
+        self.updates.append(args)
+
+
+class TestRRDUpdateService(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.rrd = rrdSupport.BaseRRDSupport(FakeRRDModule())
+        self.service = rrdSupport.set_update_service(True)
+
+    def tearDown(self):
+        rrdSupport.set_update_service(False)
+
+    def test_coalesce(self):
+        self.rrd.update_rrd_multi("a.rrd", 300, {"Idle": 1, "Running": None})
+        self.rrd.update_rrd_multi("a.rrd", 300, {"Running": 2})
+        self.rrd.update_rrd_multi("a.rrd", 600, {"Idle": 3, "Running": 4})
+        self.rrd.update_rrd_multi("a.rrd", 900, {"Idle": 5})
+        self.rrd.update_rrd_multi("b.rrd", 300, {"Idle": None})
+        self.assertEqual([], self.rrd.rrd_obj.updates)
+        self.assertEqual(3, self.service.depth)
+        stats = rrdSupport.flush_updates()
+        self.assertEqual(
+            [
+                ("a.rrd", "-t", "Idle:Running", "300:1:2", "600:3:4"),
+                ("a.rrd", "-t", "Idle", "900:5"),
+            ],
+            self.rrd.rrd_obj.updates,
+        )
+        self.assertEqual(
+            (0, 3, 2, 1, 0), tuple(stats[k] for k in ("depth", "updates", "commands", "coalesced", "errors"))
+        )
+        # reading writes the queue first
+        self.rrd.update_rrd_multi("a.rrd", 1200, {"Idle": 6})
+        with self.assertRaises(RuntimeError):
+            self.rrd.fetch_rrd("a.rrd", "AVERAGE")  # no file
+        self.assertEqual(("a.rrd", "-t", "Idle", "1200:6"), self.rrd.rrd_obj.updates[-1])
+
+    def test_errors(self):
+        self.service.max_queue = 3
+        self.rrd.update_rrd_multi("a.rrd", 300, {"Idle": "bad"})
+        self.rrd.update_rrd_multi("a.rrd", 600, {"Idle": 1})
+        self.rrd.update_rrd_multi("b.rrd", 300, {"Idle": 2})
+        # flushed when full, a bad value does not discard the others
+        self.assertEqual([("a.rrd", "-t", "Idle", "600:1"), ("b.rrd", "-t", "Idle", "300:2")], self.rrd.rrd_obj.updates)
+        self.assertEqual(1, self.service.get_stats()["errors"])
+        self.assertEqual(0, self.service.depth)
+
+    def test_daemon(self):
+        rrdSupport.set_update_service(True, daemon="unix:/tmp/rrdcached.sock")
+        self.rrd.update_rrd_multi("a.rrd", 300, {"Idle": 1})
+        rrdSupport.flush_updates()
+        self.assertEqual(
+            [("a.rrd", "--daemon", "unix:/tmp/rrdcached.sock", "-t", "Idle", "300:1")], self.rrd.rrd_obj.updates
+        )
+
+    def test_disabled(self):
+        rrdSupport.set_update_service(False)
+        self.assertIsNone(rrdSupport.flush_updates())
+        self.rrd.update_rrd_multi("a.rrd", 300, {"Idle": 1})
+        self.assertEqual([("a.rrd", "-t", "Idle", "300:1")], self.rrd.rrd_obj.updates)
+
+
+class TestRRDToolPipe(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.rrd_bin = os.path.join(self.tmpdir.name, "rrdtool")
+        with open(self.rrd_bin, "w") as f:
+            f.write(FAKE_RRDTOOL % sys.executable)
+        os.chmod(self.rrd_bin, 0o755)
+        rrd_exe = rrdSupport.rrdtool_exe.__new__(rrdSupport.rrdtool_exe)
+        rrd_exe.rrd_bin = self.rrd_bin
+        self.rrd = rrdSupport.BaseRRDSupport(rrd_exe)
+        self.service = rrdSupport.set_update_service(True)
+
+    def tearDown(self):
+        self.service.pipe.close()
+        rrdSupport.set_update_service(False)
+        self.tmpdir.cleanup()
+
+    def test_pipe(self):
+        for i in range(3):
+            self.rrd.update_rrd_multi("a b.rrd", 300 * (i + 1), {"Idle": "bad" if i == 1 else i})
+            rrdSupport.flush_updates()
+        pipe = self.service.pipe
+        self.assertTrue(pipe.is_usable())
+        with open(self.rrd_bin + ".log") as f:
+            self.assertEqual(
+                [
+                    'update "a b.rrd" "-t" "Idle" "300:0"\n',
+                    'update "a b.rrd" "-t" "Idle" "600:bad"\n',
+                    'update "a b.rrd" "-t" "Idle" "900:2"\n',
+                ],
+                f.readlines(),
+            )
+        self.assertEqual(1, self.service.get_stats()["errors"])
+        # a new process if the previous one died
+        pipe.close()
+        self.assertFalse(pipe.is_usable())
+        self.rrd.update_rrd_multi("a.rrd", 1200, {"Idle": 3})
+        rrdSupport.flush_updates()
+        self.assertIsNot(pipe, self.service.pipe)
+        self.assertEqual(1, self.service.get_stats()["errors"])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2009 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit test for the monitoring snapshots in glideinwms/lib/snapshotSupport.py"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import xmlrunner
+
+from glideinwms.lib import logSupport, snapshotSupport
+from glideinwms.unittests.unittest_utils import FakeLogger
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        logSupport.log = FakeLogger()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmpdir.name, "status.json")
+        self.snapshot = snapshotSupport.get_snapshot_fname(self.fname)
+        self.loaded = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data, data_time=100.0):
+        """Write the JSON file and then the snapshot, as the monitoring does"""
+        with open(self.fname, "w") as f:
+            json.dump({"data": data}, f)
+        return snapshotSupport.write_snapshot(self.snapshot, {"data": data}, data_time)
+
+    def from_snapshot(self, data):
+        self.loaded.append("snapshot")
+        return data["data"]
+
+    def from_json(self, fname):
+        self.loaded.append("json")
+        with open(fname) as f:
+            return json.load(f)["data"]
+
+    def load(self, cache):
+        return cache.load(self.snapshot, self.from_snapshot, self.fname, self.from_json)
+
+    def test_write_load(self):
+        self.assertEqual(os.path.join(self.tmpdir.name, "status.snap"), self.snapshot)
+        self.assertEqual(1, self.write([1, 2]))
+        self.assertEqual(2, self.write([3], 200.0))
+        self.assertEqual((2, 200.0, {"data": [3]}), snapshotSupport.load_snapshot(self.snapshot))
+        self.assertFalse(os.path.exists(f"{self.snapshot}.tmp"))
+        with open(self.snapshot, "r+b") as f:
+            f.write(b"NOTASNAP")
+        with self.assertRaises(ValueError):
+            snapshotSupport.load_snapshot(self.snapshot)
+        # an invalid snapshot restarts the sequence
+        self.assertEqual(1, self.write([4]))
+
+    def test_cache(self):
+        cache = snapshotSupport.SnapshotCache()
+        self.write([1])
+        self.assertEqual([1], self.load(cache))
+        self.assertEqual([1], self.load(cache))
+        self.assertEqual(["snapshot"], self.loaded)
+        self.assertEqual({"reused": 1, "snapshots": 1, "fallbacks": 0}, cache.prune())
+        # a new snapshot, even with the same time, is loaded again
+        self.write([2])
+        self.assertEqual([2], self.load(cache))
+        self.assertEqual(["snapshot", "snapshot"], self.loaded)
+        cache.prune()
+        self.assertEqual([self.snapshot], list(cache.cache))
+        # not used since the previous prune
+        cache.prune()
+        self.assertEqual({}, cache.cache)
+
+    def test_fallback(self):
+        cache = snapshotSupport.SnapshotCache()
+        self.write([1])
+        # the snapshot is older than the file
+        with open(self.fname, "w") as f:
+            json.dump({"data": [2]}, f)
+        os.utime(self.snapshot, (0, 0))
+        self.assertEqual([2], self.load(cache))
+        self.assertEqual([2], self.load(cache))
+        self.assertEqual(["json"], self.loaded)
+        # missing or corrupted snapshot
+        os.remove(self.snapshot)
+        self.assertEqual([2], cache.load(self.snapshot, self.from_snapshot, self.fname, self.from_json))
+        with open(self.snapshot, "wb") as f:
+            f.write(b"corrupted")
+        self.assertEqual([2], self.load(cache))
+        self.assertEqual(["json"], self.loaded)
+        self.assertEqual({"reused": 3, "snapshots": 0, "fallbacks": 1}, cache.prune())
+        # no files
+        os.remove(self.fname)
+        os.remove(self.snapshot)
+        with self.assertRaises(FileNotFoundError):
+            self.load(cache)
+        # the snapshot alone is enough
+        snapshotSupport.write_snapshot(self.snapshot, {"data": [3]}, 100.0)
+        self.assertEqual([3], self.load(cache))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output="unittests-reports"))
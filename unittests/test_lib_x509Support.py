@@ -13,7 +13,8 @@ Author:
     Dennis Box dbox@fnal.gov
 """
 
-
+import calendar
+import time
 import unittest
 
 import xmlrunner
@@ -23,7 +24,7 @@ import glideinwms.lib.subprocessSupport
 from glideinwms.unittests.unittest_utils import TestImportError
 
 try:
-    from glideinwms.lib.x509Support import extract_DN
+    from glideinwms.lib.x509Support import extract_DN, extract_not_after
 except ImportError as err:
     raise TestImportError(str(err))
 
@@ -46,6 +47,15 @@ class TestExtractDN(unittest.TestCase):
         self.assertEqual(expected, extract_DN(fname))
 
 
+class TestExtractNotAfter(unittest.TestCase):
+    def test_extract_not_after(self):
+        """Testing the expiration time, the same as openssl"""
+        fname = "fixtures/hostcert.pem"
+        out = glideinwms.lib.subprocessSupport.iexe_cmd(f"openssl x509 -noout -enddate -in {fname}")
+        expected = calendar.timegm(time.strptime(out.split("=")[1].strip(), "%b %d %H:%M:%S %Y %Z"))
+        self.assertEqual(expected, extract_not_after(fname))
+
+
 if __name__ == "__main__":
     ofl = "unittests-reports"
     unittest.main(testRunner=xmlrunner.XMLTestRunner(output=ofl))